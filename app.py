@@ -11,27 +11,76 @@ from datetime import datetime, date, time, timedelta
 from dotenv import load_dotenv, find_dotenv
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_from_directory
 from werkzeug.utils import secure_filename
-from backend.ai_service import run_ai_chat
-from backend.ai_embeddings import get_openai_client, embed_text
+from backend.ai_service import SEMANTIC_SEARCH_TYPES, run_ai_chat, semantic_search
+from backend.ai_embeddings import get_openai_client, embed_text, embed_texts_cached
 from backend.embedding_service import (
     ENTITY_BOOKMARK,
     ENTITY_CALENDAR,
     ENTITY_RECALL,
     ENTITY_TODO_ITEM,
     ENTITY_TODO_LIST,
+    collect_unused_vectors,
     delete_embedding_for_entity,
+    ensure_embeddings_for_type,
+    mark_embedding_dirty,
+    mark_embedding_dirty_detached,
+    refresh_dirty_embeddings,
     refresh_embedding_for_entity,
 )
 from models import db, User, TodoList, TodoItem, Note, NoteFolder, NoteListItem, NoteLink, NoteImage, InboxItem, AreaFolder, Area, AreaSection, AreaBlock, AreaBlockItem, AreaItem, CalendarEvent, RecurringEvent, RecurrenceException, Notification, NotificationSetting, PushSubscription, RecallItem, QuickAccessItem, BookmarkItem, DoFeedItem, PlannerFolder, PlannerSimpleItem, PlannerGroup, PlannerMultiItem, PlannerMultiLine, DocumentFolder, Document
 from apscheduler.schedulers.background import BackgroundScheduler
-from pywebpush import webpush, WebPushException
 import requests
 from sqlalchemy import or_, func
 from backend.background_jobs import start_app_context_job, start_daemon_thread
+from backend.embedding_queue import embedding_queue
+from backend.duplicate_scan import (
+    duplicate_scan_results,
+    queue_stale_duplicate_scans,
+    request_duplicate_scan,
+    run_pending_duplicate_scans,
+)
+from backend.calendar_conflicts import (
+    ScheduledEntry,
+    candidate_bounds,
+    event_end_minutes,
+    load_day_schedules,
+    minutes_to_time,
+    time_to_minutes,
+)
+from backend.calendar_rollover import roll_over_calendar
+from backend.daily_digest import prefetch_digest_items, select_digest_users, smtp_session_from_env
 from backend.phase_utils import canonicalize_phase_flags, is_phase_header
+from backend.push_delivery import PushTarget, push_delivery
+from backend.reminder_dispatcher import local_to_utc, reminder_dispatcher, reminder_due_at
+from backend.recurrence import (
+    nth_weekday_of_month,
+    parse_virtual_occurrence_id,
+    recurrence_occurrences,
+    recurrence_occurs_on,
+    virtual_occurrence_id,
+    weekday_occurrence_in_month,
+)
+from backend.title_index import ENTITY_TYPES as SUGGEST_ENTITY_TYPES, suggest_titles
+from backend.search_index import (
+    ensure_search_index,
+    rebuild_search_index,
+    reindex_search_entities,
+    search_entity_ids,
+    search_hits,
+)
+from backend.vault_text import end_extraction_kick, extract_pending_document_text, try_begin_extraction_kick
 from services.ai_gateway import call_chat_json, call_chat_text, parse_json_object
 from services.bulk_handlers import bulk_notes_route, bulk_vault_documents_route
 from services.duplicate_service import build_list_preview_text, detect_note_list_duplicates
+from services.duplicate_index import (
+    LIST_KIND_AREA,
+    LIST_KIND_NOTE,
+    list_duplicate_signatures_fn,
+    persist_pending_signatures,
+    prune_orphaned_duplicate_entries,
+    remove_list_duplicate_entries,
+    update_list_duplicate_entries,
+)
 from services.quick_bookmark_handlers import (
     bookmark_detail_route,
     bulk_bookmarks_route,
@@ -86,6 +135,8 @@ app.config['VAPID_PUBLIC_KEY'] = os.environ.get('VAPID_PUBLIC_KEY', '')
 app.config['VAPID_PRIVATE_KEY'] = os.environ.get('VAPID_PRIVATE_KEY', '')
 app.config['OPENAI_API_KEY'] = os.environ.get('OPENAI_API_KEY', '')
 app.config['OPENAI_STT_MODEL'] = os.environ.get('OPENAI_STT_MODEL', 'whisper-1')
+# Compute recurring occurrences from their rules on read instead of writing rows for every viewed day.
+app.config['CALENDAR_VIRTUAL_RECURRENCES'] = os.environ.get('CALENDAR_VIRTUAL_RECURRENCES', '0') == '1'
 DEFAULT_VAULT_MAX_SIZE = 50 * 1024 * 1024
 try:
     app.config['VAULT_MAX_FILE_SIZE'] = int(os.environ.get('VAULT_MAX_FILE_SIZE', DEFAULT_VAULT_MAX_SIZE))
@@ -95,6 +146,7 @@ except (TypeError, ValueError):
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    ensure_search_index()
 scheduler = None
 # Ensure our app logger emits INFO to the console
 if app.logger.level > logging.INFO or app.logger.level == logging.NOTSET:
@@ -103,6 +155,11 @@ if app.logger.level > logging.INFO or app.logger.level == logging.NOTSET:
 DEFAULT_SIDEBAR_ORDER = ['home', 'inbox', 'tasks', 'areas', 'calendar', 'notes', 'vault', 'recalls', 'bookmarks', 'feed', 'quick-access', 'ai', 'settings']
 DEFAULT_HOMEPAGE_ORDER = ['inbox', 'tasks', 'areas', 'calendar', 'notes', 'vault', 'recalls', 'bookmarks', 'feed', 'quick-access', 'ai', 'settings', 'download']
 CALENDAR_ITEM_NOTE_MAX_CHARS = 300
+CALENDAR_CONFLICT_MAX_SLOTS = 500
+# Virtual recurrences: days ahead that reminder rules get real rows for.
+RECURRING_MATERIALIZE_DAYS = max(1, int(os.environ.get('RECURRING_MATERIALIZE_DAYS', 2)))
+# Reminders found later than this (e.g. after downtime) are marked sent without a push.
+REMINDER_MISSED_GRACE_MINUTES = max(0, int(os.environ.get('REMINDER_MISSED_GRACE_MINUTES', 60)))
 NOTE_LIST_CONVERSION_MIN_LINES = 2
 NOTE_LIST_CONVERSION_MAX_LINES = 100
 NOTE_LIST_CONVERSION_MAX_CHARS = 80
@@ -196,6 +253,14 @@ def start_embedding_job(user_id, entity_type, entity_id):
     from backend.app_core_logic import start_embedding_job as _impl
     return _impl(user_id, entity_type, entity_id)
 
+def start_duplicate_scan_job():
+    from backend.app_core_logic import start_duplicate_scan_job as _impl
+    return _impl()
+
+def start_vault_text_job():
+    from backend.app_core_logic import start_vault_text_job as _impl
+    return _impl()
+
 def delete_embedding(user_id, entity_type, entity_id):
     from backend.app_core_logic import delete_embedding as _impl
     return _impl(user_id, entity_type, entity_id)
@@ -248,21 +313,13 @@ def _event_end_minutes(start_minutes, end_time):
     from backend.app_core_logic import _event_end_minutes as _impl
     return _impl(start_minutes, end_time)
 
-def _task_conflicts_with_event(user_id, day_obj, task_start, task_end, new_task_exclusive, exclude_event_id=None):
-    from backend.app_core_logic import _task_conflicts_with_event as _impl
-    return _impl(user_id, day_obj, task_start, task_end, new_task_exclusive, exclude_event_id)
-
-def _event_conflicts_with_event(user_id, day_obj, event_start, event_end, new_allow_overlap, exclude_event_id=None):
-    from backend.app_core_logic import _event_conflicts_with_event as _impl
-    return _impl(user_id, day_obj, event_start, event_end, new_allow_overlap, exclude_event_id)
+def _calendar_conflict(user_id, day_obj, start_time, end_time, is_event, allow_overlap, exclude_event_id=None):
+    from backend.app_core_logic import _calendar_conflict as _impl
+    return _impl(user_id, day_obj, start_time, end_time, is_event, allow_overlap, exclude_event_id)
 
-def _event_conflicts_with_task(user_id, day_obj, event_start, event_end, new_event_allow_overlap, exclude_event_id=None):
-    from backend.app_core_logic import _event_conflicts_with_task as _impl
-    return _impl(user_id, day_obj, event_start, event_end, new_event_allow_overlap, exclude_event_id)
-
-def _task_conflicts_with_task(user_id, day_obj, task_start, task_end, new_task_exclusive, exclude_event_id=None):
-    from backend.app_core_logic import _task_conflicts_with_task as _impl
-    return _impl(user_id, day_obj, task_start, task_end, new_task_exclusive, exclude_event_id)
+def _calendar_conflict_schedules(user_id, days):
+    from backend.app_core_logic import _calendar_conflict_schedules as _impl
+    return _impl(user_id, days)
 
 def _next_calendar_order(day_value, user_id):
     from backend.app_core_logic import _next_calendar_order as _impl
@@ -280,17 +337,41 @@ def _recurrence_occurs_on(rule, day_value):
     from backend.app_core_logic import _recurrence_occurs_on as _impl
     return _impl(rule, day_value)
 
-def _ensure_recurring_instances(user_id, start_day, end_day):
+def _ensure_recurring_instances(user_id, start_day, end_day, *criteria):
     from backend.app_core_logic import _ensure_recurring_instances as _impl
-    return _impl(user_id, start_day, end_day)
+    return _impl(user_id, start_day, end_day, *criteria)
+
+def _virtual_recurrences_enabled():
+    from backend.app_core_logic import _virtual_recurrences_enabled as _impl
+    return _impl()
+
+def _virtual_recurring_events(user_id, start_day, end_day, events=()):
+    from backend.app_core_logic import _virtual_recurring_events as _impl
+    return _impl(user_id, start_day, end_day, events)
+
+def _recurring_occurrence_event(user_id, rule_id, day_value):
+    from backend.app_core_logic import _recurring_occurrence_event as _impl
+    return _impl(user_id, rule_id, day_value)
+
+def _materialize_recurring_occurrence(user_id, rule_id, day_value):
+    from backend.app_core_logic import _materialize_recurring_occurrence as _impl
+    return _impl(user_id, rule_id, day_value)
+
+def _skip_recurring_occurrence(user_id, rule_id, day_value):
+    from backend.app_core_logic import _skip_recurring_occurrence as _impl
+    return _impl(user_id, rule_id, day_value)
+
+def _materialize_recurring_horizon(user_id=None):
+    from backend.app_core_logic import _materialize_recurring_horizon as _impl
+    return _impl(user_id)
 
 def _prune_recurring_instances(rule, user_id):
     from backend.app_core_logic import _prune_recurring_instances as _impl
     return _impl(rule, user_id)
 
-def _rollover_incomplete_events():
+def _rollover_incomplete_events(dry_run=False):
     from backend.app_core_logic import _rollover_incomplete_events as _impl
-    return _impl()
+    return _impl(dry_run)
 
 def _cleanup_completed_tasks():
     from backend.app_core_logic import _cleanup_completed_tasks as _impl
@@ -324,6 +405,10 @@ def _send_event_reminder(event_id):
     from backend.app_core_logic import _send_event_reminder as _impl
     return _impl(event_id)
 
+def _dispatch_due_reminders(event_ids):
+    from backend.app_core_logic import _dispatch_due_reminders as _impl
+    return _impl(event_ids)
+
 def _check_calendar_reminders():
     from backend.app_core_logic import _check_calendar_reminders as _impl
     return _impl()
@@ -387,6 +472,30 @@ def scheduler_status():
     return jsonify({'running': running, 'jobs': jobs})
 
 
+@app.route('/api/embeddings/status')
+def embeddings_status():
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'No user selected'}), 401
+    from backend.ann_index import ann_registry
+    from backend.embedding_service import embedding_index_status
+    from backend.lexical_index import lexical_cache
+    from backend.query_embedding_cache import query_embedding_cache
+    from backend.vector_cache import vector_cache
+    index = {
+        entity_type: embedding_index_status(user.id, entity_type)
+        for entity_type in (ENTITY_RECALL, ENTITY_BOOKMARK, ENTITY_TODO_ITEM, ENTITY_TODO_LIST, ENTITY_CALENDAR)
+    }
+    return jsonify({
+        'vector_cache': vector_cache.stats(),
+        'query_cache': query_embedding_cache.stats(),
+        'ann_index': ann_registry.stats(),
+        'lexical_index': lexical_cache.stats(),
+        'refresh_queue': embedding_queue.stats(),
+        'index': index,
+    })
+
+
 @app.route('/api/user/profile', methods=['GET', 'PUT'])
 def user_profile():
     from services.user_routes import user_profile as _impl
@@ -1139,12 +1248,19 @@ def recurring_event_detail(rule_id):
     return _impl(rule_id)
 
 
-@app.route('/api/calendar/events/<int:event_id>', methods=['PUT', 'DELETE'])
+# Signed: virtual recurring occurrences use negative ids.
+@app.route('/api/calendar/events/<int(signed=True):event_id>', methods=['PUT', 'DELETE'])
 def calendar_event_detail(event_id):
     from services.calendar_routes import calendar_event_detail as _impl
     return _impl(event_id)
 
 
+@app.route('/api/calendar/conflicts', methods=['POST'])
+def check_calendar_conflicts():
+    from services.calendar_routes import check_calendar_conflicts as _impl
+    return _impl()
+
+
 @app.route('/api/calendar/events/reorder', methods=['POST'])
 def reorder_calendar_events():
     from services.inline_routes import reorder_calendar_events as _impl
@@ -1294,6 +1410,26 @@ def search_entities():
     from services.inline_routes import search_entities as _impl
     return _impl()
 
+@app.route('/api/suggest')
+def suggest_entities():
+    from services.inline_routes import suggest_entities as _impl
+    return _impl()
+
+@app.route('/api/semantic-search')
+def semantic_search_entities():
+    from services.inline_routes import semantic_search_entities as _impl
+    return _impl()
+
+@app.route('/api/duplicates', methods=['GET'])
+def duplicate_matches():
+    from services.inline_routes import duplicate_matches as _impl
+    return _impl()
+
+@app.route('/api/duplicates/scan', methods=['POST'])
+def duplicate_scan_start():
+    from services.inline_routes import duplicate_scan_start as _impl
+    return _impl()
+
 @app.route('/api/ai/chat', methods=['POST'])
 def ai_chat():
     from services.inline_routes import ai_chat as _impl
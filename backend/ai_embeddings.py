@@ -1,9 +1,17 @@
 import os
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Sequence
 
 from flask import current_app
 from openai import OpenAI
 
+from backend.query_embedding_cache import MAX_CACHEABLE_CHARS, query_embedding_cache
+
+
+MAX_INPUT_CHARS = 7000
+# OpenAI caps a single embeddings request at 2048 inputs and ~300k tokens.
+DEFAULT_BATCH_MAX_INPUTS = 256
+DEFAULT_BATCH_MAX_TOKENS = 100_000
+
 
 def get_openai_client() -> OpenAI:
     api_key = os.environ.get("OPENAI_API_KEY")
@@ -12,10 +20,49 @@ def get_openai_client() -> OpenAI:
     return OpenAI(api_key=api_key)
 
 
+def embeddings_available() -> bool:
+    return bool(os.environ.get("OPENAI_API_KEY"))
+
+
+def embedding_model_name() -> str:
+    return os.environ.get("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used to size batches."""
+    return len(text) // 4 + 1
+
+
+def iter_token_batches(
+    texts: Sequence[str],
+    max_tokens: int = DEFAULT_BATCH_MAX_TOKENS,
+    max_inputs: int = DEFAULT_BATCH_MAX_INPUTS,
+) -> Iterator[List[int]]:
+    """Yield lists of indexes into texts whose combined token estimate fits the budget."""
+    batch: List[int] = []
+    batch_tokens = 0
+    for idx, text in enumerate(texts):
+        tokens = estimate_tokens(text[:MAX_INPUT_CHARS])
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_inputs):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(idx)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
 def embed_text(text: str) -> Optional[List[float]]:
     cleaned = (text or "").strip()
     if not cleaned:
         return None
+    model_name = embedding_model_name()
+    cacheable = len(cleaned) <= MAX_CACHEABLE_CHARS
+    if cacheable:
+        cached = query_embedding_cache.get(model_name, cleaned)
+        if cached is not None:
+            return cached
     try:
         client = get_openai_client()
     except Exception as exc:
@@ -23,10 +70,84 @@ def embed_text(text: str) -> Optional[List[float]]:
             current_app.logger.warning(f"Embedding unavailable: {exc}")
         return None
     try:
-        model_name = os.environ.get("OPENAI_EMBED_MODEL", "text-embedding-3-small")
-        resp = client.embeddings.create(model=model_name, input=cleaned[:7000])
-        return resp.data[0].embedding
+        resp = client.embeddings.create(model=model_name, input=cleaned[:MAX_INPUT_CHARS])
+        vector = resp.data[0].embedding
+        if cacheable and vector:
+            query_embedding_cache.put(model_name, cleaned, vector)
+        return vector
     except Exception as exc:
         if current_app:
             current_app.logger.warning(f"Embedding failed: {exc}")
         return None
+
+
+def embed_texts(texts: Sequence[str]) -> List[Optional[List[float]]]:
+    """
+    Embed several texts with one multi-input request.
+
+    Returns a list aligned with texts; blank inputs and failed requests yield None.
+    Callers are responsible for keeping each call within the token budget
+    (see iter_token_batches).
+    """
+    results: List[Optional[List[float]]] = [None] * len(texts)
+    inputs = []
+    positions = []
+    for idx, text in enumerate(texts):
+        cleaned = (text or "").strip()
+        if cleaned:
+            inputs.append(cleaned[:MAX_INPUT_CHARS])
+            positions.append(idx)
+    if not inputs:
+        return results
+    try:
+        client = get_openai_client()
+    except Exception as exc:
+        if current_app:
+            current_app.logger.warning(f"Embedding unavailable: {exc}")
+        return results
+    try:
+        resp = client.embeddings.create(model=embedding_model_name(), input=inputs)
+    except Exception as exc:
+        if current_app:
+            current_app.logger.warning(f"Batch embedding failed ({len(inputs)} inputs): {exc}")
+        return results
+    for item in resp.data:
+        index = getattr(item, "index", None)
+        if index is None or not 0 <= index < len(positions):
+            continue
+        results[positions[index]] = item.embedding
+    return results
+
+
+def embed_texts_cached(texts: Sequence[str]) -> List[Optional[List[float]]]:
+    """
+    Batch counterpart of embed_text: short texts are served from the query cache
+    and only the misses are embedded, in token-bounded multi-input requests.
+    """
+    model_name = embedding_model_name()
+    results: List[Optional[List[float]]] = [None] * len(texts)
+    missing: Dict[str, List[int]] = {}
+    for idx, text in enumerate(texts):
+        cleaned = (text or "").strip()
+        if not cleaned:
+            continue
+        if len(cleaned) <= MAX_CACHEABLE_CHARS:
+            cached = query_embedding_cache.get(model_name, cleaned)
+            if cached is not None:
+                results[idx] = cached
+                continue
+        missing.setdefault(cleaned, []).append(idx)
+    if not missing:
+        return results
+    unique = list(missing)
+    for batch in iter_token_batches(unique):
+        vectors = embed_texts([unique[pos] for pos in batch])
+        for pos, vector in zip(batch, vectors):
+            if not vector:
+                continue
+            cleaned = unique[pos]
+            if len(cleaned) <= MAX_CACHEABLE_CHARS:
+                query_embedding_cache.put(model_name, cleaned, vector)
+            for idx in missing[cleaned]:
+                results[idx] = vector
+    return results
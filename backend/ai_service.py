@@ -1,22 +1,25 @@
 import json
+import math
 import os
 from datetime import datetime, date, time
 from typing import Any, Dict, List, Optional, Sequence
 
 import pytz
 from flask import current_app
+from sqlalchemy.orm import contains_eager, selectinload
 from .ai_embeddings import embed_text, get_openai_client
-from .background_jobs import start_app_context_job
+from .embedding_queue import embedding_queue
 from .embedding_service import (
     ENTITY_BOOKMARK,
     ENTITY_CALENDAR,
     ENTITY_RECALL,
     ENTITY_TODO_ITEM,
     ENTITY_TODO_LIST,
-    ensure_embeddings_for_type,
-    list_embedding_vectors,
-    refresh_embedding_for_entity,
-    score_embeddings,
+    embedding_index_status,
+    get_embedding_matrix,
+    hybrid_rank,
+    mark_embedding_dirty_detached,
+    score_embedding_index,
 )
 from models import db, TodoList, TodoItem, CalendarEvent, RecallItem, BookmarkItem
 from .ai_context import get_all_ai_context
@@ -26,6 +29,7 @@ from services.ai_gateway import call_chat_json
 
 ALLOWED_STATUSES = {"not_started", "in_progress", "done"}
 ALLOWED_PRIORITIES = {"low", "medium", "high"}
+SEMANTIC_SEARCH_TYPES = (ENTITY_RECALL, ENTITY_BOOKMARK, ENTITY_TODO_ITEM, ENTITY_CALENDAR)
 ORDINAL_MAP = {
     "first": 1,
     "second": 2,
@@ -46,20 +50,12 @@ def _start_embedding_job(user_id: int, entity_type: str, entity_id: int) -> None
         app = current_app._get_current_object()
     except Exception:
         return
+    try:
+        mark_embedding_dirty_detached(user_id, entity_type, [entity_id])
+    except Exception as exc:
+        app.logger.warning("Embedding dirty marker failed for %s:%s (%s)", entity_type, entity_id, exc)
+    embedding_queue.enqueue(app, user_id, entity_type, [entity_id])
 
-    def _refresh_single_embedding():
-        refresh_embedding_for_entity(user_id, entity_type, entity_id)
-
-    def _on_error(exc):
-        app.logger.warning(
-            "Embedding refresh failed for %s:%s user=%s (%s)",
-            entity_type,
-            entity_id,
-            user_id,
-            exc,
-        )
-
-    start_app_context_job(app, _refresh_single_embedding, on_error=_on_error)
 
 def _list_lists(user_id: int, list_type: Optional[str] = None, search: Optional[str] = None) -> List[Dict[str, Any]]:
     query = TodoList.query.filter_by(user_id=user_id)
@@ -112,8 +108,13 @@ def _calendar_event_dict(item: CalendarEvent, similarity: Optional[float] = None
     return data
 
 
+def _ai_rerank_enabled() -> bool:
+    return os.environ.get("AI_SEARCH_RERANK", "0").lower() in ("1", "true", "yes", "on")
+
+
 def _rerank_with_ai(query: str, candidates: Sequence[Dict[str, Any]], limit: int) -> Optional[List[int]]:
-    if not query or not candidates:
+    """Opt-in (AI_SEARCH_RERANK) LLM reorder, used only for low-confidence hybrid results."""
+    if not query or not candidates or not _ai_rerank_enabled():
         return None
 
     system_prompt = (
@@ -217,14 +218,15 @@ def _create_recall(
     return _recall_dict(recall)
 
 
-def _search_recalls_semantic(user_id: int, query: str, limit: int = 6) -> List[Dict[str, Any]]:
+def _search_recalls_semantic(
+    user_id: int, query: str, limit: int = 6, *, embed: bool = True
+) -> List[Dict[str, Any]]:
     if not query:
         return []
     candidate_limit = max(limit, 30)
-    ensure_embeddings_for_type(user_id, ENTITY_RECALL, max_new=200)
-    embeddings = list_embedding_vectors(user_id, ENTITY_RECALL)
-    query_vec = embed_text(query)
-    if not embeddings or not query_vec:
+    embedding_ids, embedding_matrix = get_embedding_matrix(user_id, ENTITY_RECALL)
+    query_vec = embed_text(query) if embed else None
+    if not embedding_ids.size or not query_vec:
         items = RecallItem.query.filter(RecallItem.user_id == user_id).all()
         needle = query.lower()
         results = []
@@ -238,8 +240,10 @@ def _search_recalls_semantic(user_id: int, query: str, limit: int = 6) -> List[D
         trimmed = results[: max(1, min(candidate_limit, 30))]
         return [_recall_dict(item, similarity=score) for score, item in trimmed]
 
-    scored = score_embeddings(query_vec, embeddings, candidate_limit)
-    ids = [entity_id for score, entity_id in scored if score > 0]
+    scored, confident = hybrid_rank(
+        user_id, ENTITY_RECALL, query, query_vec, embedding_ids, embedding_matrix, candidate_limit
+    )
+    ids = [entity_id for _, entity_id in scored]
     if not ids:
         return []
     items = RecallItem.query.filter(RecallItem.user_id == user_id, RecallItem.id.in_(ids)).all()
@@ -258,7 +262,7 @@ def _search_recalls_semantic(user_id: int, query: str, limit: int = 6) -> List[D
             "payload": item.payload,
             "similarity": score,
         })
-    reranked_ids = _rerank_with_ai(query, candidates, limit)
+    reranked_ids = None if confident else _rerank_with_ai(query, candidates, limit)
     if reranked_ids:
         return [_recall_dict(item_map[item_id]) for item_id in reranked_ids if item_id in item_map]
     return [
@@ -345,14 +349,15 @@ def _create_bookmark(
     return _bookmark_dict(bookmark)
 
 
-def _search_bookmarks_semantic(user_id: int, query: str, limit: int = 6) -> List[Dict[str, Any]]:
+def _search_bookmarks_semantic(
+    user_id: int, query: str, limit: int = 6, *, embed: bool = True
+) -> List[Dict[str, Any]]:
     if not query:
         return []
     candidate_limit = max(limit, 30)
-    ensure_embeddings_for_type(user_id, ENTITY_BOOKMARK, max_new=200)
-    embeddings = list_embedding_vectors(user_id, ENTITY_BOOKMARK)
-    query_vec = embed_text(query)
-    if not embeddings or not query_vec:
+    embedding_ids, embedding_matrix = get_embedding_matrix(user_id, ENTITY_BOOKMARK)
+    query_vec = embed_text(query) if embed else None
+    if not embedding_ids.size or not query_vec:
         items = BookmarkItem.query.filter(BookmarkItem.user_id == user_id).all()
         needle = query.lower()
         results = []
@@ -366,8 +371,10 @@ def _search_bookmarks_semantic(user_id: int, query: str, limit: int = 6) -> List
         trimmed = results[: max(1, min(candidate_limit, 30))]
         return [_bookmark_dict(item, similarity=score) for score, item in trimmed]
 
-    scored = score_embeddings(query_vec, embeddings, candidate_limit)
-    ids = [entity_id for score, entity_id in scored if score > 0]
+    scored, confident = hybrid_rank(
+        user_id, ENTITY_BOOKMARK, query, query_vec, embedding_ids, embedding_matrix, candidate_limit
+    )
+    ids = [entity_id for _, entity_id in scored]
     if not ids:
         return []
     items = BookmarkItem.query.filter(BookmarkItem.user_id == user_id, BookmarkItem.id.in_(ids)).all()
@@ -385,7 +392,7 @@ def _search_bookmarks_semantic(user_id: int, query: str, limit: int = 6) -> List
             "pinned": bool(item.pinned),
             "similarity": score,
         })
-    reranked_ids = _rerank_with_ai(query, candidates, limit)
+    reranked_ids = None if confident else _rerank_with_ai(query, candidates, limit)
     if reranked_ids:
         return [_bookmark_dict(item_map[item_id]) for item_id in reranked_ids if item_id in item_map]
     return [
@@ -395,14 +402,15 @@ def _search_bookmarks_semantic(user_id: int, query: str, limit: int = 6) -> List
     ]
 
 
-def _search_tasks_semantic(user_id: int, query: str, limit: int = 6) -> List[Dict[str, Any]]:
+def _search_tasks_semantic(
+    user_id: int, query: str, limit: int = 6, *, embed: bool = True
+) -> List[Dict[str, Any]]:
     if not query:
         return []
     candidate_limit = max(limit, 30)
-    ensure_embeddings_for_type(user_id, ENTITY_TODO_ITEM, max_new=200)
-    embeddings = list_embedding_vectors(user_id, ENTITY_TODO_ITEM)
-    query_vec = embed_text(query)
-    if not embeddings or not query_vec:
+    embedding_ids, embedding_matrix = get_embedding_matrix(user_id, ENTITY_TODO_ITEM)
+    query_vec = embed_text(query) if embed else None
+    if not embedding_ids.size or not query_vec:
         like_expr = f"%{query}%"
         items = (
             TodoItem.query.join(TodoList, TodoItem.list_id == TodoList.id)
@@ -419,8 +427,10 @@ def _search_tasks_semantic(user_id: int, query: str, limit: int = 6) -> List[Dic
         )
         return [_task_dict(item) for item in items[: max(1, min(candidate_limit, 30))]]
 
-    scored = score_embeddings(query_vec, embeddings, candidate_limit)
-    ids = [entity_id for score, entity_id in scored if score > 0]
+    scored, confident = hybrid_rank(
+        user_id, ENTITY_TODO_ITEM, query, query_vec, embedding_ids, embedding_matrix, candidate_limit
+    )
+    ids = [entity_id for _, entity_id in scored]
     if not ids:
         return []
     items = (
@@ -445,7 +455,7 @@ def _search_tasks_semantic(user_id: int, query: str, limit: int = 6) -> List[Dic
             "project_type": item.list.type if item.list else None,
             "similarity": score,
         })
-    reranked_ids = _rerank_with_ai(query, candidates, limit)
+    reranked_ids = None if confident else _rerank_with_ai(query, candidates, limit)
     if reranked_ids:
         return [_task_dict(item_map[item_id]) for item_id in reranked_ids if item_id in item_map]
     return [
@@ -455,14 +465,15 @@ def _search_tasks_semantic(user_id: int, query: str, limit: int = 6) -> List[Dic
     ]
 
 
-def _search_calendar_semantic(user_id: int, query: str, limit: int = 6) -> List[Dict[str, Any]]:
+def _search_calendar_semantic(
+    user_id: int, query: str, limit: int = 6, *, embed: bool = True
+) -> List[Dict[str, Any]]:
     if not query:
         return []
     candidate_limit = max(limit, 30)
-    ensure_embeddings_for_type(user_id, ENTITY_CALENDAR, max_new=200)
-    embeddings = list_embedding_vectors(user_id, ENTITY_CALENDAR)
-    query_vec = embed_text(query)
-    if not embeddings or not query_vec:
+    embedding_ids, embedding_matrix = get_embedding_matrix(user_id, ENTITY_CALENDAR)
+    query_vec = embed_text(query) if embed else None
+    if not embedding_ids.size or not query_vec:
         like_expr = f"%{query}%"
         items = (
             CalendarEvent.query.filter(CalendarEvent.user_id == user_id)
@@ -477,8 +488,10 @@ def _search_calendar_semantic(user_id: int, query: str, limit: int = 6) -> List[
         )
         return [_calendar_event_dict(item) for item in items[: max(1, min(candidate_limit, 30))]]
 
-    scored = score_embeddings(query_vec, embeddings, candidate_limit)
-    ids = [entity_id for score, entity_id in scored if score > 0]
+    scored, confident = hybrid_rank(
+        user_id, ENTITY_CALENDAR, query, query_vec, embedding_ids, embedding_matrix, candidate_limit
+    )
+    ids = [entity_id for _, entity_id in scored]
     if not ids:
         return []
     items = CalendarEvent.query.filter(CalendarEvent.user_id == user_id, CalendarEvent.id.in_(ids)).all()
@@ -500,7 +513,7 @@ def _search_calendar_semantic(user_id: int, query: str, limit: int = 6) -> List[
             "priority": item.priority,
             "similarity": score,
         })
-    reranked_ids = _rerank_with_ai(query, candidates, limit)
+    reranked_ids = None if confident else _rerank_with_ai(query, candidates, limit)
     if reranked_ids:
         return [_calendar_event_dict(item_map[item_id]) for item_id in reranked_ids if item_id in item_map]
     return [
@@ -510,6 +523,139 @@ def _search_calendar_semantic(user_id: int, query: str, limit: int = 6) -> List[
     ]
 
 
+def _merge_semantic_hits(scored_by_type: Dict[str, List[Any]], limit: int) -> List[Any]:
+    """
+    Merge per-type (score, id) lists by similarity with a per-type quota.
+
+    Each type with hits is first capped at an equal share of the slots so one large
+    collection cannot crowd out the others; unused slots are then backfilled by score.
+    """
+    merged = sorted(
+        (
+            (score, entity_type, entity_id)
+            for entity_type, scored in scored_by_type.items()
+            for score, entity_id in scored
+            if score > 0
+        ),
+        key=lambda hit: hit[0],
+        reverse=True,
+    )
+    types_with_hits = {entity_type for _, entity_type, _ in merged}
+    quota = math.ceil(limit / max(len(types_with_hits), 1))
+    taken: Dict[str, int] = {}
+    winners = []
+    skipped = []
+    for hit in merged:
+        if len(winners) >= limit:
+            break
+        if taken.get(hit[1], 0) >= quota:
+            skipped.append(hit)
+            continue
+        taken[hit[1]] = taken.get(hit[1], 0) + 1
+        winners.append(hit)
+    winners.extend(skipped[: limit - len(winners)])
+    winners.sort(key=lambda hit: hit[0], reverse=True)
+    return winners
+
+
+def _hydrate_semantic_hits(user_id: int, winners: List[Any]) -> Dict[Any, Dict[str, Any]]:
+    """Load winning rows with one IN query per entity table."""
+    ids_by_type: Dict[str, List[int]] = {}
+    for _, entity_type, entity_id in winners:
+        ids_by_type.setdefault(entity_type, []).append(entity_id)
+    hydrated: Dict[Any, Dict[str, Any]] = {}
+    recall_ids = ids_by_type.get(ENTITY_RECALL)
+    if recall_ids:
+        for item in RecallItem.query.filter(RecallItem.user_id == user_id, RecallItem.id.in_(recall_ids)):
+            hydrated[(ENTITY_RECALL, item.id)] = _recall_dict(item)
+    bookmark_ids = ids_by_type.get(ENTITY_BOOKMARK)
+    if bookmark_ids:
+        for item in BookmarkItem.query.filter(BookmarkItem.user_id == user_id, BookmarkItem.id.in_(bookmark_ids)):
+            hydrated[(ENTITY_BOOKMARK, item.id)] = _bookmark_dict(item)
+    task_ids = ids_by_type.get(ENTITY_TODO_ITEM)
+    if task_ids:
+        tasks = (
+            TodoItem.query.join(TodoList, TodoItem.list_id == TodoList.id)
+            .options(
+                contains_eager(TodoItem.list),
+                selectinload(TodoItem.linked_list),
+                selectinload(TodoItem.linked_notes),
+            )
+            .filter(TodoList.user_id == user_id, TodoItem.id.in_(task_ids))
+        )
+        for item in tasks:
+            hydrated[(ENTITY_TODO_ITEM, item.id)] = _task_dict(item)
+    event_ids = ids_by_type.get(ENTITY_CALENDAR)
+    if event_ids:
+        events = CalendarEvent.query.options(selectinload(CalendarEvent.notes)).filter(
+            CalendarEvent.user_id == user_id,
+            CalendarEvent.id.in_(event_ids),
+        )
+        for item in events:
+            hydrated[(ENTITY_CALENDAR, item.id)] = _calendar_event_dict(item)
+    return hydrated
+
+
+def semantic_search(
+    user_id: int,
+    query: str,
+    limit: int = 10,
+    entity_types: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Search recalls, bookmarks, tasks, and calendar events in one pass.
+
+    The query is embedded once and scored against every type's cached matrix,
+    and only the merged winners are loaded from the database.
+    """
+    if isinstance(entity_types, str):
+        entity_types = [entity_types]
+    types = [t for t in (entity_types or SEMANTIC_SEARCH_TYPES) if t in SEMANTIC_SEARCH_TYPES]
+    limit = max(1, min(int(limit or 10), 50))
+    index = {entity_type: embedding_index_status(user_id, entity_type) for entity_type in types}
+    query = (query or "").strip()
+    if not query or not types:
+        return {"results": [], "index": index}
+
+    query_vec = embed_text(query)
+    if not query_vec:
+        keyword_search = {
+            ENTITY_RECALL: _search_recalls_semantic,
+            ENTITY_BOOKMARK: _search_bookmarks_semantic,
+            ENTITY_TODO_ITEM: _search_tasks_semantic,
+            ENTITY_CALENDAR: _search_calendar_semantic,
+        }
+        results = []
+        for entity_type in types:
+            for item in keyword_search[entity_type](user_id, query, limit=limit, embed=False)[:limit]:
+                results.append({
+                    "type": entity_type,
+                    "id": item.get("id"),
+                    "similarity": item.get("similarity"),
+                    "item": item,
+                })
+        results.sort(key=lambda hit: hit["similarity"] or 0.0, reverse=True)
+        return {"results": results[:limit], "index": index}
+
+    scored_by_type = {}
+    for entity_type in types:
+        embedding_ids, embedding_matrix = get_embedding_matrix(user_id, entity_type)
+        if not embedding_ids.size:
+            continue
+        scored_by_type[entity_type] = score_embedding_index(
+            user_id, entity_type, query_vec, embedding_ids, embedding_matrix, limit
+        )
+    winners = _merge_semantic_hits(scored_by_type, limit)
+    hydrated = _hydrate_semantic_hits(user_id, winners)
+    results = []
+    for score, entity_type, entity_id in winners:
+        item = hydrated.get((entity_type, entity_id))
+        if item is None:
+            continue
+        results.append({"type": entity_type, "id": entity_id, "similarity": score, "item": item})
+    return {"results": results, "index": index}
+
+
 def _list_hub_tasks(
     user_id: int,
     hub_id: int,
@@ -1128,6 +1274,25 @@ TOOLS = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_all_semantic",
+            "description": "Fuzzy search across recalls, bookmarks, tasks, and calendar events at once",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string"},
+                    "limit": {"type": "integer", "default": 10},
+                    "types": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": list(SEMANTIC_SEARCH_TYPES)},
+                    },
+                },
+                "required": ["query"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -1229,6 +1394,7 @@ def _build_system_prompt(today_iso: str, timezone: str, user_id: int) -> str:
 - Determine intent: list tasks/projects; add tasks/phases/projects; move tasks; update status/content; add/find recall items with fuzzy matching.
 - You can also manage the calendar: list calendar entries by day/range and create new entries (tasks/events/phases/groups). Always set day (YYYY-MM-DD) and use precise fields (start_time/end_time HH:MM 24h, status, priority, flags is_event/is_phase/is_group, phase_id/group_id when nesting, reminder_minutes_before, description).
 - For recall capture: when the user wants to remember something, call create_recall with title, why, payload_type (url or text), and payload.
+- When the user is vague about what kind of thing they mean (e.g. "that thing about the dentist"), call search_all_semantic(query) once instead of several per-type searches; each result has type (recall, bookmark, todo_item, calendar_event), id, similarity, and item.
 - For recall retrieval: start with search_recalls_semantic(query) to find fuzzy matches even with vague hints; if user asks for a list use list_recalls with search filters.
 - For bookmark capture: when the user wants to save quick-reference info, call create_bookmark with title, value, and optional description/pinned.
 - For bookmark retrieval: start with search_bookmarks_semantic(query); if user asks for lists or pinned-only, use list_bookmarks with pinned filter.
@@ -1255,6 +1421,7 @@ def _build_system_prompt(today_iso: str, timezone: str, user_id: int) -> str:
 - Calendar search response format:
   * Header: "**Calendar matches**" (only when showing results)
   * Each match: "- <YYYY-MM-DD> - [<status>] <title> (<priority>)"
+- Semantic search tools return {"results": [...], "index": {...}}. If index.pending > 0, very recent edits may not be searchable yet; fall back to the list_* tools with a search filter when results look incomplete.
 - Always use tools to fetch ids before mutating. Do not guess ids.
 - When user refers to names, search then pick the closest; if multiple matches, ask a short clarifying question.
 - If user says "first/second/third/last phase", choose that phase by order_index (1-based; last = final phase).
@@ -1300,6 +1467,11 @@ def _build_system_prompt(today_iso: str, timezone: str, user_id: int) -> str:
     user_context = get_all_ai_context(user_id)
     return f"{base_prompt}\n\n{user_context}"
 
+def _with_index_status(user_id: int, entity_type: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Attach index freshness so the assistant knows when recent edits may be missing."""
+    return {"results": results, "index": embedding_index_status(user_id, entity_type)}
+
+
 def _call_tool(user_id: int, name: str, args: Dict[str, Any]) -> Any:
     if name == "list_lists":
         return _list_lists(user_id, args.get("list_type"), args.get("search"))
@@ -1401,11 +1573,22 @@ def _call_tool(user_id: int, name: str, args: Dict[str, Any]) -> Any:
             payload_type=args.get("payload_type", ""),
             payload=args.get("payload", ""),
         )
-    if name == "search_recalls_semantic":
-        return _search_recalls_semantic(
+    if name == "search_all_semantic":
+        return semantic_search(
             user_id=user_id,
             query=args.get("query", ""),
-            limit=args.get("limit", 6),
+            limit=args.get("limit", 10),
+            entity_types=args.get("types"),
+        )
+    if name == "search_recalls_semantic":
+        return _with_index_status(
+            user_id,
+            ENTITY_RECALL,
+            _search_recalls_semantic(
+                user_id=user_id,
+                query=args.get("query", ""),
+                limit=args.get("limit", 6),
+            ),
         )
     if name == "list_bookmarks":
         return _list_bookmarks(
@@ -1423,22 +1606,34 @@ def _call_tool(user_id: int, name: str, args: Dict[str, Any]) -> Any:
             pinned=bool(args.get("pinned", False)),
         )
     if name == "search_bookmarks_semantic":
-        return _search_bookmarks_semantic(
-            user_id=user_id,
-            query=args.get("query", ""),
-            limit=args.get("limit", 6),
+        return _with_index_status(
+            user_id,
+            ENTITY_BOOKMARK,
+            _search_bookmarks_semantic(
+                user_id=user_id,
+                query=args.get("query", ""),
+                limit=args.get("limit", 6),
+            ),
         )
     if name == "search_tasks_semantic":
-        return _search_tasks_semantic(
-            user_id=user_id,
-            query=args.get("query", ""),
-            limit=args.get("limit", 6),
+        return _with_index_status(
+            user_id,
+            ENTITY_TODO_ITEM,
+            _search_tasks_semantic(
+                user_id=user_id,
+                query=args.get("query", ""),
+                limit=args.get("limit", 6),
+            ),
         )
     if name == "search_calendar_semantic":
-        return _search_calendar_semantic(
-            user_id=user_id,
-            query=args.get("query", ""),
-            limit=args.get("limit", 6),
+        return _with_index_status(
+            user_id,
+            ENTITY_CALENDAR,
+            _search_calendar_semantic(
+                user_id=user_id,
+                query=args.get("query", ""),
+                limit=args.get("limit", 6),
+            ),
         )
     raise ValueError(f"Unknown tool: {name}")
 
@@ -0,0 +1,343 @@
+"""
+IVF-flat approximate nearest-neighbour index over cached embedding matrices.
+
+The index never copies vectors: it keeps k-means centroids plus one inverted-list
+number per row, aligned with the (ids, matrix) pair served by vector_cache. When
+that pair changes (rows appended, swap-removed, or reloaded) the assignments are
+re-aligned by entity id and only unseen rows are assigned to a centroid.
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+import numpy as np
+from flask import current_app, has_app_context
+
+from .env import int_env
+
+
+DEFAULT_MIN_ROWS = 20000
+DEFAULT_NPROBE = 16
+KMEANS_ITERATIONS = 12
+KMEANS_SAMPLE_PER_LIST = 64
+ASSIGN_CHUNK_ROWS = 8192
+# Refit once this share of rows was assigned after training rather than during it.
+REBUILD_DRIFT_RATIO = 0.5
+# Persist after this many rows were (re)assigned since the last save.
+SAVE_EVERY_ROWS = 1000
+
+
+def list_count_for(rows: int) -> int:
+    return int(min(4096, max(16, np.sqrt(max(rows, 1)))))
+
+
+def assign_lists(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by dot product on unit rows) for every row of matrix."""
+    lists = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], ASSIGN_CHUNK_ROWS):
+        block = matrix[start:start + ASSIGN_CHUNK_ROWS]
+        lists[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return lists
+
+
+def train_centroids(
+    matrix: np.ndarray,
+    n_lists: int,
+    iterations: int = KMEANS_ITERATIONS,
+    seed: int = 0,
+) -> np.ndarray:
+    """Spherical k-means on a sample of unit-length rows."""
+    rng = np.random.default_rng(seed)
+    rows = matrix.shape[0]
+    n_lists = max(1, min(n_lists, rows))
+    sample_size = min(rows, n_lists * KMEANS_SAMPLE_PER_LIST)
+    sample = matrix[np.sort(rng.choice(rows, size=sample_size, replace=False))]
+    centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign_lists(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=n_lists)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists with random sample rows so no centroid is wasted.
+            sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IvfIndex:
+    def __init__(self, centroids: np.ndarray, ids: np.ndarray, lists: np.ndarray, trained_rows: int):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lists = np.asarray(lists, dtype=np.int32)
+        self.trained_rows = trained_rows
+        self.assigned_since_fit = 0
+        self.unsaved_rows = 0
+
+    @classmethod
+    def build(cls, ids: np.ndarray, matrix: np.ndarray, n_lists: Optional[int] = None, seed: int = 0) -> "IvfIndex":
+        centroids = train_centroids(matrix, n_lists or list_count_for(matrix.shape[0]), seed=seed)
+        return cls(centroids, np.array(ids, dtype=np.int64), assign_lists(matrix, centroids), int(matrix.shape[0]))
+
+    @property
+    def dim(self) -> int:
+        return int(self.centroids.shape[1])
+
+    @property
+    def needs_rebuild(self) -> bool:
+        return self.assigned_since_fit > max(self.trained_rows, 1) * REBUILD_DRIFT_RATIO
+
+    def align(self, ids: np.ndarray, matrix: np.ndarray) -> None:
+        """Re-key assignments to the row order of ids, assigning rows not seen before."""
+        if np.array_equal(self.ids, ids):
+            return
+        lists = np.empty(ids.shape[0], dtype=np.int32)
+        found = np.zeros(ids.shape[0], dtype=bool)
+        if self.ids.size:
+            order = np.argsort(self.ids, kind="stable")
+            known = self.ids[order]
+            pos = np.clip(np.searchsorted(known, ids), 0, known.shape[0] - 1)
+            found = known[pos] == ids
+            lists[found] = self.lists[order[pos[found]]]
+        missing = np.flatnonzero(~found)
+        if missing.size:
+            lists[missing] = assign_lists(matrix[missing], self.centroids)
+            self.assigned_since_fit += int(missing.size)
+            self.unsaved_rows += int(missing.size)
+        self.ids = np.array(ids, dtype=np.int64)
+        self.lists = lists
+
+    def reassign(self, entity_id: int, row: np.ndarray) -> None:
+        positions = np.flatnonzero(self.ids == entity_id)
+        if not positions.size:
+            return
+        self.lists[positions] = int(np.argmax(self.centroids @ row))
+        self.assigned_since_fit += 1
+        self.unsaved_rows += 1
+
+    def search(
+        self,
+        query: np.ndarray,
+        matrix: np.ndarray,
+        limit: int,
+        nprobe: int = DEFAULT_NPROBE,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (row indexes, scores), best first, for a unit-length query.
+
+        Only rows in the nprobe lists whose centroids are closest to the query are
+        scored; raising nprobe trades speed for recall (nprobe >= list count is exact).
+        """
+        centroid_scores = self.centroids @ query
+        nprobe = max(1, min(nprobe, centroid_scores.shape[0]))
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        candidates = np.flatnonzero(np.isin(self.lists, probes))
+        limit = max(1, limit)
+        if candidates.shape[0] < limit:
+            candidates = np.arange(matrix.shape[0])
+        scores = matrix[candidates] @ query
+        if limit >= scores.shape[0]:
+            top = np.argsort(-scores, kind="stable")
+        else:
+            part = np.argpartition(-scores, limit - 1)[:limit]
+            top = part[np.argsort(-scores[part], kind="stable")]
+        return candidates[top], scores[top]
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            ids=self.ids,
+            lists=self.lists,
+            trained_rows=np.int64(self.trained_rows),
+            assigned_since_fit=np.int64(self.assigned_since_fit),
+        )
+        os.replace(tmp_path, path)
+        self.unsaved_rows = 0
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IvfIndex"]:
+        try:
+            with np.load(path) as data:
+                index = cls(data["centroids"], data["ids"], data["lists"], int(data["trained_rows"]))
+                index.assigned_since_fit = int(data["assigned_since_fit"])
+        except (OSError, KeyError, ValueError):
+            return None
+        return index
+
+
+def measure_recall(
+    index: IvfIndex,
+    matrix: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    nprobe: int = DEFAULT_NPROBE,
+) -> float:
+    """Mean recall@k of the index against exact search for unit-length queries."""
+    if not queries.shape[0]:
+        return 1.0
+    hits = 0
+    for query in queries:
+        exact_scores = matrix @ query
+        exact = set(np.argpartition(-exact_scores, k - 1)[:k].tolist())
+        approx, _ = index.search(query, matrix, k, nprobe)
+        hits += len(exact.intersection(approx.tolist()))
+    return hits / float(k * queries.shape[0])
+
+
+class AnnIndexRegistry:
+    """
+    Per (user_id, entity_type) IVF indexes, built lazily for large collections.
+
+    Collections smaller than min_rows return None from search so callers fall back
+    to exact scoring; min_rows <= 0 disables the index entirely.
+
+    Each key has its own lock, so searches for different users never wait on
+    each other. Loading or (re)building an index runs outside every lock and is
+    swapped in when done; meanwhile other searches for that key return None.
+    """
+
+    def __init__(
+        self,
+        min_rows: int = DEFAULT_MIN_ROWS,
+        nprobe: int = DEFAULT_NPROBE,
+        directory: Optional[str] = None,
+    ):
+        self.min_rows = min_rows
+        self.nprobe = nprobe
+        self.directory = directory
+        self._indexes: Dict[Tuple[int, str], IvfIndex] = {}
+        # Guards _indexes, _key_locks, _building and the counters; never held during index work.
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[int, str], threading.Lock] = {}
+        self._building: Set[Tuple[int, str]] = set()
+        self.builds = 0
+        self.searches = 0
+
+    def _path(self, user_id: int, entity_type: str) -> Optional[str]:
+        directory = self.directory
+        if not directory:
+            if not has_app_context():
+                return None
+            # Sits beside the default SQLite database in the app instance folder.
+            directory = os.path.join(current_app.instance_path, "ann_index")
+        return os.path.join(directory, f"{user_id}_{entity_type}.npz")
+
+    def _save(self, key: Tuple[int, str], index: IvfIndex) -> None:
+        path = self._path(*key)
+        if not path:
+            return
+        try:
+            index.save(path)
+        except OSError as exc:
+            if has_app_context():
+                current_app.logger.warning(f"Could not persist ANN index {key}: {exc}")
+
+    def _key_lock(self, key: Tuple[int, str]) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def _usable(index: Optional[IvfIndex], matrix: np.ndarray) -> bool:
+        return index is not None and index.dim == matrix.shape[1] and not index.needs_rebuild
+
+    def _load_or_build(self, key: Tuple[int, str], ids: np.ndarray, matrix: np.ndarray, cached: bool) -> IvfIndex:
+        index = None
+        if not cached:
+            path = self._path(*key)
+            if path and os.path.exists(path):
+                index = IvfIndex.load(path)
+        if not self._usable(index, matrix):
+            index = IvfIndex.build(ids, matrix)
+            with self._lock:
+                self.builds += 1
+            self._save(key, index)
+        return index
+
+    def _search_locked(self, key, index, query, ids, matrix, limit, nprobe):
+        index.align(ids, matrix)
+        if index.unsaved_rows >= SAVE_EVERY_ROWS:
+            self._save(key, index)
+        with self._lock:
+            self.searches += 1
+        return index.search(query, matrix, limit, nprobe or self.nprobe)
+
+    def search(
+        self,
+        user_id: int,
+        entity_type: str,
+        query: np.ndarray,
+        ids: np.ndarray,
+        matrix: np.ndarray,
+        limit: int,
+        nprobe: Optional[int] = None,
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        if self.min_rows <= 0 or ids.shape[0] < self.min_rows:
+            return None
+        key = (user_id, entity_type)
+        key_lock = self._key_lock(key)
+        with key_lock:
+            index = self._indexes.get(key)
+            if self._usable(index, matrix):
+                return self._search_locked(key, index, query, ids, matrix, limit, nprobe)
+            cached = index is not None
+        with self._lock:
+            if key in self._building:
+                return None
+            self._building.add(key)
+        try:
+            index = self._load_or_build(key, ids, matrix, cached)
+            with key_lock:
+                self._indexes[key] = index
+                return self._search_locked(key, index, query, ids, matrix, limit, nprobe)
+        finally:
+            with self._lock:
+                self._building.discard(key)
+
+    def upsert(self, user_id: int, entity_type: str, entity_id: int, vector) -> None:
+        key = (user_id, entity_type)
+        with self._key_lock(key):
+            index = self._indexes.get(key)
+            if index is None:
+                return
+            row = np.asarray(vector, dtype=np.float32)
+            norm = float(np.linalg.norm(row))
+            if row.ndim != 1 or row.shape[0] != index.dim or norm == 0:
+                return
+            index.reassign(int(entity_id), row / norm)
+
+    def invalidate(self, user_id: Optional[int] = None, entity_type: Optional[str] = None) -> None:
+        with self._lock:
+            for key in list(self._indexes):
+                if user_id is not None and key[0] != user_id:
+                    continue
+                if entity_type is not None and key[1] != entity_type:
+                    continue
+                self._indexes.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "indexes": len(self._indexes),
+                "min_rows": self.min_rows,
+                "nprobe": self.nprobe,
+                "builds": self.builds,
+                "building": len(self._building),
+                "searches": self.searches,
+            }
+
+
+ann_registry = AnnIndexRegistry(
+    min_rows=int_env("EMBEDDING_ANN_MIN_ROWS", DEFAULT_MIN_ROWS),
+    nprobe=int_env("EMBEDDING_ANN_NPROBE", DEFAULT_NPROBE),
+    directory=os.environ.get("EMBEDDING_ANN_DIR") or None,
+)
@@ -7,6 +7,8 @@ for _name, _value in vars(_app_module).items():
     if not _name.startswith('__'):
         globals()[_name] = _value
 
+from sqlalchemy import insert, update
+
 def _extract_note_list_lines(raw_html):
     return extract_note_list_lines(
         raw_html,
@@ -248,20 +250,24 @@ def start_recall_processing(recall_id):
 
 
 def start_embedding_job(user_id, entity_type, entity_id):
-    """Start background embedding refresh for a single entity."""
-    def _refresh_single_embedding():
-        refresh_embedding_for_entity(user_id, entity_type, entity_id)
+    """Queue a background embedding refresh for a single entity."""
+    try:
+        mark_embedding_dirty_detached(user_id, entity_type, [entity_id])
+    except Exception as exc:
+        app.logger.warning("Embedding dirty marker failed for %s:%s (%s)", entity_type, entity_id, exc)
+    embedding_queue.enqueue(app, user_id, entity_type, [entity_id])
 
-    def _on_error(exc):
-        app.logger.warning(
-            "Embedding refresh failed for %s:%s user=%s (%s)",
-            entity_type,
-            entity_id,
-            user_id,
-            exc,
-        )
 
-    start_app_context_job(app, _refresh_single_embedding, on_error=_on_error)
+def start_embedding_jobs(user_id, entity_type, entity_ids):
+    """Queue one coalesced embedding refresh for many entities of one type."""
+    entity_ids = [entity_id for entity_id in entity_ids if entity_id]
+    if not entity_ids:
+        return
+    try:
+        mark_embedding_dirty_detached(user_id, entity_type, entity_ids)
+    except Exception as exc:
+        app.logger.warning("Embedding dirty markers failed for %s x%s (%s)", entity_type, len(entity_ids), exc)
+    embedding_queue.enqueue(app, user_id, entity_type, entity_ids)
 
 
 
@@ -283,15 +289,20 @@ def delete_embedding(user_id, entity_type, entity_id):
 
 
 def start_list_children_embedding_job(user_id, list_id):
-    """Refresh embeddings for items inside a list after a list rename."""
-    def _refresh_list_children():
-        todo_list = TodoList.query.filter_by(id=list_id, user_id=user_id).first()
-        if not todo_list:
-            return
-        for item in todo_list.items:
-            refresh_embedding_for_entity(user_id, ENTITY_TODO_ITEM, item.id)
-
-    start_app_context_job(app, _refresh_list_children)
+    """Queue embedding refreshes for items inside a list after a list rename."""
+    item_ids = [
+        item_id
+        for (item_id,) in db.session.query(TodoItem.id)
+        .join(TodoList, TodoItem.list_id == TodoList.id)
+        .filter(TodoList.id == list_id, TodoList.user_id == user_id)
+    ]
+    if not item_ids:
+        return
+    try:
+        mark_embedding_dirty_detached(user_id, ENTITY_TODO_ITEM, item_ids)
+    except Exception as exc:
+        app.logger.warning("Embedding dirty markers failed for list %s (%s)", list_id, exc)
+    embedding_queue.enqueue(app, user_id, ENTITY_TODO_ITEM, item_ids)
 
 
 def parse_outline(outline_text, list_type='list'):
@@ -570,139 +581,39 @@ def reindex_list(todo_list):
 
 
 
-def _time_to_minutes(t):
-    return (t.hour * 60) + t.minute
+_time_to_minutes = time_to_minutes
+_event_end_minutes = event_end_minutes
 
 
 
-def _event_end_minutes(start_minutes, end_time):
-    if end_time:
-        end_minutes = _time_to_minutes(end_time)
-        if end_minutes > start_minutes:
-            return end_minutes
-    return min(start_minutes + 30, 24 * 60)
-
-
-
-def _task_conflicts_with_event(user_id, day_obj, task_start, task_end, new_task_exclusive, exclude_event_id=None):
-    if not task_start:
-        return None
-    task_start_minutes = _time_to_minutes(task_start)
-    task_end_minutes = _time_to_minutes(task_end) if task_end else None
-    if task_end_minutes is not None and task_end_minutes < task_start_minutes:
-        task_end_minutes = task_start_minutes
-
-    events_query = CalendarEvent.query.filter(
-        CalendarEvent.user_id == user_id,
-        CalendarEvent.day == day_obj,
-        CalendarEvent.is_event.is_(True),
-        CalendarEvent.start_time.isnot(None)
-    )
-    if not new_task_exclusive:
-        events_query = events_query.filter(
-            db.or_(CalendarEvent.allow_overlap.is_(False), CalendarEvent.allow_overlap.is_(None))
+def _calendar_conflict_schedules(user_id, days):
+    """Day schedules for conflict checks, including virtual recurring occurrences when enabled."""
+    days = [day_value for day_value in days if day_value]
+    extra = []
+    if days and _virtual_recurrences_enabled():
+        _, planned = _plan_recurring_instances(
+            user_id, min(days), max(days), RecurringEvent.start_time.isnot(None)
         )
-    events = events_query.all()
-
-    for ev in events:
-        if exclude_event_id and ev.id == exclude_event_id:
-            continue
-        ev_start_minutes = _time_to_minutes(ev.start_time)
-        ev_end_minutes = _event_end_minutes(ev_start_minutes, ev.end_time)
-        if task_end_minutes is None:
-            if ev_start_minutes <= task_start_minutes < ev_end_minutes:
-                return ev
-        else:
-            if not (task_end_minutes <= ev_start_minutes or task_start_minutes >= ev_end_minutes):
-                return ev
-    return None
-
-
-
-def _event_conflicts_with_event(user_id, day_obj, event_start, event_end, new_allow_overlap, exclude_event_id=None):
-    if not event_start:
-        return None
-    event_start_minutes = _time_to_minutes(event_start)
-    event_end_minutes = _event_end_minutes(event_start_minutes, event_end)
-
-    events = CalendarEvent.query.filter(
-        CalendarEvent.user_id == user_id,
-        CalendarEvent.day == day_obj,
-        CalendarEvent.is_event.is_(True),
-        CalendarEvent.start_time.isnot(None)
-    ).all()
-
-    for ev in events:
-        if exclude_event_id and ev.id == exclude_event_id:
-            continue
-        ev_start_minutes = _time_to_minutes(ev.start_time)
-        ev_end_minutes = _event_end_minutes(ev_start_minutes, ev.end_time)
-        overlaps = not (event_end_minutes <= ev_start_minutes or event_start_minutes >= ev_end_minutes)
-        if overlaps and ((ev.allow_overlap is False) or (ev.allow_overlap is None) or (new_allow_overlap is False)):
-            return ev
-    return None
-
-
-
-def _event_conflicts_with_task(user_id, day_obj, event_start, event_end, new_event_allow_overlap, exclude_event_id=None):
-    if not event_start:
-        return None
-    event_start_minutes = _time_to_minutes(event_start)
-    event_end_minutes = _event_end_minutes(event_start_minutes, event_end)
-
-    tasks = CalendarEvent.query.filter(
-        CalendarEvent.user_id == user_id,
-        CalendarEvent.day == day_obj,
-        CalendarEvent.is_event.is_(False),
-        CalendarEvent.is_phase.is_(False),
-        CalendarEvent.is_group.is_(False),
-        CalendarEvent.start_time.isnot(None)
-    ).all()
-
-    for ev in tasks:
-        if exclude_event_id and ev.id == exclude_event_id:
-            continue
-        ev_start_minutes = _time_to_minutes(ev.start_time)
-        ev_end_minutes = _event_end_minutes(ev_start_minutes, ev.end_time)
-        overlaps = not (event_end_minutes <= ev_start_minutes or event_start_minutes >= ev_end_minutes)
-        if overlaps:
-            existing_task_exclusive = ev.allow_overlap is True
-            new_event_exclusive = not new_event_allow_overlap
-            if existing_task_exclusive or new_event_exclusive:
-                return ev
-    return None
+        wanted = set(days)
+        extra = [
+            ScheduledEntry(
+                virtual_occurrence_id(rule.id, day_value), rule.title, day_value, rule.start_time, rule.end_time,
+                bool(rule.is_event), False, False, False,
+            )
+            for rule, day_value in planned
+            if day_value in wanted
+        ]
+    return load_day_schedules(user_id, days, extra)
 
 
 
-def _task_conflicts_with_task(user_id, day_obj, task_start, task_end, new_task_exclusive, exclude_event_id=None):
-    if not task_start:
+def _calendar_conflict(user_id, day_obj, start_time, end_time, is_event, allow_overlap, exclude_event_id=None):
+    """First entry on the day that a new or moved task/event would overlap, or None."""
+    if not start_time or not day_obj:
         return None
-    task_start_minutes = _time_to_minutes(task_start)
-    task_end_minutes = _time_to_minutes(task_end) if task_end else None
-    if task_end_minutes is not None and task_end_minutes < task_start_minutes:
-        task_end_minutes = task_start_minutes
-
-    tasks = CalendarEvent.query.filter(
-        CalendarEvent.user_id == user_id,
-        CalendarEvent.day == day_obj,
-        CalendarEvent.is_event.is_(False),
-        CalendarEvent.is_phase.is_(False),
-        CalendarEvent.is_group.is_(False),
-        CalendarEvent.start_time.isnot(None)
-    ).all()
-
-    for ev in tasks:
-        if exclude_event_id and ev.id == exclude_event_id:
-            continue
-        ev_start_minutes = _time_to_minutes(ev.start_time)
-        ev_end_minutes = _event_end_minutes(ev_start_minutes, ev.end_time)
-        if task_end_minutes is None:
-            overlaps = ev_start_minutes <= task_start_minutes < ev_end_minutes
-        else:
-            overlaps = not (task_end_minutes <= ev_start_minutes or task_start_minutes >= ev_end_minutes)
-        if overlaps and (new_task_exclusive or (ev.allow_overlap is True)):
-            return ev
-    return None
+    return _calendar_conflict_schedules(user_id, [day_obj])[day_obj].conflict(
+        start_time, end_time, is_event, allow_overlap, exclude_event_id
+    )
 
 
 
@@ -716,498 +627,489 @@ def _next_calendar_order(day_value, user_id):
 
 
 
-def _weekday_occurrence_in_month(day_value):
-    weekday = day_value.weekday()
-    month_cal = calendar.monthcalendar(day_value.year, day_value.month)
-    count = 0
-    for week in month_cal:
-        if week[weekday]:
-            count += 1
-            if week[weekday] == day_value.day:
-                return count
-    return None
+_weekday_occurrence_in_month = weekday_occurrence_in_month
+_nth_weekday_of_month = nth_weekday_of_month
+_recurrence_occurs_on = recurrence_occurs_on
 
 
 
-def _nth_weekday_of_month(year, month, weekday, nth):
-    if weekday is None or nth is None:
-        return None
-    month_cal = calendar.monthcalendar(year, month)
-    days = [week[weekday] for week in month_cal if week[weekday]]
+def _next_calendar_orders(user_id, days):
+    """Next order index per day for many days in one grouped query."""
+    days = sorted(set(days))
     if not days:
-        return None
-    if nth > len(days):
-        day = days[-1]
-    else:
-        day = days[max(nth, 1) - 1]
-    return date(year, month, day)
-
-
+        return {}
+    rows = db.session.query(CalendarEvent.day, db.func.max(CalendarEvent.order_index)).filter(
+        CalendarEvent.user_id == user_id,
+        CalendarEvent.day >= days[0],
+        CalendarEvent.day <= days[-1]
+    ).group_by(CalendarEvent.day).all()
+    current = {day_value: max_order or 0 for day_value, max_order in rows}
+    return {day_value: current.get(day_value, 0) + 1 for day_value in days}
 
-def _recurrence_occurs_on(rule, day_value):
-    if day_value < rule.start_day:
-        return False
-    if rule.end_day and day_value > rule.end_day:
-        return False
 
-    freq = (rule.frequency or '').lower()
-    interval = max(int(rule.interval or 1), 1)
-    unit = (rule.interval_unit or '').lower()
-    days_of_week = parse_days_of_week(rule.days_of_week)
 
-    if freq == 'monthly_weekday':
-        start_day = rule.start_day
-        months_since = (day_value.year - start_day.year) * 12 + (day_value.month - start_day.month)
-        if months_since < 0 or months_since % interval != 0:
-            return False
-        weekday = rule.weekday_of_month
-        if weekday is None:
-            weekday = start_day.weekday()
-        week_of_month = rule.week_of_month
-        if week_of_month is None:
-            week_of_month = _weekday_occurrence_in_month(start_day)
-        target = _nth_weekday_of_month(day_value.year, day_value.month, weekday, week_of_month)
-        return bool(target) and day_value == target
-
-    if freq == 'daily':
-        unit = 'days'
-        interval = 1
-    elif freq == 'weekly':
-        unit = 'weeks'
-        interval = 1
-    elif freq == 'biweekly':
-        unit = 'weeks'
-        interval = 2
-    elif freq == 'monthly':
-        unit = 'months'
-        interval = 1
-    elif freq == 'yearly':
-        unit = 'years'
-        interval = 1
-    elif freq != 'custom':
-        return False
-
-    start_day = rule.start_day
-    if unit == 'days':
-        days_since = (day_value - start_day).days
-        return days_since >= 0 and days_since % interval == 0
-    if unit == 'weeks':
-        days_since = (day_value - start_day).days
-        if days_since < 0:
-            return False
-        weeks_since = days_since // 7
-        if weeks_since % interval != 0:
-            return False
-        if days_of_week:
-            return day_value.weekday() in days_of_week
-        return day_value.weekday() == start_day.weekday()
-    if unit == 'months':
-        months_since = (day_value.year - start_day.year) * 12 + (day_value.month - start_day.month)
-        if months_since < 0 or months_since % interval != 0:
-            return False
-        target_dom = rule.day_of_month or start_day.day
-        _, last_dom = calendar.monthrange(day_value.year, day_value.month)
-        if target_dom > last_dom:
-            target_dom = last_dom
-        return day_value.day == target_dom
-    if unit == 'years':
-        years_since = day_value.year - start_day.year
-        if years_since < 0 or years_since % interval != 0:
-            return False
-        target_month = rule.month_of_year or start_day.month
-        target_dom = rule.day_of_month or start_day.day
-        _, last_dom = calendar.monthrange(day_value.year, target_month)
-        if target_dom > last_dom:
-            target_dom = last_dom
-        return day_value.month == target_month and day_value.day == target_dom
-    return False
+def _virtual_recurrences_enabled():
+    return bool(app.config.get('CALENDAR_VIRTUAL_RECURRENCES'))
 
 
 
-def _ensure_recurring_instances(user_id, start_day, end_day):
+def _plan_recurring_instances(user_id, start_day, end_day, *criteria):
+    """Rules in range and the (rule, day) occurrences that have neither a row nor an exception."""
     if not start_day or not end_day or start_day > end_day:
-        return
+        return [], []
     rules = RecurringEvent.query.filter(
         RecurringEvent.user_id == user_id,
         RecurringEvent.start_day <= end_day,
-        or_(RecurringEvent.end_day.is_(None), RecurringEvent.end_day >= start_day)
+        or_(RecurringEvent.end_day.is_(None), RecurringEvent.end_day >= start_day),
+        *criteria
     ).all()
     if not rules:
-        return
+        return [], []
 
-    exceptions = RecurrenceException.query.filter(
+    exceptions = db.session.query(RecurrenceException.recurrence_id, RecurrenceException.day).filter(
         RecurrenceException.user_id == user_id,
         RecurrenceException.day >= start_day,
         RecurrenceException.day <= end_day
     ).all()
-    exception_days = {(ex.recurrence_id, ex.day) for ex in exceptions}
-
-    created_events = []
-    for rule in rules:
-        existing = CalendarEvent.query.filter(
-            CalendarEvent.recurrence_id == rule.id,
-            CalendarEvent.day >= start_day,
-            CalendarEvent.day <= end_day
-        ).all()
-        existing_days = {ev.day for ev in existing}
-        current = start_day
-        while current <= end_day:
-            if (rule.id, current) not in exception_days and current not in existing_days:
-                if _recurrence_occurs_on(rule, current):
-                    new_event = CalendarEvent(
-                        user_id=user_id,
-                        title=rule.title,
-                        description=rule.description,
-                        day=current,
-                        start_time=rule.start_time,
-                        end_time=rule.end_time,
-                        status=rule.status or 'not_started',
-                        priority=rule.priority or 'medium',
-                        is_phase=False,
-                        is_event=bool(rule.is_event),
-                        is_group=False,
-                        order_index=_next_calendar_order(current, user_id),
-                        reminder_minutes_before=rule.reminder_minutes_before,
-                        rollover_enabled=bool(rule.rollover_enabled),
-                        recurrence_id=rule.id
-                    )
-                    db.session.add(new_event)
-                    created_events.append(new_event)
-            current += timedelta(days=1)
-
-    if created_events:
+    existing = db.session.query(CalendarEvent.recurrence_id, CalendarEvent.day).filter(
+        CalendarEvent.recurrence_id.in_([rule.id for rule in rules]),
+        CalendarEvent.day >= start_day,
+        CalendarEvent.day <= end_day
+    ).all()
+    taken = {(recurrence_id, day_value) for recurrence_id, day_value in exceptions}
+    taken.update((recurrence_id, day_value) for recurrence_id, day_value in existing)
+
+    planned = [
+        (rule, day_value)
+        for rule in rules
+        for day_value in recurrence_occurrences(rule, start_day, end_day)
+        if (rule.id, day_value) not in taken
+    ]
+    return rules, planned
+
+
+
+def _ensure_recurring_instances(user_id, start_day, end_day, *criteria):
+    """
+    Materialize missing recurring instances in [start_day, end_day] with a fixed number of queries.
+
+    Extra criteria on RecurringEvent narrow the rules, e.g. to those with reminders.
+    """
+    _, planned = _plan_recurring_instances(user_id, start_day, end_day, *criteria)
+    if not planned:
+        return
+
+    next_order = _next_calendar_orders(user_id, [day_value for _, day_value in planned])
+    rows = []
+    for rule, day_value in planned:
+        rows.append({
+            'user_id': user_id,
+            'title': rule.title,
+            'description': rule.description,
+            'day': day_value,
+            'start_time': rule.start_time,
+            'end_time': rule.end_time,
+            'status': rule.status or 'not_started',
+            'priority': rule.priority or 'medium',
+            'is_phase': False,
+            'is_event': bool(rule.is_event),
+            'is_group': False,
+            'order_index': next_order[day_value],
+            'reminder_minutes_before': rule.reminder_minutes_before,
+            'next_reminder_at': _upcoming_reminder_at(day_value, rule.start_time, rule.reminder_minutes_before),
+            'rollover_enabled': bool(rule.rollover_enabled),
+            'recurrence_id': rule.id,
+        })
+        next_order[day_value] += 1
+    # One multi-row INSERT; RETURNING order is not guaranteed, so rows carry their own keys.
+    inserted = db.session.execute(
+        insert(CalendarEvent).returning(CalendarEvent.id, CalendarEvent.next_reminder_at),
+        rows,
+    ).all()
+    created_ids = sorted(row.id for row in inserted)
+    # Bulk INSERTs bypass the ORM flush hook that keeps search in sync.
+    reindex_search_entities(ENTITY_CALENDAR, created_ids)
+    db.session.commit()
+
+    for row in inserted:
+        if row.next_reminder_at:
+            reminder_dispatcher.schedule(row.id, row.next_reminder_at)
+    start_embedding_jobs(user_id, ENTITY_CALENDAR, created_ids)
+
+
+
+def _virtual_recurring_events(user_id, start_day, end_day, events=()):
+    """
+    Payloads for occurrences in range that have no row yet, shaped like CalendarEvent.to_dict().
+
+    Each day's virtual entries are ordered after that day's rows in events, as
+    materializing them would have done. Nothing is written.
+    """
+    _, planned = _plan_recurring_instances(user_id, start_day, end_day)
+    next_order = {}
+    for ev in events:
+        next_order[ev.day] = max(next_order.get(ev.day, 0), ev.order_index or 0)
+    payloads = []
+    for rule, day_value in sorted(planned, key=lambda pair: (pair[1], pair[0].start_time is None, pair[0].id)):
+        next_order[day_value] = next_order.get(day_value, 0) + 1
+        payloads.append({
+            'id': virtual_occurrence_id(rule.id, day_value),
+            'user_id': user_id,
+            'title': rule.title,
+            'description': rule.description,
+            'day': day_value.isoformat(),
+            'start_time': rule.start_time.isoformat() if rule.start_time else None,
+            'end_time': rule.end_time.isoformat() if rule.end_time else None,
+            'status': rule.status or 'not_started',
+            'priority': rule.priority or 'medium',
+            'is_phase': False,
+            'is_event': bool(rule.is_event),
+            'allow_overlap': False,
+            'display_mode': 'both',
+            'is_group': False,
+            'phase_id': None,
+            'group_id': None,
+            'order_index': next_order[day_value],
+            'reminder_minutes_before': rule.reminder_minutes_before,
+            'rollover_enabled': bool(rule.rollover_enabled),
+            'rolled_from_id': None,
+            'recurrence_id': rule.id,
+            'item_note': None,
+            'linked_notes': [],
+            'is_virtual': True,
+        })
+    return payloads
+
+
+
+def _recurring_occurrence_event(user_id, rule_id, day_value):
+    """The materialized row for one occurrence, if it has one."""
+    return CalendarEvent.query.filter_by(user_id=user_id, recurrence_id=rule_id, day=day_value).first()
+
+
+
+def _materialize_recurring_occurrence(user_id, rule_id, day_value):
+    """Row for one occurrence, inserting it first if needed; None if the rule doesn't fire that day."""
+    _ensure_recurring_instances(user_id, day_value, day_value, RecurringEvent.id == rule_id)
+    return _recurring_occurrence_event(user_id, rule_id, day_value)
+
+
+
+def _skip_recurring_occurrence(user_id, rule_id, day_value):
+    """Record a deleted occurrence that was never materialized. Returns False if there is none."""
+    rule = RecurringEvent.query.filter_by(id=rule_id, user_id=user_id).first()
+    if not rule or not _recurrence_occurs_on(rule, day_value):
+        return False
+    already = RecurrenceException.query.filter_by(user_id=user_id, recurrence_id=rule_id, day=day_value).first()
+    if not already:
+        db.session.add(RecurrenceException(user_id=user_id, recurrence_id=rule_id, day=day_value))
         db.session.commit()
-        for ev in created_events:
-            if ev.reminder_minutes_before is not None and ev.start_time:
-                _schedule_reminder_job(ev)
-            start_embedding_job(user_id, ENTITY_CALENDAR, ev.id)
+    return True
+
+
+
+def _materialize_recurring_horizon(user_id=None):
+    """
+    Virtual mode: give rules with reminders real rows from today through the
+    reminder horizon, so their reminders are in next_reminder_at.
+    """
+    if not _virtual_recurrences_enabled():
+        return
+    today = _now_local().date()
+    horizon = today + timedelta(days=RECURRING_MATERIALIZE_DAYS)
+    criteria = (RecurringEvent.reminder_minutes_before.isnot(None), RecurringEvent.start_time.isnot(None))
+    if user_id is None:
+        user_ids = [row[0] for row in db.session.query(RecurringEvent.user_id).filter(*criteria).distinct()]
+    else:
+        user_ids = [user_id]
+    for uid in user_ids:
+        _ensure_recurring_instances(uid, today, horizon, *criteria)
+
+
+
+def _materialize_recurring_horizon_job():
+    with app.app_context():
+        try:
+            _materialize_recurring_horizon()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error materializing recurring reminders: {e}")
 
 
 
 def _prune_recurring_instances(rule, user_id):
-    instances = CalendarEvent.query.filter_by(user_id=user_id, recurrence_id=rule.id).all()
-    to_delete = [ev for ev in instances if not _recurrence_occurs_on(rule, ev.day)]
-    if to_delete:
-        delete_ids = [ev.id for ev in to_delete]
+    """Drop rows and exceptions for days the (edited) rule no longer covers."""
+    instances = db.session.query(CalendarEvent.id, CalendarEvent.day).filter(
+        CalendarEvent.user_id == user_id,
+        CalendarEvent.recurrence_id == rule.id
+    ).all()
+    stale = [row for row in instances if not _recurrence_occurs_on(rule, row.day)]
+    if stale:
+        delete_ids = [row.id for row in stale]
+        to_delete = CalendarEvent.query.filter(CalendarEvent.id.in_(delete_ids)).all()
         for ev in to_delete:
-            if ev.reminder_job_id:
-                _cancel_reminder_job(ev)
+            reminder_dispatcher.cancel(ev.id)
             db.session.delete(ev)
         db.session.commit()
         for ev_id in delete_ids:
             delete_embedding(user_id, ENTITY_CALENDAR, ev_id)
 
-    exceptions = RecurrenceException.query.filter_by(user_id=user_id, recurrence_id=rule.id).all()
-    stale_exceptions = [ex for ex in exceptions if not _recurrence_occurs_on(rule, ex.day)]
-    if stale_exceptions:
-        for ex in stale_exceptions:
-            db.session.delete(ex)
+    exceptions = db.session.query(RecurrenceException.id, RecurrenceException.day).filter(
+        RecurrenceException.user_id == user_id,
+        RecurrenceException.recurrence_id == rule.id
+    ).all()
+    stale_exception_ids = [row.id for row in exceptions if not _recurrence_occurs_on(rule, row.day)]
+    if stale_exception_ids:
+        RecurrenceException.query.filter(RecurrenceException.id.in_(stale_exception_ids)).delete(
+            synchronize_session=False
+        )
         db.session.commit()
 
 
 
-def _rollover_incomplete_events():
-    """Clone yesterday's incomplete events with rollover enabled into today."""
-    with app.app_context():
-        # Acquire distributed lock to prevent concurrent execution across workers
-        worker_id = os.getpid()
-        lock_name = 'calendar_rollover'
+def _rollover_incomplete_events(dry_run=False):
+    """
+    Clone yesterday's incomplete events with rollover enabled into today.
 
-        # Try to acquire lock with a database transaction
+    Returns the run report (counts and stage timings); dry_run plans the run
+    without writing or taking the lock.
+    """
+    with app.app_context():
+        today = _now_local().date()
+        if dry_run:
+            report, _ = roll_over_calendar(today, dry_run=True, reminder_at=_upcoming_reminder_at)
+            return report
+        # Distributed lock so only one worker rolls over
+        if not _acquire_job_lock('calendar_rollover'):
+            app.logger.info("Rollover already running in another worker, skipping")
+            return {'skipped_lock': True}
         try:
-            from models import JobLock
-            from sqlalchemy.exc import IntegrityError
-
-            now = _now_local()
-            if db.engine.dialect.name == 'sqlite':
-                # SQLite doesn't support FOR UPDATE; use insert + fallback update for stale locks.
-                try:
-                    lock = JobLock(job_name=lock_name, locked_at=now, locked_by=str(worker_id))
-                    db.session.add(lock)
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
-                    lock = db.session.query(JobLock).filter_by(job_name=lock_name).first()
-                    if lock and now - lock.locked_at >= timedelta(minutes=5):
-                        lock.locked_at = now
-                        lock.locked_by = str(worker_id)
-                        db.session.commit()
-                    else:
-                        if lock:
-                            app.logger.info(f"Rollover already running (locked by {lock.locked_by}), skipping")
-                        else:
-                            app.logger.info("Rollover lock acquisition failed (missing lock), skipping")
-                        return
-            else:
-                # Use SELECT FOR UPDATE to ensure only one worker acquires the lock
-                lock = db.session.query(JobLock).filter_by(job_name=lock_name).with_for_update(nowait=True).first()
-                if lock:
-                    if now - lock.locked_at < timedelta(minutes=5):
-                        app.logger.info(f"Rollover already running (locked by {lock.locked_by}), skipping")
-                        db.session.rollback()
-                        return
-                    lock.locked_at = now
-                    lock.locked_by = str(worker_id)
-                else:
-                    lock = JobLock(job_name=lock_name, locked_at=now, locked_by=str(worker_id))
-                    db.session.add(lock)
+            if _virtual_recurrences_enabled():
+                # Unviewed occurrences have no row yet; rolling one over needs it.
+                yesterday = today - timedelta(days=1)
+                rollover_rule = RecurringEvent.rollover_enabled.is_(True)
+                for (uid,) in db.session.query(RecurringEvent.user_id).filter(rollover_rule).distinct().all():
+                    _ensure_recurring_instances(uid, yesterday, yesterday, rollover_rule)
+
+            report, created = roll_over_calendar(today, reminder_at=_upcoming_reminder_at)
+            app.logger.info(
+                "Rollover %s: %s users, %s scanned, %s copied, %s phases, %s duplicates removed, "
+                "%s batches in %.2fs (load %.2fs, plan %.2fs, write %.2fs)",
+                report['day'], report['users'], report['scanned'], report['copied'], report['phases_copied'],
+                report['duplicates_removed'], report['batches'], report['timings']['total'],
+                report['timings']['load'], report['timings']['plan'], report['timings']['write'],
+            )
+            for uid, ids in created.items():
+                start_embedding_jobs(uid, ENTITY_CALENDAR, ids)
+            return report
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error during calendar rollover: {e}")
+            raise
+        finally:
+            _release_job_lock('calendar_rollover')
 
+
+
+def _acquire_job_lock(lock_name, stale_after=timedelta(minutes=5)):
+    """Take the named JobLock for this worker; returns False when another worker holds it."""
+    from models import JobLock
+    from sqlalchemy.exc import IntegrityError
+
+    worker_id = str(os.getpid())
+    now = _now_local()
+    try:
+        if db.engine.dialect.name == 'sqlite':
+            try:
+                db.session.add(JobLock(job_name=lock_name, locked_at=now, locked_by=worker_id))
                 db.session.commit()
+                return True
+            except IntegrityError:
+                db.session.rollback()
+                lock = db.session.query(JobLock).filter_by(job_name=lock_name).first()
+                if lock and now - lock.locked_at >= stale_after:
+                    lock.locked_at = now
+                    lock.locked_by = worker_id
+                    db.session.commit()
+                    return True
+                return False
+        lock = db.session.query(JobLock).filter_by(job_name=lock_name).with_for_update(nowait=True).first()
+        if lock:
+            if now - lock.locked_at < stale_after:
+                db.session.rollback()
+                return False
+            lock.locked_at = now
+            lock.locked_by = worker_id
+        else:
+            db.session.add(JobLock(job_name=lock_name, locked_at=now, locked_by=worker_id))
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        app.logger.info(f"{lock_name} lock acquisition failed (worker {worker_id}): {e}")
+        return False
+
+
+def _release_job_lock(lock_name):
+    from models import JobLock
+
+    try:
+        lock = db.session.query(JobLock).filter_by(job_name=lock_name).first()
+        if lock and lock.locked_by == str(os.getpid()):
+            db.session.delete(lock)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error releasing {lock_name} lock: {e}")
+
+
+def _refresh_dirty_embeddings():
+    """Re-embed entities marked dirty on write so semantic search never embeds inline."""
+    with app.app_context():
+        if not _acquire_job_lock('embedding_refresh', stale_after=timedelta(minutes=10)):
+            return
+        try:
+            written = refresh_dirty_embeddings()
+            if written:
+                app.logger.info(f"Embedding refresh: wrote {written} vectors")
         except Exception as e:
-            # Lock acquisition failed (another worker has it)
             db.session.rollback()
-            app.logger.info(f"Rollover lock acquisition failed (worker {worker_id}), skipping: {e}")
+            app.logger.error(f"Error refreshing dirty embeddings: {e}")
+        finally:
+            _release_job_lock('embedding_refresh')
+
+
+def _persist_duplicate_signatures():
+    """Persist list duplicate signatures recomputed by the (read-only) duplicates endpoints."""
+    with app.app_context():
+        if not _acquire_job_lock('duplicate_signatures', stale_after=timedelta(minutes=10)):
             return
+        try:
+            written = persist_pending_signatures()
+            if written:
+                app.logger.info(f"Duplicate signatures: persisted {written} rows")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error persisting duplicate signatures: {e}")
+        finally:
+            _release_job_lock('duplicate_signatures')
+
 
+def _sweep_embeddings():
+    """Safety net for writes that bypass the dirty markers: re-hash every entity nightly."""
+    with app.app_context():
+        if not _acquire_job_lock('embedding_sweep', stale_after=timedelta(hours=2)):
+            return
         try:
-            today = _now_local().date()
-            yesterday = today - timedelta(days=1)
-
-            # Build a map of phases that need to be recreated
-            phases_yesterday = CalendarEvent.query.filter(
-                CalendarEvent.day == yesterday,
-                CalendarEvent.is_phase.is_(True)
-            ).all()
-
-            # For each user, roll their events independently
-            user_ids = [u.id for u in User.query.all()]
-            for uid in user_ids:
-                created_events = 0
-                created_phases = 0
-                created_calendar_events = []
-                created_calendar_phases = []
-
-                # Track already created rollovers so reruns stay idempotent
-                existing_rollovers = CalendarEvent.query.filter(
-                    CalendarEvent.user_id == uid,
-                    CalendarEvent.day == today,
-                    CalendarEvent.rolled_from_id.isnot(None)
-                ).all()
-                rolled_lookup = {}
-                duplicates_to_delete = []
-                for ev in existing_rollovers:
-                    key = ev.rolled_from_id
-                    if key in rolled_lookup:
-                        keep = rolled_lookup[key]
-                        # Keep the earliest created rollover, delete extras
-                        if ev.id < keep.id:
-                            duplicates_to_delete.append(keep)
-                            rolled_lookup[key] = ev
-                        else:
-                            duplicates_to_delete.append(ev)
-                    else:
-                        rolled_lookup[key] = ev
-
-                phase_map = {}
-                # Collect phases by title to recreate only if needed
-                for ph in phases_yesterday:
-                    if ph.user_id == uid:
-                        existing_phase_copy = rolled_lookup.get(ph.id)
-                        phase_map[ph.id] = existing_phase_copy.id if existing_phase_copy and existing_phase_copy.is_phase else None
-
-                events = CalendarEvent.query.filter(
-                    CalendarEvent.user_id == uid,
-                    CalendarEvent.day == yesterday,
-                    CalendarEvent.status != 'done',
-                    CalendarEvent.rollover_enabled.is_(True),
-                    CalendarEvent.is_phase.is_(False)
-                ).order_by(CalendarEvent.order_index.asc()).all()
-
-                if not events:
-                    continue
+            for uid in [u.id for u in User.query.all()]:
+                for entity_type in (ENTITY_RECALL, ENTITY_BOOKMARK, ENTITY_TODO_ITEM, ENTITY_TODO_LIST, ENTITY_CALENDAR):
+                    ensure_embeddings_for_type(uid, entity_type, max_new=5000)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error during embedding sweep: {e}")
+        finally:
+            _release_job_lock('embedding_sweep')
 
-                linked_todo_ids = {ev.todo_item_id for ev in events if ev.todo_item_id}
-                todo_items_by_id = {}
-                done_linked_todo_ids = set()
-                if linked_todo_ids:
-                    todo_items_by_id = {
-                        item.id: item for item in TodoItem.query.filter(
-                            TodoItem.id.in_(linked_todo_ids)
-                        ).all()
-                    }
-                    done_linked_todo_ids = {
-                        item_id for item_id, item in todo_items_by_id.items()
-                        if item.status == 'done'
-                    }
-
-                linked_note_item_ids = {ev.note_list_item_id for ev in events if ev.note_list_item_id}
-                note_items_by_id = {}
-                done_linked_note_item_ids = set()
-                if linked_note_item_ids:
-                    note_items_by_id = {
-                        item.id: item for item in NoteListItem.query.filter(
-                            NoteListItem.id.in_(linked_note_item_ids)
-                        ).all()
-                    }
-                    done_linked_note_item_ids = {
-                        item_id for item_id, item in note_items_by_id.items()
-                        if item.checked
-                    }
-
-                linked_feed_item_ids = {ev.do_feed_item_id for ev in events if ev.do_feed_item_id}
-                feed_items_by_id = {}
-                if linked_feed_item_ids:
-                    feed_items_by_id = {
-                        item.id: item for item in DoFeedItem.query.filter(
-                            DoFeedItem.id.in_(linked_feed_item_ids)
-                        ).all()
-                    }
-
-                def move_linked_source_dates(ev):
-                    if ev.todo_item_id:
-                        linked_item = todo_items_by_id.get(ev.todo_item_id)
-                        if linked_item:
-                            linked_item.due_date = today
-                    if ev.note_list_item_id:
-                        linked_note_item = note_items_by_id.get(ev.note_list_item_id)
-                        if linked_note_item:
-                            linked_note_item.scheduled_date = today
-                    if ev.do_feed_item_id:
-                        linked_feed_item = feed_items_by_id.get(ev.do_feed_item_id)
-                        if linked_feed_item:
-                            linked_feed_item.scheduled_date = today
-                    if ev.planner_simple_item_id:
-                        linked_planner_item = db.session.get(PlannerSimpleItem, ev.planner_simple_item_id)
-                        if linked_planner_item:
-                            linked_planner_item.scheduled_date = today
-                    if ev.planner_multi_item_id:
-                        linked_planner_item = db.session.get(PlannerMultiItem, ev.planner_multi_item_id)
-                        if linked_planner_item:
-                            linked_planner_item.scheduled_date = today
-                    if ev.planner_multi_line_id:
-                        linked_planner_line = db.session.get(PlannerMultiLine, ev.planner_multi_line_id)
-                        if linked_planner_line:
-                            linked_planner_line.scheduled_date = today
-
-                def copy_linked_source_fields(source, target):
-                    target.todo_item_id = source.todo_item_id
-                    target.planner_simple_item_id = source.planner_simple_item_id
-                    target.planner_multi_item_id = source.planner_multi_item_id
-                    target.planner_multi_line_id = source.planner_multi_line_id
-                    target.note_list_item_id = source.note_list_item_id
-                    target.do_feed_item_id = source.do_feed_item_id
-
-                events_to_delete = {}
-                for ev in events:
-                    if ev.todo_item_id and ev.todo_item_id in done_linked_todo_ids:
-                        if ev.status != 'done':
-                            ev.status = 'done'
-                        continue
-                    if ev.note_list_item_id and ev.note_list_item_id in done_linked_note_item_ids:
-                        if ev.status != 'done':
-                            ev.status = 'done'
-                        continue
-                    if ev.note_list_item_id and ev.note_list_item_id not in note_items_by_id:
-                        events_to_delete[ev.id] = ev
-                        continue
-                    if ev.do_feed_item_id and ev.do_feed_item_id not in feed_items_by_id:
-                        events_to_delete[ev.id] = ev
-                        continue
 
-                    # Skip if this event has already been rolled over today
-                    if ev.id in rolled_lookup:
-                        copy_linked_source_fields(ev, rolled_lookup[ev.id])
-                        move_linked_source_dates(ev)
-                        events_to_delete[ev.id] = ev
-                        continue
+def _collect_unused_embedding_vectors():
+    """Garbage-collect shared embedding vectors no record references anymore."""
+    with app.app_context():
+        if not _acquire_job_lock('embedding_vector_gc', stale_after=timedelta(hours=1)):
+            return
+        try:
+            pruned = prune_orphaned_duplicate_entries()
+            if pruned:
+                app.logger.info(f"Embedding vector GC: pruned {pruned} orphaned list duplicate entries")
+            removed = collect_unused_vectors()
+            if removed:
+                app.logger.info(f"Embedding vector GC: removed {removed} unused vectors")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error collecting unused embedding vectors: {e}")
+        finally:
+            _release_job_lock('embedding_vector_gc')
 
-                    new_phase_id = None
-                    if ev.phase_id:
-                        if ev.phase_id not in phase_map or phase_map[ev.phase_id] is None:
-                            orig_phase = next((p for p in phases_yesterday if p.id == ev.phase_id and p.user_id == uid), None)
-                            if orig_phase:
-                                copy_phase = CalendarEvent(
-                                    user_id=uid,
-                                    title=orig_phase.title,
-                                    description=orig_phase.description,
-                                    day=today,
-                                    is_phase=True,
-                                    status='not_started',
-                                    priority=orig_phase.priority,
-                                    item_note=orig_phase.item_note,
-                                    order_index=_next_calendar_order(today, uid),
-                                    reminder_minutes_before=None,
-                                    rollover_enabled=orig_phase.rollover_enabled,
-                                    rolled_from_id=orig_phase.id
-                                )
-                                db.session.add(copy_phase)
-                                db.session.flush()
-                                created_calendar_phases.append(copy_phase)
-                                phase_map[orig_phase.id] = copy_phase.id
-                                created_phases += 1
-                        new_phase_id = phase_map.get(ev.phase_id)
-
-                    recurrence_id = ev.recurrence_id
-                    if recurrence_id:
-                        db.session.add(RecurrenceException(
-                            user_id=uid,
-                            recurrence_id=recurrence_id,
-                            day=today
-                        ))
-
-                    copy_event = CalendarEvent(
-                        user_id=uid,
-                        title=ev.title,
-                        description=ev.description,
-                        day=today,
-                        start_time=ev.start_time,
-                        end_time=ev.end_time,
-                        status='not_started',
-                        priority=ev.priority,
-                        is_phase=False,
-                        is_event=ev.is_event,
-                        allow_overlap=ev.allow_overlap,
-                        display_mode=getattr(ev, 'display_mode', None) or 'both',
-                        is_group=ev.is_group,
-                        phase_id=new_phase_id,
-                        order_index=_next_calendar_order(today, uid),
-                        reminder_minutes_before=ev.reminder_minutes_before,
-                        rollover_enabled=ev.rollover_enabled,
-                        rolled_from_id=ev.id,
-                        todo_item_id=ev.todo_item_id,
-                        planner_simple_item_id=ev.planner_simple_item_id,
-                        planner_multi_item_id=ev.planner_multi_item_id,
-                        planner_multi_line_id=ev.planner_multi_line_id,
-                        note_list_item_id=ev.note_list_item_id,
-                        do_feed_item_id=ev.do_feed_item_id,
-                        recurrence_id=None,
-                        item_note=ev.item_note
-                    )
-                    db.session.add(copy_event)
-                    created_calendar_events.append(copy_event)
-                    created_events += 1
-                    events_to_delete[ev.id] = ev
-                    move_linked_source_dates(ev)
-
-                for dup in duplicates_to_delete:
-                    db.session.delete(dup)
-                for ev in events_to_delete.values():
-                    db.session.delete(ev)
 
-                db.session.commit()
-                if created_events or duplicates_to_delete or events_to_delete:
-                    app.logger.info(
-                        f"Rollover user {uid}: created {created_events} events, "
-                        f"created {created_phases} phases, removed {len(duplicates_to_delete)} duplicates"
-                    )
-                for created in created_calendar_phases + created_calendar_events:
-                    start_embedding_job(uid, ENTITY_CALENDAR, created.id)
+def _run_duplicate_scans():
+    """Advance queued account-wide duplicate scans for one time-boxed tick."""
+    with app.app_context():
+        if not _acquire_job_lock('duplicate_scan', stale_after=timedelta(minutes=10)):
+            return
+        try:
+            finished = run_pending_duplicate_scans()
+            if finished:
+                app.logger.info(f"Duplicate scan: finished {finished} scans")
         except Exception as e:
             db.session.rollback()
-            app.logger.error(f"Error during calendar rollover: {e}")
-            raise
+            app.logger.error(f"Error running duplicate scans: {e}")
         finally:
-            # Release the lock
-            try:
-                lock_to_release = db.session.query(JobLock).filter_by(job_name=lock_name).first()
-                if lock_to_release and lock_to_release.locked_by == str(worker_id):
-                    db.session.delete(lock_to_release)
-                    db.session.commit()
-            except Exception as e:
-                app.logger.error(f"Error releasing rollover lock: {e}")
-                db.session.rollback()
+            _release_job_lock('duplicate_scan')
+
+
+def _queue_duplicate_scans():
+    """Nightly: queue a fresh duplicate scan for every user whose last one is a day old."""
+    with app.app_context():
+        try:
+            queued = queue_stale_duplicate_scans()
+            if queued:
+                app.logger.info(f"Duplicate scan: queued {queued} scans")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error queueing duplicate scans: {e}")
+
+
+def _rebuild_search_index():
+    """Nightly: re-derive the full-text index to pick up bulk writes the flush hook missed."""
+    with app.app_context():
+        if not _acquire_job_lock('search_index_rebuild', stale_after=timedelta(hours=1)):
+            return
+        try:
+            written = rebuild_search_index()
+            app.logger.info(f"Search index: rebuilt {written} documents")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error rebuilding search index: {e}")
+        finally:
+            _release_job_lock('search_index_rebuild')
+
+
+def _extract_vault_text():
+    """Extract text from new vault documents for full-text search, time-boxed per run."""
+    with app.app_context():
+        if not _acquire_job_lock('vault_text', stale_after=timedelta(minutes=15)):
+            return
+        try:
+            processed = extract_pending_document_text(
+                _vault_root_for_user,
+                deadline=datetime.utcnow() + timedelta(minutes=5),
+            )
+            if processed:
+                app.logger.info(f"Vault text: extracted {processed} documents")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error extracting vault document text: {e}")
+        finally:
+            _release_job_lock('vault_text')
 
 
+def start_vault_text_job():
+    """Extract text for fresh uploads in a daemon thread, at most one such thread at a time."""
+    if not try_begin_extraction_kick():
+        return
+
+    def _run():
+        try:
+            _extract_vault_text()
+        finally:
+            end_extraction_kick()
+
+    start_daemon_thread(_run)
+
+
+def start_duplicate_scan_job():
+    """Run a scan tick now in a daemon thread so the requesting worker is not held."""
+    start_daemon_thread(_run_duplicate_scans)
+
 
 def _cleanup_completed_tasks():
     """Retain completed tasks indefinitely."""
@@ -1217,35 +1119,12 @@ def _cleanup_completed_tasks():
 
 def _send_email(to_addr, subject, body, html_body=None):
     """Lightweight SMTP sender using environment variables."""
-    host = os.environ.get('SMTP_HOST')
-    port = int(os.environ.get('SMTP_PORT', 587))
-    user = os.environ.get('SMTP_USER')
-    password = os.environ.get('SMTP_PASSWORD')
-    from_addr = os.environ.get('SMTP_FROM') or user
-    if not host or not from_addr:
+    smtp = smtp_session_from_env(logger=app.logger)
+    if smtp is None:
         app.logger.warning("SMTP host/from missing; email not sent")
         return False
-    import smtplib
-    from email.mime.text import MIMEText
-
-    if html_body:
-        msg = MIMEText(html_body, 'html')
-    else:
-        msg = MIMEText(body, 'plain')
-    msg['Subject'] = subject
-    msg['From'] = from_addr
-    msg['To'] = to_addr
-
-    try:
-        with smtplib.SMTP(host, port) as server:
-            server.starttls()
-            if user and password:
-                server.login(user, password)
-            server.sendmail(from_addr, [to_addr], msg.as_string())
-        return True
-    except Exception as e:
-        app.logger.error(f"SMTP send failed: {e}")
-        return False
+    with smtp:
+        return smtp.send(to_addr, subject, body, html_body=html_body)
 
 
 
@@ -1356,53 +1235,10 @@ def _send_daily_email_digest(target_day=None):
     if os.environ.get('ENABLE_CALENDAR_EMAIL_DIGEST', '1') != '1':
         return {'disabled': True}
     with app.app_context():
-        # Acquire distributed lock to avoid duplicate sends across workers.
-        worker_id = os.getpid()
-        lock_name = 'daily_email_digest'
-        lock_acquired = False
-        lock_row = None
-        try:
-            from models import JobLock
-            from sqlalchemy.exc import IntegrityError
-
-            now = _now_local()
-            if db.engine.dialect.name == 'sqlite':
-                try:
-                    lock_row = JobLock(job_name=lock_name, locked_at=now, locked_by=str(worker_id))
-                    db.session.add(lock_row)
-                    db.session.commit()
-                    lock_acquired = True
-                except IntegrityError:
-                    db.session.rollback()
-                    lock_row = db.session.query(JobLock).filter_by(job_name=lock_name).first()
-                    if lock_row and now - lock_row.locked_at >= timedelta(minutes=5):
-                        lock_row.locked_at = now
-                        lock_row.locked_by = str(worker_id)
-                        db.session.commit()
-                        lock_acquired = True
-                    else:
-                        if lock_row:
-                            app.logger.info(f"Digest already running (locked by {lock_row.locked_by}), skipping")
-                        else:
-                            app.logger.info("Digest lock acquisition failed (missing lock), skipping")
-                        return {'skipped_lock': True}
-            else:
-                lock_row = db.session.query(JobLock).filter_by(job_name=lock_name).with_for_update(nowait=True).first()
-                if lock_row:
-                    if now - lock_row.locked_at < timedelta(minutes=5):
-                        app.logger.info(f"Digest already running (locked by {lock_row.locked_by}), skipping")
-                        db.session.rollback()
-                        return {'skipped_lock': True}
-                    lock_row.locked_at = now
-                    lock_row.locked_by = str(worker_id)
-                else:
-                    lock_row = JobLock(job_name=lock_name, locked_at=now, locked_by=str(worker_id))
-                    db.session.add(lock_row)
-                db.session.commit()
-                lock_acquired = True
-        except Exception as e:
-            db.session.rollback()
-            app.logger.info(f"Digest lock acquisition failed (worker {worker_id}), skipping: {e}")
+        # Distributed lock to avoid duplicate sends across workers; a lock older than
+        # the stale window (a crashed worker) is taken over before the next hourly run.
+        if not _acquire_job_lock('daily_email_digest', stale_after=timedelta(minutes=30)):
+            app.logger.info("Digest already running in another worker, skipping")
             return {'skipped_lock': True}
 
         try:
@@ -1411,108 +1247,60 @@ def _send_daily_email_digest(target_day=None):
             is_manual = target_day is not None
             if target_day is None:
                 target_day = now_local.date()
-            users = User.query.all()
             fallback_email = os.environ.get('CONTACT_TO_EMAIL')
+            user_ids, counts = select_digest_users(None if is_manual else now_local.hour)
             stats = {
                 'day': target_day.isoformat(),
-                'users_total': len(users),
+                'users_total': counts['users_total'],
                 'eligible': 0,
                 'sent': 0,
-                'skipped_prefs': 0,
-                'skipped_hour': 0,
+                'skipped_prefs': counts['skipped_prefs'],
+                'skipped_hour': counts['skipped_hour'],
                 'skipped_no_items': 0,
                 'skipped_no_recipient': 0,
                 'errors': 0,
                 'manual': is_manual,
             }
-            for user_obj in users:
-                prefs = _get_or_create_notification_settings(user_obj.id)
-                if not prefs.email_enabled or not prefs.digest_enabled:
-                    stats['skipped_prefs'] += 1
-                    continue
-                if not is_manual and prefs.digest_hour != now_local.hour:
-                    stats['skipped_hour'] += 1
-                    continue
-                events = CalendarEvent.query.filter(
-                    CalendarEvent.user_id == user_obj.id,
-                    CalendarEvent.day == target_day,
-                    CalendarEvent.is_group.is_(False),
-                    CalendarEvent.is_phase.is_(False),
-                    CalendarEvent.is_event.is_(True)
-                ).order_by(
-                    CalendarEvent.start_time.is_(None),
-                    CalendarEvent.start_time.asc()
-                ).all()
-                calendar_tasks = CalendarEvent.query.filter(
-                    CalendarEvent.user_id == user_obj.id,
-                    CalendarEvent.day == target_day,
-                    CalendarEvent.is_group.is_(False),
-                    CalendarEvent.is_phase.is_(False),
-                    CalendarEvent.is_event.is_(False)
-                ).order_by(
-                    CalendarEvent.start_time.is_(None),
-                    CalendarEvent.start_time.asc()
-                ).all()
-                linked_task_ids = {task.todo_item_id for task in calendar_tasks if task.todo_item_id}
-                todo_task_query = TodoItem.query.join(TodoList, TodoItem.list_id == TodoList.id).filter(
-                    TodoList.user_id == user_obj.id,
-                    TodoItem.due_date == target_day,
-                    TodoItem.is_phase.is_(False)
-                )
-                if linked_task_ids:
-                    todo_task_query = todo_task_query.filter(~TodoItem.id.in_(linked_task_ids))
-                todo_tasks = todo_task_query.order_by(TodoItem.order_index.asc()).all()
-
-                tasks_for_day = []
-                for task in calendar_tasks:
-                    tasks_for_day.append({
-                        'title': task.title,
-                        'start_time': task.start_time,
-                        'end_time': task.end_time,
-                        'priority': task.priority,
-                        'status': task.status,
-                    })
-                for task in todo_tasks:
-                    tasks_for_day.append({
-                        'title': task.content,
-                        'start_time': None,
-                        'end_time': None,
-                        'priority': None,
-                        'status': task.status,
-                    })
-                tasks_for_day.sort(
-                    key=lambda item: (
-                        item.get('start_time') is None,
-                        item.get('start_time') or time.min,
-                        item.get('title', '').lower()
-                    )
-                )
-
-                if not events and not tasks_for_day:
-                    stats['skipped_no_items'] += 1
-                    continue
-                body = _build_daily_digest_body(events, tasks_for_day)
-                html_body = _build_daily_digest_html(events, tasks_for_day, target_day)
-                try:
+            if _virtual_recurrences_enabled():
+                for user_id in user_ids:
+                    _ensure_recurring_instances(user_id, target_day, target_day)
+            items_by_user = prefetch_digest_items(user_ids, target_day)
+
+            subject = f"Your tasks for {target_day.isoformat()}"
+            smtp = smtp_session_from_env(logger=app.logger)
+            try:
+                for user_id in user_ids:
+                    events, tasks_for_day = items_by_user[user_id]
+                    if not events and not tasks_for_day:
+                        stats['skipped_no_items'] += 1
+                        continue
                     recipient = fallback_email
-                    if recipient:
-                        stats['eligible'] += 1
+                    if not recipient:
+                        stats['skipped_no_recipient'] += 1
+                        continue
+                    stats['eligible'] += 1
+                    try:
+                        body = _build_daily_digest_body(events, tasks_for_day)
+                        html_body = _build_daily_digest_html(events, tasks_for_day, target_day)
                         app.logger.info(
                             "Digest email recipient=%s user_id=%s day=%s",
                             recipient,
-                            user_obj.id,
+                            user_id,
                             target_day.isoformat()
                         )
-                        if _send_email(recipient, f"Your tasks for {target_day.isoformat()}", body, html_body=html_body):
+                        if smtp is None:
+                            app.logger.warning("SMTP host/from missing; email not sent")
+                            stats['errors'] += 1
+                        elif smtp.send(recipient, subject, body, html_body=html_body):
                             stats['sent'] += 1
                         else:
                             stats['errors'] += 1
-                    else:
-                        stats['skipped_no_recipient'] += 1
-                except Exception as e:
-                    stats['errors'] += 1
-                    app.logger.error(f"Error sending digest for user {user_obj.id}: {e}")
-                    continue
+                    except Exception as e:
+                        stats['errors'] += 1
+                        app.logger.error(f"Error sending digest for user {user_id}: {e}")
+            finally:
+                if smtp is not None:
+                    smtp.close()
             app.logger.info(
                 "Digest stats day=%s manual=%s users=%s eligible=%s sent=%s skipped_prefs=%s skipped_hour=%s skipped_no_items=%s skipped_no_recipient=%s errors=%s",
                 stats['day'],
@@ -1528,92 +1316,83 @@ def _send_daily_email_digest(target_day=None):
             )
             return stats
         finally:
-            if lock_acquired and lock_row:
-                try:
-                    lock_to_release = db.session.query(JobLock).filter_by(job_name=lock_name).first()
-                    if lock_to_release and lock_to_release.locked_by == str(worker_id):
-                        db.session.delete(lock_to_release)
-                        db.session.commit()
-                        app.logger.info(f"Digest lock released (worker {worker_id})")
-                except Exception as e:
-                    db.session.rollback()
-                    app.logger.error(f"Error releasing digest lock: {e}")
+            _release_job_lock('daily_email_digest')
 
 
 
-def _schedule_reminder_job(event):
-    """Schedule a one-time reminder job for a calendar event."""
-    global scheduler
-    if not scheduler or not event.start_time or event.reminder_minutes_before is None:
-        return
+def _upcoming_reminder_at(day_value, start_time, minutes_before):
+    """Naive UTC next_reminder_at for an entry, or None when it has no reminder still ahead."""
+    reminder_at = reminder_due_at(day_value, start_time, minutes_before, app.config['DEFAULT_TIMEZONE'])
+    if reminder_at is None or reminder_at <= datetime.utcnow():
+        return None
+    return reminder_at
 
-    # Cancel existing job if present
-    if event.reminder_job_id:
-        try:
-            scheduler.remove_job(event.reminder_job_id)
-        except Exception:
-            pass
 
-    # Calculate reminder time
-    try:
-        event_datetime = datetime.combine(event.day, event.start_time)
-        event_datetime = pytz.timezone(app.config['DEFAULT_TIMEZONE']).localize(event_datetime)
-        reminder_time = event_datetime - timedelta(minutes=event.reminder_minutes_before)
+def _schedule_reminder_job(event, commit=True):
+    """Set the event's next_reminder_at for the reminder dispatcher; bulk callers pass commit=False."""
+    if not event.start_time or event.reminder_minutes_before is None:
+        return
 
+    try:
         # Only schedule if reminder is in the future
-        now = datetime.now(pytz.timezone(app.config['DEFAULT_TIMEZONE']))
-        if reminder_time > now:
-            job_id = f"reminder_{event.id}_{int(reminder_time.timestamp())}"
-            scheduler.add_job(
-                _send_event_reminder,
-                'date',
-                run_date=reminder_time,
-                args=[event.id],
-                id=job_id,
-                replace_existing=True
-            )
-            event.reminder_job_id = job_id
+        event.next_reminder_at = _upcoming_reminder_at(event.day, event.start_time, event.reminder_minutes_before)
+        if event.next_reminder_at:
             event.reminder_sent = False
             event.reminder_snoozed_until = None
+        event.reminder_job_id = None
+        if commit:
             db.session.commit()
+            reminder_dispatcher.schedule(event.id, event.next_reminder_at)
     except Exception as e:
         app.logger.error(f"Error scheduling reminder for event {event.id}: {e}")
 
 
 
 def _cancel_reminder_job(event):
-    """Cancel a scheduled reminder job for a calendar event."""
-    global scheduler
-    if not scheduler or not event.reminder_job_id:
+    """Clear a calendar event's pending reminder."""
+    if event.next_reminder_at is None and not event.reminder_job_id:
         return
 
-    try:
-        scheduler.remove_job(event.reminder_job_id)
-        app.logger.info(f"Cancelled reminder job {event.reminder_job_id} for event {event.id}")
-    except Exception as e:
-        app.logger.debug(f"Could not cancel job {event.reminder_job_id}: {e}")
-
+    if event.reminder_job_id and scheduler:
+        # Jobs scheduled before reminders moved to next_reminder_at.
+        try:
+            scheduler.remove_job(event.reminder_job_id)
+        except Exception as e:
+            app.logger.debug(f"Could not cancel job {event.reminder_job_id}: {e}")
+    reminder_dispatcher.cancel(event.id)
+    event.next_reminder_at = None
     event.reminder_job_id = None
     db.session.commit()
 
 
 
-def _is_event_reminder_source_active(event):
-    """Return True when an event reminder still points to a live, actionable source item."""
+def _is_event_reminder_source_active(event, sources=None):
+    """
+    Return True when an event reminder still points to a live, actionable source item.
+
+    sources is an optional map from _preload_reminder_sources(); without it each
+    linked item is fetched on its own.
+    """
     if not event or event.status in {'done', 'canceled'}:
         return False
+
+    def _linked(model, item_id):
+        if sources is None:
+            return db.session.get(model, item_id)
+        return sources.get((model, item_id))
+
     if event.todo_item_id:
-        linked_todo = db.session.get(TodoItem, event.todo_item_id)
+        linked_todo = _linked(TodoItem, event.todo_item_id)
         if (not linked_todo) or linked_todo.status == 'done':
             return False
     if event.note_list_item_id:
-        linked_item = db.session.get(NoteListItem, event.note_list_item_id)
+        linked_item = _linked(NoteListItem, event.note_list_item_id)
         if (not linked_item) or linked_item.checked:
             return False
         if (not linked_item.scheduled_date) or linked_item.scheduled_date != event.day:
             return False
     if event.do_feed_item_id:
-        linked_feed = db.session.get(DoFeedItem, event.do_feed_item_id)
+        linked_feed = _linked(DoFeedItem, event.do_feed_item_id)
         if not linked_feed:
             return False
         if linked_feed.scheduled_date and linked_feed.scheduled_date != event.day:
@@ -1621,75 +1400,111 @@ def _is_event_reminder_source_active(event):
     return True
 
 
+def _preload_reminder_sources(events):
+    """Load the items the given reminders link to in one query per type, keyed by (model, id)."""
+    loaded = {}
+    for model, field in ((TodoItem, 'todo_item_id'), (NoteListItem, 'note_list_item_id'), (DoFeedItem, 'do_feed_item_id')):
+        ids = {getattr(ev, field) for ev in events if getattr(ev, field)}
+        if ids:
+            loaded.update({(model, item.id): item for item in model.query.filter(model.id.in_(ids))})
+    return loaded
+
+
+def _dispatch_due_reminders(event_ids):
+    """
+    Claim and send the given reminders if they are due; returns the number pushed.
+
+    The claim clears next_reminder_at with a conditional UPDATE and is
+    committed before anything is sent, so a reminder goes out at most once
+    even with several dispatchers. Reminders more than
+    REMINDER_MISSED_GRACE_MINUTES late (e.g. while no worker was running) are
+    marked sent without a push.
+    """
+    now = datetime.utcnow()
+    due = dict(db.session.query(CalendarEvent.id, CalendarEvent.next_reminder_at).filter(
+        CalendarEvent.id.in_(list(event_ids)),
+        CalendarEvent.next_reminder_at <= now
+    ).all())
+    if not due:
+        return 0
+    claimed = db.session.execute(
+        update(CalendarEvent)
+        .where(CalendarEvent.id.in_(list(due)), CalendarEvent.next_reminder_at <= now)
+        .values(next_reminder_at=None)
+        .returning(CalendarEvent.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.session.commit()
+    if not claimed:
+        return 0
+
+    events = CalendarEvent.query.filter(CalendarEvent.id.in_(claimed)).order_by(CalendarEvent.id).all()
+    sources = _preload_reminder_sources(events)
+    users = {user.id: user for user in User.query.filter(User.id.in_({ev.user_id for ev in events})).all()}
+    tz_name = app.config['DEFAULT_TIMEZONE']
+    now_local = datetime.now(pytz.timezone(tz_name)).replace(tzinfo=None)
+    missed_before = now - timedelta(minutes=REMINDER_MISSED_GRACE_MINUTES)
+    prefs_by_user = {}
+    snoozed = []
+    pushes = []
+    for event in events:
+        if event.reminder_sent:
+            continue
+        if not _is_event_reminder_source_active(event, sources):
+            event.reminder_snoozed_until = None
+            event.reminder_sent = True
+            continue
+        if event.reminder_snoozed_until and now_local < event.reminder_snoozed_until:
+            # Still snoozed: come back at the snooze time.
+            event.next_reminder_at = local_to_utc(event.reminder_snoozed_until, tz_name)
+            snoozed.append(event)
+            continue
+        if due[event.id] < missed_before:
+            app.logger.info(f"Skipping reminder for event {event.id}: missed by more than {REMINDER_MISSED_GRACE_MINUTES} minutes")
+            event.reminder_sent = True
+            continue
+        user = users.get(event.user_id)
+        if not user:
+            continue
+        if user.id not in prefs_by_user:
+            prefs_by_user[user.id] = _get_or_create_notification_settings(user.id)
+        prefs = prefs_by_user[user.id]
+        if not prefs.push_enabled or not prefs.reminders_enabled:
+            continue
+        event.reminder_sent = True
+        event.reminder_job_id = None
+        pushes.append((
+            user,
+            f"Reminder: {event.title}",
+            f"Starting at {event.start_time.strftime('%I:%M %p')}" if event.start_time else "",
+            f'/calendar?day={event.day.isoformat()}',
+            event.id,
+        ))
+    db.session.commit()
+
+    for event in snoozed:
+        reminder_dispatcher.schedule(event.id, event.next_reminder_at)
+    actions = [
+        {'action': 'snooze', 'title': 'Snooze'},
+        {'action': 'dismiss', 'title': 'Dismiss'}
+    ]
+    for user, title, body, link, event_id in pushes:
+        try:
+            _send_push_to_user(user, title, body, link=link, event_id=event_id, actions=actions)
+        except Exception as e:
+            app.logger.error(f"Error sending reminder for event {event_id}: {e}")
+    return len(pushes)
+
+
 def _send_event_reminder(event_id):
-    """Send a reminder notification for a specific calendar event."""
+    """Send a calendar event's reminder if it is due."""
     with app.app_context():
         try:
-            event = db.session.get(CalendarEvent, event_id)
-            if not event:
-                return
-
-            # Check if already sent or snoozed
-            if event.reminder_sent:
-                return
-            if not _is_event_reminder_source_active(event):
-                event.reminder_job_id = None
-                event.reminder_snoozed_until = None
-                event.reminder_sent = True
-                db.session.commit()
-                return
-
-            # Check if snoozed
-            if event.reminder_snoozed_until:
-                tz = pytz.timezone(app.config['DEFAULT_TIMEZONE'])
-                now = datetime.now(tz).replace(tzinfo=None)
-                if now < event.reminder_snoozed_until:
-                    # Still snoozed, reschedule for snooze time
-                    global scheduler
-                    if scheduler:
-                        job_id = f"reminder_{event.id}_{int(event.reminder_snoozed_until.timestamp())}"
-                        scheduler.add_job(
-                            _send_event_reminder,
-                            'date',
-                            run_date=pytz.timezone(app.config['DEFAULT_TIMEZONE']).localize(event.reminder_snoozed_until),
-                            args=[event_id],
-                            id=job_id,
-                            replace_existing=True
-                        )
-                        event.reminder_job_id = job_id
-                        db.session.commit()
-                    return
-
-            # Get user
-            user = db.session.get(User, event.user_id)
-            if not user:
-                return
-
-            # Check user preferences
-            prefs = _get_or_create_notification_settings(user.id)
-            if not prefs.push_enabled or not prefs.reminders_enabled:
-                return
-
-            # Send push notification with action buttons
-            title = f"Reminder: {event.title}"
-            body = f"Starting at {event.start_time.strftime('%I:%M %p')}" if event.start_time else ""
-            day_str = event.day.isoformat()
-            link = f'/calendar?day={day_str}'
-
-            actions = [
-                {'action': 'snooze', 'title': 'Snooze'},
-                {'action': 'dismiss', 'title': 'Dismiss'}
-            ]
-
-            _send_push_to_user(user, title, body, link=link, event_id=event.id, actions=actions)
-
-            # Mark as sent
-            event.reminder_sent = True
-            event.reminder_job_id = None
-            db.session.commit()
-
+            return _dispatch_due_reminders([event_id])
         except Exception as e:
+            db.session.rollback()
             app.logger.error(f"Error sending reminder for event {event_id}: {e}")
+            return 0
 
 
 
@@ -1772,39 +1587,16 @@ def _check_calendar_reminders():
 
 
 def _schedule_existing_reminders():
-    """Schedule reminder jobs for all existing events with reminders on startup."""
-    with app.app_context():
-        try:
-            now = datetime.now(pytz.timezone(app.config['DEFAULT_TIMEZONE']))
-            # Get events with reminders that haven't been sent yet
-            events = CalendarEvent.query.filter(
-                CalendarEvent.reminder_minutes_before.isnot(None),
-                CalendarEvent.start_time.isnot(None),
-                CalendarEvent.reminder_sent.is_(False),
-                CalendarEvent.status != 'done',
-                CalendarEvent.status != 'canceled',
-                CalendarEvent.day >= now.date()
-            ).all()
-
-            scheduled_count = 0
-            updated_invalid = False
-            for event in events:
-                try:
-                    if not _is_event_reminder_source_active(event):
-                        event.reminder_job_id = None
-                        event.reminder_snoozed_until = None
-                        event.reminder_sent = True
-                        updated_invalid = True
-                        continue
-                    _schedule_reminder_job(event)
-                    scheduled_count += 1
-                except Exception as e:
-                    app.logger.error(f"Error scheduling reminder for event {event.id}: {e}")
-            if updated_invalid:
-                db.session.commit()
+    """
+    Start the reminder dispatcher on startup.
 
-        except Exception as e:
-            app.logger.error(f"Error in _schedule_existing_reminders: {e}")
+    Pending reminders stay in calendar_event.next_reminder_at; the dispatcher
+    reads them from that index as they come due, so nothing is loaded here.
+    """
+    try:
+        reminder_dispatcher.start(app, fire=_dispatch_due_reminders)
+    except Exception as e:
+        app.logger.error(f"Error in _schedule_existing_reminders: {e}")
 
 
 _jobs_bootstrapped = False
@@ -1869,8 +1661,59 @@ def _start_scheduler():
             replace_existing=True,
             max_instances=1,
         )
-    # Note: Calendar reminders now use server-scheduled jobs (scheduled per-event)
-    # Legacy minute-polling has been replaced with precise scheduling
+    scheduler.add_job(
+        _refresh_dirty_embeddings,
+        'interval',
+        minutes=max(1, int(os.environ.get('EMBEDDING_REFRESH_INTERVAL_MINUTES', 2))),
+        id='embedding_refresh',
+        replace_existing=True,
+        max_instances=1,
+    )
+    scheduler.add_job(
+        _persist_duplicate_signatures,
+        'interval',
+        minutes=max(1, int(os.environ.get('DUPLICATE_SIGNATURE_INTERVAL_MINUTES', 2))),
+        id='duplicate_signatures',
+        replace_existing=True,
+        max_instances=1,
+    )
+    scheduler.add_job(_sweep_embeddings, 'cron', hour=3, minute=30, id='embedding_sweep', replace_existing=True)
+    scheduler.add_job(
+        _collect_unused_embedding_vectors,
+        'cron',
+        hour=4,
+        minute=15,
+        id='embedding_vector_gc',
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        _run_duplicate_scans,
+        'interval',
+        minutes=max(1, int(os.environ.get('DUPLICATE_SCAN_INTERVAL_MINUTES', 5))),
+        id='duplicate_scan',
+        replace_existing=True,
+        max_instances=1,
+    )
+    scheduler.add_job(_queue_duplicate_scans, 'cron', hour=2, minute=45, id='duplicate_scan_queue', replace_existing=True)
+    scheduler.add_job(_rebuild_search_index, 'cron', hour=4, minute=15, id='search_index_rebuild', replace_existing=True)
+    scheduler.add_job(
+        _extract_vault_text,
+        'interval',
+        minutes=max(1, int(os.environ.get('VAULT_TEXT_INTERVAL_MINUTES', 10))),
+        id='vault_text',
+        replace_existing=True,
+        max_instances=1,
+    )
+    if _virtual_recurrences_enabled():
+        scheduler.add_job(
+            _materialize_recurring_horizon_job,
+            'interval',
+            hours=1,
+            id='recurring_reminder_horizon',
+            replace_existing=True,
+            max_instances=1,
+        )
+    # Calendar reminders are sent by the reminder dispatcher (see _schedule_existing_reminders).
     scheduler.start()
 
     # Catch up rollover if the server started after the scheduled time
@@ -1878,7 +1721,7 @@ def _start_scheduler():
         _rollover_incomplete_events()
     except Exception as e:
         app.logger.error(f"Error running rollover catch-up: {e}")
-    # Schedule existing reminders on startup
+    _materialize_recurring_horizon_job()
     _schedule_existing_reminders()
 
 
@@ -1942,32 +1785,21 @@ def _send_push_to_user(user, title, body=None, link=None, event_id=None, actions
         payload_data['actions'] = actions
 
     payload = json.dumps(payload_data)
-    sent = 0
     # Use high urgency for reminders to ensure delivery on mobile even when screen is off
     headers = {'Urgency': 'high', 'Topic': 'reminder'} if event_id else {}
-    for sub in subs:
-        try:
-            webpush(
-                subscription_info={
-                    'endpoint': sub.endpoint,
-                    'keys': {'p256dh': sub.p256dh, 'auth': sub.auth}
-                },
-                data=payload,
-                vapid_private_key=private_key,
-                vapid_claims={"sub": "mailto:{}".format(os.environ.get('VAPID_SUBJECT', 'admin@example.com'))},
-                headers=headers
-            )
-            sent += 1
-        except WebPushException as exc:
-            # Clean up invalid subscriptions
-            if exc.response and exc.response.status_code in (404, 410):
-                app.logger.warning("Deleting invalid push subscription %s due to %s", sub.endpoint, exc.response.status_code)
-                db.session.delete(sub)
-                db.session.commit()
-            continue
-        except Exception:
-            app.logger.exception("Push send error")
-            continue
-    return sent
+    result = push_delivery.send(
+        [PushTarget(sub.id, sub.endpoint, sub.p256dh, sub.auth) for sub in subs],
+        payload,
+        private_key,
+        "mailto:{}".format(os.environ.get('VAPID_SUBJECT', 'admin@example.com')),
+        headers=headers,
+        logger=app.logger,
+    )
+    if result.dead:
+        # Clean up invalid subscriptions
+        app.logger.warning("Deleting %s invalid push subscriptions for user %s", len(result.dead), user.id)
+        PushSubscription.query.filter(PushSubscription.id.in_(result.dead)).delete(synchronize_session=False)
+        db.session.commit()
+    return result.sent
 
 
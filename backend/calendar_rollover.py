@@ -0,0 +1,348 @@
+"""
+Set-based nightly rollover of unfinished calendar entries.
+
+Yesterday's eligible entries for every user come from one query; their
+linked tasks, list items, feed items, planner rows and phases from one IN
+query per type; today's existing copies and order indexes from one query
+each. Order indexes for copies are handed out in memory per user. Copies,
+deletes and recurrence exceptions are written with bulk statements and
+committed per batch of users, so a crash loses at most one batch and the
+rerun skips what was already copied (copies carry rolled_from_id).
+
+A dry run plans the same work and reports it without writing anything.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, insert, update
+
+from .search_index import ENTITY_CALENDAR, reindex_search_entities
+from models import (
+    db,
+    CalendarEvent,
+    DoFeedItem,
+    Note,
+    NoteListItem,
+    PlannerMultiItem,
+    PlannerMultiLine,
+    PlannerSimpleItem,
+    RecurrenceException,
+    TodoItem,
+)
+
+
+ROLLOVER_BATCH_SIZE = max(1, int(os.environ.get('ROLLOVER_BATCH_SIZE', 500)))
+_IN_CHUNK = 500
+
+# CalendarEvent link column -> (model, date attribute moved to today)
+_LINKED_SOURCES = OrderedDict([
+    ('todo_item_id', (TodoItem, 'due_date')),
+    ('note_list_item_id', (NoteListItem, 'scheduled_date')),
+    ('do_feed_item_id', (DoFeedItem, 'scheduled_date')),
+    ('planner_simple_item_id', (PlannerSimpleItem, 'scheduled_date')),
+    ('planner_multi_item_id', (PlannerMultiItem, 'scheduled_date')),
+    ('planner_multi_line_id', (PlannerMultiLine, 'scheduled_date')),
+])
+_LINK_FIELDS = tuple(_LINKED_SOURCES)
+
+
+def _chunks(values: List[int], size: int = _IN_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _load_by_id(model, ids: Iterable[int]) -> Dict[int, object]:
+    found = {}
+    for chunk in _chunks(sorted(set(ids))):
+        found.update((row.id, row) for row in model.query.filter(model.id.in_(chunk)))
+    return found
+
+
+def _insert_rows():
+    # Keep NULLs in the statement so rows with different empty columns still share one multi-row INSERT.
+    return insert(CalendarEvent).execution_options(render_nulls=True)
+
+
+class _Batch:
+    """Planned writes for a group of users, applied with one statement per kind."""
+
+    def __init__(self):
+        self.events = 0
+        self.phase_rows = []
+        self.copy_rows = []
+        self.exceptions = set()
+        self.delete_ids = set()
+        self.mark_done = []
+        self.moves = []
+        self.relinks = []
+
+    def apply(self, today) -> Dict[int, List[int]]:
+        """Write the batch and commit; returns created copy ids per user."""
+        created: Dict[int, List[int]] = {}
+        for ev in self.mark_done:
+            ev.status = 'done'
+        for source, target in self.relinks:
+            for field in _LINK_FIELDS:
+                setattr(target, field, getattr(source, field))
+        for obj, attribute in self.moves:
+            setattr(obj, attribute, today)
+
+        phase_ids = {}
+        if self.phase_rows:
+            inserted = db.session.execute(
+                _insert_rows().returning(CalendarEvent.id, CalendarEvent.user_id, CalendarEvent.rolled_from_id),
+                self.phase_rows,
+            ).all()
+            for row in inserted:
+                phase_ids[row.rolled_from_id] = row.id
+                created.setdefault(row.user_id, []).append(row.id)
+        if self.copy_rows:
+            for row in self.copy_rows:
+                pending_phase = row.pop('_new_phase_of', None)
+                if pending_phase is not None:
+                    row['phase_id'] = phase_ids.get(pending_phase)
+            inserted = db.session.execute(
+                _insert_rows().returning(CalendarEvent.id, CalendarEvent.user_id),
+                self.copy_rows,
+            ).all()
+            for row in inserted:
+                created.setdefault(row.user_id, []).append(row.id)
+        if self.exceptions:
+            db.session.execute(
+                insert(RecurrenceException),
+                [
+                    {'user_id': user_id, 'recurrence_id': recurrence_id, 'day': day_value}
+                    for user_id, recurrence_id, day_value in sorted(self.exceptions)
+                ],
+            )
+        delete_ids = sorted(self.delete_ids)
+        for chunk in _chunks(delete_ids):
+            # Bulk deletes skip the ORM's SET NULL handling of these references.
+            db.session.execute(
+                update(Note).where(Note.calendar_event_id.in_(chunk)).values(calendar_event_id=None),
+                execution_options={'synchronize_session': False},
+            )
+            for column in (CalendarEvent.phase_id, CalendarEvent.group_id):
+                db.session.execute(
+                    update(CalendarEvent).where(column.in_(chunk)).values({column.key: None}),
+                    execution_options={'synchronize_session': False},
+                )
+            db.session.execute(
+                delete(CalendarEvent).where(CalendarEvent.id.in_(chunk)),
+                execution_options={'synchronize_session': False},
+            )
+        created_ids = sorted(entity_id for ids in created.values() for entity_id in ids)
+        reindex_search_entities(ENTITY_CALENDAR, created_ids + delete_ids)
+        db.session.commit()
+        return created
+
+
+def roll_over_calendar(today, dry_run: bool = False, batch_size: int = ROLLOVER_BATCH_SIZE,
+                       reminder_at=None) -> Tuple[dict, Dict[int, List[int]]]:
+    """
+    Copy yesterday's unfinished rollover-enabled entries of every user into today.
+
+    Returns (report, created ids per user). The report holds counts and
+    per-stage timings in seconds; with dry_run nothing is written and created
+    is empty. reminder_at(day, start_time, minutes_before), when given, sets
+    each copy's next_reminder_at.
+    """
+    started = time.perf_counter()
+    yesterday = today - timedelta(days=1)
+    report = {
+        'day': today.isoformat(),
+        'dry_run': bool(dry_run),
+        'users': 0,
+        'scanned': 0,
+        'copied': 0,
+        'phases_copied': 0,
+        'relinked': 0,
+        'marked_done': 0,
+        'deleted': 0,
+        'duplicates_removed': 0,
+        'batches': 0,
+        'timings': {},
+    }
+
+    events = CalendarEvent.query.filter(
+        CalendarEvent.day == yesterday,
+        CalendarEvent.status != 'done',
+        CalendarEvent.rollover_enabled.is_(True),
+        CalendarEvent.is_phase.is_(False)
+    ).order_by(CalendarEvent.user_id.asc(), CalendarEvent.order_index.asc(), CalendarEvent.id.asc()).all()
+    existing_copies = CalendarEvent.query.filter(
+        CalendarEvent.day == today,
+        CalendarEvent.rolled_from_id.isnot(None)
+    ).order_by(CalendarEvent.id.asc()).all()
+    linked = {
+        field: _load_by_id(model, (getattr(ev, field) for ev in events if getattr(ev, field)))
+        for field, (model, _attribute) in _LINKED_SOURCES.items()
+    }
+    phases = {
+        phase.id: phase
+        for phase in _load_by_id(CalendarEvent, (ev.phase_id for ev in events if ev.phase_id)).values()
+        if phase.is_phase and phase.day == yesterday
+    }
+    max_orders = dict(
+        db.session.query(CalendarEvent.user_id, db.func.max(CalendarEvent.order_index))
+        .filter(CalendarEvent.day == today)
+        .group_by(CalendarEvent.user_id)
+        .all()
+    )
+    loaded = time.perf_counter()
+
+    # Earliest copy of each source wins; later ones are duplicates from overlapping runs.
+    rolled_lookup = {}
+    duplicate_ids = set()
+    for copy in existing_copies:
+        if copy.rolled_from_id in rolled_lookup:
+            duplicate_ids.add(copy.id)
+        else:
+            rolled_lookup[copy.rolled_from_id] = copy
+    report['duplicates_removed'] = len(duplicate_ids)
+
+    batches = []
+    batch = _Batch()
+    batch.delete_ids.update(duplicate_ids)
+    user_ids = []
+    position = 0
+    while position < len(events):
+        uid = events[position].user_id
+        user_events = []
+        while position < len(events) and events[position].user_id == uid:
+            user_events.append(events[position])
+            position += 1
+        user_ids.append(uid)
+        _plan_user(batch, uid, user_events, today, linked, phases, rolled_lookup, max_orders, report, reminder_at)
+        if batch.events >= batch_size:
+            batches.append(batch)
+            batch = _Batch()
+    if batch.events or batch.delete_ids:
+        batches.append(batch)
+    report['users'] = len(user_ids)
+    report['scanned'] = len(events)
+    planned = time.perf_counter()
+
+    created: Dict[int, List[int]] = {}
+    if not dry_run:
+        for pending in batches:
+            for uid, ids in pending.apply(today).items():
+                created.setdefault(uid, []).extend(ids)
+    report['batches'] = len(batches)
+    finished = time.perf_counter()
+    report['timings'] = {
+        'load': round(loaded - started, 4),
+        'plan': round(planned - loaded, 4),
+        'write': round(finished - planned, 4),
+        'total': round(finished - started, 4),
+    }
+    return report, created
+
+
+def _plan_user(batch, uid, events, today, linked, phases, rolled_lookup, max_orders, report, reminder_at=None):
+    next_order = (max_orders.get(uid) or 0) + 1
+    phase_map = {
+        phase_id: rolled_lookup[phase_id].id
+        for phase_id in {ev.phase_id for ev in events if ev.phase_id}
+        if phase_id in rolled_lookup and rolled_lookup[phase_id].is_phase
+    }
+    todo_items = linked['todo_item_id']
+    note_items = linked['note_list_item_id']
+    feed_items = linked['do_feed_item_id']
+
+    for ev in events:
+        batch.events += 1
+        todo_item = todo_items.get(ev.todo_item_id) if ev.todo_item_id else None
+        note_item = note_items.get(ev.note_list_item_id) if ev.note_list_item_id else None
+        if (todo_item is not None and todo_item.status == 'done') or (note_item is not None and note_item.checked):
+            batch.mark_done.append(ev)
+            report['marked_done'] += 1
+            continue
+        if (ev.note_list_item_id and note_item is None) or (ev.do_feed_item_id and ev.do_feed_item_id not in feed_items):
+            batch.delete_ids.add(ev.id)
+            report['deleted'] += 1
+            continue
+
+        moves = [
+            (linked[field][getattr(ev, field)], attribute)
+            for field, (_model, attribute) in _LINKED_SOURCES.items()
+            if getattr(ev, field) and getattr(ev, field) in linked[field]
+        ]
+        if ev.id in rolled_lookup:
+            # Already copied by an earlier run; keep its links current and drop the source.
+            batch.relinks.append((ev, rolled_lookup[ev.id]))
+            batch.moves.extend(moves)
+            batch.delete_ids.add(ev.id)
+            report['relinked'] += 1
+            continue
+
+        phase_id = None
+        new_phase_of = None
+        if ev.phase_id:
+            if phase_map.get(ev.phase_id) is not None:
+                phase_id = phase_map[ev.phase_id]
+            else:
+                orig_phase = phases.get(ev.phase_id)
+                if orig_phase is not None and orig_phase.user_id == uid:
+                    if ev.phase_id not in phase_map:
+                        batch.phase_rows.append({
+                            'user_id': uid,
+                            'title': orig_phase.title,
+                            'description': orig_phase.description,
+                            'day': today,
+                            'is_phase': True,
+                            'is_event': False,
+                            'is_group': False,
+                            'status': 'not_started',
+                            'priority': orig_phase.priority,
+                            'item_note': orig_phase.item_note,
+                            'order_index': next_order,
+                            'reminder_minutes_before': None,
+                            'rollover_enabled': orig_phase.rollover_enabled,
+                            'rolled_from_id': orig_phase.id,
+                        })
+                        next_order += 1
+                        phase_map[ev.phase_id] = None
+                        report['phases_copied'] += 1
+                    new_phase_of = ev.phase_id
+
+        if ev.recurrence_id:
+            batch.exceptions.add((uid, ev.recurrence_id, today))
+
+        row = {
+            'user_id': uid,
+            'title': ev.title,
+            'description': ev.description,
+            'day': today,
+            'start_time': ev.start_time,
+            'end_time': ev.end_time,
+            'status': 'not_started',
+            'priority': ev.priority,
+            'is_phase': False,
+            'is_event': ev.is_event,
+            'allow_overlap': ev.allow_overlap,
+            'display_mode': ev.display_mode or 'both',
+            'is_group': ev.is_group,
+            'phase_id': phase_id,
+            'order_index': next_order,
+            'reminder_minutes_before': ev.reminder_minutes_before,
+            'next_reminder_at': (
+                reminder_at(today, ev.start_time, ev.reminder_minutes_before) if reminder_at else None
+            ),
+            'rollover_enabled': ev.rollover_enabled,
+            'rolled_from_id': ev.id,
+            'recurrence_id': None,
+            'item_note': ev.item_note,
+        }
+        row.update((field, getattr(ev, field)) for field in _LINK_FIELDS)
+        if new_phase_of is not None:
+            row['_new_phase_of'] = new_phase_of
+        batch.copy_rows.append(row)
+        next_order += 1
+        batch.moves.extend(moves)
+        batch.delete_ids.add(ev.id)
+        report['copied'] += 1
@@ -0,0 +1,285 @@
+"""
+Batched daily digest: select recipients, prefetch their day, send over one SMTP session.
+
+The hourly digest job runs in three stages. select_digest_users() picks the
+users whose digest_hour is the current hour with a single SQL query (users
+without a NotificationSetting row get the column defaults), and counts the
+rest for the job stats in the same pass. prefetch_digest_items() loads every
+calendar entry and due todo for those users in two grouped queries. The
+rendered messages then go out through one SmtpSession, which keeps a single
+authenticated connection open for the whole run, reconnects when the server
+drops it or after SMTP_MESSAGES_PER_CONNECTION messages, and retries
+transient failures.
+"""
+
+import os
+import smtplib
+import time
+from collections import defaultdict
+from datetime import time as dt_time
+from email.mime.text import MIMEText
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, or_
+
+from .env import float_env, int_env
+from models import db, CalendarEvent, NotificationSetting, TodoItem, TodoList, User
+
+
+DEFAULT_SMTP_PORT = 587
+DEFAULT_SMTP_TIMEOUT_SECONDS = 30.0
+DEFAULT_SMTP_RETRIES = 2
+DEFAULT_MESSAGES_PER_CONNECTION = 100
+PREFETCH_CHUNK_SIZE = 500
+
+# Connection-level problems: reconnect and send the message again.
+_RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+
+def build_message(from_addr: str, to_addr: str, subject: str, body: str, html_body: Optional[str] = None) -> str:
+    msg = MIMEText(html_body, 'html') if html_body else MIMEText(body, 'plain')
+    msg['Subject'] = subject
+    msg['From'] = from_addr
+    msg['To'] = to_addr
+    return msg.as_string()
+
+
+class SmtpSession:
+    """
+    One authenticated SMTP connection reused for many messages.
+
+    The connection is opened on the first send. A message is retried up to
+    `retries` times on a fresh connection when the server disconnects or
+    answers with a 4xx (temporary) code; 5xx answers fail that message only.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = DEFAULT_SMTP_PORT,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        from_addr: Optional[str] = None,
+        timeout: float = DEFAULT_SMTP_TIMEOUT_SECONDS,
+        retries: int = DEFAULT_SMTP_RETRIES,
+        messages_per_connection: int = DEFAULT_MESSAGES_PER_CONNECTION,
+        smtp_factory: Optional[Callable[..., smtplib.SMTP]] = None,
+        logger=None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.from_addr = from_addr or user
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.messages_per_connection = max(1, messages_per_connection)
+        self.smtp_factory = smtp_factory
+        self.logger = logger
+        self.sleep = sleep
+        self._server = None
+        self._sent_on_connection = 0
+        self.connections = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def __enter__(self) -> 'SmtpSession':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _connect(self):
+        factory = self.smtp_factory or smtplib.SMTP
+        server = factory(self.host, self.port, timeout=self.timeout)
+        try:
+            server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            self._drop(server)
+            raise
+        self._server = server
+        self._sent_on_connection = 0
+        self.connections += 1
+        return server
+
+    @staticmethod
+    def _drop(server) -> None:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            self._drop(server)
+
+    def send(self, to_addr: str, subject: str, body: str, html_body: Optional[str] = None) -> bool:
+        message = build_message(self.from_addr, to_addr, subject, body, html_body)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                self.sleep(min(2 ** (attempt - 1), 10))
+            try:
+                if self._server is not None and self._sent_on_connection >= self.messages_per_connection:
+                    self.close()
+                server = self._server or self._connect()
+                server.sendmail(self.from_addr, [to_addr], message)
+                self._sent_on_connection += 1
+                self.sent += 1
+                return True
+            except smtplib.SMTPResponseException as exc:
+                if 400 <= exc.smtp_code < 500:
+                    # Temporary refusal; the server may have ended the transaction, start clean.
+                    self.close()
+                    error = exc
+                    continue
+                error = exc
+                break
+            except smtplib.SMTPRecipientsRefused as exc:
+                error = exc
+                break
+            except _RECONNECT_ERRORS as exc:
+                if self._server is not None:
+                    self._drop(self._server)
+                    self._server = None
+                error = exc
+        self.failed += 1
+        if self.logger is not None:
+            self.logger.error(f"SMTP send failed: {error}")
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'connections': self.connections,
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+        }
+
+
+def smtp_session_from_env(logger=None, smtp_factory: Optional[Callable[..., smtplib.SMTP]] = None) -> Optional[SmtpSession]:
+    """SmtpSession from SMTP_* settings, or None when host or sender is missing."""
+    host = os.environ.get('SMTP_HOST')
+    user = os.environ.get('SMTP_USER')
+    from_addr = os.environ.get('SMTP_FROM') or user
+    if not host or not from_addr:
+        return None
+    return SmtpSession(
+        host,
+        port=int_env('SMTP_PORT', DEFAULT_SMTP_PORT),
+        user=user,
+        password=os.environ.get('SMTP_PASSWORD'),
+        from_addr=from_addr,
+        timeout=float_env('SMTP_TIMEOUT_SECONDS', DEFAULT_SMTP_TIMEOUT_SECONDS),
+        retries=int_env('SMTP_RETRIES', DEFAULT_SMTP_RETRIES),
+        messages_per_connection=int_env('SMTP_MESSAGES_PER_CONNECTION', DEFAULT_MESSAGES_PER_CONNECTION),
+        smtp_factory=smtp_factory,
+        logger=logger,
+    )
+
+
+def select_digest_users(hour: Optional[int]) -> Tuple[List[int], Dict[str, int]]:
+    """
+    Ids of users due a digest at local `hour` (any hour when None), plus counts for the stats.
+
+    Counts are users_total, skipped_prefs (email or digest off) and
+    skipped_hour (digest enabled for another hour).
+    """
+    default_hour = NotificationSetting.digest_hour.default.arg
+    no_prefs = NotificationSetting.id.is_(None)
+    wants_digest = or_(
+        no_prefs,
+        and_(NotificationSetting.email_enabled.is_(True), NotificationSetting.digest_enabled.is_(True)),
+    )
+    if hour is None:
+        at_hour = wants_digest
+    else:
+        hour_matches = NotificationSetting.digest_hour == hour
+        if default_hour == hour:
+            hour_matches = or_(no_prefs, hour_matches)
+        at_hour = and_(wants_digest, hour_matches)
+    rows = db.session.query(User.id, case((at_hour, 1), (wants_digest, 2), else_=0)).outerjoin(
+        NotificationSetting, NotificationSetting.user_id == User.id
+    ).order_by(User.id).all()
+    user_ids = [user_id for user_id, bucket in rows if bucket == 1]
+    counts = {
+        'users_total': len(rows),
+        'skipped_prefs': sum(1 for _, bucket in rows if bucket == 0),
+        'skipped_hour': sum(1 for _, bucket in rows if bucket == 2),
+    }
+    return user_ids, counts
+
+
+def _chunks(values: Sequence[int], size: int = PREFETCH_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def prefetch_digest_items(user_ids: Sequence[int], day) -> Dict[int, Tuple[list, list]]:
+    """
+    user id -> (events, tasks) for `day`, loaded with one calendar and one todo query per chunk of users.
+
+    Events are CalendarEvent rows; tasks are dicts (title, start_time,
+    end_time, priority, status) from calendar tasks and from todos due that
+    day which are not already linked to one of the user's calendar tasks.
+    """
+    entries = defaultdict(list)
+    todos = defaultdict(list)
+    for chunk in _chunks(list(user_ids)):
+        rows = CalendarEvent.query.filter(
+            CalendarEvent.user_id.in_(chunk),
+            CalendarEvent.day == day,
+            CalendarEvent.is_group.is_(False),
+            CalendarEvent.is_phase.is_(False),
+        ).order_by(
+            CalendarEvent.user_id,
+            CalendarEvent.start_time.is_(None),
+            CalendarEvent.start_time.asc(),
+        ).all()
+        for row in rows:
+            entries[row.user_id].append(row)
+        todo_rows = db.session.query(TodoList.user_id, TodoItem).join(
+            TodoList, TodoItem.list_id == TodoList.id
+        ).filter(
+            TodoList.user_id.in_(chunk),
+            TodoItem.due_date == day,
+            TodoItem.is_phase.is_(False),
+        ).order_by(TodoList.user_id, TodoItem.order_index.asc()).all()
+        for user_id, item in todo_rows:
+            todos[user_id].append(item)
+
+    items = {}
+    for user_id in user_ids:
+        events = [row for row in entries.get(user_id, []) if row.is_event]
+        calendar_tasks = [row for row in entries.get(user_id, []) if not row.is_event]
+        linked_task_ids = {task.todo_item_id for task in calendar_tasks if task.todo_item_id}
+        tasks = [{
+            'title': task.title,
+            'start_time': task.start_time,
+            'end_time': task.end_time,
+            'priority': task.priority,
+            'status': task.status,
+        } for task in calendar_tasks]
+        tasks.extend({
+            'title': item.content,
+            'start_time': None,
+            'end_time': None,
+            'priority': None,
+            'status': item.status,
+        } for item in todos.get(user_id, []) if item.id not in linked_task_ids)
+        tasks.sort(key=lambda item: (
+            item.get('start_time') is None,
+            item.get('start_time') or dt_time.min,
+            item.get('title', '').lower(),
+        ))
+        items[user_id] = (events, tasks)
+    return items
@@ -0,0 +1,448 @@
+"""
+Account-wide near-duplicate scan across tasks, list items, recalls and bookmarks.
+
+A scan walks one user's items in a fixed (entity type, id) order, a chunk of
+rows at a time. For each row only later rows that share a blocking key (the
+whole normalized text or one of its tokens) are scored: identical text, token
+overlap, then cosine similarity of content-addressed title vectors. Matches are
+written per chunk together with the cursor, so a scan interrupted by the time
+budget, a restart or a crash resumes where it stopped. The loaded and indexed
+corpus is kept per scan between ticks, so only a new process reloads it.
+"""
+
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .ai_embeddings import embed_texts_cached, embedding_model_name, embeddings_available
+from .embedding_service import (
+    ENTITY_BOOKMARK,
+    ENTITY_RECALL,
+    ENTITY_TODO_ITEM,
+    _chunks,
+    _find_vectors,
+    _store_vectors,
+    _vector_values,
+)
+from .env import int_env
+from .text_helpers import _jaccard_similarity, _normalize_similarity_text, _tokenize_similarity
+from models import (
+    db,
+    AreaBlock,
+    AreaBlockItem,
+    BookmarkItem,
+    DuplicateMatch,
+    DuplicateScan,
+    EmbeddingVector,
+    Note,
+    NoteListItem,
+    RecallItem,
+    TodoItem,
+    TodoList,
+    User,
+)
+from services.duplicate_index import _hash_text
+from services.duplicate_service import build_list_preview_text
+
+
+ENTITY_NOTE_LIST_ITEM = "note_list_item"
+ENTITY_AREA_BLOCK_ITEM = "area_block_item"
+SCAN_ENTITY_TYPES = (
+    ENTITY_TODO_ITEM,
+    ENTITY_NOTE_LIST_ITEM,
+    ENTITY_AREA_BLOCK_ITEM,
+    ENTITY_RECALL,
+    ENTITY_BOOKMARK,
+)
+_TYPE_RANK = {entity_type: rank for rank, entity_type in enumerate(SCAN_ENTITY_TYPES)}
+
+SCAN_PENDING = "pending"
+SCAN_RUNNING = "running"
+SCAN_DONE = "done"
+SCAN_FAILED = "failed"
+
+LIST_HEADING_PREFIXES = ("[[section]]", "[[subsection]]")
+LEXICAL_THRESHOLD = 0.8
+VECTOR_THRESHOLD = 0.9
+PREVIEW_CHARS = 300
+RESCAN_AFTER = timedelta(days=1)
+
+
+CHUNK_ROWS = int_env("DUPLICATE_SCAN_CHUNK_ROWS", 500)
+TIME_BUDGET_SECONDS = int_env("DUPLICATE_SCAN_TIME_BUDGET_SECONDS", 20)
+# Tokens shared by more items than this are too common to say anything about duplication.
+BLOCK_MAX_SIZE = int_env("DUPLICATE_SCAN_BLOCK_MAX_SIZE", 200)
+# Indexed corpora of in-progress scans kept between ticks.
+MAX_CACHED_CORPORA = int_env("DUPLICATE_SCAN_CACHED_CORPORA", 4)
+
+Row = Tuple[str, int, str]
+
+
+def load_scan_rows(user_id: int) -> List[Row]:
+    """(entity type, id, preview text) for every scannable item, in scan order."""
+    rows: List[Row] = []
+    for item_id, content in (
+        db.session.query(TodoItem.id, TodoItem.content)
+        .join(TodoList, TodoItem.list_id == TodoList.id)
+        .filter(TodoList.user_id == user_id, db.or_(TodoItem.is_phase.is_(False), TodoItem.is_phase.is_(None)))
+        .filter(TodoItem.status != "phase")
+    ):
+        rows.append((ENTITY_TODO_ITEM, item_id, (content or "").strip()))
+    for item in (
+        db.session.query(NoteListItem.id, NoteListItem.text, NoteListItem.link_text)
+        .join(Note, NoteListItem.note_id == Note.id)
+        .filter(Note.user_id == user_id, Note.note_type == "list")
+    ):
+        if (item.text or "").strip().startswith(LIST_HEADING_PREFIXES):
+            continue
+        rows.append((ENTITY_NOTE_LIST_ITEM, item.id, build_list_preview_text(item)))
+    for item in (
+        db.session.query(AreaBlockItem.id, AreaBlockItem.text, AreaBlockItem.link_text)
+        .join(AreaBlock, AreaBlockItem.block_id == AreaBlock.id)
+        .filter(AreaBlockItem.user_id == user_id, AreaBlockItem.item_type == "item")
+    ):
+        rows.append((ENTITY_AREA_BLOCK_ITEM, item.id, build_list_preview_text(item)))
+    for item_id, title in db.session.query(RecallItem.id, RecallItem.title).filter(RecallItem.user_id == user_id):
+        rows.append((ENTITY_RECALL, item_id, (title or "").strip()))
+    for item_id, title in db.session.query(BookmarkItem.id, BookmarkItem.title).filter(BookmarkItem.user_id == user_id):
+        rows.append((ENTITY_BOOKMARK, item_id, (title or "").strip()))
+    rows = [row for row in rows if row[2]]
+    rows.sort(key=lambda row: (_TYPE_RANK[row[0]], row[1]))
+    return rows
+
+
+class ScanCorpus:
+    """Normalized rows plus an inverted index over their blocking keys."""
+
+    def __init__(self, rows: List[Row], block_max_size: int = BLOCK_MAX_SIZE):
+        self.rows = rows
+        self.order_keys = [(_TYPE_RANK[entity_type], entity_id) for entity_type, entity_id, _ in rows]
+        self.normalized = [_normalize_similarity_text(text) for _, _, text in rows]
+        self.tokens = [_tokenize_similarity(text) for text in self.normalized]
+        self.block_max_size = block_max_size
+        self.postings: Dict[Tuple[str, str], List[int]] = {}
+        for idx, (text, tokens) in enumerate(zip(self.normalized, self.tokens)):
+            if not text:
+                continue
+            for key in self._keys(text, tokens):
+                self.postings.setdefault(key, []).append(idx)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @staticmethod
+    def _keys(text: str, tokens: List[str]):
+        keys = {("text", text)}
+        keys.update(("token", token) for token in tokens if len(token) > 1)
+        return keys
+
+    def position_after(self, entity_type: Optional[str], entity_id: Optional[int]) -> int:
+        """Index of the first row strictly after the cursor (0 for a fresh scan)."""
+        if entity_type is None or entity_type not in _TYPE_RANK:
+            return 0
+        return bisect_right(self.order_keys, (_TYPE_RANK[entity_type], entity_id or 0))
+
+    def partners(self, idx: int) -> List[int]:
+        text = self.normalized[idx]
+        if not text:
+            return []
+        found = set()
+        for key in self._keys(text, self.tokens[idx]):
+            members = self.postings.get(key, ())
+            if key[0] != "text" and len(members) > self.block_max_size:
+                continue
+            found.update(members)
+        return sorted(j for j in found if j > idx)
+
+
+class _CorpusCache:
+    """Small LRU of ScanCorpus per scan id, so resuming a scan does not reload and re-index it."""
+
+    def __init__(self, max_entries: int = MAX_CACHED_CORPORA):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[int, ScanCorpus]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scan_id: int) -> Optional[ScanCorpus]:
+        with self._lock:
+            corpus = self._entries.get(scan_id)
+            if corpus is not None:
+                self._entries.move_to_end(scan_id)
+            return corpus
+
+    def put(self, scan_id: int, corpus: ScanCorpus) -> None:
+        with self._lock:
+            self._entries[scan_id] = corpus
+            self._entries.move_to_end(scan_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, scan_id: int) -> None:
+        with self._lock:
+            self._entries.pop(scan_id, None)
+
+
+_scan_corpora = _CorpusCache()
+
+
+def title_vectors(texts_by_hash: Dict[str, str], embed_texts_fn=None) -> Dict[str, np.ndarray]:
+    """
+    Unit vectors for normalized titles, keyed by content hash.
+
+    Vectors live in the shared embedding_vector table, so titles already embedded
+    for list duplicate checks or an earlier scan are not sent to the provider again.
+    """
+    if not texts_by_hash or not embeddings_available():
+        return {}
+    model_name = embedding_model_name()
+    rows = _find_vectors(texts_by_hash, model_name)
+    missing = [content_hash for content_hash in texts_by_hash if content_hash not in rows]
+    if missing:
+        embedded = list((embed_texts_fn or embed_texts_cached)([texts_by_hash[h] for h in missing]))
+        fresh = {content_hash: vector for content_hash, vector in zip(missing, embedded) if vector}
+        rows.update(_store_vectors(model_name, fresh))
+    # Keep the nightly vector GC from collecting titles the scan still relies on.
+    now = datetime.utcnow()
+    for chunk in _chunks([row.id for row in rows.values()]):
+        EmbeddingVector.query.filter(EmbeddingVector.id.in_(chunk)).update(
+            {EmbeddingVector.last_used_at: now},
+            synchronize_session=False,
+        )
+    vectors = {}
+    for content_hash, row in rows.items():
+        values = _vector_values(row)
+        norm = float(np.linalg.norm(values)) if values is not None else 0.0
+        if norm > 0:
+            vectors[content_hash] = values / norm
+    return vectors
+
+
+def score_chunk(
+    corpus: ScanCorpus,
+    start: int,
+    stop: int,
+    vectors_fn: Optional[Callable[[Dict[str, str]], Dict[str, np.ndarray]]] = None,
+) -> List[Tuple[int, int, float, str]]:
+    """Matches (i, j, similarity, method) for rows start..stop against later rows."""
+    matches = []
+    undecided = []
+    for i in range(start, stop):
+        for j in corpus.partners(i):
+            if corpus.normalized[i] == corpus.normalized[j]:
+                matches.append((i, j, 1.0, "exact"))
+                continue
+            score = _jaccard_similarity(corpus.tokens[i], corpus.tokens[j])
+            if score >= LEXICAL_THRESHOLD:
+                matches.append((i, j, score, "lexical"))
+            else:
+                undecided.append((i, j))
+    if not undecided or vectors_fn is None:
+        return matches
+    texts_by_hash = {}
+    for pair in undecided:
+        for idx in pair:
+            texts_by_hash[_hash_text(corpus.normalized[idx])] = corpus.normalized[idx]
+    vectors = vectors_fn(texts_by_hash)
+    scorable = [
+        (i, j, vectors[_hash_text(corpus.normalized[i])], vectors[_hash_text(corpus.normalized[j])])
+        for i, j in undecided
+        if _hash_text(corpus.normalized[i]) in vectors and _hash_text(corpus.normalized[j]) in vectors
+    ]
+    if not scorable:
+        return matches
+    dims = {vec_a.shape[0] for _, _, vec_a, _ in scorable} | {vec_b.shape[0] for _, _, _, vec_b in scorable}
+    if len(dims) != 1:
+        return matches
+    left = np.vstack([vec_a for _, _, vec_a, _ in scorable])
+    right = np.vstack([vec_b for _, _, _, vec_b in scorable])
+    scores = np.einsum("ij,ij->i", left, right)
+    for (i, j, _, _), score in zip(scorable, scores.tolist()):
+        if score >= VECTOR_THRESHOLD:
+            matches.append((i, j, round(score, 4), "vector"))
+    return matches
+
+
+def request_duplicate_scan(user_id: int) -> DuplicateScan:
+    """Queue a scan for user_id, reusing one that is already queued or running."""
+    active = (
+        DuplicateScan.query.filter(
+            DuplicateScan.user_id == user_id,
+            DuplicateScan.status.in_((SCAN_PENDING, SCAN_RUNNING)),
+        )
+        .order_by(DuplicateScan.id.desc())
+        .first()
+    )
+    if active is not None:
+        return active
+    scan = DuplicateScan(user_id=user_id, status=SCAN_PENDING)
+    db.session.add(scan)
+    db.session.commit()
+    return scan
+
+
+def queue_stale_duplicate_scans(rescan_after: timedelta = RESCAN_AFTER) -> int:
+    """Queue a scan for every user whose last finished scan is older than rescan_after."""
+    cutoff = datetime.utcnow() - rescan_after
+    queued = 0
+    for (user_id,) in db.session.query(User.id):
+        latest = (
+            DuplicateScan.query.filter_by(user_id=user_id)
+            .order_by(DuplicateScan.id.desc())
+            .first()
+        )
+        if latest is not None and (
+            latest.status in (SCAN_PENDING, SCAN_RUNNING)
+            or (latest.finished_at and latest.finished_at > cutoff)
+        ):
+            continue
+        db.session.add(DuplicateScan(user_id=user_id, status=SCAN_PENDING))
+        queued += 1
+    db.session.commit()
+    return queued
+
+
+def _finish_scan(scan: DuplicateScan) -> None:
+    scan.status = SCAN_DONE
+    scan.finished_at = datetime.utcnow()
+    older = [
+        scan_id
+        for (scan_id,) in db.session.query(DuplicateScan.id).filter(
+            DuplicateScan.user_id == scan.user_id,
+            DuplicateScan.id < scan.id,
+            DuplicateScan.status.in_((SCAN_DONE, SCAN_FAILED)),
+        )
+    ]
+    for chunk in _chunks(older):
+        DuplicateMatch.query.filter(DuplicateMatch.scan_id.in_(chunk)).delete(synchronize_session=False)
+        DuplicateScan.query.filter(DuplicateScan.id.in_(chunk)).delete(synchronize_session=False)
+
+
+def run_duplicate_scan(
+    scan: DuplicateScan,
+    deadline: float,
+    chunk_rows: int = CHUNK_ROWS,
+    vectors_fn: Optional[Callable[[Dict[str, str]], Dict[str, np.ndarray]]] = title_vectors,
+) -> bool:
+    """Advance scan chunk by chunk until it finishes or time.monotonic() passes deadline."""
+    if scan.status == SCAN_PENDING:
+        scan.status = SCAN_RUNNING
+        scan.started_at = datetime.utcnow()
+    corpus = _scan_corpora.get(scan.id)
+    if corpus is None:
+        # Loaded once per scan and process; a scan resumed elsewhere rebuilds it and bisects to the cursor.
+        corpus = ScanCorpus(load_scan_rows(scan.user_id))
+        _scan_corpora.put(scan.id, corpus)
+    scan.items_total = len(corpus)
+    position = corpus.position_after(scan.cursor_type, scan.cursor_id)
+    db.session.commit()
+    while position < len(corpus):
+        stop = min(position + max(1, chunk_rows), len(corpus))
+        matches = score_chunk(corpus, position, stop, vectors_fn)
+        db.session.add_all(
+            DuplicateMatch(
+                scan_id=scan.id,
+                user_id=scan.user_id,
+                source_type=corpus.rows[i][0],
+                source_id=corpus.rows[i][1],
+                source_text=corpus.rows[i][2][:PREVIEW_CHARS],
+                target_type=corpus.rows[j][0],
+                target_id=corpus.rows[j][1],
+                target_text=corpus.rows[j][2][:PREVIEW_CHARS],
+                similarity=similarity,
+                method=method,
+            )
+            for i, j, similarity, method in matches
+        )
+        scan.cursor_type, scan.cursor_id = corpus.rows[stop - 1][0], corpus.rows[stop - 1][1]
+        scan.items_scanned = stop
+        scan.matches_found = (scan.matches_found or 0) + len(matches)
+        db.session.commit()
+        position = stop
+        if position < len(corpus) and time.monotonic() >= deadline:
+            return False
+    _finish_scan(scan)
+    db.session.commit()
+    _scan_corpora.discard(scan.id)
+    return True
+
+
+def run_pending_duplicate_scans(time_budget: float = TIME_BUDGET_SECONDS, **kwargs) -> int:
+    """Work through queued scans, oldest first, for at most time_budget seconds; returns scans finished."""
+    deadline = time.monotonic() + time_budget
+    finished = 0
+    while time.monotonic() < deadline:
+        scan = (
+            DuplicateScan.query.filter(DuplicateScan.status.in_((SCAN_PENDING, SCAN_RUNNING)))
+            .order_by(DuplicateScan.id.asc())
+            .first()
+        )
+        if scan is None:
+            break
+        try:
+            done = run_duplicate_scan(scan, deadline, **kwargs)
+        except Exception as exc:
+            db.session.rollback()
+            _scan_corpora.discard(scan.id)
+            scan.status = SCAN_FAILED
+            scan.error = str(exc)[:500]
+            scan.finished_at = datetime.utcnow()
+            db.session.commit()
+            raise
+        if not done:
+            break
+        finished += 1
+    return finished
+
+
+def duplicate_scan_results(
+    user_id: int,
+    limit: int = 50,
+    offset: int = 0,
+    entity_types: Optional[Iterable[str]] = None,
+) -> Dict[str, object]:
+    """Page through the latest finished scan's matches, best first, plus the active scan's progress."""
+    latest = (
+        DuplicateScan.query.filter_by(user_id=user_id, status=SCAN_DONE)
+        .order_by(DuplicateScan.id.desc())
+        .first()
+    )
+    active = (
+        DuplicateScan.query.filter(
+            DuplicateScan.user_id == user_id,
+            DuplicateScan.status.in_((SCAN_PENDING, SCAN_RUNNING, SCAN_FAILED)),
+            DuplicateScan.id > (latest.id if latest else 0),
+        )
+        .order_by(DuplicateScan.id.desc())
+        .first()
+    )
+    payload: Dict[str, object] = {
+        "scan": latest.to_dict() if latest else None,
+        "active_scan": active.to_dict() if active else None,
+        "matches": [],
+        "total": 0,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": None,
+    }
+    if latest is None:
+        return payload
+    query = DuplicateMatch.query.filter_by(scan_id=latest.id)
+    types = [t for t in (entity_types or ()) if t in _TYPE_RANK]
+    if types:
+        query = query.filter(db.or_(DuplicateMatch.source_type.in_(types), DuplicateMatch.target_type.in_(types)))
+    total = query.count()
+    matches = (
+        query.order_by(DuplicateMatch.similarity.desc(), DuplicateMatch.id.asc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    payload["matches"] = [match.to_dict() for match in matches]
+    payload["total"] = total
+    payload["next_offset"] = offset + limit if offset + limit < total else None
+    return payload
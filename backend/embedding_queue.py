@@ -0,0 +1,194 @@
+"""Coalescing, bounded background queue for per-entity embedding refreshes."""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .env import float_env, int_env
+
+
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+DEFAULT_MAX_DELAY_SECONDS = 30.0
+DEFAULT_MAX_PENDING = 10000
+DEFAULT_WORKERS = 2
+DEFAULT_BATCH_SIZE = 200
+
+Key = Tuple[int, str, int]
+
+
+class EmbeddingRefreshQueue:
+    """
+    Keyed pending set drained by one dispatcher thread into a small worker pool.
+
+    Repeated requests for the same (user_id, entity_type, entity_id) inside the
+    debounce window collapse into one refresh; an entry that keeps being touched
+    is still flushed after max_delay. Ready entries are grouped per (user, type)
+    and handed to `refresh(user_id, entity_type, entity_ids)` in batches. When the
+    pending set is full new requests are dropped: the dirty marker written by the
+    caller keeps them queued for the scheduled refresher.
+    """
+
+    def __init__(
+        self,
+        refresh: Optional[Callable[[int, str, List[int]], int]] = None,
+        debounce_seconds: float = DEFAULT_DEBOUNCE_SECONDS,
+        max_delay_seconds: float = DEFAULT_MAX_DELAY_SECONDS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        workers: int = DEFAULT_WORKERS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.refresh = refresh
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.max_pending = max_pending
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        # key -> (first_enqueued_at, last_enqueued_at), monotonic seconds
+        self._pending: "OrderedDict[Key, Tuple[float, float]]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._app = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._in_flight = 0
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed_batches = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def enqueue(self, app, user_id: int, entity_type: str, entity_ids: Iterable[int]) -> None:
+        now = time.monotonic()
+        with self._cond:
+            self._app = self._app or app
+            for entity_id in entity_ids:
+                if not entity_id:
+                    continue
+                key = (int(user_id), entity_type, int(entity_id))
+                existing = self._pending.get(key)
+                if existing is not None:
+                    self._pending[key] = (existing[0], now)
+                    self.coalesced += 1
+                    continue
+                if len(self._pending) >= self.max_pending:
+                    self.dropped += 1
+                    continue
+                self._pending[key] = (now, now)
+                self.enqueued += 1
+            self._ensure_dispatcher()
+            self._cond.notify()
+
+    def _ensure_dispatcher(self) -> None:
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embedding-refresh")
+        self._dispatcher = threading.Thread(target=self._dispatch_forever, name="embedding-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    def _ready_at(self, first: float, last: float) -> float:
+        return min(last + self.debounce_seconds, first + self.max_delay_seconds)
+
+    def take_ready(self, now: Optional[float] = None) -> List[Tuple[int, str, List[int], float]]:
+        """Pop ready entries grouped as (user_id, entity_type, entity_ids, oldest enqueue time)."""
+        now = time.monotonic() if now is None else now
+        groups: Dict[Tuple[int, str], Tuple[List[int], float]] = {}
+        with self._cond:
+            for key, (first, last) in list(self._pending.items()):
+                if self._ready_at(first, last) > now:
+                    continue
+                ids, oldest = groups.get(key[:2], ([], first))
+                ids.append(key[2])
+                groups[key[:2]] = (ids, min(oldest, first))
+                del self._pending[key]
+        batches = []
+        for (user_id, entity_type), (ids, oldest) in groups.items():
+            for start in range(0, len(ids), self.batch_size):
+                batches.append((user_id, entity_type, ids[start:start + self.batch_size], oldest))
+        return batches
+
+    def run_batch(self, user_id: int, entity_type: str, entity_ids: List[int], enqueued_at: float) -> None:
+        lag = time.monotonic() - enqueued_at
+        try:
+            if self._app is not None:
+                with self._app.app_context():
+                    self._refresh(user_id, entity_type, entity_ids)
+            else:
+                self._refresh(user_id, entity_type, entity_ids)
+        except Exception as exc:
+            self.failed_batches += 1
+            if self._app is not None:
+                self._app.logger.warning(
+                    "Embedding refresh failed for %s x%s user=%s (%s)",
+                    entity_type,
+                    len(entity_ids),
+                    user_id,
+                    exc,
+                )
+        finally:
+            with self._cond:
+                self.processed += len(entity_ids)
+                self.last_lag_seconds = lag
+                self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+    def _refresh(self, user_id: int, entity_type: str, entity_ids: List[int]) -> None:
+        refresh = self.refresh
+        if refresh is None:
+            from .embedding_service import refresh_embeddings_for_entities as refresh
+        refresh(user_id, entity_type, entity_ids)
+
+    def _next_wakeup(self, now: float) -> Optional[float]:
+        if not self._pending:
+            return None
+        return max(0.0, min(self._ready_at(first, last) for first, last in self._pending.values()) - now)
+
+    def _dispatch_forever(self) -> None:
+        while True:
+            with self._cond:
+                while self._in_flight >= self.workers:
+                    self._cond.wait()
+                timeout = self._next_wakeup(time.monotonic())
+                if timeout is None or timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+            for batch in self.take_ready():
+                with self._cond:
+                    while self._in_flight >= self.workers:
+                        self._cond.wait()
+                    self._in_flight += 1
+                future = self._executor.submit(self.run_batch, *batch)
+                future.add_done_callback(self._batch_done)
+
+    def _batch_done(self, _future) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        now = time.monotonic()
+        with self._cond:
+            oldest = min((first for first, _ in self._pending.values()), default=None)
+            return {
+                "depth": len(self._pending),
+                "in_flight_batches": self._in_flight,
+                "oldest_pending_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+                "last_lag_seconds": round(self.last_lag_seconds, 3),
+                "max_lag_seconds": round(self.max_lag_seconds, 3),
+                "enqueued": self.enqueued,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "processed": self.processed,
+                "failed_batches": self.failed_batches,
+            }
+
+
+embedding_queue = EmbeddingRefreshQueue(
+    debounce_seconds=float_env("EMBEDDING_QUEUE_DEBOUNCE_SECONDS", DEFAULT_DEBOUNCE_SECONDS),
+    max_delay_seconds=float_env("EMBEDDING_QUEUE_MAX_DELAY_SECONDS", DEFAULT_MAX_DELAY_SECONDS),
+    max_pending=int_env("EMBEDDING_QUEUE_MAX_PENDING", DEFAULT_MAX_PENDING),
+    workers=int_env("EMBEDDING_QUEUE_WORKERS", DEFAULT_WORKERS),
+    batch_size=int_env("EMBEDDING_QUEUE_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+)
@@ -1,16 +1,35 @@
 import hashlib
 import json
+import os
+from datetime import datetime, timedelta
 from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import insert, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 
-from .ai_embeddings import embed_text
+from .ai_embeddings import (
+    DEFAULT_BATCH_MAX_INPUTS,
+    DEFAULT_BATCH_MAX_TOKENS,
+    embed_text,
+    embed_texts,
+    embedding_model_name,
+    embeddings_available,
+    iter_token_batches,
+)
+from .ann_index import ann_registry
+from .lexical_index import Bm25Index, lexical_cache, reciprocal_rank_fusion
+from .vector_cache import vector_cache
 from models import (
     db,
     BookmarkItem,
     CalendarEvent,
+    EmbeddingDirtyMarker,
     EmbeddingRecord,
+    EmbeddingVector,
+    ListDuplicateEntry,
     RecallItem,
     TodoItem,
     TodoList,
@@ -23,6 +42,28 @@ ENTITY_TODO_ITEM = "todo_item"
 ENTITY_TODO_LIST = "todo_list"
 ENTITY_CALENDAR = "calendar_event"
 
+# Vectors are stored packed little-endian so blobs are portable between hosts.
+STORAGE_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+}
+DEFAULT_STORAGE_DTYPE = "float32"
+MAX_SCORED_RESULTS = 15
+DIRTY_REFRESH_BATCH = 500
+IN_CHUNK_SIZE = 500
+VECTOR_GC_GRACE = timedelta(days=7)
+# Below this best cosine similarity a result set counts as low confidence unless
+# the lexical and vector rankings agree on the top hit.
+CONFIDENT_SIMILARITY = float(os.environ.get("SEMANTIC_CONFIDENT_SIMILARITY", "0.35"))
+
+ENTITY_MODELS = {
+    ENTITY_RECALL: RecallItem,
+    ENTITY_BOOKMARK: BookmarkItem,
+    ENTITY_TODO_ITEM: TodoItem,
+    ENTITY_TODO_LIST: TodoList,
+    ENTITY_CALENDAR: CalendarEvent,
+}
+
 
 def _normalize_text(parts: Iterable[Optional[str]]) -> str:
     return "\n".join([p.strip() for p in parts if p and p.strip()]).strip()
@@ -93,6 +134,11 @@ def _hash_text(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
+def _storage_dtype_name() -> str:
+    name = (os.environ.get("EMBEDDING_STORAGE_DTYPE") or DEFAULT_STORAGE_DTYPE).strip().lower()
+    return name if name in STORAGE_DTYPES else DEFAULT_STORAGE_DTYPE
+
+
 def _serialize_embedding(vector: List[float]) -> str:
     return json.dumps(vector)
 
@@ -106,6 +152,151 @@ def _deserialize_embedding(raw: str) -> Optional[List[float]]:
         return None
 
 
+def pack_embedding(vector: Iterable[float], dtype_name: Optional[str] = None) -> Tuple[bytes, str]:
+    """Pack a vector into the binary storage format, returning (blob, dtype_name)."""
+    name = dtype_name if dtype_name in STORAGE_DTYPES else _storage_dtype_name()
+    arr = np.asarray(vector, dtype=STORAGE_DTYPES[name])
+    return arr.tobytes(), name
+
+
+def unpack_embedding(blob: Optional[bytes], dtype_name: Optional[str]) -> Optional[np.ndarray]:
+    """Decode a stored blob into a float32 vector (None when missing or malformed)."""
+    if not blob:
+        return None
+    dtype = STORAGE_DTYPES.get(dtype_name or DEFAULT_STORAGE_DTYPE)
+    if dtype is None or len(blob) % dtype.itemsize:
+        return None
+    return np.frombuffer(blob, dtype=dtype).astype(np.float32)
+
+
+def _record_vector(blob: Optional[bytes], dtype_name: Optional[str], raw_json: Optional[str]) -> Optional[np.ndarray]:
+    vec = unpack_embedding(blob, dtype_name)
+    if vec is not None:
+        return vec
+    legacy = _deserialize_embedding(raw_json or "")
+    if not legacy:
+        return None
+    return np.asarray(legacy, dtype=np.float32)
+
+
+def _chunks(values: List, size: int = IN_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _adjust_ref_counts(deltas: Dict[int, int]) -> None:
+    by_delta: Dict[int, List[int]] = {}
+    for vector_id, delta in deltas.items():
+        if vector_id and delta:
+            by_delta.setdefault(delta, []).append(vector_id)
+    now = datetime.utcnow()
+    for delta, vector_ids in by_delta.items():
+        for chunk in _chunks(vector_ids):
+            EmbeddingVector.query.filter(EmbeddingVector.id.in_(chunk)).update(
+                {
+                    EmbeddingVector.ref_count: EmbeddingVector.ref_count + delta,
+                    EmbeddingVector.last_used_at: now,
+                },
+                synchronize_session=False,
+            )
+
+
+def _find_vectors(content_hashes: Iterable[str], model_name: str) -> Dict[str, EmbeddingVector]:
+    found: Dict[str, EmbeddingVector] = {}
+    for chunk in _chunks(list(set(content_hashes))):
+        for row in EmbeddingVector.query.filter(
+            EmbeddingVector.model_name == model_name,
+            EmbeddingVector.content_hash.in_(chunk),
+        ):
+            found[row.content_hash] = row
+    return found
+
+
+def _store_vectors(model_name: str, vectors: Dict[str, List[float]]) -> Dict[str, EmbeddingVector]:
+    """Insert freshly embedded vectors, tolerating concurrent inserts of the same content."""
+    rows = {}
+    for content_hash, vector in vectors.items():
+        blob, dtype_name = pack_embedding(vector)
+        rows[content_hash] = EmbeddingVector(
+            content_hash=content_hash,
+            model_name=model_name,
+            embedding_blob=blob,
+            embedding_dtype=dtype_name,
+            embedding_dim=len(vector),
+            ref_count=0,
+        )
+    if not rows:
+        return {}
+    db.session.add_all(rows.values())
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        found = _find_vectors(rows, model_name)
+        missing = {h: vectors[h] for h in rows if h not in found}
+        for content_hash, vector in missing.items():
+            blob, dtype_name = pack_embedding(vector)
+            db.session.add(EmbeddingVector(
+                content_hash=content_hash,
+                model_name=model_name,
+                embedding_blob=blob,
+                embedding_dtype=dtype_name,
+                embedding_dim=len(vector),
+                ref_count=0,
+            ))
+        db.session.commit()
+        return _find_vectors(rows, model_name)
+    return rows
+
+
+def _vector_values(row: EmbeddingVector) -> Optional[np.ndarray]:
+    return unpack_embedding(row.embedding_blob, row.embedding_dtype) if row is not None else None
+
+
+def _record_has_vector(record: EmbeddingRecord) -> bool:
+    return bool(record.vector_id or record.embedding_blob or record.embedding_json)
+
+
+def _attach_vector(
+    record: EmbeddingRecord,
+    vector_row: EmbeddingVector,
+    source_hash: str,
+    ref_deltas: Dict[int, int],
+) -> None:
+    """Point a record at a shared vector, accumulating ref-count changes into ref_deltas."""
+    if record.vector_id != vector_row.id:
+        if record.vector_id:
+            ref_deltas[record.vector_id] = ref_deltas.get(record.vector_id, 0) - 1
+        ref_deltas[vector_row.id] = ref_deltas.get(vector_row.id, 0) + 1
+    record.vector_id = vector_row.id
+    record.embedding_blob = None
+    record.embedding_dtype = None
+    record.embedding_json = None
+    record.embedding_dim = vector_row.embedding_dim
+    record.source_hash = source_hash
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length so cosine similarity becomes a dot product."""
+    if matrix.size == 0:
+        return matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _vector_for_text(cleaned: str, source_hash: str) -> Optional[EmbeddingVector]:
+    """Return the shared vector for this text, embedding it only when no entity has it yet."""
+    model_name = embedding_model_name()
+    existing = _find_vectors([source_hash], model_name).get(source_hash)
+    if existing is not None:
+        return existing
+    vector = embed_text(cleaned)
+    if not vector:
+        return None
+    return _store_vectors(model_name, {source_hash: vector}).get(source_hash)
+
+
 def upsert_embedding(user_id: int, entity_type: str, entity_id: int, text: str) -> Optional[List[float]]:
     cleaned = (text or "").strip()
     if not cleaned:
@@ -116,114 +307,414 @@ def upsert_embedding(user_id: int, entity_type: str, entity_id: int, text: str)
         entity_type=entity_type,
         entity_id=entity_id,
     ).first()
-    if record and record.source_hash == source_hash and record.embedding_json:
-        return _deserialize_embedding(record.embedding_json)
+    if record and record.source_hash == source_hash:
+        existing = _vector_values(record.vector) if record.vector_id else _record_vector(
+            record.embedding_blob, record.embedding_dtype, record.embedding_json
+        )
+        if existing is not None:
+            return existing.tolist()
 
-    vector = embed_text(cleaned)
-    if not vector:
+    vector_row = _vector_for_text(cleaned, source_hash)
+    if vector_row is None:
         return None
+    vector = _vector_values(vector_row).tolist()
+
+    for attempt in range(2):
+        if record is None:
+            record = EmbeddingRecord.query.filter_by(
+                user_id=user_id,
+                entity_type=entity_type,
+                entity_id=entity_id,
+            ).first()
+        if record is None:
+            record = EmbeddingRecord(user_id=user_id, entity_type=entity_type, entity_id=entity_id)
+            db.session.add(record)
+        ref_deltas: Dict[int, int] = {}
+        _attach_vector(record, vector_row, source_hash, ref_deltas)
+        try:
+            _adjust_ref_counts(ref_deltas)
+            db.session.commit()
+            break
+        except IntegrityError:
+            # Another worker inserted the record first; retry against its row.
+            db.session.rollback()
+            record = None
+            if attempt:
+                return None
+    vector_cache.upsert(user_id, entity_type, entity_id, vector)
+    ann_registry.upsert(user_id, entity_type, entity_id, vector)
+    lexical_cache.upsert(user_id, entity_type, entity_id, cleaned)
+    return vector
 
-    payload = _serialize_embedding(vector)
-    if record:
-        record.embedding_json = payload
-        record.embedding_dim = len(vector)
-        record.source_hash = source_hash
-        db.session.commit()
-        return vector
 
-    record = EmbeddingRecord(
-        user_id=user_id,
-        entity_type=entity_type,
-        entity_id=entity_id,
-        embedding_json=payload,
-        embedding_dim=len(vector),
-        source_hash=source_hash,
+def _embedding_rows(user_id: int, entity_type: str):
+    rows = (
+        db.session.query(
+            EmbeddingRecord.entity_id,
+            EmbeddingVector.embedding_blob,
+            EmbeddingVector.embedding_dtype,
+            EmbeddingRecord.embedding_blob,
+            EmbeddingRecord.embedding_dtype,
+            EmbeddingRecord.embedding_json,
+        )
+        .outerjoin(EmbeddingVector, EmbeddingRecord.vector_id == EmbeddingVector.id)
+        .filter(EmbeddingRecord.user_id == user_id, EmbeddingRecord.entity_type == entity_type)
+        .all()
     )
-    db.session.add(record)
-    try:
-        db.session.commit()
-    except IntegrityError:
-        db.session.rollback()
-        record = EmbeddingRecord.query.filter_by(
-            user_id=user_id,
-            entity_type=entity_type,
-            entity_id=entity_id,
-        ).first()
-        if not record:
-            return None
-        record.embedding_json = payload
-        record.embedding_dim = len(vector)
-        record.source_hash = source_hash
-        db.session.commit()
-    return vector
+    for entity_id, shared_blob, shared_dtype, legacy_blob, legacy_dtype, legacy_json in rows:
+        if shared_blob:
+            yield entity_id, shared_blob, shared_dtype, None
+        else:
+            yield entity_id, legacy_blob, legacy_dtype, legacy_json
 
 
 def list_embedding_vectors(user_id: int, entity_type: str) -> List[Tuple[int, List[float]]]:
-    records = EmbeddingRecord.query.filter_by(user_id=user_id, entity_type=entity_type).all()
     vectors = []
-    for record in records:
-        vec = _deserialize_embedding(record.embedding_json or "")
-        if not vec:
+    for entity_id, blob, dtype_name, raw_json in _embedding_rows(user_id, entity_type):
+        vec = _record_vector(blob, dtype_name, raw_json)
+        if vec is None or not vec.size:
             continue
-        vectors.append((record.entity_id, vec))
+        vectors.append((entity_id, vec.tolist()))
     return vectors
 
 
-def ensure_embeddings_for_type(user_id: int, entity_type: str, max_new: int = 200) -> int:
-    existing = {
-        record.entity_id: record.source_hash
-        for record in EmbeddingRecord.query.filter_by(user_id=user_id, entity_type=entity_type).all()
-    }
-    created = 0
+def load_embedding_matrix(user_id: int, entity_type: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Load a user's vectors for one entity type as (ids, matrix) with unit-length rows.
+
+    Rows whose dimension differs from the majority (e.g. left over from an older
+    embedding model) are skipped so the matrix stays rectangular.
+    """
+    ids: List[int] = []
+    vectors: List[np.ndarray] = []
+    for entity_id, blob, dtype_name, raw_json in _embedding_rows(user_id, entity_type):
+        vec = _record_vector(blob, dtype_name, raw_json)
+        if vec is None or not vec.size:
+            continue
+        ids.append(entity_id)
+        vectors.append(vec)
+    if not vectors:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    dims: Dict[int, int] = {}
+    for vec in vectors:
+        dims[vec.shape[0]] = dims.get(vec.shape[0], 0) + 1
+    dim = max(dims, key=dims.get)
+    keep = [idx for idx, vec in enumerate(vectors) if vec.shape[0] == dim]
+    matrix = np.vstack([vectors[idx] for idx in keep]).astype(np.float32, copy=False)
+    id_array = np.asarray([ids[idx] for idx in keep], dtype=np.int64)
+    return id_array, normalize_rows(matrix)
+
+
+def get_embedding_matrix(user_id: int, entity_type: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Cached variant of load_embedding_matrix; writes through this module keep it current."""
+    return vector_cache.get(user_id, entity_type, load_embedding_matrix)
+
+
+def upsert_embeddings_bulk(
+    user_id: int,
+    entity_type: str,
+    entries: Iterable[Tuple[int, str]],
+    max_tokens: int = DEFAULT_BATCH_MAX_TOKENS,
+    max_inputs: int = DEFAULT_BATCH_MAX_INPUTS,
+) -> int:
+    """
+    Embed many (entity_id, text) pairs with multi-input requests sized by token budget.
+
+    Entries whose stored hash already matches are skipped, and texts that already
+    exist in the shared vector store (for any entity or user) are never sent to
+    the provider. Returns the number of records written.
+    """
+    pending: Dict[int, Tuple[str, str]] = {}
+    for entity_id, text in entries:
+        cleaned = (text or "").strip()
+        if cleaned:
+            pending[entity_id] = (cleaned, _hash_text(cleaned))
+    if not pending:
+        return 0
+
+    records: Dict[int, EmbeddingRecord] = {}
+    for chunk in _chunks(list(pending)):
+        for record in EmbeddingRecord.query.filter(
+            EmbeddingRecord.user_id == user_id,
+            EmbeddingRecord.entity_type == entity_type,
+            EmbeddingRecord.entity_id.in_(chunk),
+        ):
+            records[record.entity_id] = record
+
+    dirty = [
+        entity_id
+        for entity_id, (_, source_hash) in pending.items()
+        if not (
+            entity_id in records
+            and records[entity_id].source_hash == source_hash
+            and _record_has_vector(records[entity_id])
+        )
+    ]
+    if not dirty:
+        return 0
 
+    model_name = embedding_model_name()
+    known = _find_vectors([pending[entity_id][1] for entity_id in dirty], model_name)
+    missing: Dict[str, str] = {}
+    for entity_id in dirty:
+        text, source_hash = pending[entity_id]
+        if source_hash not in known:
+            missing.setdefault(source_hash, text)
+    missing_hashes = list(missing)
+    texts = [missing[content_hash] for content_hash in missing_hashes]
+    for batch in iter_token_batches(texts, max_tokens=max_tokens, max_inputs=max_inputs):
+        vectors = embed_texts([texts[idx] for idx in batch])
+        fresh = {missing_hashes[idx]: vector for idx, vector in zip(batch, vectors) if vector}
+        known.update(_store_vectors(model_name, fresh))
+
+    written = 0
+    for chunk in _chunks(dirty):
+        for attempt in range(2):
+            attached = []
+            ref_deltas: Dict[int, int] = {}
+            for entity_id in chunk:
+                vector_row = known.get(pending[entity_id][1])
+                if vector_row is None:
+                    continue
+                record = records.get(entity_id)
+                if record is None:
+                    record = EmbeddingRecord(user_id=user_id, entity_type=entity_type, entity_id=entity_id)
+                    records[entity_id] = record
+                _attach_vector(record, vector_row, pending[entity_id][1], ref_deltas)
+                attached.append((entity_id, vector_row))
+            if not attached:
+                break
+            try:
+                db.session.add_all([records[entity_id] for entity_id, _ in attached])
+                _adjust_ref_counts(ref_deltas)
+                db.session.commit()
+                break
+            except IntegrityError:
+                db.session.rollback()
+                attached = []
+                if attempt:
+                    break
+                # A concurrent writer inserted some of these rows: reload the chunk's records
+                # and vectors, then retry with the vectors already computed.
+                for entity_id in chunk:
+                    records.pop(entity_id, None)
+                for record in EmbeddingRecord.query.filter(
+                    EmbeddingRecord.user_id == user_id,
+                    EmbeddingRecord.entity_type == entity_type,
+                    EmbeddingRecord.entity_id.in_(chunk),
+                ):
+                    records[record.entity_id] = record
+                hashes = {pending[entity_id][1] for entity_id in chunk}
+                for content_hash in hashes:
+                    known.pop(content_hash, None)
+                known.update(_find_vectors(list(hashes), model_name))
+        values = [(entity_id, _vector_values(vector_row)) for entity_id, vector_row in attached]
+        vector_cache.upsert_many(user_id, entity_type, values)
+        for entity_id, vector in values:
+            ann_registry.upsert(user_id, entity_type, entity_id, vector)
+            lexical_cache.upsert(user_id, entity_type, entity_id, pending[entity_id][0])
+        written += len(attached)
+    return written
+
+
+def _entity_query(user_id: int, entity_type: str):
     if entity_type == ENTITY_RECALL:
-        query = RecallItem.query.filter_by(user_id=user_id)
-    elif entity_type == ENTITY_BOOKMARK:
-        query = BookmarkItem.query.filter_by(user_id=user_id)
-    elif entity_type == ENTITY_TODO_ITEM:
-        query = (
+        return RecallItem.query.filter_by(user_id=user_id)
+    if entity_type == ENTITY_BOOKMARK:
+        return BookmarkItem.query.filter_by(user_id=user_id)
+    if entity_type == ENTITY_TODO_ITEM:
+        return (
             TodoItem.query.join(TodoList, TodoItem.list_id == TodoList.id)
             .filter(TodoList.user_id == user_id)
             .options(joinedload(TodoItem.list))
         )
-    elif entity_type == ENTITY_TODO_LIST:
-        query = TodoList.query.filter_by(user_id=user_id)
-    elif entity_type == ENTITY_CALENDAR:
-        query = CalendarEvent.query.filter_by(user_id=user_id)
-    else:
+    if entity_type == ENTITY_TODO_LIST:
+        return TodoList.query.filter_by(user_id=user_id)
+    if entity_type == ENTITY_CALENDAR:
+        return CalendarEvent.query.filter_by(user_id=user_id)
+    return None
+
+
+def ensure_embeddings_for_type(
+    user_id: int,
+    entity_type: str,
+    max_new: int = 200,
+    max_tokens: int = DEFAULT_BATCH_MAX_TOKENS,
+    max_inputs: int = DEFAULT_BATCH_MAX_INPUTS,
+) -> int:
+    query = _entity_query(user_id, entity_type)
+    if query is None:
         return 0
+    existing = {
+        entity_id: source_hash
+        for entity_id, source_hash in db.session.query(EmbeddingRecord.entity_id, EmbeddingRecord.source_hash)
+        .filter(EmbeddingRecord.user_id == user_id, EmbeddingRecord.entity_type == entity_type)
+        .all()
+    }
 
+    dirty: List[Tuple[int, str]] = []
     for item in query:
         text = build_embedding_text(entity_type, item)
         if not text:
             continue
-        current_hash = _hash_text(text)
-        if item.id in existing and existing[item.id] == current_hash:
+        if existing.get(item.id) == _hash_text(text):
             continue
-        if upsert_embedding(user_id, entity_type, item.id, text):
-            created += 1
-        if created >= max_new:
+        dirty.append((item.id, text))
+        if len(dirty) >= max_new:
             break
-    return created
+    if not dirty:
+        return 0
+    return upsert_embeddings_bulk(user_id, entity_type, dirty, max_tokens=max_tokens, max_inputs=max_inputs)
 
 
 def cosine_similarity(vec_a: List[float], vec_b: List[float]) -> float:
-    if not vec_a or not vec_b or len(vec_a) != len(vec_b):
+    if vec_a is None or vec_b is None or len(vec_a) == 0 or len(vec_a) != len(vec_b):
         return 0.0
-    dot = sum(a * b for a, b in zip(vec_a, vec_b))
-    mag_a = sum(a * a for a in vec_a) ** 0.5
-    mag_b = sum(b * b for b in vec_b) ** 0.5
-    if mag_a == 0 or mag_b == 0:
+    a = np.asarray(vec_a, dtype=np.float32)
+    b = np.asarray(vec_b, dtype=np.float32)
+    mag = float(np.linalg.norm(a) * np.linalg.norm(b))
+    if mag == 0:
         return 0.0
-    return dot / (mag_a * mag_b)
+    return float(np.dot(a, b) / mag)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return indices of the k highest scores, best first, without a full sort."""
+    count = scores.shape[0]
+    if k <= 0 or count == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= count:
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def score_embedding_matrix(
+    query_vec: List[float],
+    ids: np.ndarray,
+    matrix: np.ndarray,
+    limit: int,
+) -> List[Tuple[float, int]]:
+    """Score a pre-normalized matrix against a query with one matrix-vector product."""
+    if query_vec is None or matrix.size == 0:
+        return []
+    query = np.asarray(query_vec, dtype=np.float32)
+    if query.ndim != 1 or query.shape[0] != matrix.shape[1]:
+        return []
+    norm = float(np.linalg.norm(query))
+    if norm == 0:
+        return []
+    scores = matrix @ (query / norm)
+    top = top_k_indices(scores, max(1, min(limit, MAX_SCORED_RESULTS)))
+    return [(float(scores[idx]), int(ids[idx])) for idx in top]
+
+
+def score_embedding_index(
+    user_id: int,
+    entity_type: str,
+    query_vec: List[float],
+    ids: np.ndarray,
+    matrix: np.ndarray,
+    limit: int,
+) -> List[Tuple[float, int]]:
+    """
+    Score a user's cached matrix, using the IVF index once the collection is large.
+
+    Small collections (below EMBEDDING_ANN_MIN_ROWS) are scored exactly.
+    """
+    if query_vec is None or matrix.size == 0:
+        return []
+    query = np.asarray(query_vec, dtype=np.float32)
+    if query.ndim != 1 or query.shape[0] != matrix.shape[1]:
+        return []
+    norm = float(np.linalg.norm(query))
+    if norm == 0:
+        return []
+    k = max(1, min(limit, MAX_SCORED_RESULTS))
+    approximate = ann_registry.search(user_id, entity_type, query / norm, ids, matrix, k)
+    if approximate is None:
+        return score_embedding_matrix(query_vec, ids, matrix, limit)
+    rows, scores = approximate
+    return [(float(score), int(ids[row])) for row, score in zip(rows, scores)]
+
+
+def load_lexical_documents(
+    user_id: int,
+    entity_type: str,
+    entity_ids: Optional[List[int]] = None,
+) -> Dict[int, str]:
+    """Return {entity_id: build_embedding_text(...)} for all entities, or just entity_ids."""
+    if entity_ids is not None:
+        items = _load_entities(user_id, entity_type, entity_ids).values()
+    else:
+        query = _entity_query(user_id, entity_type)
+        items = query.all() if query is not None else []
+    return {item.id: build_embedding_text(entity_type, item) for item in items}
+
+
+def get_lexical_index(user_id: int, entity_type: str) -> Optional[Bm25Index]:
+    """Cached BM25 index, or None while its first build runs in the background."""
+    app = current_app._get_current_object() if has_app_context() else None
+    return lexical_cache.get(user_id, entity_type, load_lexical_documents, app=app)
+
+
+def hybrid_rank(
+    user_id: int,
+    entity_type: str,
+    query: str,
+    query_vec: List[float],
+    ids: np.ndarray,
+    matrix: np.ndarray,
+    limit: int,
+) -> Tuple[List[Tuple[float, int]], bool]:
+    """
+    Fuse BM25 and cosine rankings with reciprocal-rank fusion.
+
+    Returns ((cosine similarity, entity_id) in fused order, confident). A result
+    set is confident when the best cosine clears CONFIDENT_SIMILARITY or both
+    rankings put the same entity first. Until the user's BM25 index has been
+    built in the background, only the vector ranking is used.
+    """
+    vector_ranked = [
+        (score, entity_id)
+        for score, entity_id in score_embedding_index(user_id, entity_type, query_vec, ids, matrix, limit)
+        if score > 0
+    ]
+    lexical_index = get_lexical_index(user_id, entity_type)
+    lexical_ranked = lexical_index.search(query, limit) if lexical_index is not None else []
+    fused = reciprocal_rank_fusion([
+        [entity_id for _, entity_id in vector_ranked],
+        [entity_id for _, entity_id in lexical_ranked],
+    ])[:limit]
+    if not fused:
+        return [], False
+
+    similarity = {entity_id: score for score, entity_id in vector_ranked}
+    missing = [entity_id for _, entity_id in fused if entity_id not in similarity]
+    if missing and matrix.size:
+        rows = np.flatnonzero(np.isin(ids, missing))
+        query_arr = np.asarray(query_vec, dtype=np.float32)
+        norm = float(np.linalg.norm(query_arr))
+        if rows.size and norm:
+            for row, score in zip(rows, matrix[rows] @ (query_arr / norm)):
+                similarity[int(ids[row])] = float(score)
+    ranked = [(similarity.get(entity_id, 0.0), entity_id) for _, entity_id in fused]
+
+    best_cosine = vector_ranked[0][0] if vector_ranked else 0.0
+    agree = bool(vector_ranked and lexical_ranked and vector_ranked[0][1] == lexical_ranked[0][1])
+    return ranked, best_cosine >= CONFIDENT_SIMILARITY or agree
 
 
 def score_embeddings(query_vec: List[float], embeddings: List[Tuple[int, List[float]]], limit: int) -> List[Tuple[float, int]]:
-    scored: List[Tuple[float, int]] = []
-    for entity_id, vec in embeddings:
-        scored.append((cosine_similarity(query_vec, vec), entity_id))
-    scored.sort(key=lambda pair: pair[0], reverse=True)
-    return scored[: max(1, min(limit, 15))]
+    if not embeddings:
+        return []
+    dim = len(query_vec) if query_vec is not None else 0
+    pairs = [(entity_id, vec) for entity_id, vec in embeddings if len(vec) == dim]
+    if not pairs:
+        return []
+    ids = np.asarray([entity_id for entity_id, _ in pairs], dtype=np.int64)
+    matrix = normalize_rows(np.asarray([vec for _, vec in pairs], dtype=np.float32))
+    return score_embedding_matrix(query_vec, ids, matrix, limit)
 
 
 def refresh_embedding_for_entity(user_id: int, entity_type: str, entity_id: int) -> bool:
@@ -248,12 +739,271 @@ def refresh_embedding_for_entity(user_id: int, entity_type: str, entity_id: int)
     text = build_embedding_text(entity_type, item)
     if not text:
         return False
-    return bool(upsert_embedding(user_id, entity_type, entity_id, text))
+    if not upsert_embedding(user_id, entity_type, entity_id, text):
+        return False
+    clear_embedding_dirty(user_id, entity_type, [entity_id])
+    return True
 
 
 def delete_embedding_for_entity(user_id: int, entity_type: str, entity_id: int) -> int:
-    return EmbeddingRecord.query.filter_by(
+    query = EmbeddingRecord.query.filter_by(
+        user_id=user_id,
+        entity_type=entity_type,
+        entity_id=entity_id,
+    )
+    _adjust_ref_counts({vector_id: -1 for (vector_id,) in query.with_entities(EmbeddingRecord.vector_id)})
+    deleted = query.delete()
+    EmbeddingDirtyMarker.query.filter_by(
         user_id=user_id,
         entity_type=entity_type,
         entity_id=entity_id,
     ).delete()
+    vector_cache.remove(user_id, entity_type, entity_id)
+    lexical_cache.remove(user_id, entity_type, entity_id)
+    return deleted
+
+
+def _upsert_dirty_markers(execute, user_id: int, entity_type: str, entity_ids: List[int]) -> None:
+    """One marker per entity: refresh marked_at on existing rows, insert the rest."""
+    now = datetime.utcnow()
+    for chunk in _chunks(entity_ids):
+        existing = {
+            entity_id
+            for (entity_id,) in execute(
+                select(EmbeddingDirtyMarker.entity_id).where(
+                    EmbeddingDirtyMarker.user_id == user_id,
+                    EmbeddingDirtyMarker.entity_type == entity_type,
+                    EmbeddingDirtyMarker.entity_id.in_(chunk),
+                )
+            )
+        }
+        if existing:
+            execute(
+                update(EmbeddingDirtyMarker)
+                .where(
+                    EmbeddingDirtyMarker.user_id == user_id,
+                    EmbeddingDirtyMarker.entity_type == entity_type,
+                    EmbeddingDirtyMarker.entity_id.in_(existing),
+                )
+                .values(marked_at=now)
+            )
+        missing = [entity_id for entity_id in chunk if entity_id not in existing]
+        if missing:
+            execute(
+                insert(EmbeddingDirtyMarker),
+                [
+                    {'user_id': user_id, 'entity_type': entity_type, 'entity_id': entity_id, 'marked_at': now}
+                    for entity_id in missing
+                ],
+            )
+
+
+def mark_embedding_dirty(user_id: int, entity_type: str, entity_ids: Iterable[int], commit: bool = True) -> None:
+    """Record, in the current session, that these entities changed so the background refresher re-embeds them."""
+    ids = sorted({entity_id for entity_id in entity_ids if entity_id})
+    if not ids:
+        return
+    _upsert_dirty_markers(db.session.execute, user_id, entity_type, ids)
+    if commit:
+        db.session.commit()
+    lexical_cache.mark_stale(user_id, entity_type, ids)
+
+
+def mark_embedding_dirty_detached(user_id: int, entity_type: str, entity_ids: Iterable[int]) -> None:
+    """
+    Like mark_embedding_dirty, but in its own transaction: the caller's session,
+    and whatever it has pending, is left untouched. Call it after the caller's
+    commit; on SQLite a flushed, uncommitted write holds the database lock.
+    """
+    ids = sorted({entity_id for entity_id in entity_ids if entity_id})
+    if not ids:
+        return
+    for attempt in range(2):
+        try:
+            with db.engine.begin() as connection:
+                _upsert_dirty_markers(connection.execute, user_id, entity_type, ids)
+            break
+        except IntegrityError:
+            # A concurrent writer inserted one of the markers first; the retry updates it.
+            if attempt:
+                raise
+    lexical_cache.mark_stale(user_id, entity_type, ids)
+
+
+def clear_embedding_dirty(user_id: int, entity_type: str, entity_ids: Iterable[int]) -> None:
+    ids = list(set(entity_ids))
+    if not ids:
+        return
+    EmbeddingDirtyMarker.query.filter(
+        EmbeddingDirtyMarker.user_id == user_id,
+        EmbeddingDirtyMarker.entity_type == entity_type,
+        EmbeddingDirtyMarker.entity_id.in_(ids),
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _load_entities(user_id: int, entity_type: str, entity_ids: List[int]) -> Dict[int, object]:
+    query = _entity_query(user_id, entity_type)
+    model = ENTITY_MODELS.get(entity_type)
+    if query is None or model is None or not entity_ids:
+        return {}
+    return {item.id: item for item in query.filter(model.id.in_(entity_ids)).all()}
+
+
+def refresh_dirty_embeddings(limit: int = DIRTY_REFRESH_BATCH) -> int:
+    """
+    Drain up to `limit` dirty markers: re-embed changed entities in batches and
+    drop embeddings whose entity no longer exists. Markers for entities that
+    could not be embedded stay queued for the next run.
+    """
+    if not embeddings_available():
+        return 0
+    markers = (
+        db.session.query(
+            EmbeddingDirtyMarker.id,
+            EmbeddingDirtyMarker.user_id,
+            EmbeddingDirtyMarker.entity_type,
+            EmbeddingDirtyMarker.entity_id,
+        )
+        .order_by(EmbeddingDirtyMarker.marked_at.asc(), EmbeddingDirtyMarker.id.asc())
+        .limit(limit)
+        .all()
+    )
+    grouped: Dict[Tuple[int, str], Dict[int, List[int]]] = {}
+    for marker_id, user_id, entity_type, entity_id in markers:
+        grouped.setdefault((user_id, entity_type), {}).setdefault(entity_id, []).append(marker_id)
+
+    written = 0
+    for (user_id, entity_type), marker_ids_by_entity in grouped.items():
+        written += _refresh_entity_group(user_id, entity_type, marker_ids_by_entity)
+    return written
+
+
+def _refresh_entity_group(user_id: int, entity_type: str, marker_ids_by_entity: Dict[int, List[int]]) -> int:
+    started_at = datetime.utcnow()
+    entities = _load_entities(user_id, entity_type, list(marker_ids_by_entity))
+    entries = []
+    done_marker_ids: List[int] = []
+    for entity_id, marker_ids in marker_ids_by_entity.items():
+        item = entities.get(entity_id)
+        text = build_embedding_text(entity_type, item) if item is not None else ""
+        if not text:
+            if item is None:
+                delete_embedding_for_entity(user_id, entity_type, entity_id)
+            done_marker_ids.extend(marker_ids)
+            continue
+        entries.append((entity_id, text))
+    written = upsert_embeddings_bulk(user_id, entity_type, entries)
+    fresh_hashes = {
+        entity_id: source_hash
+        for entity_id, source_hash in db.session.query(EmbeddingRecord.entity_id, EmbeddingRecord.source_hash)
+        .filter(
+            EmbeddingRecord.user_id == user_id,
+            EmbeddingRecord.entity_type == entity_type,
+            EmbeddingRecord.entity_id.in_([entity_id for entity_id, _ in entries] or [0]),
+        )
+        .all()
+    }
+    for entity_id, text in entries:
+        if fresh_hashes.get(entity_id) == _hash_text(text):
+            done_marker_ids.extend(marker_ids_by_entity[entity_id])
+    if done_marker_ids:
+        # Markers re-marked after the entities were loaded keep their row for the next run.
+        EmbeddingDirtyMarker.query.filter(
+            EmbeddingDirtyMarker.id.in_(done_marker_ids),
+            EmbeddingDirtyMarker.marked_at <= started_at,
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    return written
+
+
+def refresh_embeddings_for_entities(user_id: int, entity_type: str, entity_ids: Iterable[int]) -> int:
+    """Re-embed specific entities through the batched path and clear their dirty markers."""
+    if not embeddings_available():
+        return 0
+    marker_ids_by_entity: Dict[int, List[int]] = {entity_id: [] for entity_id in set(entity_ids) if entity_id}
+    for chunk in _chunks(list(marker_ids_by_entity)):
+        markers = db.session.query(EmbeddingDirtyMarker.id, EmbeddingDirtyMarker.entity_id).filter(
+            EmbeddingDirtyMarker.user_id == user_id,
+            EmbeddingDirtyMarker.entity_type == entity_type,
+            EmbeddingDirtyMarker.entity_id.in_(chunk),
+        )
+        for marker_id, entity_id in markers:
+            marker_ids_by_entity[entity_id].append(marker_id)
+    if not marker_ids_by_entity:
+        return 0
+    return _refresh_entity_group(user_id, entity_type, marker_ids_by_entity)
+
+
+def embedding_index_status(user_id: int, entity_type: str) -> Dict[str, object]:
+    """Describe how current the semantic index is for one entity type."""
+    indexed, last_indexed_at = (
+        db.session.query(db.func.count(EmbeddingRecord.id), db.func.max(EmbeddingRecord.updated_at))
+        .filter(EmbeddingRecord.user_id == user_id, EmbeddingRecord.entity_type == entity_type)
+        .one()
+    )
+    pending, oldest_pending = (
+        db.session.query(
+            db.func.count(db.distinct(EmbeddingDirtyMarker.entity_id)),
+            db.func.min(EmbeddingDirtyMarker.marked_at),
+        )
+        .filter(EmbeddingDirtyMarker.user_id == user_id, EmbeddingDirtyMarker.entity_type == entity_type)
+        .one()
+    )
+    return {
+        "indexed": int(indexed or 0),
+        "pending": int(pending or 0),
+        "last_indexed_at": last_indexed_at.isoformat() if last_indexed_at else None,
+        "oldest_pending_at": oldest_pending.isoformat() if oldest_pending else None,
+    }
+
+
+def collect_unused_vectors(grace: timedelta = VECTOR_GC_GRACE) -> int:
+    """
+    Delete shared vectors that nothing references and nothing has used within `grace`.
+
+    References are checked with NOT EXISTS in the DELETE itself rather than
+    trusted from ref_count, so a vector a writer attaches concurrently is never
+    removed from under it. The grace period keeps vectors around for text that
+    comes back soon after it was removed (undo, rollover, re-import). Records
+    whose vector row has gone anyway are queued for re-embedding.
+    """
+    cutoff = datetime.utcnow() - grace
+    record_refs = db.session.query(EmbeddingRecord.id).filter(EmbeddingRecord.vector_id == EmbeddingVector.id)
+    # List duplicate entries reference vectors by content hash rather than id.
+    list_refs = db.session.query(ListDuplicateEntry.id).filter(
+        ListDuplicateEntry.vector_hash == EmbeddingVector.content_hash
+    )
+    deleted = EmbeddingVector.query.filter(
+        EmbeddingVector.last_used_at < cutoff,
+        ~record_refs.exists(),
+        ~list_refs.exists(),
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    repair_dangling_vector_refs()
+    return deleted
+
+
+def repair_dangling_vector_refs() -> int:
+    """Detach records whose shared vector row is missing and mark them dirty so they are re-embedded."""
+    dangling = (
+        db.session.query(EmbeddingRecord.id, EmbeddingRecord.user_id, EmbeddingRecord.entity_type, EmbeddingRecord.entity_id)
+        .outerjoin(EmbeddingVector, EmbeddingRecord.vector_id == EmbeddingVector.id)
+        .filter(EmbeddingRecord.vector_id.isnot(None), EmbeddingVector.id.is_(None))
+        .all()
+    )
+    if not dangling:
+        return 0
+    grouped: Dict[Tuple[int, str], List[int]] = {}
+    for _, user_id, entity_type, entity_id in dangling:
+        grouped.setdefault((user_id, entity_type), []).append(entity_id)
+    for chunk in _chunks([record_id for record_id, _, _, _ in dangling]):
+        # A cleared source_hash makes every refresh path treat the record as stale.
+        EmbeddingRecord.query.filter(EmbeddingRecord.id.in_(chunk)).update(
+            {EmbeddingRecord.vector_id: None, EmbeddingRecord.source_hash: None},
+            synchronize_session=False,
+        )
+    for (user_id, entity_type), entity_ids in grouped.items():
+        mark_embedding_dirty(user_id, entity_type, entity_ids, commit=False)
+    db.session.commit()
+    return len(dangling)
@@ -0,0 +1,19 @@
+"""Typed environment settings for module-level configuration."""
+
+import os
+
+
+def int_env(name: str, default: int) -> int:
+    """Integer value of an environment variable, or default when unset or malformed."""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def float_env(name: str, default: float) -> float:
+    """Float value of an environment variable, or default when unset or malformed."""
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
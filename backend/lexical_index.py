@@ -0,0 +1,258 @@
+"""BM25 index over build_embedding_text strings, cached per (user_id, entity_type)."""
+
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .env import int_env
+
+
+DEFAULT_MAX_INDEXES = 256
+DEFAULT_TTL_SECONDS = 300
+RRF_K = 60
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[Tuple[float, int]]:
+    """Fuse several best-first id rankings; returns (fused score, id) best first."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, entity_id in enumerate(ranking):
+            fused[entity_id] = fused.get(entity_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(((score, entity_id) for entity_id, score in fused.items()), key=lambda pair: -pair[0])
+
+
+class Bm25Index:
+    """Okapi BM25 over an inverted index that supports per-document upserts."""
+
+    def __init__(self, documents: Optional[Dict[int, str]] = None):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self.total_length = 0
+        self.loaded_at = time.monotonic()
+        for entity_id, text in (documents or {}).items():
+            self.upsert(entity_id, text)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def remove(self, entity_id: int) -> None:
+        length = self.doc_lengths.pop(entity_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.doc_terms.pop(entity_id, ()):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(entity_id, None)
+                if not docs:
+                    del self.postings[term]
+
+    def upsert(self, entity_id: int, text: str) -> None:
+        if entity_id in self.doc_lengths:
+            self.remove(entity_id)
+        tokens = tokenize(text)
+        if not tokens:
+            return
+        counts = Counter(tokens)
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[entity_id] = count
+        self.doc_terms[entity_id] = tuple(counts)
+        self.doc_lengths[entity_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def search(self, query: str, limit: int) -> List[Tuple[float, int]]:
+        doc_count = len(self.doc_lengths)
+        if not doc_count or limit <= 0:
+            return []
+        avg_length = self.total_length / doc_count
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            # Snapshot the postings: the background builder may upsert while a search runs.
+            docs = list((self.postings.get(term) or {}).items())
+            if not docs:
+                continue
+            idf = math.log(1.0 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for entity_id, tf in docs:
+                length = self.doc_lengths.get(entity_id)
+                if length is None:
+                    continue
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * length / avg_length)
+                scores[entity_id] = scores.get(entity_id, 0.0) + idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+        ranked = sorted(((score, entity_id) for entity_id, score in scores.items()), key=lambda pair: -pair[0])
+        return ranked[:limit]
+
+
+class LexicalIndexCache:
+    """
+    LRU of Bm25Index per (user_id, entity_type), built off the request path.
+
+    get() never reads the database. A miss or an expired entry queues a build on
+    the background thread, and the caller gets None (or the expired index) until
+    it lands. Changed entities queued with mark_stale are re-read in one batch by
+    the same thread, so edits show up lexically before they are re-embedded.
+    """
+
+    def __init__(self, max_indexes: int = DEFAULT_MAX_INDEXES, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.max_indexes = max_indexes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[int, str], Bm25Index]" = OrderedDict()
+        # key -> entity ids to re-read, or None for a full (re)build
+        self._pending: "OrderedDict[Tuple[int, str], Optional[Set[int]]]" = OrderedDict()
+        self._loader: Optional[Callable[[int, str, Optional[List[int]]], Dict[int, str]]] = None
+        self._cond = threading.Condition(threading.RLock())
+        self._app = None
+        self._worker: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.failed_builds = 0
+
+    def get(
+        self,
+        user_id: int,
+        entity_type: str,
+        loader: Callable[[int, str, Optional[List[int]]], Dict[int, str]],
+        app=None,
+    ) -> Optional[Bm25Index]:
+        """
+        Cached index or None while the first build is queued.
+
+        loader(user_id, entity_type, None) returns every document; with ids, only
+        those. It runs on the background thread inside `app`'s context.
+        """
+        key = (user_id, entity_type)
+        with self._cond:
+            self._loader = loader
+            if app is not None:
+                self._app = app
+            index = self._entries.get(key)
+            if index is None:
+                self.misses += 1
+                self._queue(key, None)
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            if self.ttl_seconds > 0 and time.monotonic() - index.loaded_at > self.ttl_seconds:
+                self._queue(key, None)
+            return index
+
+    def _queue(self, key: Tuple[int, str], entity_ids: Optional[Set[int]]) -> None:
+        if key in self._pending:
+            queued = self._pending[key]
+            if queued is None or entity_ids is None:
+                self._pending[key] = None
+            else:
+                queued.update(entity_ids)
+        else:
+            self._pending[key] = None if entity_ids is None else set(entity_ids)
+        self._ensure_worker()
+        self._cond.notify()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(target=self._build_forever, name="lexical-index", daemon=True)
+        self._worker.start()
+
+    def run_pending(self) -> int:
+        """Build or refresh every queued index on the calling thread; returns how many were processed."""
+        processed = 0
+        while True:
+            with self._cond:
+                if not self._pending:
+                    return processed
+                key, entity_ids = self._pending.popitem(last=False)
+                loader = self._loader
+            if loader is None:
+                continue
+            try:
+                self._build(key, entity_ids, loader)
+            except Exception as exc:
+                self.failed_builds += 1
+                if self._app is not None:
+                    self._app.logger.warning("Lexical index build failed for %s user=%s (%s)", key[1], key[0], exc)
+            processed += 1
+
+    def _build(self, key: Tuple[int, str], entity_ids: Optional[Set[int]], loader) -> None:
+        user_id, entity_type = key
+        if entity_ids is None:
+            index = Bm25Index(loader(user_id, entity_type, None))
+            with self._cond:
+                self._entries[key] = index
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_indexes:
+                    self._entries.popitem(last=False)
+                self.builds += 1
+            return
+        documents = loader(user_id, entity_type, sorted(entity_ids))
+        with self._cond:
+            index = self._entries.get(key)
+            if index is None:
+                return
+            for entity_id in entity_ids:
+                if entity_id in documents:
+                    index.upsert(entity_id, documents[entity_id])
+                else:
+                    index.remove(entity_id)
+
+    def _build_forever(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                app = self._app
+            if app is not None:
+                with app.app_context():
+                    self.run_pending()
+            else:
+                self.run_pending()
+
+    def mark_stale(self, user_id: int, entity_type: str, entity_ids: Iterable[int]) -> None:
+        key = (user_id, entity_type)
+        with self._cond:
+            if key in self._entries:
+                self._queue(key, {int(entity_id) for entity_id in entity_ids})
+
+    def upsert(self, user_id: int, entity_type: str, entity_id: int, text: str) -> None:
+        with self._cond:
+            index = self._entries.get((user_id, entity_type))
+            if index is not None:
+                index.upsert(int(entity_id), text)
+
+    def remove(self, user_id: int, entity_type: str, entity_id: int) -> None:
+        with self._cond:
+            index = self._entries.get((user_id, entity_type))
+            if index is not None:
+                index.remove(int(entity_id))
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "documents": sum(len(index) for index in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "pending_builds": len(self._pending),
+                "builds": self.builds,
+                "failed_builds": self.failed_builds,
+            }
+
+
+lexical_cache = LexicalIndexCache(
+    max_indexes=int_env("LEXICAL_INDEX_MAX_ENTRIES", DEFAULT_MAX_INDEXES),
+    ttl_seconds=int_env("LEXICAL_INDEX_TTL_SECONDS", DEFAULT_TTL_SECONDS),
+)
@@ -0,0 +1,228 @@
+"""
+Pooled, concurrent Web Push delivery.
+
+One PushDeliveryService per process keeps a requests.Session whose
+connection pool is shared by every send, parses the VAPID private key once
+and reuses the signed VAPID headers per push-service origin until shortly
+before they expire. A user's subscriptions are sent to concurrently from a
+bounded thread pool, so a user with several devices gets them all at once
+and one slow push service does not hold up the rest beyond `timeout`.
+
+Sending never touches the database: subscriptions the push service reports
+gone (404/410) come back in PushResult.dead for the caller to delete in one
+statement. Per-endpoint latency is kept for the most recent endpoints.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+import requests
+from py_vapid import Vapid
+from pywebpush import WebPusher
+
+from .env import float_env, int_env
+
+
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT_SECONDS = 10.0
+# Push services accept VAPID tokens for at most 24 hours; pywebpush signs for 12.
+VAPID_TOKEN_SECONDS = 12 * 60 * 60
+VAPID_REFRESH_MARGIN_SECONDS = 10 * 60
+MAX_TRACKED_ENDPOINTS = 1000
+
+PushTarget = namedtuple('PushTarget', ['id', 'endpoint', 'p256dh', 'auth'])
+PushResult = namedtuple('PushResult', ['sent', 'dead', 'failed'])
+
+
+def push_origin(endpoint: str) -> str:
+    url = urlparse(endpoint)
+    return f"{url.scheme}://{url.netloc}"
+
+
+class _EndpointLatency:
+    __slots__ = ('count', 'failures', 'last_ms', 'max_ms', 'total_ms', 'last_status')
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+        self.last_status = None
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'last_ms': round(self.last_ms, 1),
+            'max_ms': round(self.max_ms, 1),
+            'avg_ms': round(self.total_ms / self.count, 1) if self.count else 0.0,
+            'last_status': self.last_status,
+        }
+
+
+class PushDeliveryService:
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        session: Optional[requests.Session] = None,
+        clock=time.time,
+    ):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.clock = clock
+        self._session = session
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._vapid_keys: Dict[str, Vapid] = {}
+        # (private key, subject, origin) -> (headers, expires_at)
+        self._vapid_headers: Dict[tuple, tuple] = {}
+        self._latency: 'OrderedDict[str, _EndpointLatency]' = OrderedDict()
+        self.sent = 0
+        self.dead = 0
+        self.failed = 0
+        self.vapid_signatures = 0
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=self.workers)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="web-push")
+            return self._executor
+
+    def _vapid(self, private_key: str) -> Vapid:
+        vapid = self._vapid_keys.get(private_key)
+        if vapid is None:
+            if os.path.isfile(private_key):
+                vapid = Vapid.from_file(private_key_file=private_key)
+            else:
+                vapid = Vapid.from_string(private_key=private_key)
+            self._vapid_keys[private_key] = vapid
+        return vapid
+
+    def vapid_headers(self, private_key: str, subject: str, endpoint: str) -> Dict[str, str]:
+        """Signed VAPID headers for the endpoint's origin, reused until close to expiry."""
+        origin = push_origin(endpoint)
+        key = (private_key, subject, origin)
+        now = self.clock()
+        with self._lock:
+            cached = self._vapid_headers.get(key)
+            if cached is not None and cached[1] - VAPID_REFRESH_MARGIN_SECONDS > now:
+                return cached[0]
+            expires_at = int(now) + VAPID_TOKEN_SECONDS
+            headers = self._vapid(private_key).sign({'sub': subject, 'aud': origin, 'exp': expires_at})
+            self._vapid_headers[key] = (dict(headers), expires_at)
+            self.vapid_signatures += 1
+            return dict(headers)
+
+    def _record(self, endpoint: str, elapsed_ms: float, status, ok: bool) -> None:
+        with self._lock:
+            entry = self._latency.pop(endpoint, None) or _EndpointLatency()
+            entry.count += 1
+            entry.failures += 0 if ok else 1
+            entry.last_ms = elapsed_ms
+            entry.max_ms = max(entry.max_ms, elapsed_ms)
+            entry.total_ms += elapsed_ms
+            entry.last_status = status
+            self._latency[endpoint] = entry
+            while len(self._latency) > MAX_TRACKED_ENDPOINTS:
+                self._latency.popitem(last=False)
+
+    def _send_one(self, target: PushTarget, data: str, headers: Dict[str, str], ttl: int):
+        started = time.perf_counter()
+        status = None
+        try:
+            response = WebPusher(
+                {'endpoint': target.endpoint, 'keys': {'p256dh': target.p256dh, 'auth': target.auth}},
+                requests_session=self.session,
+            ).send(data, headers, ttl=ttl, content_encoding='aes128gcm', timeout=self.timeout)
+            status = response.status_code
+        finally:
+            ok = status is not None and status <= 202
+            self._record(target.endpoint, (time.perf_counter() - started) * 1000.0, status, ok)
+        return status
+
+    def send(
+        self,
+        targets: Sequence[PushTarget],
+        data: str,
+        private_key: str,
+        subject: str,
+        headers: Optional[Dict[str, str]] = None,
+        ttl: int = 0,
+        logger=None,
+    ) -> PushResult:
+        """Deliver data to every target concurrently; returns (sent count, dead target ids, failed count)."""
+        if not targets:
+            return PushResult(0, [], 0)
+        futures = {}
+        pool = self._pool()
+        for target in targets:
+            request_headers = dict(headers or {})
+            request_headers.update(self.vapid_headers(private_key, subject, target.endpoint))
+            futures[pool.submit(self._send_one, target, data, request_headers, ttl)] = target
+        # Every request carries its own timeout; this only bounds the wait if one hangs past it.
+        done, not_done = wait(futures, timeout=self.timeout * 2 + 1)
+        sent = 0
+        dead: List[int] = []
+        failed = len(not_done)
+        for future in done:
+            target = futures[future]
+            try:
+                status = future.result()
+            except Exception as exc:
+                failed += 1
+                if logger is not None:
+                    logger.error("Push send error for %s: %s", push_origin(target.endpoint), exc)
+                continue
+            if status <= 202:
+                sent += 1
+            elif status in (404, 410):
+                dead.append(target.id)
+            else:
+                failed += 1
+                if logger is not None:
+                    logger.warning("Push to %s failed with status %s", push_origin(target.endpoint), status)
+        with self._lock:
+            self.sent += sent
+            self.dead += len(dead)
+            self.failed += failed
+        return PushResult(sent, sorted(dead), failed)
+
+    def stats(self, endpoints: int = 20) -> Dict[str, object]:
+        with self._lock:
+            recent = list(self._latency.items())[-endpoints:]
+            return {
+                'sent': self.sent,
+                'dead': self.dead,
+                'failed': self.failed,
+                'vapid_signatures': self.vapid_signatures,
+                'endpoints': {endpoint: entry.as_dict() for endpoint, entry in reversed(recent)},
+            }
+
+    def endpoint_latency(self, endpoint: str) -> Optional[Dict[str, object]]:
+        with self._lock:
+            entry = self._latency.get(endpoint)
+            return entry.as_dict() if entry is not None else None
+
+
+push_delivery = PushDeliveryService(
+    workers=int_env("PUSH_WORKERS", DEFAULT_WORKERS),
+    timeout=float_env("PUSH_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS),
+)
@@ -0,0 +1,172 @@
+"""Bounded, TTL-aware cache for short query embeddings with an optional SQLite tier."""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .env import int_env
+
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+# Longer inputs are entity text, which the shared embedding_vector store already dedupes.
+MAX_CACHEABLE_CHARS = 1000
+# Expired disk rows are deleted at most this often per process rather than on every put.
+DISK_PRUNE_INTERVAL_SECONDS = 60 * 60
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query_text(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", (text or "").strip()).casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    LRU of (model name, normalized text) -> vector.
+
+    When `disk_path` is set, misses fall through to a small SQLite table so the
+    cache survives restarts and is shared by worker processes on the same host.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        disk_path: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_ready = False
+        self._pruned_at = 0.0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(model_name: str, text: str) -> str:
+        payload = f"{model_name}\0{normalize_query_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _fresh(self, stored_at: float) -> bool:
+        return self.ttl_seconds <= 0 or time.time() - stored_at <= self.ttl_seconds
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.disk_path, timeout=5)
+        if not self._disk_ready:
+            try:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embedding "
+                    "(cache_key TEXT PRIMARY KEY, vector BLOB NOT NULL, stored_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_query_embedding_stored_at ON query_embedding(stored_at)"
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._disk_ready = True
+        return conn
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, List[float]]]:
+        if not self.disk_path:
+            return None
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT vector, stored_at FROM query_embedding WHERE cache_key = ?",
+                    (key,),
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if not row or not self._fresh(row[1]):
+            return None
+        return row[1], np.frombuffer(row[0], dtype="<f4").astype(float).tolist()
+
+    def _disk_put(self, key: str, stored_at: float, vector: List[float]) -> None:
+        if not self.disk_path:
+            return
+        prune = self.ttl_seconds > 0 and stored_at - self._pruned_at >= DISK_PRUNE_INTERVAL_SECONDS
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO query_embedding (cache_key, vector, stored_at) VALUES (?, ?, ?)",
+                    (key, np.asarray(vector, dtype="<f4").tobytes(), stored_at),
+                )
+                if prune:
+                    conn.execute(
+                        "DELETE FROM query_embedding WHERE stored_at < ?",
+                        (stored_at - self.ttl_seconds,),
+                    )
+        except sqlite3.Error:
+            return
+        if prune:
+            self._pruned_at = stored_at
+
+    def _remember(self, key: str, stored_at: float, vector: List[float]) -> None:
+        self._entries[key] = (stored_at, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        key = self._key(model_name, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry[0]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        disk_entry = self._disk_get(key)
+        with self._lock:
+            if disk_entry is not None:
+                self.disk_hits += 1
+                self._remember(key, *disk_entry)
+                return disk_entry[1]
+            self.misses += 1
+        return None
+
+    def put(self, model_name: str, text: str, vector: List[float]) -> None:
+        key = self._key(model_name, text)
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, stored_at, vector)
+        self._disk_put(key, stored_at, vector)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk_enabled": bool(self.disk_path),
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=int_env("QUERY_EMBED_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+    ttl_seconds=int_env("QUERY_EMBED_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS),
+    disk_path=os.environ.get("QUERY_EMBED_CACHE_PATH") or None,
+)
@@ -0,0 +1,222 @@
+"""
+Calendar recurrence rules: single-day tests and closed-form expansion.
+
+recurrence_occurs_on answers "does this rule fire on day X"; recurrence_occurrences
+yields every firing day in a range by stepping straight from one occurrence
+to the next, so expanding a year costs one step per occurrence rather than
+one test per calendar day. Both read the same normalized rule.
+
+Occurrences that have no CalendarEvent row yet are addressed by a negative
+virtual id packing the rule id and the day's ordinal.
+"""
+
+import calendar
+from collections import namedtuple
+from datetime import date, timedelta
+from typing import Iterator, Optional
+
+from services.validation_service import parse_days_of_week
+
+
+# Larger than any date ordinal, so rule id and day unpack with one divmod.
+VIRTUAL_ID_FACTOR = 10 ** 7
+
+_Schedule = namedtuple('_Schedule', ['freq', 'unit', 'interval', 'days_of_week'])
+
+# Fixed frequencies map onto (unit, interval); 'custom' reads both from the rule.
+_FIXED_FREQUENCIES = {
+    'daily': ('days', 1),
+    'weekly': ('weeks', 1),
+    'biweekly': ('weeks', 2),
+    'monthly': ('months', 1),
+    'yearly': ('years', 1),
+}
+
+
+def weekday_occurrence_in_month(day_value):
+    weekday = day_value.weekday()
+    month_cal = calendar.monthcalendar(day_value.year, day_value.month)
+    count = 0
+    for week in month_cal:
+        if week[weekday]:
+            count += 1
+            if week[weekday] == day_value.day:
+                return count
+    return None
+
+
+def nth_weekday_of_month(year, month, weekday, nth):
+    if weekday is None or nth is None:
+        return None
+    month_cal = calendar.monthcalendar(year, month)
+    days = [week[weekday] for week in month_cal if week[weekday]]
+    if not days:
+        return None
+    if nth > len(days):
+        day = days[-1]
+    else:
+        day = days[max(nth, 1) - 1]
+    return date(year, month, day)
+
+
+def _schedule(rule) -> Optional[_Schedule]:
+    freq = (rule.frequency or '').lower()
+    interval = max(int(rule.interval or 1), 1)
+    unit = (rule.interval_unit or '').lower()
+    if freq in _FIXED_FREQUENCIES:
+        unit, interval = _FIXED_FREQUENCIES[freq]
+    elif freq not in ('custom', 'monthly_weekday'):
+        return None
+    return _Schedule(freq, unit, interval, parse_days_of_week(rule.days_of_week))
+
+
+def _months_since(start_day, day_value):
+    return (day_value.year - start_day.year) * 12 + (day_value.month - start_day.month)
+
+
+def _add_months(day_value, months):
+    index = day_value.year * 12 + (day_value.month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+def _clamped_day(year, month, day_of_month):
+    _, last_dom = calendar.monthrange(year, month)
+    return date(year, month, min(day_of_month, last_dom))
+
+
+def _monthly_weekday_target(rule, year, month):
+    weekday = rule.weekday_of_month
+    if weekday is None:
+        weekday = rule.start_day.weekday()
+    week_of_month = rule.week_of_month
+    if week_of_month is None:
+        week_of_month = weekday_occurrence_in_month(rule.start_day)
+    return nth_weekday_of_month(year, month, weekday, week_of_month)
+
+
+def recurrence_occurs_on(rule, day_value):
+    if day_value < rule.start_day:
+        return False
+    if rule.end_day and day_value > rule.end_day:
+        return False
+    schedule = _schedule(rule)
+    if schedule is None:
+        return False
+    start_day = rule.start_day
+    interval = schedule.interval
+
+    if schedule.freq == 'monthly_weekday':
+        months_since = _months_since(start_day, day_value)
+        if months_since < 0 or months_since % interval != 0:
+            return False
+        target = _monthly_weekday_target(rule, day_value.year, day_value.month)
+        return bool(target) and day_value == target
+
+    unit = schedule.unit
+    if unit == 'days':
+        days_since = (day_value - start_day).days
+        return days_since >= 0 and days_since % interval == 0
+    if unit == 'weeks':
+        days_since = (day_value - start_day).days
+        if days_since < 0:
+            return False
+        weeks_since = days_since // 7
+        if weeks_since % interval != 0:
+            return False
+        if schedule.days_of_week:
+            return day_value.weekday() in schedule.days_of_week
+        return day_value.weekday() == start_day.weekday()
+    if unit == 'months':
+        months_since = _months_since(start_day, day_value)
+        if months_since < 0 or months_since % interval != 0:
+            return False
+        target = _clamped_day(day_value.year, day_value.month, rule.day_of_month or start_day.day)
+        return day_value == target
+    if unit == 'years':
+        years_since = day_value.year - start_day.year
+        if years_since < 0 or years_since % interval != 0:
+            return False
+        target_month = rule.month_of_year or start_day.month
+        target = _clamped_day(day_value.year, target_month, rule.day_of_month or start_day.day)
+        return day_value == target
+    return False
+
+
+def _first_step(elapsed, interval):
+    """Smallest multiple of interval that is >= elapsed (and >= 0)."""
+    if elapsed <= 0:
+        return 0
+    return -(-elapsed // interval) * interval
+
+
+def recurrence_occurrences(rule, start_day, end_day) -> Iterator[date]:
+    """Yield, in order, every day in [start_day, end_day] on which the rule occurs."""
+    schedule = _schedule(rule)
+    if schedule is None:
+        return
+    origin = rule.start_day
+    low = max(start_day, origin)
+    high = min(end_day, rule.end_day) if rule.end_day else end_day
+    if low > high:
+        return
+    interval = schedule.interval
+
+    if schedule.freq == 'monthly_weekday' or schedule.unit in ('months', 'years'):
+        if schedule.unit == 'years' and schedule.freq != 'monthly_weekday':
+            step = 12 * interval
+            offset = _first_step(low.year - origin.year, interval) * 12
+        else:
+            step = interval
+            offset = _first_step(_months_since(origin, low), interval)
+        while True:
+            year, month = _add_months(origin, offset)
+            if schedule.unit == 'years' and schedule.freq != 'monthly_weekday':
+                month = 1  # the target month may precede the start day's month
+            if date(year, month, 1) > high:
+                return
+            if schedule.freq == 'monthly_weekday':
+                target = _monthly_weekday_target(rule, year, month)
+            elif schedule.unit == 'months':
+                target = _clamped_day(year, month, rule.day_of_month or origin.day)
+            else:
+                target = _clamped_day(year, rule.month_of_year or origin.month, rule.day_of_month or origin.day)
+            if target and low <= target <= high:
+                yield target
+            offset += step
+        return
+
+    if schedule.unit == 'days':
+        current = origin + timedelta(days=_first_step((low - origin).days, interval))
+        while current <= high:
+            yield current
+            current += timedelta(days=interval)
+        return
+
+    if schedule.unit == 'weeks':
+        weekdays = schedule.days_of_week or [origin.weekday()]
+        # Offsets inside a 7-day block that starts on the rule's start day.
+        block_offsets = sorted((weekday - origin.weekday()) % 7 for weekday in weekdays)
+        week = _first_step((low - origin).days // 7, interval)
+        while True:
+            block_start = origin + timedelta(weeks=week)
+            if block_start > high:
+                return
+            for offset in block_offsets:
+                current = block_start + timedelta(days=offset)
+                if low <= current <= high:
+                    yield current
+            week += interval
+
+
+def virtual_occurrence_id(rule_id, day_value):
+    return -(rule_id * VIRTUAL_ID_FACTOR + day_value.toordinal())
+
+
+def parse_virtual_occurrence_id(event_id):
+    """Return (rule_id, day) for a virtual occurrence id, None for any other id."""
+    if event_id is None or event_id >= 0:
+        return None
+    rule_id, ordinal = divmod(-event_id, VIRTUAL_ID_FACTOR)
+    if rule_id <= 0 or not 0 < ordinal <= date.max.toordinal():
+        return None
+    return rule_id, date.fromordinal(ordinal)
@@ -0,0 +1,312 @@
+"""
+Calendar reminder dispatch from a persistent next_reminder_at column.
+
+Every pending reminder lives on its CalendarEvent row as next_reminder_at
+(naive UTC, indexed). One dispatcher thread per process pulls the reminders
+due within a short lookahead window from that index in keyset-paged batches
+and parks them in a two-level timing wheel (one-second ticks, one-minute
+buckets above them), so a reminder fires within a tick of its time without
+an APScheduler job per event. Startup loads nothing up front: the first pull
+picks up whatever is due, including reminders that came due while no worker
+was running.
+
+Sending claims rows with a conditional UPDATE, so several workers can run a
+dispatcher against the same database without sending a reminder twice.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pytz
+from sqlalchemy import and_, or_
+
+from .env import float_env, int_env
+from models import db, CalendarEvent
+
+
+DEFAULT_TICK_SECONDS = 1.0
+DEFAULT_WHEEL_SLOTS = 60
+DEFAULT_LOOKAHEAD_SECONDS = 60.0
+DEFAULT_BATCH_SIZE = 200
+
+
+def reminder_due_at(day, start_time, minutes_before, tz_name: str) -> Optional[datetime]:
+    """Naive UTC time a reminder fires for an entry starting at day/start_time in tz_name."""
+    if day is None or start_time is None or minutes_before is None:
+        return None
+    local = pytz.timezone(tz_name).localize(datetime.combine(day, start_time))
+    return (local - timedelta(minutes=minutes_before)).astimezone(pytz.UTC).replace(tzinfo=None)
+
+
+def local_to_utc(value: datetime, tz_name: str) -> datetime:
+    """Naive local time in tz_name (as reminder_snoozed_until is stored) to naive UTC."""
+    return pytz.timezone(tz_name).localize(value).astimezone(pytz.UTC).replace(tzinfo=None)
+
+
+def _epoch(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TimingWheel:
+    """
+    Two-level hashed timing wheel over integer ticks.
+
+    Keys due within `slots` ticks sit in the fine level, keys due within
+    slots * slots ticks in the coarse level, anything later in an overflow
+    set. Each coarse bucket is redistributed into the fine level when the
+    wheel reaches it. A key is returned by advance() at the first tick at or
+    after its deadline; adding a key again moves it.
+    """
+
+    def __init__(self, tick_seconds: float = DEFAULT_TICK_SECONDS, slots: int = DEFAULT_WHEEL_SLOTS,
+                 now: Optional[float] = None):
+        self.tick_seconds = tick_seconds
+        self.slots = max(2, slots)
+        self._current = self._tick_of(time.time() if now is None else now)
+        self._fine = [set() for _ in range(self.slots)]
+        self._coarse = [set() for _ in range(self.slots)]
+        self._overflow = set()
+        self._ready = set()
+        self._deadlines: Dict[object, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key) -> bool:
+        return key in self._deadlines
+
+    def _tick_of(self, seconds: float) -> int:
+        return int(math.floor(seconds / self.tick_seconds))
+
+    def _place(self, key, deadline: int) -> None:
+        delta = deadline - self._current
+        if delta <= 0:
+            self._ready.add(key)
+        elif delta < self.slots:
+            self._fine[deadline % self.slots].add(key)
+        elif delta < self.slots * self.slots:
+            self._coarse[(deadline // self.slots) % self.slots].add(key)
+        else:
+            self._overflow.add(key)
+
+    def add(self, key, deadline_seconds: float) -> None:
+        self.discard(key)
+        deadline = int(math.ceil(deadline_seconds / self.tick_seconds))
+        self._deadlines[key] = deadline
+        self._place(key, deadline)
+
+    def discard(self, key) -> None:
+        deadline = self._deadlines.pop(key, None)
+        if deadline is None:
+            return
+        self._fine[deadline % self.slots].discard(key)
+        self._coarse[(deadline // self.slots) % self.slots].discard(key)
+        self._overflow.discard(key)
+        self._ready.discard(key)
+
+    def _cascade(self) -> None:
+        bucket = self._coarse[(self._current // self.slots) % self.slots]
+        pending = list(bucket)
+        bucket.clear()
+        for key in pending:
+            self._place(key, self._deadlines[key])
+        if self._overflow:
+            pending = list(self._overflow)
+            self._overflow.clear()
+            for key in pending:
+                self._place(key, self._deadlines[key])
+
+    def advance(self, now: float) -> List[object]:
+        """Move the wheel to `now` and pop every key whose deadline has passed, earliest first."""
+        target = self._tick_of(now)
+        if target - self._current > self.slots * self.slots:
+            # Long stall: re-sort everything instead of stepping tick by tick.
+            self._current = target
+            for level in (self._fine, self._coarse):
+                for bucket in level:
+                    bucket.clear()
+            self._overflow.clear()
+            for key, deadline in self._deadlines.items():
+                self._place(key, deadline)
+        while self._current < target:
+            self._current += 1
+            if self._current % self.slots == 0:
+                self._cascade()
+            bucket = self._fine[self._current % self.slots]
+            self._ready.update(bucket)
+            bucket.clear()
+        due = sorted(self._ready, key=lambda key: (self._deadlines[key], key))
+        self._ready.clear()
+        for key in due:
+            del self._deadlines[key]
+        return due
+
+
+def load_due_reminders(until: datetime, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Tuple[int, datetime]]:
+    """(event id, next_reminder_at) for every reminder due by `until`, read in keyset-paged batches."""
+    last = None
+    while True:
+        query = db.session.query(CalendarEvent.id, CalendarEvent.next_reminder_at).filter(
+            CalendarEvent.next_reminder_at.isnot(None),
+            CalendarEvent.next_reminder_at <= until,
+        )
+        if last is not None:
+            query = query.filter(or_(
+                CalendarEvent.next_reminder_at > last[1],
+                and_(CalendarEvent.next_reminder_at == last[1], CalendarEvent.id > last[0]),
+            ))
+        rows = query.order_by(CalendarEvent.next_reminder_at.asc(), CalendarEvent.id.asc()).limit(batch_size).all()
+        for row in rows:
+            yield row.id, row.next_reminder_at
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+
+
+class ReminderDispatcher:
+    """
+    Per-process reminder loop: refill from the index, advance the wheel, fire.
+
+    `fire(event_ids)` receives the due ids in batches of batch_size and is
+    responsible for claiming and sending them; it runs inside the app context.
+    schedule()/cancel() keep the wheel in step with writes made in this
+    process. Writes from other processes are picked up by the next refill,
+    every lookahead / 2 seconds.
+    """
+
+    def __init__(
+        self,
+        fire: Optional[Callable[[List[int]], object]] = None,
+        load_due: Optional[Callable[[datetime, int], Iterable[Tuple[int, datetime]]]] = None,
+        tick_seconds: float = DEFAULT_TICK_SECONDS,
+        lookahead_seconds: float = DEFAULT_LOOKAHEAD_SECONDS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.fire = fire
+        self.load_due = load_due or load_due_reminders
+        self.tick_seconds = tick_seconds
+        self.lookahead_seconds = max(lookahead_seconds, tick_seconds)
+        self.batch_size = max(1, batch_size)
+        self.clock = clock
+        self._wheel = TimingWheel(tick_seconds, now=clock())
+        self._cond = threading.Condition()
+        self._app = None
+        self._thread: Optional[threading.Thread] = None
+        self._next_refill = 0.0
+        self.refills = 0
+        self.loaded = 0
+        self.fired = 0
+        self.failed_batches = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app, fire: Optional[Callable[[List[int]], object]] = None) -> None:
+        with self._cond:
+            self._app = app
+            if fire is not None:
+                self.fire = fire
+            if self.running:
+                return
+            self._next_refill = 0.0
+            self._thread = threading.Thread(target=self._dispatch_forever, name="reminder-dispatch", daemon=True)
+            self._thread.start()
+
+    def schedule(self, event_id: int, due_at: Optional[datetime]) -> None:
+        """Track a reminder written in this process; far-off ones wait for a later refill."""
+        if due_at is None:
+            self.cancel(event_id)
+            return
+        due = _epoch(due_at)
+        with self._cond:
+            if due <= self.clock() + self.lookahead_seconds:
+                self._wheel.add(event_id, due)
+                self._cond.notify()
+            else:
+                self._wheel.discard(event_id)
+
+    def cancel(self, event_id: int) -> None:
+        with self._cond:
+            self._wheel.discard(event_id)
+
+    def _refill(self, now: float) -> None:
+        until = datetime.fromtimestamp(now + self.lookahead_seconds, tz=timezone.utc).replace(tzinfo=None)
+        loaded = 0
+        for event_id, due_at in self.load_due(until, self.batch_size):
+            with self._cond:
+                self._wheel.add(event_id, _epoch(due_at))
+            loaded += 1
+        self.refills += 1
+        self.loaded += loaded
+        self._next_refill = now + self.lookahead_seconds / 2
+
+    def run_pending(self, now: Optional[float] = None) -> float:
+        """One pass of the loop; returns how long the loop may sleep before the next pass."""
+        now = self.clock() if now is None else now
+        if now >= self._next_refill:
+            self._refill(now)
+        with self._cond:
+            due = self._wheel.advance(now)
+            pending = len(self._wheel)
+        for start in range(0, len(due), self.batch_size):
+            batch = due[start:start + self.batch_size]
+            try:
+                self.fire(batch)
+                self.fired += len(batch)
+            except Exception as exc:
+                self.failed_batches += 1
+                if self._app is not None:
+                    self._app.logger.error("Reminder batch of %s failed: %s", len(batch), exc)
+        if due:
+            lag = max(0.0, self.clock() - now)
+            self.last_lag_seconds = lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+        wait = self._next_refill - self.clock()
+        if pending:
+            wait = min(wait, self.tick_seconds)
+        return max(0.0, wait)
+
+    def _run_once(self) -> float:
+        if self._app is None:
+            return self.run_pending()
+        with self._app.app_context():
+            return self.run_pending()
+
+    def _dispatch_forever(self) -> None:
+        while True:
+            try:
+                wait = self._run_once()
+            except Exception as exc:
+                wait = self.tick_seconds
+                if self._app is not None:
+                    self._app.logger.error("Reminder dispatcher pass failed: %s", exc)
+            with self._cond:
+                self._cond.wait(wait)
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            depth = len(self._wheel)
+        return {
+            "running": self.running,
+            "wheel_depth": depth,
+            "refills": self.refills,
+            "loaded": self.loaded,
+            "fired": self.fired,
+            "failed_batches": self.failed_batches,
+            "last_lag_seconds": round(self.last_lag_seconds, 3),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+        }
+
+
+reminder_dispatcher = ReminderDispatcher(
+    tick_seconds=float_env("REMINDER_TICK_SECONDS", DEFAULT_TICK_SECONDS),
+    lookahead_seconds=float_env("REMINDER_LOOKAHEAD_SECONDS", DEFAULT_LOOKAHEAD_SECONDS),
+    batch_size=int_env("REMINDER_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+)
@@ -0,0 +1,565 @@
+"""
+Full-text search over tasks, notes, note-list items, calendar events, area list items
+and vault documents.
+
+SQLite gets one FTS5 virtual table, PostgreSQL a plain table with a weighted
+tsvector column behind a GIN index; the dialect decides which. Both key a
+document by one integer (entity id * 8 + type code), so a write is a delete
+and an insert by primary key.
+
+An after_flush listener re-indexes rows written through the ORM inside the
+same transaction. Bulk UPDATE/DELETE statements and database-level cascades
+bypass it; callers always re-read hits from the entity tables, so such rows
+drop out, and rebuild_search_index() re-derives everything.
+"""
+
+import html
+import re
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import column, event, func, inspect as sa_inspect, literal_column, select, table, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from .text_helpers import _html_to_plain_text
+from models import (
+    db, AreaBlockItem, CalendarEvent, Document, DocumentText, Note, NoteListItem, TodoItem, TodoList, User,
+)
+
+
+ENTITY_TODO_ITEM = "todo_item"
+ENTITY_NOTE = "note"
+ENTITY_NOTE_LIST_ITEM = "note_list_item"
+ENTITY_CALENDAR = "calendar_event"
+ENTITY_AREA_BLOCK_ITEM = "area_block_item"
+ENTITY_DOCUMENT = "document"
+
+TYPE_CODES = {
+    ENTITY_TODO_ITEM: 1,
+    ENTITY_NOTE: 2,
+    ENTITY_NOTE_LIST_ITEM: 3,
+    ENTITY_CALENDAR: 4,
+    ENTITY_AREA_BLOCK_ITEM: 5,
+    ENTITY_DOCUMENT: 6,
+}
+TYPE_STRIDE = 8
+_TYPES_BY_CODE = {code: entity_type for entity_type, code in TYPE_CODES.items()}
+
+BACKEND_FTS5 = "fts5"
+BACKEND_POSTGRES = "postgres"
+FTS_TABLE = "search_fts"
+PG_TABLE = "search_document"
+
+MAX_QUERY_TERMS = 8
+# Upper bound on hits per search_entity_ids() call; pass `within` so caller filters apply before it.
+CANDIDATE_LIMIT = 1000
+REBUILD_BATCH = 500
+SNIPPET_TOKENS = 16
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+SearchHit = namedtuple("SearchHit", ["entity_type", "entity_id", "rank", "snippet"])
+
+# Indexed attributes per model; a flush that touches none of them skips re-indexing.
+_INDEXED_FIELDS = {
+    TodoItem: (ENTITY_TODO_ITEM, ("content", "description", "notes", "list_id")),
+    Note: (ENTITY_NOTE, ("title", "content", "is_pin_protected", "user_id")),
+    NoteListItem: (ENTITY_NOTE_LIST_ITEM, ("text", "note", "link_text", "note_id")),
+    CalendarEvent: (ENTITY_CALENDAR, ("title", "description", "item_note", "user_id")),
+    AreaBlockItem: (ENTITY_AREA_BLOCK_ITEM, ("text", "details", "note", "link_text", "user_id")),
+    # A document's body is its extracted text, so both rows re-index the document.
+    Document: (ENTITY_DOCUMENT, ("title", "original_filename", "file_type", "tags", "user_id")),
+    DocumentText: (ENTITY_DOCUMENT, ("content",)),
+}
+
+_backends: Dict[str, Optional[str]] = {}
+
+
+def doc_id(entity_type: str, entity_id: int) -> int:
+    return int(entity_id) * TYPE_STRIDE + TYPE_CODES[entity_type]
+
+
+def _split_doc_id(value: int) -> Tuple[str, int]:
+    return _TYPES_BY_CODE.get(value % TYPE_STRIDE, ""), value // TYPE_STRIDE
+
+
+def _join(parts: Iterable[Optional[str]]) -> str:
+    return "\n".join(part.strip() for part in parts if part and part.strip())
+
+
+def document_text(entity_type: str, obj) -> Tuple[str, str]:
+    """(title, body) indexed for one entity."""
+    if entity_type == ENTITY_TODO_ITEM:
+        return obj.content or "", _join([obj.description, obj.notes])
+    if entity_type == ENTITY_NOTE:
+        # Protected notes are findable by title only, like their locked list view.
+        body = "" if obj.is_pin_protected else _html_to_plain_text(obj.content or "")
+        return obj.title or "", body
+    if entity_type == ENTITY_NOTE_LIST_ITEM:
+        return obj.text or "", _join([obj.note, obj.link_text])
+    if entity_type == ENTITY_CALENDAR:
+        return obj.title or "", _join([obj.description, obj.item_note])
+    if entity_type == ENTITY_AREA_BLOCK_ITEM:
+        return obj.text or "", _join([obj.details, obj.note, obj.link_text])
+    return "", ""
+
+
+def _document_rows(connection, document_ids: Iterable[int]) -> List[Tuple[str, int, int, str, str]]:
+    """Index rows for vault documents, read through the connection so no lazy loads fire."""
+    ids = sorted({int(i) for i in document_ids if i})
+    rows = []
+    for start in range(0, len(ids), REBUILD_BATCH):
+        chunk = ids[start:start + REBUILD_BATCH]
+        result = connection.execute(
+            select(
+                Document.id, Document.user_id, Document.title, Document.original_filename,
+                Document.file_type, Document.tags, DocumentText.content,
+            )
+            .outerjoin(DocumentText, DocumentText.document_id == Document.id)
+            .where(Document.id.in_(chunk))
+        )
+        for doc_id_value, user_id, title, filename, file_type, tags, content in result:
+            body = _join([filename, (tags or "").replace(",", " "), file_type, content])
+            rows.append((ENTITY_DOCUMENT, doc_id_value, user_id, title or "", body))
+    return rows
+
+
+def _engine_key(bind) -> str:
+    engine = getattr(bind, "engine", bind)
+    return str(engine.url)
+
+
+def _table_exists(connection, dialect: str) -> bool:
+    if dialect == "sqlite":
+        row = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE}
+        ).first()
+        return row is not None
+    if dialect == "postgresql":
+        return connection.execute(text("SELECT to_regclass(:name)"), {"name": PG_TABLE}).scalar() is not None
+    return False
+
+
+def _backend_name(dialect: str) -> Optional[str]:
+    return {"sqlite": BACKEND_FTS5, "postgresql": BACKEND_POSTGRES}.get(dialect)
+
+
+def _backend_for(connection) -> Optional[str]:
+    key = _engine_key(connection)
+    if key not in _backends:
+        dialect = connection.dialect.name
+        _backends[key] = _backend_name(dialect) if _table_exists(connection, dialect) else None
+    return _backends[key]
+
+
+def create_search_index_ddl(dialect: str) -> List[str]:
+    """Statements creating the search structures for a dialect (shared with migrations)."""
+    if dialect == "sqlite":
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "title, body, owner, tokenize = 'unicode61 remove_diacritics 2')"
+        ]
+    if dialect == "postgresql":
+        return [
+            f"""
+            CREATE TABLE IF NOT EXISTS {PG_TABLE} (
+                doc_id BIGINT PRIMARY KEY,
+                entity_type VARCHAR(30) NOT NULL,
+                entity_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                title TEXT NOT NULL DEFAULT '',
+                body TEXT NOT NULL DEFAULT '',
+                tsv TSVECTOR GENERATED ALWAYS AS (
+                    setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+                    || setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+                ) STORED
+            )
+            """,
+            f"CREATE INDEX IF NOT EXISTS idx_{PG_TABLE}_tsv ON {PG_TABLE} USING GIN (tsv)",
+            f"CREATE INDEX IF NOT EXISTS idx_{PG_TABLE}_user_type ON {PG_TABLE} (user_id, entity_type)",
+        ]
+    return []
+
+
+def ensure_search_index() -> Optional[str]:
+    """Create the index for the current engine if needed, backfilling it while empty."""
+    engine = db.engine
+    key = _engine_key(engine)
+    dialect = engine.dialect.name
+    statements = create_search_index_ddl(dialect)
+    if not statements:
+        _backends[key] = None
+        return None
+    table = FTS_TABLE if dialect == "sqlite" else PG_TABLE
+    try:
+        with engine.begin() as connection:
+            if not _table_exists(connection, dialect):
+                for statement in statements:
+                    connection.execute(text(statement))
+            empty = connection.execute(text(f"SELECT 1 FROM {table} LIMIT 1")).first() is None
+    except DBAPIError:
+        # e.g. SQLite built without FTS5: searches keep using LIKE.
+        _backends[key] = None
+        return None
+    _backends[key] = _backend_name(dialect)
+    if empty:
+        # New (or migrated-in) index: backfill it from the entity tables.
+        rebuild_search_index()
+    return _backends[key]
+
+
+def search_backend() -> Optional[str]:
+    key = _engine_key(db.engine)
+    if key not in _backends:
+        with db.engine.connect() as connection:
+            return _backend_for(connection)
+    return _backends[key]
+
+
+def _write_documents(connection, backend: str, rows: Sequence[Tuple[str, int, int, str, str]], removed: Sequence[int]):
+    """rows are (entity_type, entity_id, user_id, title, body); removed are doc ids."""
+    stale = list(removed) + [doc_id(entity_type, entity_id) for entity_type, entity_id, _, _, _ in rows]
+    if backend == BACKEND_FTS5:
+        if stale:
+            connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :doc_id"), [{"doc_id": d} for d in stale])
+        if rows:
+            connection.execute(
+                text(f"INSERT INTO {FTS_TABLE} (rowid, title, body, owner) VALUES (:doc_id, :title, :body, :owner)"),
+                [
+                    {"doc_id": doc_id(t, i), "title": title, "body": body, "owner": f"u{user_id}"}
+                    for t, i, user_id, title, body in rows
+                ],
+            )
+        return
+    if removed:
+        connection.execute(text(f"DELETE FROM {PG_TABLE} WHERE doc_id = :doc_id"), [{"doc_id": d} for d in removed])
+    if rows:
+        connection.execute(
+            text(
+                f"INSERT INTO {PG_TABLE} (doc_id, entity_type, entity_id, user_id, title, body) "
+                "VALUES (:doc_id, :entity_type, :entity_id, :user_id, :title, :body) "
+                "ON CONFLICT (doc_id) DO UPDATE SET user_id = EXCLUDED.user_id, "
+                "title = EXCLUDED.title, body = EXCLUDED.body"
+            ),
+            [
+                {"doc_id": doc_id(t, i), "entity_type": t, "entity_id": i, "user_id": user_id, "title": title, "body": body}
+                for t, i, user_id, title, body in rows
+            ],
+        )
+
+
+def _parent_owners(connection, model, ids: Iterable[int]) -> Dict[int, int]:
+    ids = sorted({int(i) for i in ids if i})
+    if not ids:
+        return {}
+    return {row[0]: row[1] for row in connection.execute(select(model.id, model.user_id).where(model.id.in_(ids)))}
+
+
+def _has_indexed_changes(obj, fields: Sequence[str]) -> bool:
+    state = sa_inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+@event.listens_for(Session, "after_flush")
+def _index_flushed_rows(session, _flush_context):
+    changed = []
+    removed = []
+    for obj in session.new:
+        spec = _INDEXED_FIELDS.get(type(obj))
+        if spec:
+            changed.append((spec[0], obj))
+    for obj in session.dirty:
+        spec = _INDEXED_FIELDS.get(type(obj))
+        if spec and _has_indexed_changes(obj, spec[1]):
+            changed.append((spec[0], obj))
+    for obj in session.deleted:
+        if isinstance(obj, DocumentText):
+            changed.append((ENTITY_DOCUMENT, obj))
+            continue
+        spec = _INDEXED_FIELDS.get(type(obj))
+        if spec and obj.id:
+            removed.append(doc_id(spec[0], obj.id))
+    if not changed and not removed:
+        return
+    connection = session.connection()
+    backend = _backend_for(connection)
+    if backend is None:
+        return
+    list_owners = _parent_owners(connection, TodoList, [o.list_id for t, o in changed if t == ENTITY_TODO_ITEM])
+    note_owners = _parent_owners(connection, Note, [o.note_id for t, o in changed if t == ENTITY_NOTE_LIST_ITEM])
+    document_ids = set()
+    rows = []
+    for entity_type, obj in changed:
+        if entity_type == ENTITY_DOCUMENT:
+            document_ids.add(obj.document_id if isinstance(obj, DocumentText) else obj.id)
+            continue
+        if entity_type == ENTITY_TODO_ITEM:
+            user_id = list_owners.get(obj.list_id)
+        elif entity_type == ENTITY_NOTE_LIST_ITEM:
+            user_id = note_owners.get(obj.note_id)
+        else:
+            user_id = obj.user_id
+        if user_id is None or obj.id is None:
+            continue
+        title, body = document_text(entity_type, obj)
+        rows.append((entity_type, obj.id, user_id, title, body))
+    # Read after the flush, so deleted documents are simply absent.
+    rows.extend(_document_rows(connection, document_ids))
+    _write_documents(connection, backend, rows, removed)
+
+
+def _entity_batches(entity_type: str, user_id: Optional[int], ids: Optional[Sequence[int]] = None):
+    """Yield lists of (entity_type, id, user_id, title, body) for one entity type."""
+    if entity_type == ENTITY_DOCUMENT:
+        query = db.session.query(Document.id)
+        if user_id is not None:
+            query = query.filter(Document.user_id == user_id)
+        if ids is not None:
+            query = query.filter(Document.id.in_(ids))
+        last_id = 0
+        while True:
+            ids = [row[0] for row in query.filter(Document.id > last_id).order_by(Document.id.asc()).limit(REBUILD_BATCH)]
+            if not ids:
+                return
+            last_id = ids[-1]
+            yield _document_rows(db.session.connection(), ids)
+    if entity_type == ENTITY_TODO_ITEM:
+        query = db.session.query(TodoItem, TodoList.user_id).join(TodoList, TodoItem.list_id == TodoList.id)
+        if user_id is not None:
+            query = query.filter(TodoList.user_id == user_id)
+        order = TodoItem.id
+    elif entity_type == ENTITY_NOTE_LIST_ITEM:
+        query = db.session.query(NoteListItem, Note.user_id).join(Note, NoteListItem.note_id == Note.id)
+        if user_id is not None:
+            query = query.filter(Note.user_id == user_id)
+        order = NoteListItem.id
+    else:
+        model = {ENTITY_NOTE: Note, ENTITY_CALENDAR: CalendarEvent, ENTITY_AREA_BLOCK_ITEM: AreaBlockItem}[entity_type]
+        query = db.session.query(model, model.user_id)
+        if user_id is not None:
+            query = query.filter(model.user_id == user_id)
+        order = model.id
+    if ids is not None:
+        query = query.filter(order.in_(ids))
+    last_id = 0
+    while True:
+        batch = query.filter(order > last_id).order_by(order.asc()).limit(REBUILD_BATCH).all()
+        if not batch:
+            return
+        last_id = batch[-1][0].id
+        yield [(entity_type, obj.id, owner, *document_text(entity_type, obj)) for obj, owner in batch]
+
+
+def _delete_user_documents(connection, backend: str, user_id: int) -> None:
+    if backend == BACKEND_FTS5:
+        connection.execute(
+            text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :owner)"),
+            {"owner": f'owner : "u{int(user_id)}"'},
+        )
+    else:
+        connection.execute(text(f"DELETE FROM {PG_TABLE} WHERE user_id = :user_id"), {"user_id": user_id})
+
+
+def _rebuild_user(backend: str, user_id: int) -> int:
+    _delete_user_documents(db.session.connection(), backend, user_id)
+    written = 0
+    for entity_type in TYPE_CODES:
+        for rows in _entity_batches(entity_type, user_id):
+            _write_documents(db.session.connection(), backend, rows, [])
+            written += len(rows)
+    db.session.commit()
+    return written
+
+
+def rebuild_search_index(user_id: Optional[int] = None) -> int:
+    """
+    Re-derive the index (for one user, or everyone) from the entity tables.
+
+    A full rebuild runs one transaction per user, so the write lock is never
+    held for the whole index and other users' searches are unaffected; it then
+    drops documents of users that no longer exist.
+    """
+    backend = search_backend()
+    if backend is None:
+        return 0
+    if user_id is not None:
+        return _rebuild_user(backend, user_id)
+    written = 0
+    for (uid,) in db.session.query(User.id).order_by(User.id).all():
+        written += _rebuild_user(backend, uid)
+    user_table = User.__table__.name
+    if backend == BACKEND_FTS5:
+        db.session.execute(text(
+            f"DELETE FROM {FTS_TABLE} WHERE owner NOT IN (SELECT 'u' || id FROM \"{user_table}\")"
+        ))
+    else:
+        db.session.execute(text(
+            f"DELETE FROM {PG_TABLE} WHERE user_id NOT IN (SELECT id FROM \"{user_table}\")"
+        ))
+    db.session.commit()
+    return written
+
+
+def reindex_search_entities(entity_type: str, ids: Sequence[int]) -> int:
+    """
+    Sync rows written or deleted by bulk statements, which the flush listener never sees.
+
+    Ids whose rows no longer exist are dropped from the index.
+    """
+    backend = search_backend()
+    if backend is None or not ids:
+        return 0
+    connection = db.session.connection()
+    written = 0
+    for start in range(0, len(ids), REBUILD_BATCH):
+        chunk = list(ids[start:start + REBUILD_BATCH])
+        found = set()
+        for rows in _entity_batches(entity_type, None, chunk):
+            _write_documents(connection, backend, rows, [])
+            found.update(entity_id for _, entity_id, _, _, _ in rows)
+            written += len(rows)
+        gone = [doc_id(entity_type, entity_id) for entity_id in chunk if entity_id not in found]
+        if gone:
+            _write_documents(connection, backend, [], gone)
+    return written
+
+
+def query_terms(query: str) -> List[str]:
+    return _TERM_RE.findall((query or "").lower())[:MAX_QUERY_TERMS]
+
+
+def _fts5_match(user_id: int, terms: Sequence[str], title_only: bool) -> str:
+    columns = "{title}" if title_only else "{title body}"
+    clauses = [f'owner : "u{int(user_id)}"'] + [f'{columns} : "{term}"*' for term in terms]
+    return " AND ".join(clauses)
+
+
+def _pg_tsquery(terms: Sequence[str], title_only: bool) -> str:
+    weight = "A" if title_only else ""
+    return " & ".join(f"{term}:*{weight}" for term in terms)
+
+
+def render_snippet(raw: Optional[str]) -> str:
+    """HTML-escape a snippet and turn the match markers into <mark> tags."""
+    escaped = html.escape((raw or "").strip())
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def _within_doc_ids(within, entity_type: str):
+    """Doc ids for the entity ids selected by `within` (a Query or Select of one id column)."""
+    subquery = within.subquery()
+    entity_id = list(subquery.c)[0]
+    return select(entity_id * TYPE_STRIDE + TYPE_CODES[entity_type])
+
+
+def search_hits(
+    user_id: int,
+    query: str,
+    entity_types: Optional[Sequence[str]] = None,
+    limit: int = 50,
+    title_only: bool = False,
+    within=None,
+) -> Optional[List[SearchHit]]:
+    """
+    Best-first hits whose words start with every query term.
+
+    `within` (a Query or Select of entity ids, one entity type only) restricts
+    hits in the same statement, so `limit` applies after the caller's filters.
+    Returns None when no full-text index is available or the query has no
+    searchable terms, so callers can fall back to LIKE matching.
+    """
+    terms = query_terms(query)
+    backend = search_backend() if terms else None
+    if backend is None:
+        return None
+    types = [t for t in (entity_types or TYPE_CODES) if t in TYPE_CODES]
+    if not types:
+        return []
+    if within is not None and len(types) != 1:
+        raise ValueError("within restricts a single entity type")
+    connection = db.session.connection()
+    if backend == BACKEND_FTS5:
+        codes = ", ".join(str(TYPE_CODES[t]) for t in types)
+        fts = table(FTS_TABLE, column("rowid"))
+        statement = (
+            select(
+                fts.c.rowid,
+                literal_column(f"bm25({FTS_TABLE}, 10.0, 4.0, 0.0)").label("rank"),
+                literal_column(f"snippet({FTS_TABLE}, 0, char(2), char(3), '…', {SNIPPET_TOKENS})"),
+                literal_column(f"snippet({FTS_TABLE}, 1, char(2), char(3), '…', {SNIPPET_TOKENS})"),
+            )
+            .where(text(f"{FTS_TABLE} MATCH :match").bindparams(match=_fts5_match(user_id, terms, title_only)))
+            .where(text(f"(rowid % {TYPE_STRIDE}) IN ({codes})"))
+            .order_by(literal_column("rank"))
+            .limit(int(limit))
+        )
+        if within is not None:
+            statement = statement.where(fts.c.rowid.in_(_within_doc_ids(within, types[0])))
+        hits = []
+        for rowid, rank, title_snippet, body_snippet in connection.execute(statement).all():
+            entity_type, entity_id = _split_doc_id(rowid)
+            snippet = body_snippet if body_snippet and _MARK_START in body_snippet else title_snippet
+            # bm25() is lower-is-better; flip it so every backend ranks higher-is-better.
+            hits.append(SearchHit(entity_type, entity_id, -float(rank), render_snippet(snippet)))
+        return hits
+    document = table(
+        PG_TABLE, column("doc_id"), column("title"), column("body"), column("tsv"), column("user_id"), column("entity_type")
+    )
+    tsquery = literal_column("q")
+    matched = (
+        select(
+            document.c.doc_id,
+            document.c.title,
+            document.c.body,
+            tsquery,
+            func.ts_rank_cd(document.c.tsv, tsquery).label("rank"),
+        )
+        .select_from(document, func.to_tsquery("simple", _pg_tsquery(terms, title_only)).alias("q"))
+        .where(
+            document.c.user_id == user_id,
+            document.c.entity_type.in_(types),
+            document.c.tsv.op("@@")(tsquery),
+        )
+        .order_by(literal_column("rank").desc())
+        .limit(int(limit))
+    )
+    if within is not None:
+        matched = matched.where(document.c.doc_id.in_(_within_doc_ids(within, types[0])))
+    hit = matched.subquery("hit")
+    statement = select(
+        hit.c.doc_id,
+        hit.c.rank,
+        func.ts_headline(
+            "simple",
+            hit.c.title + "\n" + hit.c.body,
+            hit.c.q,
+            f"StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=24, MinWords=8, MaxFragments=1",
+        ),
+    ).order_by(hit.c.rank.desc())
+    hits = []
+    for value, rank, snippet in connection.execute(statement).all():
+        entity_type, entity_id = _split_doc_id(value)
+        hits.append(SearchHit(entity_type, entity_id, float(rank), render_snippet(snippet)))
+    return hits
+
+
+def search_entity_ids(
+    user_id: int,
+    query: str,
+    entity_type: str,
+    limit: int = CANDIDATE_LIMIT,
+    title_only: bool = False,
+    within=None,
+) -> Optional[Dict[int, SearchHit]]:
+    """
+    Hits for one entity type keyed by id, in rank order (None when unavailable).
+
+    Pass the caller's filtered query as `within`: otherwise only the best
+    `limit` hits are returned and later SQL filters can discard all of them.
+    """
+    hits = search_hits(user_id, query, [entity_type], limit=limit, title_only=title_only, within=within)
+    if hits is None:
+        return None
+    return {hit.entity_id: hit for hit in hits}
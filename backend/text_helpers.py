@@ -7,6 +7,10 @@ from markupsafe import Markup, escape
 
 
 LINK_PATTERN = re.compile(r"\[([^\]]+)\]\((https?://[^\s)]+)\)")
+# Lists shorter than this are compared pair by pair; longer ones go through blocking.
+DUPLICATE_BLOCKING_MIN_ITEMS = 200
+# Blocking keys shared by more items than this are too common to narrow anything down.
+DUPLICATE_BLOCK_MAX_SIZE = 250
 
 
 def linkify_text(text):
@@ -314,7 +318,51 @@ def _cosine_similarity(vec_a, vec_b):
     return dot / ((norm_a ** 0.5) * (norm_b ** 0.5))
 
 
-def _group_duplicates(items, similarity_fn, threshold):
+def _blocking_keys(text, tokens):
+    keys = {("text", text)}
+    keys.update(("token", token) for token in tokens)
+    # Character trigrams across the whole string catch substrings that span tokens.
+    keys.update(("gram", text[idx : idx + 3]) for idx in range(len(text) - 2))
+    # Short words survive a one-letter typo ("egs"/"eggs") only on bigrams.
+    for token in tokens:
+        if len(token) <= 4:
+            keys.update(("pair", token[idx : idx + 2]) for idx in range(len(token) - 1))
+    return keys
+
+
+def _candidate_pairs(texts, token_lists, max_block_size=DUPLICATE_BLOCK_MAX_SIZE):
+    """
+    Index pairs (i, j), i < j, that share at least one blocking key.
+
+    Keys are the whole normalized text, its tokens, character trigrams, and
+    bigrams of short tokens. Keys shared by more than max_block_size items are
+    ignored, except the whole-text key, so identical lines always meet.
+    """
+    postings = {}
+    item_keys = []
+    for idx, (text, tokens) in enumerate(zip(texts, token_lists)):
+        keys = _blocking_keys(text, tokens)
+        item_keys.append(keys)
+        for key in keys:
+            postings.setdefault(key, []).append(idx)
+
+    pairs = []
+    for i, keys in enumerate(item_keys):
+        partners = set()
+        for key in keys:
+            members = postings[key]
+            if key[0] != "text" and len(members) > max_block_size:
+                continue
+            partners.update(members)
+        pairs.extend((i, j) for j in sorted(partners) if j > i)
+    return pairs
+
+
+def _group_duplicates(items, similarity_fn, threshold, candidate_pairs=None):
+    """
+    Union items whose similarity meets threshold; candidate_pairs limits which
+    pairs are scored (defaults to every pair).
+    """
     parent = list(range(len(items)))
 
     def find(idx):
@@ -329,10 +377,14 @@ def _group_duplicates(items, similarity_fn, threshold):
         if root_a != root_b:
             parent[root_b] = root_a
 
-    for i in range(len(items)):
-        for j in range(i + 1, len(items)):
-            if similarity_fn(i, j) >= threshold:
-                union(i, j)
+    if candidate_pairs is None:
+        candidate_pairs = ((i, j) for i in range(len(items)) for j in range(i + 1, len(items)))
+    for i, j in candidate_pairs:
+        # Already grouped pairs cannot change the result, so skip the scorers.
+        if find(i) == find(j):
+            continue
+        if similarity_fn(i, j) >= threshold:
+            union(i, j)
 
     groups = {}
     for idx, item in enumerate(items):
@@ -0,0 +1,264 @@
+"""
+In-memory, per-user prefix index over titles for search-as-you-type.
+
+Each user's titles (lists, notes, areas, area blocks, folders, bookmarks and
+vault documents) are loaded once into a sorted word array; a lookup bisects
+to the words starting with the most selective query token and keeps the
+entries whose words cover every other token. When nothing matches, the
+last-resort fuzzy pass swaps that token for close vocabulary words.
+
+ORM writes to indexed titles drop the user's index on commit. Bulk query
+updates and other worker processes are covered by a short TTL.
+"""
+
+import difflib
+import heapq
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from models import (
+    db,
+    Area,
+    AreaBlock,
+    AreaFolder,
+    BookmarkItem,
+    Document,
+    DocumentFolder,
+    Note,
+    NoteFolder,
+    TodoList,
+)
+
+
+TITLE_INDEX_TTL_SECONDS = int(os.environ.get('TITLE_INDEX_TTL_SECONDS', 300))
+MAX_CACHED_USERS = 256
+# Matching titles (right type, every token covered) ranked per lookup; short prefixes stop here.
+MAX_CANDIDATES = 5000
+FUZZY_MIN_TOKEN = 3
+FUZZY_CUTOFF = 0.75
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+TitleEntry = namedtuple('TitleEntry', ['entity_type', 'entity_id', 'title', 'key', 'words', 'extra'])
+
+# entity type -> (model, title column, extra columns, whether archived rows are skipped)
+_SOURCES = {
+    'list': (TodoList, 'title', ('type',), False),
+    'note': (Note, 'title', ('note_type', 'folder_id'), True),
+    'area': (Area, 'name', ('folder_id',), True),
+    'area_block': (AreaBlock, 'title', ('area_id', 'block_type'), False),
+    'note_folder': (NoteFolder, 'name', ('parent_id',), True),
+    'area_folder': (AreaFolder, 'name', (), False),
+    'document_folder': (DocumentFolder, 'name', ('area_id', 'parent_id'), True),
+    'bookmark': (BookmarkItem, 'title', ('area_id',), False),
+    'document': (Document, 'title', ('area_id', 'folder_id', 'file_extension'), True),
+}
+ENTITY_TYPES = tuple(_SOURCES)
+_WATCHED_FIELDS = {
+    model: (title_field, 'archived_at') if skip_archived else (title_field,)
+    for model, title_field, _extra, skip_archived in _SOURCES.values()
+}
+
+_cache_lock = threading.Lock()
+_cache: 'OrderedDict[int, _UserTitleIndex]' = OrderedDict()
+_generations: Dict[int, int] = {}
+
+
+def normalize_title(value: str) -> str:
+    """Lowercase and strip accents so 'Café' is found by 'cafe'."""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def title_tokens(value: str) -> List[str]:
+    return _TOKEN_RE.findall(normalize_title(value))
+
+
+class _UserTitleIndex:
+    __slots__ = ('entries', 'words', 'postings', 'built_at')
+
+    def __init__(self, entries: Sequence[TitleEntry]):
+        self.entries = list(entries)
+        by_word: Dict[str, List[int]] = {}
+        for position, entry in enumerate(self.entries):
+            for word in set(entry.words):
+                by_word.setdefault(word, []).append(position)
+        self.words = sorted(by_word)
+        self.postings = [by_word[word] for word in self.words]
+        self.built_at = time.monotonic()
+
+    def words_with_prefix(self, prefix: str):
+        start = bisect_left(self.words, prefix)
+        for position in range(start, len(self.words)):
+            if not self.words[position].startswith(prefix):
+                break
+            yield position
+
+    def prefix_candidates(self, prefix: str, accept: Optional[Callable[[TitleEntry], bool]] = None) -> List[int]:
+        """Entry positions with a word starting with prefix, filtered by accept before the cap."""
+        found = []
+        seen = set()
+        for position in self.words_with_prefix(prefix):
+            for entry_position in self.postings[position]:
+                if entry_position in seen:
+                    continue
+                seen.add(entry_position)
+                if accept is not None and not accept(self.entries[entry_position]):
+                    continue
+                found.append(entry_position)
+                if len(found) >= MAX_CANDIDATES:
+                    return found
+        return found
+
+    def close_words(self, token: str) -> List[str]:
+        """Vocabulary words near token, searched among words sharing its first letter."""
+        pool = [self.words[position] for position in self.words_with_prefix(token[0])]
+        return difflib.get_close_matches(token, pool, n=5, cutoff=FUZZY_CUTOFF)
+
+
+def _load_entries(user_id: int) -> List[TitleEntry]:
+    entries = []
+    for entity_type, (model, title_field, extra_fields, skip_archived) in _SOURCES.items():
+        columns = [model.id, getattr(model, title_field)] + [getattr(model, field) for field in extra_fields]
+        query = db.session.query(*columns).filter(model.user_id == user_id)
+        if skip_archived:
+            query = query.filter(model.archived_at.is_(None))
+        for row in query:
+            title = (row[1] or '').strip()
+            words = title_tokens(title)
+            if not words:
+                continue
+            extra = dict(zip(extra_fields, row[2:]))
+            if 'type' in extra:
+                extra['list_type'] = extra.pop('type')
+            entries.append(TitleEntry(entity_type, row[0], title, ' '.join(words), tuple(words), extra))
+    return entries
+
+
+def _index_for(user_id: int) -> _UserTitleIndex:
+    with _cache_lock:
+        index = _cache.get(user_id)
+        if index is not None and time.monotonic() - index.built_at < TITLE_INDEX_TTL_SECONDS:
+            _cache.move_to_end(user_id)
+            return index
+        generation = _generations.get(user_id, 0)
+    index = _UserTitleIndex(_load_entries(user_id))
+    with _cache_lock:
+        # A write committed while loading makes this build stale; serve it once, don't cache it.
+        if _generations.get(user_id, 0) == generation:
+            _cache[user_id] = index
+            _cache.move_to_end(user_id)
+            while len(_cache) > MAX_CACHED_USERS:
+                _cache.popitem(last=False)
+    return index
+
+
+def invalidate_title_index(user_id: Optional[int] = None):
+    """Drop one user's cached index, or every user's."""
+    with _cache_lock:
+        if user_id is None:
+            _cache.clear()
+            for key in list(_generations):
+                _generations[key] += 1
+            return
+        _cache.pop(user_id, None)
+        _generations[user_id] = _generations.get(user_id, 0) + 1
+
+
+def suggest_titles(
+    user_id: int,
+    query: str,
+    entity_types: Optional[Sequence[str]] = None,
+    limit: int = 10,
+) -> List[dict]:
+    """
+    Titles whose words start with every query token, best first.
+
+    Titles that start with the whole query rank above word-start matches,
+    then shorter titles first. Types and the other tokens are checked while
+    collecting, so the MAX_CANDIDATES cap only counts real matches. Results
+    from the fuzzy pass carry fuzzy=True.
+    """
+    tokens = title_tokens(query)
+    if not tokens:
+        return []
+    index = _index_for(user_id)
+    wanted = set(entity_types) if entity_types else None
+    anchor = max(tokens, key=len)
+    others = [token for token in tokens if token is not anchor]
+    phrase = ' '.join(tokens)
+
+    def accept(entry):
+        if wanted and entry.entity_type not in wanted:
+            return False
+        return all(any(word.startswith(token) for word in entry.words) for token in others)
+
+    def matches(anchor_words):
+        seen = set()
+        ranked = []
+        for anchor_word in anchor_words:
+            for position in index.prefix_candidates(anchor_word, accept):
+                if position in seen:
+                    continue
+                seen.add(position)
+                entry = index.entries[position]
+                rank = (
+                    0 if entry.key.startswith(phrase) else 1,
+                    0 if entry.words[0].startswith(tokens[0]) else 1,
+                    len(entry.title),
+                    entry.key,
+                    entry.entity_id,
+                )
+                ranked.append((rank, position))
+        return [index.entries[position] for _, position in heapq.nsmallest(limit, ranked)]
+
+    fuzzy = False
+    found = matches([anchor])
+    if not found and len(anchor) >= FUZZY_MIN_TOKEN:
+        found = matches(index.close_words(anchor))
+        fuzzy = bool(found)
+    results = []
+    for entry in found:
+        payload = {'type': entry.entity_type, 'id': entry.entity_id, 'title': entry.title}
+        payload.update(entry.extra)
+        if fuzzy:
+            payload['fuzzy'] = True
+        results.append(payload)
+    return results
+
+
+def _title_changed(obj, fields: Sequence[str]) -> bool:
+    state = sa_inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_title_writes(session, _flush_context):
+    users = session.info.setdefault('title_index_users', set())
+    for obj in list(session.new) + list(session.deleted):
+        if type(obj) in _WATCHED_FIELDS and obj.user_id is not None:
+            users.add(obj.user_id)
+    for obj in session.dirty:
+        fields = _WATCHED_FIELDS.get(type(obj))
+        if fields and obj.user_id is not None and _title_changed(obj, fields + ('user_id',)):
+            users.add(obj.user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _drop_committed_indexes(session):
+    for user_id in session.info.pop('title_index_users', ()):
+        invalidate_title_index(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_writes(session):
+    session.info.pop('title_index_users', None)
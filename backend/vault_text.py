@@ -0,0 +1,224 @@
+"""
+Plain-text extraction for vault documents, feeding full-text search.
+
+Documents of a supported type get one DocumentText row holding their text,
+capped at MAX_TEXT_CHARS. Runs are incremental: a document is pending while
+it has no row or its row came from a different stored file. File reads run in
+a bounded thread pool and never touch the database; the calling thread writes
+the rows, which the search index picks up on flush. Failed reads keep an
+'error' row and are retried only once the document's file changes.
+"""
+
+import os
+import re
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy import or_
+
+from .text_helpers import _html_to_plain_text
+from models import db, Document, DocumentText
+
+
+TEXT_EXTENSIONS = {
+    'txt', 'md', 'markdown', 'rst', 'log', 'csv', 'tsv', 'json', 'xml', 'yaml', 'yml', 'toml', 'ini', 'cfg',
+    'js', 'jsx', 'ts', 'tsx', 'py', 'css', 'java', 'cpp', 'c', 'h', 'go', 'rs', 'rb', 'php', 'sh', 'sql',
+}
+HTML_EXTENSIONS = {'html', 'htm'}
+PDF_EXTENSIONS = {'pdf'}
+SUPPORTED_EXTENSIONS = TEXT_EXTENSIONS | HTML_EXTENSIONS | PDF_EXTENSIONS
+
+STATUS_DONE = 'done'
+STATUS_EMPTY = 'empty'
+STATUS_TOO_LARGE = 'too_large'
+STATUS_ERROR = 'error'
+
+# Bytes read from a text/code/HTML file; the rest of a larger file is not indexed.
+MAX_READ_BYTES = int(os.environ.get('VAULT_TEXT_MAX_BYTES', 1024 * 1024))
+# PDFs must be parsed whole, so larger ones are skipped instead of truncated.
+MAX_PDF_BYTES = int(os.environ.get('VAULT_TEXT_MAX_PDF_BYTES', 20 * 1024 * 1024))
+MAX_TEXT_CHARS = 200_000
+# Decompressed content-stream bytes the no-pypdf fallback inflates per PDF; operators
+# and positioning outweigh the shown text, so allow several bytes per character.
+MAX_PDF_STREAM_BYTES = MAX_TEXT_CHARS * 16
+EXTRACT_WORKERS = max(1, int(os.environ.get('VAULT_TEXT_WORKERS', 4)))
+EXTRACT_BATCH_SIZE = 50
+
+_SCRIPT_STYLE_RE = re.compile(r"(?is)<(script|style)\b.*?</\1\s*>")
+_PDF_STREAM_RE = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.S)
+_PDF_TEXT_RE = re.compile(rb"\[(.*?)\]\s*TJ|\((.*?)(?<!\\)\)\s*(?:Tj|'|\")", re.S)
+_PDF_STRING_RE = re.compile(rb"\((.*?)(?<!\\)\)", re.S)
+_PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'', b'f': b'', b'(': b'(', b')': b')', b'\\': b'\\'}
+
+_kick_lock = threading.Lock()
+
+
+def _decode(raw: bytes) -> str:
+    if raw.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return raw.decode('utf-16', errors='replace')
+    # The byte cap can split a multi-byte character; replacing it is harmless for search.
+    return raw.decode('utf-8', errors='replace')
+
+
+def _unescape_pdf_string(raw: bytes) -> bytes:
+    out = bytearray()
+    i = 0
+    while i < len(raw):
+        char = raw[i:i + 1]
+        if char == b'\\' and i + 1 < len(raw):
+            nxt = raw[i + 1:i + 2]
+            if nxt in b"01234567":
+                octal = re.match(rb"[0-7]{1,3}", raw[i + 1:i + 4]).group(0)
+                out.append(int(octal, 8) & 0xFF)
+                i += 1 + len(octal)
+                continue
+            out += _PDF_ESCAPES.get(nxt, nxt)
+            i += 2
+            continue
+        out += char
+        i += 1
+    return bytes(out)
+
+
+def _pdf_text_fallback(data: bytes) -> str:
+    """Text-showing operators from (Flate) content streams; enough for simple PDFs."""
+    parts = []
+    length = 0
+    budget = MAX_PDF_STREAM_BYTES
+    for match in _PDF_STREAM_RE.finditer(data):
+        if length >= MAX_TEXT_CHARS or budget <= 0:
+            break
+        stream = match.group(1)
+        try:
+            # Bounded output: a small deflate bomb must not inflate past the budget.
+            stream = zlib.decompressobj().decompress(stream, budget)
+        except zlib.error:
+            stream = stream[:budget]
+        budget -= len(stream)
+        for shown in _PDF_TEXT_RE.finditer(stream):
+            if shown.group(1) is not None:
+                pieces = _PDF_STRING_RE.findall(shown.group(1))
+            else:
+                pieces = [shown.group(2)]
+            text = b''.join(_unescape_pdf_string(piece) for piece in pieces).decode('latin-1')
+            if text.strip():
+                parts.append(text)
+                length += len(text) + 1
+                if length >= MAX_TEXT_CHARS:
+                    break
+    return ' '.join(parts)
+
+
+def _pdf_text(path: str) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        with open(path, 'rb') as handle:
+            return _pdf_text_fallback(handle.read())
+    reader = PdfReader(path)
+    parts = []
+    length = 0
+    for page in reader.pages:
+        text = page.extract_text() or ''
+        parts.append(text)
+        length += len(text)
+        if length >= MAX_TEXT_CHARS:
+            break
+    return '\n'.join(parts)
+
+
+def extract_file_text(path: str, extension: str) -> Tuple[str, str, bool]:
+    """Return (status, text, truncated) for one file; never raises."""
+    extension = (extension or '').lower()
+    try:
+        if extension in PDF_EXTENSIONS:
+            if os.path.getsize(path) > MAX_PDF_BYTES:
+                return STATUS_TOO_LARGE, '', False
+            text = _pdf_text(path)
+            truncated = False
+        else:
+            with open(path, 'rb') as handle:
+                raw = handle.read(MAX_READ_BYTES + 1)
+            truncated = len(raw) > MAX_READ_BYTES
+            text = _decode(raw[:MAX_READ_BYTES])
+            if extension in HTML_EXTENSIONS:
+                text = _html_to_plain_text(_SCRIPT_STYLE_RE.sub(' ', text))
+    except Exception as exc:
+        return STATUS_ERROR, str(exc)[:300], False
+    text = text.replace('\x00', '').strip()
+    if len(text) > MAX_TEXT_CHARS:
+        text = text[:MAX_TEXT_CHARS]
+        truncated = True
+    return (STATUS_DONE if text else STATUS_EMPTY), text, truncated
+
+
+def pending_documents_query():
+    """Supported documents without text from their current file."""
+    return (
+        db.session.query(Document.id, Document.user_id, Document.stored_filename, Document.file_extension)
+        .outerjoin(DocumentText, DocumentText.document_id == Document.id)
+        .filter(
+            Document.file_extension.in_(sorted(SUPPORTED_EXTENSIONS)),
+            or_(DocumentText.document_id.is_(None), DocumentText.stored_filename != Document.stored_filename),
+        )
+    )
+
+
+def extract_pending_document_text(
+    vault_root_fn: Callable[[int], str],
+    deadline: Optional[datetime] = None,
+    workers: int = EXTRACT_WORKERS,
+    batch_size: int = EXTRACT_BATCH_SIZE,
+) -> int:
+    """
+    Extract text for pending documents in id order until none remain or the deadline passes.
+
+    vault_root_fn maps a user id to that user's vault directory. Returns the
+    number of documents processed.
+    """
+    processed = 0
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='vault-text') as pool:
+        while deadline is None or datetime.utcnow() < deadline:
+            batch = (
+                pending_documents_query()
+                .filter(Document.id > last_id)
+                .order_by(Document.id.asc())
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            paths = [os.path.join(vault_root_fn(row.user_id), row.stored_filename) for row in batch]
+            results = pool.map(extract_file_text, paths, [row.file_extension for row in batch])
+            existing = {
+                entry.document_id: entry
+                for entry in DocumentText.query.filter(DocumentText.document_id.in_([row.id for row in batch]))
+            }
+            for row, (status, text, truncated) in zip(batch, results):
+                entry = existing.get(row.id)
+                if entry is None:
+                    entry = DocumentText(document_id=row.id, user_id=row.user_id)
+                    db.session.add(entry)
+                entry.stored_filename = row.stored_filename
+                entry.status = status
+                entry.content = text if status == STATUS_DONE else None
+                entry.error = text if status == STATUS_ERROR else None
+                entry.truncated = truncated
+                entry.extracted_at = datetime.utcnow()
+            db.session.commit()
+            processed += len(batch)
+    return processed
+
+
+def try_begin_extraction_kick() -> bool:
+    """Single-flight guard so uploads start at most one extra extraction thread."""
+    return _kick_lock.acquire(blocking=False)
+
+
+def end_extraction_kick():
+    _kick_lock.release()
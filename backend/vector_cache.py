@@ -0,0 +1,244 @@
+"""Process-local cache of decoded embedding matrices keyed by (user_id, entity_type)."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .env import int_env
+
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 300
+
+
+class _MatrixEntry:
+    """
+    Growable (ids, matrix) pair.
+
+    Rows live in a preallocated buffer so appends are amortized O(dim); readers
+    receive views sliced to the size at read time, which later appends never touch.
+    Updates and removals are copy-on-write: they build fresh arrays and swap them
+    in, so a reader still scoring an earlier view keeps a consistent id mapping.
+    Batch writes through put_many/remove_many pay for that copy once per batch.
+    """
+
+    def __init__(self, ids: np.ndarray, matrix: np.ndarray):
+        self.size = int(ids.shape[0])
+        self.dim = int(matrix.shape[1]) if matrix.ndim == 2 and self.size else 0
+        self.ids = np.array(ids, dtype=np.int64)
+        self.matrix = np.array(matrix, dtype=np.float32).reshape(self.size, self.dim)
+        self.positions: Dict[int, int] = {int(entity_id): idx for idx, entity_id in enumerate(self.ids)}
+        self.loaded_at = time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.ids.nbytes + self.matrix.nbytes)
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.ids[: self.size], self.matrix[: self.size]
+
+    def _grow(self, capacity: Optional[int] = None) -> None:
+        """Move rows into fresh arrays (doubling the capacity by default); old views keep the old ones."""
+        if capacity is None:
+            capacity = max(16, self.matrix.shape[0] * 2)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        matrix[: self.size] = self.matrix[: self.size]
+        ids[: self.size] = self.ids[: self.size]
+        self.matrix = matrix
+        self.ids = ids
+
+    def put_many(self, rows: List[Tuple[int, np.ndarray]]) -> bool:
+        """Update or append (entity_id, row) pairs, copying the buffers at most once per call."""
+        if not rows:
+            return True
+        dim = self.dim if self.size else int(rows[0][1].shape[0])
+        if any(row.shape[0] != dim for _, row in rows):
+            return False
+        if not self.size:
+            self.dim = dim
+            self.matrix = np.zeros((0, dim), dtype=np.float32)
+        appended = {entity_id for entity_id, _ in rows if entity_id not in self.positions}
+        capacity = self.matrix.shape[0]
+        needed = self.size + len(appended)
+        if needed > capacity:
+            self._grow(max(16, capacity * 2, needed))
+        elif len(appended) < len(rows):
+            # Updated rows may be inside views already handed out.
+            self._grow(capacity)
+        for entity_id, row in rows:
+            idx = self.positions.get(entity_id)
+            if idx is None:
+                idx = self.size
+                self.ids[idx] = entity_id
+                self.positions[entity_id] = idx
+                self.size += 1
+            self.matrix[idx] = row
+        return True
+
+    def remove_many(self, entity_ids: List[int]) -> None:
+        """Drop rows by swapping in the last row, copying the buffers at most once per call."""
+        entity_ids = [entity_id for entity_id in entity_ids if entity_id in self.positions]
+        if not entity_ids:
+            return
+        self._grow(self.matrix.shape[0])
+        for entity_id in entity_ids:
+            idx = self.positions.pop(entity_id, None)
+            if idx is None:
+                continue
+            last = self.size - 1
+            if idx != last:
+                moved_id = int(self.ids[last])
+                self.matrix[idx] = self.matrix[last]
+                self.ids[idx] = moved_id
+                self.positions[moved_id] = idx
+            self.size = last
+
+
+class VectorIndexCache:
+    """
+    LRU cache of normalized embedding matrices bounded by a memory budget.
+
+    Writes patch cached entries rather than dropping them, so an AI chat turn
+    that fires several semantic searches only pays the load cost once. Entries
+    also expire after a TTL so other worker processes' writes become visible
+    eventually.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[int, str], _MatrixEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        # Only keys with a load in flight: key -> [loads in flight, writes since the first one started].
+        self._loading: Dict[Tuple[int, str], List[int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, entry: _MatrixEntry) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - entry.loaded_at > self.ttl_seconds
+
+    def _drop(self, key: Tuple[int, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.evictions += 1
+
+    def _note_write(self, key: Tuple[int, str]) -> None:
+        loading = self._loading.get(key)
+        if loading is not None:
+            loading[1] += 1
+
+    def get(
+        self,
+        user_id: int,
+        entity_type: str,
+        loader: Callable[[int, str], Tuple[np.ndarray, np.ndarray]],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        key = (user_id, entity_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.view()
+            self.misses += 1
+            loading = self._loading.setdefault(key, [0, 0])
+            loading[0] += 1
+            generation = loading[1]
+        try:
+            ids, matrix = loader(user_id, entity_type)
+            entry = _MatrixEntry(ids, matrix)
+        finally:
+            with self._lock:
+                loading[0] -= 1
+                if not loading[0]:
+                    self._loading.pop(key, None)
+        with self._lock:
+            if loading[1] != generation:
+                # A write landed while loading; serve this snapshot without caching it.
+                return entry.view()
+            self._drop(key)
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            self._evict()
+            return entry.view()
+
+    def upsert(self, user_id: int, entity_type: str, entity_id: int, vector) -> None:
+        self.upsert_many(user_id, entity_type, [(entity_id, vector)])
+
+    def upsert_many(self, user_id: int, entity_type: str, items: Iterable[Tuple[int, object]]) -> None:
+        """Patch a cached entry with (entity_id, vector) pairs in one copy-on-write pass."""
+        key = (user_id, entity_type)
+        rows = []
+        valid = True
+        for entity_id, vector in items:
+            row = np.asarray(vector, dtype=np.float32)
+            norm = float(np.linalg.norm(row)) if row.ndim == 1 else 0.0
+            if norm == 0:
+                valid = False
+                break
+            rows.append((int(entity_id), row / norm))
+        if valid and not rows:
+            return
+        with self._lock:
+            self._note_write(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if not valid:
+                self._drop(key)
+                return
+            before = entry.nbytes
+            if not entry.put_many(rows):
+                # Dimension changed (new embedding model); reload on next read.
+                self._drop(key)
+                return
+            self._bytes += entry.nbytes - before
+            self._evict()
+
+    def remove(self, user_id: int, entity_type: str, entity_id: int) -> None:
+        key = (user_id, entity_type)
+        with self._lock:
+            self._note_write(key)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.remove_many([int(entity_id)])
+
+    def invalidate(self, user_id: Optional[int] = None, entity_type: Optional[str] = None) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                if user_id is not None and key[0] != user_id:
+                    continue
+                if entity_type is not None and key[1] != entity_type:
+                    continue
+                self._drop(key)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+vector_cache = VectorIndexCache(
+    max_bytes=int_env("EMBEDDING_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES),
+    ttl_seconds=int_env("EMBEDDING_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS),
+)
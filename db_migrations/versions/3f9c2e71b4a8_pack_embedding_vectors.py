@@ -0,0 +1,99 @@
+"""pack embedding vectors as binary float32
+
+Revision ID: 3f9c2e71b4a8
+Revises: d1e2f3a4b5c6
+Create Date: 2026-10-18 09:00:00.000000
+"""
+
+import json
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+revision = '3f9c2e71b4a8'
+down_revision = 'd1e2f3a4b5c6'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def _columns(table_name: str) -> set[str]:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    return {c['name'] for c in inspector.get_columns(table_name)}
+
+
+def _convert_json_rows() -> None:
+    bind = op.get_bind()
+    select_sql = sa.text(
+        "SELECT id, embedding_json FROM embedding_record "
+        "WHERE embedding_blob IS NULL AND embedding_json IS NOT NULL AND id > :last_id "
+        "ORDER BY id LIMIT :limit"
+    )
+    update_sql = sa.text(
+        "UPDATE embedding_record SET embedding_blob = :blob, embedding_dtype = 'float32', "
+        "embedding_dim = :dim, embedding_json = NULL WHERE id = :id"
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(select_sql, {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, raw in rows:
+            last_id = row_id
+            try:
+                values = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(values, list) or not values:
+                continue
+            blob = np.asarray(values, dtype='<f4').tobytes()
+            updates.append({'id': row_id, 'blob': blob, 'dim': len(values)})
+        if updates:
+            bind.execute(update_sql, updates)
+
+
+def _restore_json_rows() -> None:
+    bind = op.get_bind()
+    select_sql = sa.text(
+        "SELECT id, embedding_blob, embedding_dtype FROM embedding_record "
+        "WHERE embedding_blob IS NOT NULL AND id > :last_id ORDER BY id LIMIT :limit"
+    )
+    update_sql = sa.text("UPDATE embedding_record SET embedding_json = :raw WHERE id = :id")
+    last_id = 0
+    while True:
+        rows = bind.execute(select_sql, {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, blob, dtype_name in rows:
+            last_id = row_id
+            dtype = '<f2' if dtype_name == 'float16' else '<f4'
+            values = np.frombuffer(bytes(blob), dtype=dtype).astype(float).tolist()
+            updates.append({'id': row_id, 'raw': json.dumps(values)})
+        if updates:
+            bind.execute(update_sql, updates)
+
+
+def upgrade() -> None:
+    columns = _columns('embedding_record')
+    if 'embedding_blob' not in columns:
+        op.add_column('embedding_record', sa.Column('embedding_blob', sa.LargeBinary(), nullable=True))
+    if 'embedding_dtype' not in columns:
+        op.add_column('embedding_record', sa.Column('embedding_dtype', sa.String(length=10), nullable=True))
+    _convert_json_rows()
+
+
+def downgrade() -> None:
+    columns = _columns('embedding_record')
+    if 'embedding_blob' in columns:
+        _restore_json_rows()
+    with op.batch_alter_table('embedding_record') as batch_op:
+        if 'embedding_dtype' in columns:
+            batch_op.drop_column('embedding_dtype')
+        if 'embedding_blob' in columns:
+            batch_op.drop_column('embedding_blob')
@@ -0,0 +1,146 @@
+"""add content-addressed embedding vectors
+
+Revision ID: 5d8a0c3e9f17
+Revises: 7b1e4d9a2c63
+Create Date: 2026-10-18 11:00:00.000000
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+revision = '5d8a0c3e9f17'
+down_revision = '7b1e4d9a2c63'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def _columns(table_name: str) -> set[str]:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    return {c['name'] for c in inspector.get_columns(table_name)}
+
+
+def _tables() -> set[str]:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    return set(inspector.get_table_names())
+
+
+def _move_inline_vectors() -> None:
+    """Move per-record blobs/JSON into embedding_vector, sharing rows with identical source text."""
+    bind = op.get_bind()
+    model_name = os.environ.get('OPENAI_EMBED_MODEL', 'text-embedding-3-small')
+    select_sql = sa.text(
+        "SELECT id, source_hash, embedding_blob, embedding_dtype, embedding_json FROM embedding_record "
+        "WHERE vector_id IS NULL AND (embedding_blob IS NOT NULL OR embedding_json IS NOT NULL) "
+        "AND id > :last_id ORDER BY id LIMIT :limit"
+    )
+    find_sql = sa.text(
+        "SELECT id FROM embedding_vector WHERE content_hash = :content_hash AND model_name = :model_name"
+    )
+    insert_sql = sa.text(
+        "INSERT INTO embedding_vector "
+        "(content_hash, model_name, embedding_blob, embedding_dtype, embedding_dim, ref_count, created_at, last_used_at) "
+        "VALUES (:content_hash, :model_name, :blob, :dtype, :dim, 0, :now, :now)"
+    )
+    update_sql = sa.text(
+        "UPDATE embedding_record SET vector_id = :vector_id, embedding_blob = NULL, "
+        "embedding_dtype = NULL, embedding_json = NULL WHERE id = :id"
+    )
+    now = datetime.utcnow()
+    last_id = 0
+    while True:
+        rows = bind.execute(select_sql, {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        for row_id, source_hash, blob, dtype_name, raw_json in rows:
+            last_id = row_id
+            if blob:
+                blob = bytes(blob)
+                dtype_name = dtype_name or 'float32'
+            else:
+                try:
+                    values = json.loads(raw_json)
+                except (TypeError, ValueError):
+                    continue
+                if not isinstance(values, list) or not values:
+                    continue
+                blob = np.asarray(values, dtype='<f4').tobytes()
+                dtype_name = 'float32'
+            itemsize = 2 if dtype_name == 'float16' else 4
+            content_hash = source_hash or hashlib.sha256(blob).hexdigest()
+            params = {'content_hash': content_hash, 'model_name': model_name}
+            vector_id = bind.execute(find_sql, params).scalar()
+            if vector_id is None:
+                bind.execute(insert_sql, {
+                    **params,
+                    'blob': blob,
+                    'dtype': dtype_name,
+                    'dim': len(blob) // itemsize,
+                    'now': now,
+                })
+                vector_id = bind.execute(find_sql, params).scalar()
+            bind.execute(update_sql, {'vector_id': vector_id, 'id': row_id})
+    bind.execute(sa.text(
+        "UPDATE embedding_vector SET ref_count = "
+        "(SELECT COUNT(*) FROM embedding_record WHERE embedding_record.vector_id = embedding_vector.id)"
+    ))
+
+
+def _restore_inline_vectors() -> None:
+    op.get_bind().execute(sa.text(
+        "UPDATE embedding_record SET "
+        "embedding_blob = (SELECT embedding_blob FROM embedding_vector WHERE embedding_vector.id = embedding_record.vector_id), "
+        "embedding_dtype = (SELECT embedding_dtype FROM embedding_vector WHERE embedding_vector.id = embedding_record.vector_id) "
+        "WHERE vector_id IS NOT NULL"
+    ))
+
+
+def upgrade() -> None:
+    if 'embedding_vector' not in _tables():
+        op.create_table(
+            'embedding_vector',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('content_hash', sa.String(length=64), nullable=False),
+            sa.Column('model_name', sa.String(length=100), nullable=False),
+            sa.Column('embedding_blob', sa.LargeBinary(), nullable=False),
+            sa.Column('embedding_dtype', sa.String(length=10), nullable=False),
+            sa.Column('embedding_dim', sa.Integer(), nullable=False),
+            sa.Column('ref_count', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('last_used_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('content_hash', 'model_name', name='uniq_embedding_vector_content'),
+        )
+        op.create_index('idx_embedding_vector_gc', 'embedding_vector', ['ref_count', 'last_used_at'], unique=False)
+    if 'vector_id' not in _columns('embedding_record'):
+        op.add_column('embedding_record', sa.Column('vector_id', sa.Integer(), nullable=True))
+    op.create_index(
+        'idx_embedding_record_vector',
+        'embedding_record',
+        ['vector_id'],
+        unique=False,
+        if_not_exists=True,
+    )
+    _move_inline_vectors()
+
+
+def downgrade() -> None:
+    if 'vector_id' in _columns('embedding_record'):
+        if 'embedding_vector' in _tables():
+            _restore_inline_vectors()
+        op.drop_index('idx_embedding_record_vector', table_name='embedding_record', if_exists=True)
+        with op.batch_alter_table('embedding_record') as batch_op:
+            batch_op.drop_column('vector_id')
+    if 'embedding_vector' in _tables():
+        op.drop_index('idx_embedding_vector_gc', table_name='embedding_vector')
+        op.drop_table('embedding_vector')
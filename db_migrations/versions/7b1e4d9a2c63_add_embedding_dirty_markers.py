@@ -0,0 +1,49 @@
+"""add embedding dirty markers
+
+Revision ID: 7b1e4d9a2c63
+Revises: 3f9c2e71b4a8
+Create Date: 2026-10-18 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '7b1e4d9a2c63'
+down_revision = '3f9c2e71b4a8'
+branch_labels = None
+depends_on = None
+
+
+def _tables() -> set[str]:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    return set(inspector.get_table_names())
+
+
+def upgrade() -> None:
+    if 'embedding_dirty_marker' not in _tables():
+        op.create_table(
+            'embedding_dirty_marker',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('entity_type', sa.String(length=30), nullable=False),
+            sa.Column('entity_id', sa.Integer(), nullable=False),
+            sa.Column('marked_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index(
+            'idx_embedding_dirty_user_type',
+            'embedding_dirty_marker',
+            ['user_id', 'entity_type'],
+            unique=False,
+        )
+        op.create_index('idx_embedding_dirty_marked_at', 'embedding_dirty_marker', ['marked_at'], unique=False)
+
+
+def downgrade() -> None:
+    if 'embedding_dirty_marker' in _tables():
+        op.drop_index('idx_embedding_dirty_marked_at', table_name='embedding_dirty_marker')
+        op.drop_index('idx_embedding_dirty_user_type', table_name='embedding_dirty_marker')
+        op.drop_table('embedding_dirty_marker')
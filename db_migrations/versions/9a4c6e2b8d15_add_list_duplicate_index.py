@@ -0,0 +1,48 @@
+"""add persisted list duplicate index
+
+Revision ID: 9a4c6e2b8d15
+Revises: 5d8a0c3e9f17
+Create Date: 2026-10-18 12:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '9a4c6e2b8d15'
+down_revision = '5d8a0c3e9f17'
+branch_labels = None
+depends_on = None
+
+
+def _tables() -> set[str]:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    return set(inspector.get_table_names())
+
+
+def upgrade() -> None:
+    if 'list_duplicate_entry' not in _tables():
+        op.create_table(
+            'list_duplicate_entry',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('list_kind', sa.String(length=10), nullable=False),
+            sa.Column('list_id', sa.Integer(), nullable=False),
+            sa.Column('item_id', sa.Integer(), nullable=False),
+            sa.Column('source_hash', sa.String(length=64), nullable=False),
+            sa.Column('normalized_text', sa.Text(), nullable=False),
+            sa.Column('token_signature', sa.Text(), nullable=False),
+            sa.Column('vector_hash', sa.String(length=64), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('list_kind', 'item_id', name='uniq_list_duplicate_item'),
+        )
+        op.create_index('idx_list_duplicate_list', 'list_duplicate_entry', ['list_kind', 'list_id'], unique=False)
+
+
+def downgrade() -> None:
+    if 'list_duplicate_entry' in _tables():
+        op.drop_index('idx_list_duplicate_list', table_name='list_duplicate_entry')
+        op.drop_table('list_duplicate_entry')
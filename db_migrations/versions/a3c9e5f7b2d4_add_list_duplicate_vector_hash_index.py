@@ -0,0 +1,27 @@
+"""add list_duplicate_entry.vector_hash index
+
+Revision ID: a3c9e5f7b2d4
+Revises: f4b8d2c6e1a9
+Create Date: 2026-10-19 09:00:00.000000
+"""
+
+from alembic import op
+
+
+revision = 'a3c9e5f7b2d4'
+down_revision = 'f4b8d2c6e1a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'idx_list_duplicate_vector_hash',
+        'list_duplicate_entry',
+        ['vector_hash'],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_list_duplicate_vector_hash', table_name='list_duplicate_entry', if_exists=True)
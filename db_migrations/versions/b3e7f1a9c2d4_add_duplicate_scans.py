@@ -0,0 +1,78 @@
+"""add account-wide duplicate scans
+
+Revision ID: b3e7f1a9c2d4
+Revises: 9a4c6e2b8d15
+Create Date: 2026-10-18 13:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b3e7f1a9c2d4'
+down_revision = '9a4c6e2b8d15'
+branch_labels = None
+depends_on = None
+
+
+def _tables() -> set[str]:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    return set(inspector.get_table_names())
+
+
+def upgrade() -> None:
+    tables = _tables()
+    if 'duplicate_scan' not in tables:
+        op.create_table(
+            'duplicate_scan',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('cursor_type', sa.String(length=30), nullable=True),
+            sa.Column('cursor_id', sa.Integer(), nullable=True),
+            sa.Column('items_total', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('items_scanned', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('matches_found', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('idx_duplicate_scan_user_status', 'duplicate_scan', ['user_id', 'status'], unique=False)
+    if 'duplicate_match' not in tables:
+        op.create_table(
+            'duplicate_match',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('scan_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('source_type', sa.String(length=30), nullable=False),
+            sa.Column('source_id', sa.Integer(), nullable=False),
+            sa.Column('source_text', sa.String(length=300), nullable=True),
+            sa.Column('target_type', sa.String(length=30), nullable=False),
+            sa.Column('target_id', sa.Integer(), nullable=False),
+            sa.Column('target_text', sa.String(length=300), nullable=True),
+            sa.Column('similarity', sa.Float(), nullable=False),
+            sa.Column('method', sa.String(length=10), nullable=False),
+            sa.ForeignKeyConstraint(['scan_id'], ['duplicate_scan.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index(
+            'idx_duplicate_match_scan_similarity',
+            'duplicate_match',
+            ['scan_id', 'similarity'],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    tables = _tables()
+    if 'duplicate_match' in tables:
+        op.drop_index('idx_duplicate_match_scan_similarity', table_name='duplicate_match')
+        op.drop_table('duplicate_match')
+    if 'duplicate_scan' in tables:
+        op.drop_index('idx_duplicate_scan_user_status', table_name='duplicate_scan')
+        op.drop_table('duplicate_scan')
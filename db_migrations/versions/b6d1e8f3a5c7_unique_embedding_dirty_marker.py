@@ -0,0 +1,39 @@
+"""make embedding_dirty_marker unique per entity
+
+Revision ID: b6d1e8f3a5c7
+Revises: a3c9e5f7b2d4
+Create Date: 2026-10-19 11:00:00.000000
+"""
+
+from alembic import op
+
+
+revision = 'b6d1e8f3a5c7'
+down_revision = 'a3c9e5f7b2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM embedding_dirty_marker
+        WHERE id NOT IN (
+            SELECT keep_id FROM (
+                SELECT MAX(id) AS keep_id FROM embedding_dirty_marker
+                GROUP BY user_id, entity_type, entity_id
+            ) AS newest
+        )
+        """
+    )
+    op.create_index(
+        'uniq_embedding_dirty_entity',
+        'embedding_dirty_marker',
+        ['user_id', 'entity_type', 'entity_id'],
+        unique=True,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uniq_embedding_dirty_entity', table_name='embedding_dirty_marker', if_exists=True)
@@ -0,0 +1,52 @@
+"""add full-text search index
+
+Revision ID: c5d2e8f4a6b0
+Revises: b3e7f1a9c2d4
+Create Date: 2026-10-18 14:00:00.000000
+"""
+
+from alembic import op
+
+
+revision = 'c5d2e8f4a6b0'
+down_revision = 'b3e7f1a9c2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Mirrors backend/search_index.create_search_index_ddl; the app backfills an
+    # empty index on its next start.
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+            "title, body, owner, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif dialect == 'postgresql':
+        op.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_document (
+                doc_id BIGINT PRIMARY KEY,
+                entity_type VARCHAR(30) NOT NULL,
+                entity_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                title TEXT NOT NULL DEFAULT '',
+                body TEXT NOT NULL DEFAULT '',
+                tsv TSVECTOR GENERATED ALWAYS AS (
+                    setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+                    || setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+                ) STORED
+            )
+            """
+        )
+        op.execute('CREATE INDEX IF NOT EXISTS idx_search_document_tsv ON search_document USING GIN (tsv)')
+        op.execute('CREATE INDEX IF NOT EXISTS idx_search_document_user_type ON search_document (user_id, entity_type)')
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS search_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP TABLE IF EXISTS search_document')
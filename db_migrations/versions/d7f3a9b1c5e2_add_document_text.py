@@ -0,0 +1,41 @@
+"""add extracted vault document text
+
+Revision ID: d7f3a9b1c5e2
+Revises: c5d2e8f4a6b0
+Create Date: 2026-10-18 15:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'd7f3a9b1c5e2'
+down_revision = 'c5d2e8f4a6b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if 'document_text' in set(inspector.get_table_names()):
+        return
+    op.create_table(
+        'document_text',
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('stored_filename', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('truncated', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('error', sa.String(length=300), nullable=True),
+        sa.Column('extracted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['document.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('document_id'),
+    )
+    op.create_index('ix_document_text_user_id', 'document_text', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_text_user_id', table_name='document_text')
+    op.drop_table('document_text')
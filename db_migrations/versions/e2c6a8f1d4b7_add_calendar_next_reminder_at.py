@@ -0,0 +1,94 @@
+"""add calendar_event.next_reminder_at
+
+Revision ID: e2c6a8f1d4b7
+Revises: d7f3a9b1c5e2
+Create Date: 2026-10-18 18:00:00.000000
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from alembic import op
+import pytz
+import sqlalchemy as sa
+
+
+revision = 'e2c6a8f1d4b7'
+down_revision = 'd7f3a9b1c5e2'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def _columns(table_name: str) -> set[str]:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    return {c['name'] for c in inspector.get_columns(table_name)}
+
+
+def _backfill_pending_reminders() -> None:
+    """Pending reminders of upcoming entries get their fire time (naive UTC) in next_reminder_at."""
+    bind = op.get_bind()
+    tz = pytz.timezone(os.environ.get('DEFAULT_TIMEZONE', 'America/New_York'))
+    now = datetime.utcnow()
+    calendar_event = sa.table(
+        'calendar_event',
+        sa.column('id', sa.Integer()),
+        sa.column('day', sa.Date()),
+        sa.column('start_time', sa.Time()),
+        sa.column('reminder_minutes_before', sa.Integer()),
+        sa.column('reminder_sent', sa.Boolean()),
+        sa.column('status', sa.String()),
+        sa.column('next_reminder_at', sa.DateTime()),
+    )
+    pending = sa.and_(
+        calendar_event.c.reminder_minutes_before.isnot(None),
+        calendar_event.c.start_time.isnot(None),
+        sa.or_(calendar_event.c.reminder_sent.is_(None), calendar_event.c.reminder_sent == sa.false()),
+        calendar_event.c.status.notin_(['done', 'canceled']),
+        calendar_event.c.day >= now.date(),
+    )
+    update_sql = (
+        sa.update(calendar_event)
+        .where(calendar_event.c.id == sa.bindparam('row_id'))
+        .values(next_reminder_at=sa.bindparam('due'))
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(
+                calendar_event.c.id,
+                calendar_event.c.day,
+                calendar_event.c.start_time,
+                calendar_event.c.reminder_minutes_before,
+            )
+            .where(pending, calendar_event.c.id > last_id)
+            .order_by(calendar_event.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, day, start_time, minutes_before in rows:
+            last_id = row_id
+            local = tz.localize(datetime.combine(day, start_time))
+            due = local.astimezone(pytz.UTC).replace(tzinfo=None) - timedelta(minutes=minutes_before)
+            if due > now:
+                updates.append({'row_id': row_id, 'due': due})
+        if updates:
+            bind.execute(update_sql, updates)
+
+
+def upgrade() -> None:
+    if 'next_reminder_at' not in _columns('calendar_event'):
+        op.add_column('calendar_event', sa.Column('next_reminder_at', sa.DateTime(), nullable=True))
+        _backfill_pending_reminders()
+    op.create_index('idx_calendar_event_next_reminder', 'calendar_event', ['next_reminder_at'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    if 'next_reminder_at' in _columns('calendar_event'):
+        op.drop_index('idx_calendar_event_next_reminder', table_name='calendar_event', if_exists=True)
+        with op.batch_alter_table('calendar_event') as batch_op:
+            batch_op.drop_column('next_reminder_at')
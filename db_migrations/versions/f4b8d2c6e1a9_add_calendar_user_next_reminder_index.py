@@ -0,0 +1,27 @@
+"""add calendar_event (user_id, next_reminder_at) index
+
+Revision ID: f4b8d2c6e1a9
+Revises: e2c6a8f1d4b7
+Create Date: 2026-10-18 20:00:00.000000
+"""
+
+from alembic import op
+
+
+revision = 'f4b8d2c6e1a9'
+down_revision = 'e2c6a8f1d4b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'idx_calendar_event_user_next_reminder',
+        'calendar_event',
+        ['user_id', 'next_reminder_at'],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_calendar_event_user_next_reminder', table_name='calendar_event', if_exists=True)
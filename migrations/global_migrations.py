@@ -16,6 +16,7 @@ Idempotent updates:
 """
 import sqlite3
 from pathlib import Path
+from migrations.migrate import backfill_next_reminder_at
 from migrations.migration_utils import add_column, table_exists
 
 DB_PATH = Path("instance") / "todo.db"
@@ -273,6 +274,10 @@ def ensure_calendar_event(cur):
             "CREATE INDEX IF NOT EXISTS idx_calendar_event_external "
             "ON calendar_event(user_id, external_source, external_id)"
         )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_calendar_event_user_next_reminder "
+            "ON calendar_event(user_id, next_reminder_at)"
+        )
         print("[add] calendar_event table created")
         return
 
@@ -289,6 +294,7 @@ def ensure_calendar_event(cur):
     add_column(cur, "calendar_event", "reminder_job_id", "VARCHAR(255)")
     add_column(cur, "calendar_event", "reminder_sent", "BOOLEAN DEFAULT 0")
     add_column(cur, "calendar_event", "reminder_snoozed_until", "TIMESTAMP")
+    add_column(cur, "calendar_event", "next_reminder_at", "TIMESTAMP")
     add_column(cur, "calendar_event", "rollover_enabled", "BOOLEAN DEFAULT 1")
     add_column(cur, "calendar_event", "rolled_from_id", "INTEGER")
     add_column(cur, "calendar_event", "recurrence_id", "INTEGER")
@@ -312,6 +318,12 @@ def ensure_calendar_event(cur):
         "CREATE INDEX IF NOT EXISTS idx_calendar_event_external "
         "ON calendar_event(user_id, external_source, external_id)"
     )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_calendar_event_next_reminder ON calendar_event(next_reminder_at)")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_calendar_event_user_next_reminder "
+        "ON calendar_event(user_id, next_reminder_at)"
+    )
+    backfill_next_reminder_at(cur)
 
 
 def ensure_teamwork_ignored_task(cur):
@@ -353,7 +365,10 @@ def ensure_embedding_table(cur):
                 user_id INTEGER NOT NULL,
                 entity_type VARCHAR(30) NOT NULL,
                 entity_id INTEGER NOT NULL,
+                vector_id INTEGER,
                 embedding_json TEXT,
+                embedding_blob BLOB,
+                embedding_dtype VARCHAR(10),
                 embedding_dim INTEGER,
                 source_hash VARCHAR(64),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -371,6 +386,9 @@ def ensure_embedding_table(cur):
     add_column(cur, "embedding_record", "entity_type", "VARCHAR(30)")
     add_column(cur, "embedding_record", "entity_id", "INTEGER")
     add_column(cur, "embedding_record", "embedding_json", "TEXT")
+    add_column(cur, "embedding_record", "embedding_blob", "BLOB")
+    add_column(cur, "embedding_record", "embedding_dtype", "VARCHAR(10)")
+    add_column(cur, "embedding_record", "vector_id", "INTEGER")
     add_column(cur, "embedding_record", "embedding_dim", "INTEGER")
     add_column(cur, "embedding_record", "source_hash", "VARCHAR(64)")
     add_column(cur, "embedding_record", "created_at", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
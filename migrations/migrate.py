@@ -21,8 +21,16 @@ Creates/aligns all core tables to the current models:
 The script is idempotent: it only adds missing tables/columns and backfills
 order indexes and legacy statuses.
 """
+import hashlib
+import json
+import os
 import sqlite3
+from datetime import datetime, timedelta
 from pathlib import Path
+
+import numpy as np
+import pytz
+
 from migrations.migration_utils import add_column, table_exists
 
 DB_PATH = Path("instance") / "todo.db"
@@ -701,6 +709,7 @@ def ensure_calendar_event_table(cur):
                 reminder_job_id VARCHAR(255),
                 reminder_sent BOOLEAN DEFAULT 0,
                 reminder_snoozed_until TIMESTAMP,
+                next_reminder_at TIMESTAMP,
                 rollover_enabled BOOLEAN DEFAULT 1,
                 rolled_from_id INTEGER,
                 todo_item_id INTEGER,
@@ -723,6 +732,11 @@ def ensure_calendar_event_table(cur):
             "CREATE INDEX IF NOT EXISTS idx_calendar_event_external "
             "ON calendar_event(user_id, external_source, external_id)"
         )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_calendar_event_next_reminder ON calendar_event(next_reminder_at)")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_calendar_event_user_next_reminder "
+            "ON calendar_event(user_id, next_reminder_at)"
+        )
         print("[add] calendar_event table created")
         return
 
@@ -739,6 +753,7 @@ def ensure_calendar_event_table(cur):
     add_column(cur, "calendar_event", "reminder_job_id", "VARCHAR(255)")
     add_column(cur, "calendar_event", "reminder_sent", "BOOLEAN DEFAULT 0")
     add_column(cur, "calendar_event", "reminder_snoozed_until", "TIMESTAMP")
+    add_column(cur, "calendar_event", "next_reminder_at", "TIMESTAMP")
     add_column(cur, "calendar_event", "rollover_enabled", "BOOLEAN DEFAULT 1")
     add_column(cur, "calendar_event", "rolled_from_id", "INTEGER")
     add_column(cur, "calendar_event", "recurrence_id", "INTEGER")
@@ -762,6 +777,44 @@ def ensure_calendar_event_table(cur):
         "CREATE INDEX IF NOT EXISTS idx_calendar_event_external "
         "ON calendar_event(user_id, external_source, external_id)"
     )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_calendar_event_next_reminder ON calendar_event(next_reminder_at)")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_calendar_event_user_next_reminder "
+        "ON calendar_event(user_id, next_reminder_at)"
+    )
+
+
+def backfill_next_reminder_at(cur, batch_size=500):
+    """Give pending reminders of upcoming entries a next_reminder_at (naive UTC) for the reminder dispatcher."""
+    tz = pytz.timezone(os.environ.get("DEFAULT_TIMEZONE", "America/New_York"))
+    now = datetime.utcnow()
+    scheduled = 0
+    last_id = 0
+    while True:
+        cur.execute(
+            "SELECT id, day, start_time, reminder_minutes_before FROM calendar_event "
+            "WHERE next_reminder_at IS NULL AND reminder_minutes_before IS NOT NULL AND start_time IS NOT NULL "
+            "AND (reminder_sent IS NULL OR reminder_sent = 0) AND status NOT IN ('done', 'canceled') "
+            "AND day >= ? AND id > ? ORDER BY id LIMIT ?",
+            (now.date().isoformat(), last_id, batch_size),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, day, start_time, minutes_before in rows:
+            last_id = row_id
+            try:
+                local = datetime.fromisoformat(f"{day} {start_time}")
+            except (TypeError, ValueError):
+                continue
+            due = tz.localize(local).astimezone(pytz.UTC).replace(tzinfo=None) - timedelta(minutes=minutes_before)
+            if due > now:
+                updates.append((due.strftime("%Y-%m-%d %H:%M:%S.%f"), row_id))
+        cur.executemany("UPDATE calendar_event SET next_reminder_at = ? WHERE id = ?", updates)
+        scheduled += len(updates)
+    if scheduled:
+        print(f"[update] scheduled {scheduled} calendar reminders")
 
 
 def ensure_teamwork_ignored_task_table(cur):
@@ -1169,7 +1222,10 @@ def ensure_embedding_table(cur):
                 user_id INTEGER NOT NULL,
                 entity_type VARCHAR(30) NOT NULL,
                 entity_id INTEGER NOT NULL,
+                vector_id INTEGER,
                 embedding_json TEXT,
+                embedding_blob BLOB,
+                embedding_dtype VARCHAR(10),
                 embedding_dim INTEGER,
                 source_hash VARCHAR(64),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -1181,12 +1237,16 @@ def ensure_embedding_table(cur):
             "CREATE UNIQUE INDEX IF NOT EXISTS idx_embedding_unique "
             "ON embedding_record(user_id, entity_type, entity_id)"
         )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_embedding_record_vector ON embedding_record(vector_id)")
         print("[add] embedding_record table created")
         return
     add_column(cur, "embedding_record", "user_id", "INTEGER")
     add_column(cur, "embedding_record", "entity_type", "VARCHAR(30)")
     add_column(cur, "embedding_record", "entity_id", "INTEGER")
     add_column(cur, "embedding_record", "embedding_json", "TEXT")
+    add_column(cur, "embedding_record", "embedding_blob", "BLOB")
+    add_column(cur, "embedding_record", "embedding_dtype", "VARCHAR(10)")
+    add_column(cur, "embedding_record", "vector_id", "INTEGER")
     add_column(cur, "embedding_record", "embedding_dim", "INTEGER")
     add_column(cur, "embedding_record", "source_hash", "VARCHAR(64)")
     add_column(cur, "embedding_record", "created_at", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
@@ -1195,6 +1255,243 @@ def ensure_embedding_table(cur):
         "CREATE UNIQUE INDEX IF NOT EXISTS idx_embedding_unique "
         "ON embedding_record(user_id, entity_type, entity_id)"
     )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_embedding_record_vector ON embedding_record(vector_id)")
+
+
+def pack_legacy_embeddings(cur, batch_size=500):
+    """Convert JSON-encoded embedding vectors into packed little-endian float32 blobs."""
+    converted = 0
+    last_id = 0
+    while True:
+        cur.execute(
+            "SELECT id, embedding_json FROM embedding_record "
+            "WHERE embedding_blob IS NULL AND embedding_json IS NOT NULL AND id > ? "
+            "ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, raw in rows:
+            last_id = row_id
+            try:
+                values = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(values, list) or not values:
+                continue
+            updates.append((np.asarray(values, dtype="<f4").tobytes(), len(values), row_id))
+        cur.executemany(
+            "UPDATE embedding_record SET embedding_blob = ?, embedding_dtype = 'float32', "
+            "embedding_dim = ?, embedding_json = NULL WHERE id = ?",
+            updates,
+        )
+        converted += len(updates)
+    if converted:
+        print(f"[update] packed {converted} embedding_record vectors")
+
+
+def ensure_embedding_vector_table(cur):
+    """Create the content-addressed vector store shared by embedding records."""
+    if not table_exists(cur, "embedding_vector"):
+        cur.execute(
+            """
+            CREATE TABLE embedding_vector (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                content_hash VARCHAR(64) NOT NULL,
+                model_name VARCHAR(100) NOT NULL,
+                embedding_blob BLOB NOT NULL,
+                embedding_dtype VARCHAR(10) NOT NULL DEFAULT 'float32',
+                embedding_dim INTEGER NOT NULL,
+                ref_count INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        print("[add] embedding_vector table created")
+    else:
+        print("[ok] embedding_vector table exists")
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uniq_embedding_vector_content "
+        "ON embedding_vector(content_hash, model_name)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_embedding_vector_gc ON embedding_vector(ref_count, last_used_at)"
+    )
+
+
+def share_inline_embeddings(cur):
+    """Move per-record vector blobs into embedding_vector so identical text shares one row."""
+    model_name = os.environ.get("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+    cur.execute(
+        "SELECT id, source_hash, embedding_blob, embedding_dtype FROM embedding_record "
+        "WHERE vector_id IS NULL AND embedding_blob IS NOT NULL"
+    )
+    rows = cur.fetchall()
+    for row_id, source_hash, blob, dtype_name in rows:
+        dtype_name = dtype_name or "float32"
+        content_hash = source_hash or hashlib.sha256(blob).hexdigest()
+        cur.execute(
+            "INSERT OR IGNORE INTO embedding_vector "
+            "(content_hash, model_name, embedding_blob, embedding_dtype, embedding_dim, ref_count) "
+            "VALUES (?, ?, ?, ?, ?, 0)",
+            (content_hash, model_name, blob, dtype_name, len(blob) // (2 if dtype_name == "float16" else 4)),
+        )
+        cur.execute(
+            "UPDATE embedding_record SET vector_id = "
+            "(SELECT id FROM embedding_vector WHERE content_hash = ? AND model_name = ?), "
+            "embedding_blob = NULL, embedding_dtype = NULL WHERE id = ?",
+            (content_hash, model_name, row_id),
+        )
+    cur.execute(
+        "UPDATE embedding_vector SET ref_count = "
+        "(SELECT COUNT(*) FROM embedding_record WHERE embedding_record.vector_id = embedding_vector.id)"
+    )
+    if rows:
+        print(f"[update] moved {len(rows)} embedding_record vectors into embedding_vector")
+
+
+def ensure_embedding_dirty_marker_table(cur):
+    """Create the queue of entities whose embeddings need a background refresh."""
+    if not table_exists(cur, "embedding_dirty_marker"):
+        cur.execute(
+            """
+            CREATE TABLE embedding_dirty_marker (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                entity_type VARCHAR(30) NOT NULL,
+                entity_id INTEGER NOT NULL,
+                marked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES user(id)
+            )
+            """
+        )
+        print("[add] embedding_dirty_marker table created")
+    else:
+        print("[ok] embedding_dirty_marker table exists")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_embedding_dirty_user_type "
+        "ON embedding_dirty_marker(user_id, entity_type)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_embedding_dirty_marked_at ON embedding_dirty_marker(marked_at)"
+    )
+    # One marker per entity; keep the newest of any duplicates queued before the unique index.
+    cur.execute(
+        """
+        DELETE FROM embedding_dirty_marker
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM embedding_dirty_marker GROUP BY user_id, entity_type, entity_id
+        )
+        """
+    )
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uniq_embedding_dirty_entity "
+        "ON embedding_dirty_marker(user_id, entity_type, entity_id)"
+    )
+
+
+def ensure_list_duplicate_entry_table(cur):
+    """Create the persisted per-item duplicate signatures for note lists and area list blocks."""
+    if not table_exists(cur, "list_duplicate_entry"):
+        cur.execute(
+            """
+            CREATE TABLE list_duplicate_entry (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                list_kind VARCHAR(10) NOT NULL,
+                list_id INTEGER NOT NULL,
+                item_id INTEGER NOT NULL,
+                source_hash VARCHAR(64) NOT NULL,
+                normalized_text TEXT NOT NULL,
+                token_signature TEXT NOT NULL,
+                vector_hash VARCHAR(64) NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES user(id),
+                CONSTRAINT uniq_list_duplicate_item UNIQUE (list_kind, item_id)
+            )
+            """
+        )
+        print("[add] list_duplicate_entry table created")
+    else:
+        print("[ok] list_duplicate_entry table exists")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_list_duplicate_list ON list_duplicate_entry(list_kind, list_id)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_list_duplicate_vector_hash ON list_duplicate_entry(vector_hash)"
+    )
+
+
+def ensure_duplicate_scan_tables(cur):
+    """Create the account-wide duplicate scan state and its results."""
+    if not table_exists(cur, "duplicate_scan"):
+        cur.execute(
+            """
+            CREATE TABLE duplicate_scan (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                cursor_type VARCHAR(30),
+                cursor_id INTEGER,
+                items_total INTEGER NOT NULL DEFAULT 0,
+                items_scanned INTEGER NOT NULL DEFAULT 0,
+                matches_found INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES user(id)
+            )
+            """
+        )
+        print("[add] duplicate_scan table created")
+    else:
+        print("[ok] duplicate_scan table exists")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_duplicate_scan_user_status ON duplicate_scan(user_id, status)")
+    if not table_exists(cur, "duplicate_match"):
+        cur.execute(
+            """
+            CREATE TABLE duplicate_match (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                source_type VARCHAR(30) NOT NULL,
+                source_id INTEGER NOT NULL,
+                source_text VARCHAR(300),
+                target_type VARCHAR(30) NOT NULL,
+                target_id INTEGER NOT NULL,
+                target_text VARCHAR(300),
+                similarity FLOAT NOT NULL,
+                method VARCHAR(10) NOT NULL,
+                FOREIGN KEY (scan_id) REFERENCES duplicate_scan(id) ON DELETE CASCADE,
+                FOREIGN KEY (user_id) REFERENCES user(id)
+            )
+            """
+        )
+        print("[add] duplicate_match table created")
+    else:
+        print("[ok] duplicate_match table exists")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_duplicate_match_scan_similarity ON duplicate_match(scan_id, similarity)"
+    )
+
+
+def ensure_search_fts_table(cur):
+    """Create the FTS5 search index; the app backfills it on its next start while empty."""
+    if table_exists(cur, "search_fts"):
+        print("[ok] search_fts table exists")
+        return
+    try:
+        cur.execute(
+            "CREATE VIRTUAL TABLE search_fts USING fts5("
+            "title, body, owner, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        print("[add] search_fts table created")
+    except sqlite3.OperationalError as exc:
+        print(f"[skip] search_fts not created ({exc}); searches fall back to LIKE")
 
 
 def ensure_notification_tables(cur):
@@ -1331,6 +1628,31 @@ def ensure_document_folder_table(cur):
     )
 
 
+def ensure_document_text_table(cur):
+    """Create the extracted-text store for vault documents."""
+    if not table_exists(cur, "document_text"):
+        cur.execute(
+            """
+            CREATE TABLE document_text (
+                document_id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                stored_filename VARCHAR(255) NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                content TEXT,
+                truncated BOOLEAN NOT NULL DEFAULT 0,
+                error VARCHAR(300),
+                extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (document_id) REFERENCES document(id) ON DELETE CASCADE,
+                FOREIGN KEY (user_id) REFERENCES user(id)
+            )
+            """
+        )
+        print("[add] document_text table created")
+    else:
+        print("[ok] document_text table exists")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_document_text_user_id ON document_text(user_id)")
+
+
 def ensure_document_table(cur):
     """Create or align the document table for the vault."""
     if not table_exists(cur, "document"):
@@ -1433,6 +1755,7 @@ def main():
         ensure_area_block_table(cur)
         ensure_area_block_item_table(cur)
         ensure_calendar_event_table(cur)
+        backfill_next_reminder_at(cur)
         ensure_teamwork_ignored_task_table(cur)
         ensure_recurring_event_table(cur)
         ensure_recurrence_exception_table(cur)
@@ -1446,10 +1769,18 @@ def main():
         ensure_planner_multi_line_table(cur)
         backfill_do_feed_scheduled_date_from_planner_bridge(cur)
         ensure_embedding_table(cur)
+        pack_legacy_embeddings(cur)
+        ensure_embedding_vector_table(cur)
+        share_inline_embeddings(cur)
+        ensure_embedding_dirty_marker_table(cur)
+        ensure_list_duplicate_entry_table(cur)
+        ensure_duplicate_scan_tables(cur)
+        ensure_search_fts_table(cur)
         ensure_notification_tables(cur)
         ensure_job_lock_table(cur)
         ensure_document_folder_table(cur)
         ensure_document_table(cur)
+        ensure_document_text_table(cur)
         ensure_note_image_table(cur)
         conn.commit()
         print("Baseline migration complete.")
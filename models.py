@@ -894,6 +894,7 @@ class CalendarEvent(db.Model):
     reminder_job_id = db.Column(db.String(255), nullable=True)
     reminder_sent = db.Column(db.Boolean, default=False)
     reminder_snoozed_until = db.Column(db.DateTime, nullable=True)
+    next_reminder_at = db.Column(db.DateTime, nullable=True)  # naive UTC; NULL when nothing is pending
     rollover_enabled = db.Column(db.Boolean, default=False)
     # Rollover copies keep the source id for audit/idempotency even after the
     # original row is deleted, so this must not be a strict foreign key.
@@ -927,6 +928,8 @@ class CalendarEvent(db.Model):
 
     __table_args__ = (
         db.Index('idx_calendar_event_external', 'user_id', 'external_source', 'external_id'),
+        db.Index('idx_calendar_event_next_reminder', 'next_reminder_at'),
+        db.Index('idx_calendar_event_user_next_reminder', 'user_id', 'next_reminder_at'),
     )
 
     def is_phase_header(self):
@@ -1320,36 +1323,163 @@ class PlannerMultiLine(db.Model):
         }
 
 
+class EmbeddingVector(db.Model):
+    """Content-addressed embedding vectors shared by every record with identical source text."""
+    __tablename__ = 'embedding_vector'
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'model_name', name='uniq_embedding_vector_content'),
+        db.Index('idx_embedding_vector_gc', 'ref_count', 'last_used_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)  # sha256 of the normalized source text
+    model_name = db.Column(db.String(100), nullable=False)
+    embedding_blob = db.Column(db.LargeBinary, nullable=False)  # Packed little-endian float32/float16
+    embedding_dtype = db.Column(db.String(10), nullable=False, default='float32')
+    embedding_dim = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class EmbeddingRecord(db.Model):
     """Stored embeddings for semantic search across app entities."""
     __tablename__ = 'embedding_record'
     __table_args__ = (
         db.UniqueConstraint('user_id', 'entity_type', 'entity_id', name='uniq_embedding_entity'),
+        db.Index('idx_embedding_record_vector', 'vector_id'),
     )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     entity_type = db.Column(db.String(30), nullable=False)
     entity_id = db.Column(db.Integer, nullable=False)
-    embedding_json = db.Column(db.Text, nullable=True)
+    vector_id = db.Column(db.Integer, db.ForeignKey('embedding_vector.id'), nullable=True)
+    embedding_json = db.Column(db.Text, nullable=True)  # Legacy JSON storage, migrated to embedding_vector
+    embedding_blob = db.Column(db.LargeBinary, nullable=True)  # Legacy inline blob, migrated to embedding_vector
+    embedding_dtype = db.Column(db.String(10), nullable=True)  # 'float32' | 'float16'
     embedding_dim = db.Column(db.Integer, nullable=True)
     source_hash = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    vector = db.relationship('EmbeddingVector')
+
     def to_dict(self):
         return {
             'id': self.id,
             'user_id': self.user_id,
             'entity_type': self.entity_type,
             'entity_id': self.entity_id,
+            'vector_id': self.vector_id,
             'embedding_dim': self.embedding_dim,
+            'embedding_dtype': self.embedding_dtype,
             'source_hash': self.source_hash,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
 
 
+class EmbeddingDirtyMarker(db.Model):
+    """Entities whose stored embedding may be out of date; drained by the background refresher."""
+    __tablename__ = 'embedding_dirty_marker'
+    __table_args__ = (
+        db.Index('idx_embedding_dirty_user_type', 'user_id', 'entity_type'),
+        db.Index('idx_embedding_dirty_marked_at', 'marked_at'),
+        db.Index('uniq_embedding_dirty_entity', 'user_id', 'entity_type', 'entity_id', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    entity_type = db.Column(db.String(30), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    marked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ListDuplicateEntry(db.Model):
+    """Per-item duplicate-detection signature for note lists and area list blocks."""
+    __tablename__ = 'list_duplicate_entry'
+    __table_args__ = (
+        db.UniqueConstraint('list_kind', 'item_id', name='uniq_list_duplicate_item'),
+        db.Index('idx_list_duplicate_list', 'list_kind', 'list_id'),
+        db.Index('idx_list_duplicate_vector_hash', 'vector_hash'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    list_kind = db.Column(db.String(10), nullable=False)  # 'note' or 'area'
+    list_id = db.Column(db.Integer, nullable=False)  # note.id or area_block.id
+    item_id = db.Column(db.Integer, nullable=False)
+    source_hash = db.Column(db.String(64), nullable=False)  # sha256 of the raw preview text
+    normalized_text = db.Column(db.Text, nullable=False)
+    token_signature = db.Column(db.Text, nullable=False)  # space-joined similarity tokens
+    vector_hash = db.Column(db.String(64), nullable=False)  # embedding_vector.content_hash of normalized_text
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DuplicateScan(db.Model):
+    """One account-wide duplicate scan; cursor_type/cursor_id mark the last scanned row."""
+    __tablename__ = 'duplicate_scan'
+    __table_args__ = (
+        db.Index('idx_duplicate_scan_user_status', 'user_id', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending|running|done|failed
+    cursor_type = db.Column(db.String(30), nullable=True)
+    cursor_id = db.Column(db.Integer, nullable=True)
+    items_total = db.Column(db.Integer, nullable=False, default=0)
+    items_scanned = db.Column(db.Integer, nullable=False, default=0)
+    matches_found = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'items_total': self.items_total or 0,
+            'items_scanned': self.items_scanned or 0,
+            'matches_found': self.matches_found or 0,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class DuplicateMatch(db.Model):
+    """A near-duplicate pair found by an account-wide duplicate scan."""
+    __tablename__ = 'duplicate_match'
+    __table_args__ = (
+        db.Index('idx_duplicate_match_scan_similarity', 'scan_id', 'similarity'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    scan_id = db.Column(db.Integer, db.ForeignKey('duplicate_scan.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    source_type = db.Column(db.String(30), nullable=False)
+    source_id = db.Column(db.Integer, nullable=False)
+    source_text = db.Column(db.String(300), nullable=True)
+    target_type = db.Column(db.String(30), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    target_text = db.Column(db.String(300), nullable=True)
+    similarity = db.Column(db.Float, nullable=False)
+    method = db.Column(db.String(10), nullable=False)  # exact|lexical|vector
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'similarity': self.similarity,
+            'method': self.method,
+            'source': {'type': self.source_type, 'id': self.source_id, 'text': self.source_text},
+            'target': {'type': self.target_type, 'id': self.target_id, 'text': self.target_text},
+        }
+
+
 class QuickAccessItem(db.Model):
     """User's quick access pinned items."""
     id = db.Column(db.Integer, primary_key=True)
@@ -1494,3 +1624,17 @@ class Document(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
+
+
+class DocumentText(db.Model):
+    """Plain text extracted from a vault document's file, feeding full-text search."""
+    __tablename__ = 'document_text'
+
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    stored_filename = db.Column(db.String(255), nullable=False)  # file the text came from
+    status = db.Column(db.String(20), nullable=False)  # done|empty|too_large|error
+    content = db.Column(db.Text, nullable=True)
+    truncated = db.Column(db.Boolean, default=False, nullable=False)
+    error = db.Column(db.String(300), nullable=True)
+    extracted_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -18,6 +18,7 @@ os.environ.setdefault("BOOTSTRAP_JOBS_ON_IMPORT", "0")
 
 from app import app
 from models import User
+from backend.ai_embeddings import DEFAULT_BATCH_MAX_INPUTS, DEFAULT_BATCH_MAX_TOKENS
 from backend.embedding_service import (
     ENTITY_BOOKMARK,
     ENTITY_CALENDAR,
@@ -27,27 +28,51 @@ from backend.embedding_service import (
     ensure_embeddings_for_type,
 )
 
+ENTITY_TYPES = (ENTITY_RECALL, ENTITY_BOOKMARK, ENTITY_TODO_ITEM, ENTITY_TODO_LIST, ENTITY_CALENDAR)
 
-def backfill_for_user(user_id: int, max_per_type: int) -> None:
-    ensure_embeddings_for_type(user_id, ENTITY_RECALL, max_new=max_per_type)
-    ensure_embeddings_for_type(user_id, ENTITY_BOOKMARK, max_new=max_per_type)
-    ensure_embeddings_for_type(user_id, ENTITY_TODO_ITEM, max_new=max_per_type)
-    ensure_embeddings_for_type(user_id, ENTITY_TODO_LIST, max_new=max_per_type)
-    ensure_embeddings_for_type(user_id, ENTITY_CALENDAR, max_new=max_per_type)
+
+def backfill_for_user(
+    user_id: int,
+    max_per_type: int,
+    batch_tokens: int = DEFAULT_BATCH_MAX_TOKENS,
+    batch_size: int = DEFAULT_BATCH_MAX_INPUTS,
+) -> None:
+    for entity_type in ENTITY_TYPES:
+        written = ensure_embeddings_for_type(
+            user_id,
+            entity_type,
+            max_new=max_per_type,
+            max_tokens=batch_tokens,
+            max_inputs=batch_size,
+        )
+        if written:
+            print(f"[user {user_id}] {entity_type}: {written} embeddings written")
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Backfill semantic embeddings for app content.")
     parser.add_argument("--user-id", type=int, default=None, help="Limit backfill to a specific user")
     parser.add_argument("--max-per-type", type=int, default=5000, help="Max new embeddings per entity type")
+    parser.add_argument(
+        "--batch-tokens",
+        type=int,
+        default=DEFAULT_BATCH_MAX_TOKENS,
+        help="Estimated token budget per embedding request",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_MAX_INPUTS,
+        help="Max inputs per embedding request",
+    )
     args = parser.parse_args()
 
     with app.app_context():
         if args.user_id:
-            backfill_for_user(args.user_id, args.max_per_type)
+            backfill_for_user(args.user_id, args.max_per_type, args.batch_tokens, args.batch_size)
             return
         for user in User.query.all():
-            backfill_for_user(user.id, args.max_per_type)
+            backfill_for_user(user.id, args.max_per_type, args.batch_tokens, args.batch_size)
 
 
 if __name__ == "__main__":
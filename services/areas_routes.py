@@ -1945,6 +1945,8 @@ def area_list_block_items(block_id):
     )
     block.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
     a.db.session.add(item)
+    a.db.session.flush()
+    _update_area_list_duplicate_entries(a, user, block, [item])
     a.db.session.commit()
     return a.jsonify(_area_list_item_to_note_dict(item)), 201
 
@@ -1961,6 +1963,7 @@ def area_list_block_item_detail(block_id, item_id):
         if item.item_type == 'section':
             _promote_area_subsections_after_section_delete(a, user, block.id, item.id)
         a.db.session.delete(item)
+        a.remove_list_duplicate_entries(a.LIST_KIND_AREA, [item_id], commit=False)
         _reindex_area_block_items(a, block.id)
         block.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
         a.db.session.commit()
@@ -2007,6 +2010,7 @@ def area_list_block_item_detail(block_id, item_id):
         requested_checked = _parse_bool(data.get('checked'))
         if requested_checked and _normalize_area_list_mode(block.list_mode) == 'revolving' and item.item_type == 'item':
             a.db.session.delete(item)
+            a.remove_list_duplicate_entries(a.LIST_KIND_AREA, [item_id], commit=False)
             _reindex_area_block_items(a, block.id)
             block.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
             a.db.session.commit()
@@ -2029,6 +2033,8 @@ def area_list_block_item_detail(block_id, item_id):
             ordered_ids.insert(insert_index, item.id)
             for index, ordered_id in enumerate(ordered_ids, start=1):
                 item_map[ordered_id].order_index = index
+    if 'text' in data or 'link_text' in data:
+        _update_area_list_duplicate_entries(a, user, block, [item])
     block.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
     a.db.session.commit()
     return a.jsonify(_area_list_item_to_note_dict(item))
@@ -2072,6 +2078,29 @@ def reorder_area_list_block_items(block_id):
     return a.jsonify({'status': 'ok'})
 
 
+def _area_list_duplicate_preview(item):
+    return type('AreaListDuplicateItem', (), {
+        'id': item.id,
+        'text': _area_list_full_text(item),
+        'note': item.note,
+        'link_text': item.link_text,
+        'link_url': item.link_url,
+        'order_index': item.order_index or 0,
+    })()
+
+
+def _update_area_list_duplicate_entries(a, user, block, items):
+    a.update_list_duplicate_entries(
+        user.id,
+        a.LIST_KIND_AREA,
+        block.id,
+        [_area_list_duplicate_preview(item) for item in items],
+        LIST_SECTION_PREFIX,
+        LIST_SUBSECTION_PREFIX,
+        commit=False,
+    )
+
+
 def area_list_block_item_duplicates(block_id):
     a = _app_module()
     user = a.get_current_user()
@@ -2082,22 +2111,13 @@ def area_list_block_item_duplicates(block_id):
         a.AreaBlockItem.order_index.asc(),
         a.AreaBlockItem.id.asc(),
     ).all()
-    preview_items = [
-        type('AreaListDuplicateItem', (), {
-            'id': item.id,
-            'text': _area_list_full_text(item),
-            'note': item.note,
-            'link_text': item.link_text,
-            'link_url': item.link_url,
-            'order_index': item.order_index or 0,
-        })()
-        for item in items
-    ]
     payload = a.detect_note_list_duplicates(
-        items=preview_items,
+        items=[_area_list_duplicate_preview(item) for item in items],
         section_prefix=LIST_SECTION_PREFIX,
         subsection_prefix=LIST_SUBSECTION_PREFIX,
         embed_text_fn=a.embed_text,
+        embed_texts_fn=a.embed_texts_cached,
+        signatures_fn=a.list_duplicate_signatures_fn(user.id, a.LIST_KIND_AREA, block.id, a.embed_texts_cached),
     )
     return a.jsonify(payload)
 
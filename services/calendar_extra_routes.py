@@ -53,6 +53,21 @@ def reorder_calendar_events():
     if not day_obj:
         return jsonify({'error': 'Invalid day'}), 400
 
+    # Virtual recurring occurrences need a row to hold their position.
+    resolved_ids = []
+    for eid in ids:
+        try:
+            eid_int = int(eid)
+        except (TypeError, ValueError):
+            continue
+        occurrence = parse_virtual_occurrence_id(eid_int)
+        if occurrence and occurrence[1] == day_obj:
+            event = _materialize_recurring_occurrence(user.id, occurrence[0], day_obj)
+            eid_int = event.id if event else None
+        if eid_int is not None:
+            resolved_ids.append(eid_int)
+    ids = resolved_ids
+
     items = CalendarEvent.query.filter(
         CalendarEvent.user_id == user.id,
         CalendarEvent.id.in_(ids),
@@ -77,10 +92,11 @@ def manual_rollover():
     user = get_current_user()
     if not user:
         return jsonify({'error': 'No user selected'}), 401
-    app.logger.info(f"Manual rollover triggered by user {user.id}")
-    _rollover_incomplete_events()
+    dry_run = str(request.args.get('dry_run') or '').lower() in {'1', 'true', 'yes'}
+    app.logger.info(f"Manual rollover triggered by user {user.id} (dry_run={dry_run})")
+    report = _rollover_incomplete_events(dry_run=dry_run)
     app.logger.info("Manual rollover completed")
-    return jsonify({'status': 'ok'})
+    return jsonify({'status': 'ok', 'report': report})
 
 
 
@@ -33,6 +33,7 @@ def calendar_search():
     jsonify = a.jsonify
     or_ = a.or_
     request = a.request
+    search_entity_ids = a.search_entity_ids
     user = get_current_user()
     if not user:
         return jsonify({'error': 'No user selected'}), 401
@@ -48,18 +49,24 @@ def calendar_search():
     limit = max(1, min(limit, 100))
 
     like_expr = f"%{query}%"
-    events = CalendarEvent.query.filter(
-        CalendarEvent.user_id == user.id,
-        or_(
-            CalendarEvent.title.ilike(like_expr),
-            CalendarEvent.description.ilike(like_expr),
-            CalendarEvent.item_note.ilike(like_expr)
-        )
-    ).order_by(
-        CalendarEvent.day.asc(),
-        CalendarEvent.start_time.asc(),
-        CalendarEvent.order_index.asc()
-    ).limit(limit).all()
+    # With a full-text index the best-ranked matches win the limit; results still list by date.
+    event_query = CalendarEvent.query.filter(CalendarEvent.user_id == user.id)
+    event_hits = search_entity_ids(user.id, query, 'calendar_event', limit=limit)
+    if event_hits is not None:
+        events = event_query.filter(CalendarEvent.id.in_(list(event_hits))).all()
+        events = sorted(events, key=lambda ev: -event_hits[ev.id].rank)[:limit]
+    else:
+        events = event_query.filter(
+            or_(
+                CalendarEvent.title.ilike(like_expr),
+                CalendarEvent.description.ilike(like_expr),
+                CalendarEvent.item_note.ilike(like_expr)
+            )
+        ).order_by(
+            CalendarEvent.day.asc(),
+            CalendarEvent.start_time.asc(),
+            CalendarEvent.order_index.asc()
+        ).limit(limit).all()
 
     results = []
     linked_task_ids = set()
@@ -82,22 +89,32 @@ def calendar_search():
             'calendar_event_id': ev.id,
             'item_note': ev.item_note
         })
+        if event_hits is not None:
+            results[-1]['snippet'] = event_hits[ev.id].snippet
 
     remaining = max(0, limit - len(results))
     if remaining:
         task_query = TodoItem.query.join(TodoList, TodoItem.list_id == TodoList.id).filter(
             TodoList.user_id == user.id,
             TodoItem.due_date.isnot(None),
-            TodoItem.is_phase.is_(False),
-            or_(
-                TodoItem.content.ilike(like_expr),
-                TodoItem.description.ilike(like_expr),
-                TodoItem.notes.ilike(like_expr)
-            )
+            TodoItem.is_phase.is_(False)
         )
         if linked_task_ids:
             task_query = task_query.filter(~TodoItem.id.in_(linked_task_ids))
-        tasks = task_query.order_by(TodoItem.due_date.asc(), TodoItem.order_index.asc()).limit(remaining).all()
+        task_hits = search_entity_ids(
+            user.id, query, 'todo_item', limit=remaining, within=task_query.with_entities(TodoItem.id)
+        ) if event_hits is not None else None
+        if task_hits is not None:
+            tasks = task_query.filter(TodoItem.id.in_(list(task_hits))).all()
+            tasks = sorted(tasks, key=lambda item: -task_hits[item.id].rank)[:remaining]
+        else:
+            tasks = task_query.filter(
+                or_(
+                    TodoItem.content.ilike(like_expr),
+                    TodoItem.description.ilike(like_expr),
+                    TodoItem.notes.ilike(like_expr)
+                )
+            ).order_by(TodoItem.due_date.asc(), TodoItem.order_index.asc()).limit(remaining).all()
         for item in tasks:
             results.append({
                 'type': 'task',
@@ -110,6 +127,8 @@ def calendar_search():
                 'task_list_title': item.list.title if item.list else '',
                 'calendar_event_id': None
             })
+            if task_hits is not None:
+                results[-1]['snippet'] = task_hits[item.id].snippet
 
     results.sort(key=lambda r: ((r.get('day') or ''), (r.get('start_time') or ''), (r.get('title') or '')))
     return jsonify({'query': query, 'results': results})
@@ -125,14 +144,13 @@ def calendar_events():
     NoteListItem = a.NoteListItem
     TodoItem = a.TodoItem
     TodoList = a.TodoList
+    _calendar_conflict = a._calendar_conflict
     _ensure_recurring_instances = a._ensure_recurring_instances
-    _event_conflicts_with_event = a._event_conflicts_with_event
-    _event_conflicts_with_task = a._event_conflicts_with_task
     _next_calendar_order = a._next_calendar_order
     _normalize_calendar_item_note = a._normalize_calendar_item_note
     _schedule_reminder_job = a._schedule_reminder_job
-    _task_conflicts_with_event = a._task_conflicts_with_event
-    _task_conflicts_with_task = a._task_conflicts_with_task
+    _virtual_recurrences_enabled = a._virtual_recurrences_enabled
+    _virtual_recurring_events = a._virtual_recurring_events
     _now_local = a._now_local
     date = a.date
     db = a.db
@@ -165,7 +183,9 @@ def calendar_events():
         if end_day < start_day:
             return jsonify({'error': 'end must be on/after start'}), 400
 
-        _ensure_recurring_instances(user.id, start_day, end_day)
+        virtual = _virtual_recurrences_enabled()
+        if not virtual:
+            _ensure_recurring_instances(user.id, start_day, end_day)
 
         events = CalendarEvent.query.filter(
             CalendarEvent.user_id == user.id,
@@ -200,6 +220,9 @@ def calendar_events():
             if ev.phase_id:
                 data['phase_title'] = phase_map_by_day.get(day_key, {}).get(ev.phase_id)
             by_day.setdefault(day_key, []).append(data)
+        if virtual:
+            for data in _virtual_recurring_events(user.id, start_day, end_day, events):
+                by_day.setdefault(data['day'], []).append(data)
 
         due_items = TodoItem.query.join(TodoList, TodoItem.list_id == TodoList.id).filter(
             TodoList.user_id == user.id,
@@ -332,7 +355,9 @@ def calendar_events():
         day_obj = parse_day_value(day_str)
         if not day_obj:
             return jsonify({'error': 'Invalid day'}), 400
-        _ensure_recurring_instances(user.id, day_obj, day_obj)
+        virtual = _virtual_recurrences_enabled()
+        if not virtual:
+            _ensure_recurring_instances(user.id, day_obj, day_obj)
         events = CalendarEvent.query.filter_by(user_id=user.id, day=day_obj).order_by(
             CalendarEvent.order_index.asc()
         ).all()
@@ -355,6 +380,8 @@ def calendar_events():
                 parent = next((e for e in events if e.id == ev.phase_id), None)
                 data['phase_title'] = parent.title if parent else None
             payload.append(data)
+        if virtual:
+            payload.extend(_virtual_recurring_events(user.id, day_obj, day_obj, events))
 
         # Also include tasks due on this day (from main task lists) as linkable entries
         due_items = TodoItem.query.join(TodoList, TodoItem.list_id == TodoList.id).filter(
@@ -619,40 +646,14 @@ def calendar_events():
     new_allow_overlap = bool(data.get('allow_overlap'))
     force_overlap = bool(data.get('force_overlap'))
     if (not is_phase) and (not is_group) and start_time and not force_overlap:
-        if not is_event:
-            conflict = _task_conflicts_with_event(user.id, day_obj, start_time, end_time, new_allow_overlap)
-            if conflict:
-                return jsonify({
-                    'conflict_warning': True,
-                    'message': f'"{conflict.title}" is scheduled during this time. Add task anyway?',
-                    'conflict_event_id': conflict.id,
-                    'conflict_event_title': conflict.title
-                }), 409
-            conflict = _task_conflicts_with_task(user.id, day_obj, start_time, end_time, new_allow_overlap)
-            if conflict:
-                return jsonify({
-                    'conflict_warning': True,
-                    'message': f'"{conflict.title}" is scheduled during this time. Add task anyway?',
-                    'conflict_event_id': conflict.id,
-                    'conflict_event_title': conflict.title
-                }), 409
-        else:
-            conflict = _event_conflicts_with_event(user.id, day_obj, start_time, end_time, new_allow_overlap)
-            if conflict:
-                return jsonify({
-                    'conflict_warning': True,
-                    'message': f'"{conflict.title}" is scheduled during this time. Add event anyway?',
-                    'conflict_event_id': conflict.id,
-                    'conflict_event_title': conflict.title
-                }), 409
-            conflict = _event_conflicts_with_task(user.id, day_obj, start_time, end_time, new_allow_overlap)
-            if conflict:
-                return jsonify({
-                    'conflict_warning': True,
-                    'message': f'"{conflict.title}" is scheduled during this time. Add event anyway?',
-                    'conflict_event_id': conflict.id,
-                    'conflict_event_title': conflict.title
-                }), 409
+        conflict = _calendar_conflict(user.id, day_obj, start_time, end_time, is_event, new_allow_overlap)
+        if conflict:
+            return jsonify({
+                'conflict_warning': True,
+                'message': f'"{conflict.title}" is scheduled during this time. Add {"event" if is_event else "task"} anyway?',
+                'conflict_event_id': conflict.id,
+                'conflict_event_title': conflict.title
+            }), 409
 
     default_rollover = (not is_event) and (not is_group) and (not is_phase)
     new_event = CalendarEvent(
@@ -695,6 +696,8 @@ def create_recurring_calendar_event():
     ALLOWED_STATUSES = a.ALLOWED_STATUSES
     RecurringEvent = a.RecurringEvent
     _ensure_recurring_instances = a._ensure_recurring_instances
+    _materialize_recurring_horizon = a._materialize_recurring_horizon
+    _virtual_recurrences_enabled = a._virtual_recurrences_enabled
     _weekday_occurrence_in_month = a._weekday_occurrence_in_month
     _now_local = a._now_local
     date = a.date
@@ -846,7 +849,10 @@ def create_recurring_calendar_event():
     db.session.add(rule)
     db.session.commit()
 
-    _ensure_recurring_instances(user.id, start_day, start_day)
+    if _virtual_recurrences_enabled():
+        _materialize_recurring_horizon(user.id)
+    else:
+        _ensure_recurring_instances(user.id, start_day, start_day)
     return jsonify({'id': rule.id}), 201
 
 def recurring_event_detail(rule_id):
@@ -855,6 +861,7 @@ def recurring_event_detail(rule_id):
     CalendarEvent = a.CalendarEvent
     RecurrenceException = a.RecurrenceException
     RecurringEvent = a.RecurringEvent
+    _materialize_recurring_horizon = a._materialize_recurring_horizon
     _prune_recurring_instances = a._prune_recurring_instances
     _weekday_occurrence_in_month = a._weekday_occurrence_in_month
     db = a.db
@@ -974,6 +981,7 @@ def recurring_event_detail(rule_id):
 
     db.session.commit()
     _prune_recurring_instances(rule, user.id)
+    _materialize_recurring_horizon(user.id)
     return jsonify({'id': rule.id})
 
 def calendar_event_detail(event_id):
@@ -983,27 +991,43 @@ def calendar_event_detail(event_id):
     CalendarEvent = a.CalendarEvent
     ENTITY_CALENDAR = a.ENTITY_CALENDAR
     RecurrenceException = a.RecurrenceException
+    _calendar_conflict = a._calendar_conflict
     _cancel_reminder_job = a._cancel_reminder_job
-    _event_conflicts_with_event = a._event_conflicts_with_event
-    _event_conflicts_with_task = a._event_conflicts_with_task
+    _materialize_recurring_occurrence = a._materialize_recurring_occurrence
     _next_calendar_order = a._next_calendar_order
     _normalize_calendar_item_note = a._normalize_calendar_item_note
+    _recurring_occurrence_event = a._recurring_occurrence_event
     _schedule_reminder_job = a._schedule_reminder_job
-    _task_conflicts_with_event = a._task_conflicts_with_event
-    _task_conflicts_with_task = a._task_conflicts_with_task
+    _skip_recurring_occurrence = a._skip_recurring_occurrence
     db = a.db
     delete_embedding = a.delete_embedding
     get_current_user = a.get_current_user
     jsonify = a.jsonify
     parse_day_value = a.parse_day_value
     parse_time_str = a.parse_time_str
+    parse_virtual_occurrence_id = a.parse_virtual_occurrence_id
     request = a.request
     start_embedding_job = a.start_embedding_job
     user = get_current_user()
     if not user:
         return jsonify({'error': 'No user selected'}), 401
 
-    event = CalendarEvent.query.filter_by(id=event_id, user_id=user.id).first_or_404()
+    occurrence = parse_virtual_occurrence_id(event_id)
+    if occurrence:
+        # A virtual occurrence gets a row only when edited; deleting one just records the skip.
+        rule_id, occurrence_day = occurrence
+        if request.method == 'DELETE':
+            event = _recurring_occurrence_event(user.id, rule_id, occurrence_day)
+            if event is None:
+                if not _skip_recurring_occurrence(user.id, rule_id, occurrence_day):
+                    return jsonify({'error': 'Event not found'}), 404
+                return '', 204
+        else:
+            event = _materialize_recurring_occurrence(user.id, rule_id, occurrence_day)
+        if event is None:
+            return jsonify({'error': 'Event not found'}), 404
+    else:
+        event = CalendarEvent.query.filter_by(id=event_id, user_id=user.id).first_or_404()
 
     if request.method == 'DELETE':
         # Cancel reminder job if exists
@@ -1116,72 +1140,23 @@ def calendar_event_detail(event_id):
 
     force_overlap = bool(data.get('force_overlap'))
     if (not event.is_phase) and (not event.is_group) and event.start_time and not force_overlap:
-        if not event.is_event:
-            conflict = _task_conflicts_with_event(
-                user.id,
-                event.day,
-                event.start_time,
-                event.end_time,
-                event.allow_overlap,
-                exclude_event_id=event.id
-            )
-            if conflict:
-                db.session.rollback()
-                return jsonify({
-                    'conflict_warning': True,
-                    'message': f'"{conflict.title}" is scheduled during this time. Update task anyway?',
-                    'conflict_event_id': conflict.id,
-                    'conflict_event_title': conflict.title
-                }), 409
-            conflict = _task_conflicts_with_task(
-                user.id,
-                event.day,
-                event.start_time,
-                event.end_time,
-                event.allow_overlap,
-                exclude_event_id=event.id
-            )
-            if conflict:
-                db.session.rollback()
-                return jsonify({
-                    'conflict_warning': True,
-                    'message': f'"{conflict.title}" is scheduled during this time. Update task anyway?',
-                    'conflict_event_id': conflict.id,
-                    'conflict_event_title': conflict.title
-                }), 409
-        else:
-            conflict = _event_conflicts_with_event(
-                user.id,
-                event.day,
-                event.start_time,
-                event.end_time,
-                event.allow_overlap,
-                exclude_event_id=event.id
-            )
-            if conflict:
-                db.session.rollback()
-                return jsonify({
-                    'conflict_warning': True,
-                    'message': f'"{conflict.title}" is scheduled during this time. Update event anyway?',
-                    'conflict_event_id': conflict.id,
-                    'conflict_event_title': conflict.title
-                }), 409
-            conflict = _event_conflicts_with_task(
-                user.id,
-                event.day,
-                event.start_time,
-                event.end_time,
-                event.allow_overlap,
-                exclude_event_id=event.id
-            )
-            if conflict:
-                db.session.rollback()
-                return jsonify({
-                    'conflict_warning': True,
-                    'message': f'"{conflict.title}" is scheduled during this time. Update event anyway?',
-                    'conflict_event_id': conflict.id,
-                    'conflict_event_title': conflict.title
-                }), 409
+        conflict = _calendar_conflict(
+            user.id,
+            event.day,
+            event.start_time,
+            event.end_time,
+            event.is_event,
+            event.allow_overlap,
+            exclude_event_id=event.id
+        )
+        if conflict:
+            db.session.rollback()
+            return jsonify({
+                'conflict_warning': True,
+                'message': f'"{conflict.title}" is scheduled during this time. Update {"event" if event.is_event else "task"} anyway?',
+                'conflict_event_id': conflict.id,
+                'conflict_event_title': conflict.title
+            }), 409
 
     if status_changed:
         if event.status in {'done', 'canceled'}:
@@ -1206,3 +1181,73 @@ def calendar_event_detail(event_id):
             _cancel_reminder_job(event)
 
     return jsonify(event.to_dict())
+
+def check_calendar_conflicts():
+    import app as a
+    CALENDAR_CONFLICT_MAX_SLOTS = a.CALENDAR_CONFLICT_MAX_SLOTS
+    _calendar_conflict_schedules = a._calendar_conflict_schedules
+    candidate_bounds = a.candidate_bounds
+    get_current_user = a.get_current_user
+    jsonify = a.jsonify
+    minutes_to_time = a.minutes_to_time
+    parse_day_value = a.parse_day_value
+    parse_time_str = a.parse_time_str
+    request = a.request
+    """Check many candidate slots at once; each touched day is loaded a single time."""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'No user selected'}), 401
+
+    data = request.json or {}
+    slots = data.get('slots')
+    if not isinstance(slots, list) or not slots:
+        return jsonify({'error': 'slots array required'}), 400
+    if len(slots) > CALENDAR_CONFLICT_MAX_SLOTS:
+        return jsonify({'error': f'At most {CALENDAR_CONFLICT_MAX_SLOTS} slots per request'}), 400
+    find_free = bool(data.get('find_free'))
+
+    parsed = []
+    for slot in slots:
+        slot = slot if isinstance(slot, dict) else {}
+        day_obj = parse_day_value(slot.get('day'))
+        start_time = parse_time_str(slot.get('start_time'))
+        if not day_obj or not start_time:
+            parsed.append(None)
+            continue
+        try:
+            exclude_event_id = int(slot['exclude_event_id']) if slot.get('exclude_event_id') is not None else None
+        except (TypeError, ValueError):
+            exclude_event_id = None
+        parsed.append((
+            day_obj,
+            start_time,
+            parse_time_str(slot.get('end_time')),
+            bool(slot.get('is_event')),
+            bool(slot.get('allow_overlap')),
+            exclude_event_id,
+        ))
+
+    schedules = _calendar_conflict_schedules(user.id, [entry[0] for entry in parsed if entry])
+    results = []
+    for entry in parsed:
+        if entry is None:
+            results.append({'error': 'day and start_time are required'})
+            continue
+        day_obj, start_time, end_time, is_event, allow_overlap, exclude_event_id = entry
+        schedule = schedules[day_obj]
+        conflict = schedule.conflict(start_time, end_time, is_event, allow_overlap, exclude_event_id)
+        result = {
+            'day': day_obj.isoformat(),
+            'start_time': start_time.isoformat(),
+            'conflict': conflict is not None,
+            'conflict_event_id': conflict.id if conflict else None,
+            'conflict_event_title': conflict.title if conflict else None,
+        }
+        if find_free and conflict:
+            start, end = candidate_bounds(start_time, end_time, is_event)
+            free_start = schedule.first_free_start(
+                end - start, is_event, allow_overlap, earliest=start, exclude_event_id=exclude_event_id
+            )
+            result['next_free_start'] = minutes_to_time(free_start).isoformat() if free_start is not None else None
+        results.append(result)
+    return jsonify({'results': results})
@@ -0,0 +1,295 @@
+"""
+Persisted duplicate-detection signatures for note lists and area list blocks.
+
+Each candidate item keeps one ListDuplicateEntry row holding its normalized
+preview text, similarity tokens and the content hash of its vector in the
+shared embedding_vector table. Route handlers update rows as items are created,
+edited and deleted; the duplicates endpoints read them back in one query and
+only recompute rows whose preview text no longer matches (writes through bulk
+or AI paths that bypass the hooks).
+
+The duplicates endpoints are GETs and never write: recomputed signatures and
+freshly embedded vectors are used in memory and queued, and the signature
+refresh job persists the queue.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+
+from backend.ai_embeddings import embedding_model_name, embeddings_available
+from backend.embedding_service import _chunks, _find_vectors, _store_vectors, _vector_values
+from backend.env import int_env
+from backend.text_helpers import _normalize_similarity_text, _tokenize_similarity
+from models import AreaBlock, AreaBlockItem, ListDuplicateEntry, Note, NoteListItem, db
+from services.duplicate_service import build_list_preview_text
+
+LIST_KIND_NOTE = "note"
+LIST_KIND_AREA = "area"
+
+
+def _hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _is_heading(item, section_prefix, subsection_prefix=None):
+    text_value = (item.text or "").strip()
+    return text_value.startswith(section_prefix) or bool(
+        subsection_prefix and text_value.startswith(subsection_prefix)
+    )
+
+
+def _signature(preview):
+    normalized = _normalize_similarity_text(preview)
+    return {
+        "source_hash": _hash_text(preview),
+        "normalized_text": normalized,
+        "token_signature": " ".join(_tokenize_similarity(normalized)),
+        "vector_hash": _hash_text(normalized),
+    }
+
+
+def _apply_signature(entry, preview):
+    for name, value in _signature(preview).items():
+        setattr(entry, name, value)
+    entry.updated_at = datetime.utcnow()
+
+
+class PendingSignatures:
+    """
+    Signatures and vectors computed by read requests, waiting to be persisted.
+
+    Bounded: the oldest entries are dropped first, and a dropped signature is
+    simply recomputed by the next read of its list.
+    """
+
+    def __init__(self, max_entries=5000, max_vectors=2000):
+        self.max_entries = max(1, max_entries)
+        self.max_vectors = max(1, max_vectors)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._vectors = OrderedDict()
+
+    def add_entry(self, user_id, list_kind, list_id, item_id, preview):
+        key = (list_kind, item_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (user_id, list_id, preview, datetime.utcnow())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add_vectors(self, model_name, vectors):
+        with self._lock:
+            for content_hash, vector in vectors.items():
+                self._vectors[(model_name, content_hash)] = vector
+            while len(self._vectors) > self.max_vectors:
+                self._vectors.popitem(last=False)
+
+    def take(self):
+        with self._lock:
+            entries, self._entries = self._entries, OrderedDict()
+            vectors, self._vectors = self._vectors, OrderedDict()
+        return entries, vectors
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "vectors": len(self._vectors)}
+
+
+pending_signatures = PendingSignatures(
+    max_entries=int_env("DUPLICATE_PENDING_SIGNATURES", 5000),
+    max_vectors=int_env("DUPLICATE_PENDING_VECTORS", 2000),
+)
+
+
+def update_list_duplicate_entries(
+    user_id,
+    list_kind,
+    list_id,
+    items,
+    section_prefix,
+    subsection_prefix=None,
+    commit=True,
+):
+    """
+    Upsert signatures for items (objects with id, text and link_text).
+
+    Headings and items without preview text are not duplicate candidates, so any
+    row they had is dropped.
+    """
+    items = [item for item in items if item.id]
+    if not items:
+        return
+    existing = {
+        entry.item_id: entry
+        for entry in ListDuplicateEntry.query.filter(
+            ListDuplicateEntry.list_kind == list_kind,
+            ListDuplicateEntry.item_id.in_([item.id for item in items]),
+        )
+    }
+    for item in items:
+        entry = existing.get(item.id)
+        preview = build_list_preview_text(item).strip()
+        if _is_heading(item, section_prefix, subsection_prefix) or not preview:
+            if entry is not None:
+                db.session.delete(entry)
+            continue
+        if entry is None:
+            entry = ListDuplicateEntry(user_id=user_id, list_kind=list_kind, list_id=list_id, item_id=item.id)
+            db.session.add(entry)
+        elif entry.source_hash == _hash_text(preview) and entry.list_id == list_id:
+            continue
+        entry.list_id = list_id
+        _apply_signature(entry, preview)
+    if commit:
+        _commit_entries()
+
+
+def remove_list_duplicate_entries(list_kind, item_ids, commit=True):
+    item_ids = [int(item_id) for item_id in item_ids if item_id]
+    for chunk in _chunks(item_ids):
+        ListDuplicateEntry.query.filter(
+            ListDuplicateEntry.list_kind == list_kind,
+            ListDuplicateEntry.item_id.in_(chunk),
+        ).delete(synchronize_session=False)
+    if commit:
+        db.session.commit()
+
+
+def _commit_entries():
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request indexed the same item first; its row is just as current.
+        db.session.rollback()
+
+
+def _entry_vectors(entries, embed_texts_fn):
+    """
+    Vectors for entries via their shared-vector hashes, embedding only unseen texts.
+
+    Freshly embedded vectors are used as-is and queued for persistence.
+    """
+    if not embeddings_available():
+        return None
+    model_name = embedding_model_name()
+    rows = {
+        content_hash: _vector_values(row)
+        for content_hash, row in _find_vectors([entry["vector_hash"] for entry in entries], model_name).items()
+    }
+    missing = {}
+    for entry in entries:
+        if rows.get(entry["vector_hash"]) is None:
+            missing.setdefault(entry["vector_hash"], entry["normalized_text"])
+    if missing:
+        hashes = list(missing)
+        vectors = list(embed_texts_fn([missing[content_hash] for content_hash in hashes]))
+        fresh = {content_hash: vector for content_hash, vector in zip(hashes, vectors) if vector}
+        if len(fresh) != len(hashes):
+            return None
+        pending_signatures.add_vectors(model_name, fresh)
+        rows.update({content_hash: np.asarray(vector, dtype=np.float32) for content_hash, vector in fresh.items()})
+    return [rows[entry["vector_hash"]] for entry in entries]
+
+
+def load_list_duplicate_signatures(user_id, list_kind, list_id, candidates, embed_texts_fn):
+    """
+    Return (normalized texts, token lists, vectors or None) aligned with candidates.
+
+    Candidates are the dicts built by detect_note_list_duplicates. Read-only:
+    stale or missing rows are recomputed in memory and queued for
+    persist_pending_signatures(); rows for items that left the list are
+    ignored here and removed by prune_orphaned_duplicate_entries().
+    """
+    entries = {
+        entry.item_id: entry
+        for entry in ListDuplicateEntry.query.filter_by(list_kind=list_kind, list_id=list_id)
+    }
+    ordered = []
+    for candidate in candidates:
+        entry = entries.get(candidate["id"])
+        if entry is not None and entry.source_hash == _hash_text(candidate["preview"]):
+            ordered.append({
+                "normalized_text": entry.normalized_text,
+                "token_signature": entry.token_signature,
+                "vector_hash": entry.vector_hash,
+            })
+            continue
+        ordered.append(_signature(candidate["preview"]))
+        pending_signatures.add_entry(user_id, list_kind, list_id, candidate["id"], candidate["preview"])
+    normalized = [entry["normalized_text"] for entry in ordered]
+    tokens = [_tokenize_similarity(entry["token_signature"]) for entry in ordered]
+    return normalized, tokens, _entry_vectors(ordered, embed_texts_fn)
+
+
+def persist_pending_signatures():
+    """
+    Write signatures and vectors queued by duplicate reads; returns rows written.
+
+    A queued signature is skipped when a write path updated its row after the
+    read that computed it.
+    """
+    entries, vectors = pending_signatures.take()
+    written = 0
+    if entries:
+        existing = {}
+        for list_kind in {key[0] for key in entries}:
+            item_ids = [item_id for kind, item_id in entries if kind == list_kind]
+            for chunk in _chunks(item_ids):
+                for entry in ListDuplicateEntry.query.filter(
+                    ListDuplicateEntry.list_kind == list_kind,
+                    ListDuplicateEntry.item_id.in_(chunk),
+                ):
+                    existing[(list_kind, entry.item_id)] = entry
+        for (list_kind, item_id), (user_id, list_id, preview, queued_at) in entries.items():
+            entry = existing.get((list_kind, item_id))
+            if entry is None:
+                entry = ListDuplicateEntry(user_id=user_id, list_kind=list_kind, list_id=list_id, item_id=item_id)
+                db.session.add(entry)
+            elif entry.updated_at is not None and entry.updated_at > queued_at:
+                continue
+            entry.list_id = list_id
+            _apply_signature(entry, preview)
+            written += 1
+        _commit_entries()
+    by_model = {}
+    for (model_name, content_hash), vector in vectors.items():
+        by_model.setdefault(model_name, {})[content_hash] = vector
+    for model_name, fresh in by_model.items():
+        found = _find_vectors(list(fresh), model_name)
+        fresh = {content_hash: vector for content_hash, vector in fresh.items() if content_hash not in found}
+        written += len(_store_vectors(model_name, fresh))
+    return written
+
+
+def list_duplicate_signatures_fn(user_id, list_kind, list_id, embed_texts_fn):
+    """Adapter for detect_note_list_duplicates(signatures_fn=...)."""
+
+    def signatures_fn(candidates):
+        return load_list_duplicate_signatures(user_id, list_kind, list_id, candidates, embed_texts_fn)
+
+    return signatures_fn
+
+
+def prune_orphaned_duplicate_entries():
+    """Delete rows whose item was removed outside the hooked routes (list deletes, cascades)."""
+    removed = ListDuplicateEntry.query.filter(
+        ListDuplicateEntry.list_kind == LIST_KIND_NOTE,
+        ~db.session.query(NoteListItem.id)
+        .join(Note, NoteListItem.note_id == Note.id)
+        .filter(NoteListItem.id == ListDuplicateEntry.item_id, Note.id == ListDuplicateEntry.list_id)
+        .exists(),
+    ).delete(synchronize_session=False)
+    removed += ListDuplicateEntry.query.filter(
+        ListDuplicateEntry.list_kind == LIST_KIND_AREA,
+        ~db.session.query(AreaBlockItem.id)
+        .join(AreaBlock, AreaBlockItem.block_id == AreaBlock.id)
+        .filter(AreaBlockItem.id == ListDuplicateEntry.item_id, AreaBlock.id == ListDuplicateEntry.list_id)
+        .exists(),
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
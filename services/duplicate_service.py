@@ -1,6 +1,9 @@
+import numpy as np
+
 from backend.text_helpers import (
+    DUPLICATE_BLOCKING_MIN_ITEMS,
+    _candidate_pairs,
     _containment_similarity,
-    _cosine_similarity,
     _group_duplicates,
     _jaccard_similarity,
     _normalize_similarity_text,
@@ -20,7 +23,65 @@ def build_list_preview_text(item):
     return base or link_label
 
 
-def detect_note_list_duplicates(items, section_prefix, embed_text_fn, subsection_prefix=None):
+EMBEDDING_DUPLICATE_THRESHOLD = 0.8
+SIMILARITY_CHUNK_ROWS = 512
+
+
+def _embed_previews(normalized, embed_text_fn, embed_texts_fn):
+    """Return one vector per preview, or None if any preview could not be embedded."""
+    if embed_texts_fn is not None:
+        embeddings = list(embed_texts_fn(normalized))
+        if len(embeddings) != len(normalized) or any(vec is None for vec in embeddings):
+            return None
+        return embeddings
+    embeddings = []
+    for text in normalized:
+        embedding = embed_text_fn(text)
+        if embedding is None:
+            return None
+        embeddings.append(embedding)
+    return embeddings
+
+
+def _cosine_pairs(embeddings, threshold):
+    """
+    Pairs (i, j), i < j, whose cosine similarity meets threshold.
+
+    Rows are normalized once and compared with one matrix product per chunk of
+    rows, so memory stays at SIMILARITY_CHUNK_ROWS x n.
+    """
+    dims = {len(vec) for vec in embeddings}
+    if len(dims) != 1:
+        return None
+    matrix = np.asarray(embeddings, dtype=np.float64)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    pairs = []
+    for start in range(0, matrix.shape[0], SIMILARITY_CHUNK_ROWS):
+        scores = matrix[start : start + SIMILARITY_CHUNK_ROWS] @ matrix.T
+        rows, cols = np.nonzero(scores >= threshold)
+        rows += start
+        keep = cols > rows
+        pairs.extend(zip(rows[keep].tolist(), cols[keep].tolist()))
+    return pairs
+
+
+def detect_note_list_duplicates(
+    items,
+    section_prefix,
+    embed_text_fn,
+    subsection_prefix=None,
+    embed_texts_fn=None,
+    signatures_fn=None,
+):
+    """
+    Group near-duplicate list items.
+
+    signatures_fn(candidates), when given, returns precomputed (normalized texts,
+    token lists, vectors or None) aligned with candidates, e.g. from the
+    persisted list duplicate index.
+    """
     section_by_id = {}
     current_section = None
     current_subsection = None
@@ -71,27 +132,35 @@ def detect_note_list_duplicates(items, section_prefix, embed_text_fn, subsection
     if len(candidates) < 2:
         return {"groups": [], "method": "none", "threshold": None}
 
-    normalized = [_normalize_similarity_text(item["preview"]) for item in candidates]
-    tokens = [_tokenize_similarity(text) for text in normalized]
-
-    embeddings = []
-    for text in normalized:
-        embedding = embed_text_fn(text)
-        if embedding is None:
-            embeddings = None
-            break
-        embeddings.append(embedding)
+    if signatures_fn is not None:
+        normalized, tokens, embeddings = signatures_fn(candidates)
+    else:
+        normalized = [_normalize_similarity_text(item["preview"]) for item in candidates]
+        tokens = [_tokenize_similarity(text) for text in normalized]
+        embeddings = _embed_previews(normalized, embed_text_fn, embed_texts_fn)
+    cosine_pairs = _cosine_pairs(embeddings, EMBEDDING_DUPLICATE_THRESHOLD) if embeddings else None
 
-    if embeddings:
-        threshold = 0.8
+    if cosine_pairs is not None:
+        threshold = EMBEDDING_DUPLICATE_THRESHOLD
+        cosine_hits = set(cosine_pairs)
 
         def similarity_fn(i, j):
-            cosine = _cosine_similarity(embeddings[i], embeddings[j])
+            if (i, j) in cosine_hits:
+                return 1.0
             containment = _containment_similarity(tokens[i], tokens[j])
             substring = _substring_similarity(normalized[i], normalized[j])
-            return max(cosine, containment, substring)
+            return max(containment, substring)
 
-        grouped = _group_duplicates(candidates, similarity_fn, threshold)
+        # Cosine matches come from the matrix product; the remaining pairs only
+        # need the token/substring scorers, which blocking narrows on long lists.
+        if len(candidates) >= DUPLICATE_BLOCKING_MIN_ITEMS:
+            lexical_pairs = _candidate_pairs(normalized, tokens)
+        else:
+            lexical_pairs = [
+                (i, j) for i in range(len(candidates)) for j in range(i + 1, len(candidates))
+            ]
+        pairs = cosine_pairs + [pair for pair in lexical_pairs if pair not in cosine_hits]
+        grouped = _group_duplicates(candidates, similarity_fn, threshold, pairs)
         method = "embeddings"
     else:
         threshold = 0.6
@@ -103,7 +172,11 @@ def detect_note_list_duplicates(items, section_prefix, embed_text_fn, subsection
             substring = _substring_similarity(normalized[i], normalized[j])
             return max(seq_score, token_score, containment, substring)
 
-        grouped = _group_duplicates(candidates, similarity_fn, threshold)
+        pairs = None
+        if len(candidates) >= DUPLICATE_BLOCKING_MIN_ITEMS:
+            # Only pairs sharing a token or character n-gram can plausibly clear 0.6.
+            pairs = _candidate_pairs(normalized, tokens)
+        grouped = _group_duplicates(candidates, similarity_fn, threshold, pairs)
         method = "fuzzy"
 
     groups = []
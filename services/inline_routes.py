@@ -8,7 +8,7 @@ from services.quick_bookmark_extra_routes import handle_quick_access, delete_qui
 from services.feed_routes import handle_feed, feed_detail, feed_to_recall
 from services.calendar_extra_routes import list_recurring_events, reorder_calendar_events, manual_rollover, send_digest_now, dismiss_reminder
 from services.notification_extra_routes import api_list_notifications, api_mark_notifications_read, api_mark_notification_read, api_notification_settings
-from services.list_search_extra_routes import list_items_in_list, search_entities, ai_chat, move_destinations, list_phases, list_hubs, hub_children, export_list, reorder_items
+from services.list_search_extra_routes import list_items_in_list, search_entities, suggest_entities, semantic_search_entities, duplicate_matches, duplicate_scan_start, ai_chat, move_destinations, list_phases, list_hubs, hub_children, export_list, reorder_items
 from services.bulk_extra_routes import bulk_notes, bulk_vault_documents, bulk_bookmarks
 
 __all__ = [
@@ -77,6 +77,10 @@ __all__ = [
     'api_notification_settings',
     'list_items_in_list',
     'search_entities',
+    'semantic_search_entities',
+    'suggest_entities',
+    'duplicate_matches',
+    'duplicate_scan_start',
     'ai_chat',
     'move_destinations',
     'list_phases',
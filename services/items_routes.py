@@ -851,6 +851,7 @@ def query_items():
     get_current_user = a.get_current_user
     jsonify = a.jsonify
     request = a.request
+    search_entity_ids = a.search_entity_ids
     """Query items across lists with filters for AI/clients."""
     user = get_current_user()
     if not user:
@@ -889,15 +890,24 @@ def query_items():
     if is_phase_param is not None:
         is_phase_bool = is_phase_param.lower() in ['1', 'true', 'yes', 'on']
         query = query.filter(TodoItem.is_phase == is_phase_bool)
-    if search:
-        like_expr = f"%{search}%"
-        query = query.filter(db.or_(TodoItem.content.ilike(like_expr), TodoItem.description.ilike(like_expr)))
-
-    items = query.order_by(TodoItem.list_id, TodoItem.order_index).limit(limit).all()
+    hits = search_entity_ids(
+        user.id, search, 'todo_item', limit=limit, within=query.with_entities(TodoItem.id)
+    ) if search else None
+    if hits is not None:
+        # Best-ranked matches among the rows the filters above select.
+        items = query.filter(TodoItem.id.in_(list(hits))).all()
+        items = sorted(items, key=lambda i: -hits[i.id].rank)[:limit]
+    else:
+        if search:
+            like_expr = f"%{search}%"
+            query = query.filter(db.or_(TodoItem.content.ilike(like_expr), TodoItem.description.ilike(like_expr)))
+        items = query.order_by(TodoItem.list_id, TodoItem.order_index).limit(limit).all()
     payload = []
     for item in items:
         data = item.to_dict()
         data['list_title'] = item.list.title
         data['list_type'] = item.list.type
+        if hits is not None:
+            data['snippet'] = hits[item.id].snippet
         payload.append(data)
     return jsonify(payload)
@@ -42,7 +42,7 @@ def list_items_in_list(list_id):
 
 
 def search_entities():
-    """Simple search across lists and items for AI resolution."""
+    """Search lists by title and tasks, notes, and list items by full text for AI resolution."""
     user = get_current_user()
     if not user:
         return jsonify({'error': 'No user selected'}), 401
@@ -69,26 +69,154 @@ def search_entities():
         TodoList.title.ilike(like_expr)
     ).order_by(TodoList.title.asc()).limit(list_limit).all()
 
-    items = TodoItem.query.join(TodoList, TodoItem.list_id == TodoList.id).filter(
-        TodoList.user_id == user.id,
-        db.or_(TodoItem.content.ilike(like_expr), TodoItem.description.ilike(like_expr))
-    ).order_by(TodoItem.list_id, TodoItem.order_index).limit(item_limit).all()
+    def ranked(query, entity_type, model):
+        # Ranked per type within the caller's scope, so one busy type cannot take every slot.
+        type_hits = search_entity_ids(
+            user.id, q, entity_type, limit=item_limit, within=query.with_entities(model.id)
+        )
+        if type_hits is None:
+            return None
+        if not type_hits:
+            return []
+        rows = {row.id: row for row in query.filter(model.id.in_(list(type_hits)))}
+        return [(rows[entity_id], hit.snippet) for entity_id, hit in type_hits.items() if entity_id in rows]
+
+    items = ranked(
+        TodoItem.query.join(TodoList, TodoItem.list_id == TodoList.id).filter(TodoList.user_id == user.id),
+        'todo_item', TodoItem,
+    )
+    if items is None:
+        items = TodoItem.query.join(TodoList, TodoItem.list_id == TodoList.id).filter(
+            TodoList.user_id == user.id,
+            db.or_(TodoItem.content.ilike(like_expr), TodoItem.description.ilike(like_expr))
+        ).order_by(TodoItem.list_id, TodoItem.order_index).limit(item_limit).all()
+        return jsonify({
+            'lists': [{'id': l.id, 'title': l.title, 'type': l.type} for l in lists],
+            'items': [_search_item_dict(i) for i in items]
+        })
+
+    notes = ranked(Note.query.filter(Note.user_id == user.id), 'note', Note)
+    list_items = ranked(
+        NoteListItem.query.join(Note, NoteListItem.note_id == Note.id).filter(
+            Note.user_id == user.id,
+            Note.is_pin_protected.is_(False),
+        ),
+        'note_list_item', NoteListItem,
+    )
+    area_items = ranked(AreaBlockItem.query.filter(AreaBlockItem.user_id == user.id), 'area_block_item', AreaBlockItem)
 
     return jsonify({
         'lists': [{'id': l.id, 'title': l.title, 'type': l.type} for l in lists],
-        'items': [{
-            'id': i.id,
-            'content': i.content,
-            'status': i.status,
-            'is_phase': i.is_phase,
-            'list_id': i.list_id,
-            'list_title': i.list.title,
-            'list_type': i.list.type,
-            'phase_id': i.phase_id
-        } for i in items]
+        'items': [dict(_search_item_dict(i), snippet=snippet) for i, snippet in items],
+        'notes': [{
+            'id': n.id,
+            'title': n.title,
+            'note_type': n.note_type,
+            'folder_id': n.folder_id,
+            'snippet': snippet
+        } for n, snippet in notes],
+        'list_items': [{
+            'id': li.id,
+            'text': li.text,
+            'note_id': li.note_id,
+            'checked': li.checked,
+            'snippet': snippet
+        } for li, snippet in list_items],
+        'area_items': [{
+            'id': ai.id,
+            'text': ai.text,
+            'area_id': ai.area_id,
+            'block_id': ai.block_id,
+            'status': ai.status,
+            'snippet': snippet
+        } for ai, snippet in area_items]
     })
 
 
+def _search_item_dict(i):
+    return {
+        'id': i.id,
+        'content': i.content,
+        'status': i.status,
+        'is_phase': i.is_phase,
+        'list_id': i.list_id,
+        'list_title': i.list.title,
+        'list_type': i.list.type,
+        'phase_id': i.phase_id
+    }
+
+
+def suggest_entities():
+    """Search-as-you-type over titles, served from the per-user in-memory prefix index."""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'No user selected'}), 401
+
+    q = (request.args.get('q') or '').strip()
+    types = [t.strip() for t in (request.args.get('types') or '').split(',') if t.strip()]
+    unknown = [t for t in types if t not in SUGGEST_ENTITY_TYPES]
+    if unknown:
+        return jsonify({'error': f"Unknown types: {', '.join(unknown)}"}), 400
+    try:
+        limit = int(request.args.get('limit', 10))
+    except (ValueError, TypeError):
+        limit = 10
+    limit = min(max(limit, 1), 50)
+
+    return jsonify({'query': q, 'results': suggest_titles(user.id, q, types or None, limit)})
+
+
+def semantic_search_entities():
+    """Embedding search across recalls, bookmarks, tasks, and calendar events in one pass."""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'No user selected'}), 401
+
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+
+    try:
+        limit = int(request.args.get('limit', 10))
+    except (ValueError, TypeError):
+        limit = 10
+    limit = min(max(limit, 1), 50)
+    types = [t.strip() for t in (request.args.get('types') or '').split(',') if t.strip()]
+    unknown = [t for t in types if t not in SEMANTIC_SEARCH_TYPES]
+    if unknown:
+        return jsonify({'error': f"Unknown types: {', '.join(unknown)}"}), 400
+    return jsonify(semantic_search(user.id, q, limit=limit, entity_types=types or None))
+
+
+def duplicate_matches():
+    """Page through the latest account-wide duplicate scan, best matches first."""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'No user selected'}), 401
+
+    try:
+        limit = int(request.args.get('limit', 50))
+    except (ValueError, TypeError):
+        limit = 50
+    try:
+        offset = int(request.args.get('offset', 0))
+    except (ValueError, TypeError):
+        offset = 0
+    limit = min(max(limit, 1), 200)
+    offset = max(offset, 0)
+    types = [t.strip() for t in (request.args.get('types') or '').split(',') if t.strip()] or None
+    return jsonify(duplicate_scan_results(user.id, limit=limit, offset=offset, entity_types=types))
+
+
+def duplicate_scan_start():
+    """Queue an account-wide duplicate scan and start working on it in the background."""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'No user selected'}), 401
+    scan = request_duplicate_scan(user.id)
+    start_duplicate_scan_job()
+    return jsonify(scan.to_dict()), 202
+
 
 def ai_chat():
     """AI chat endpoint that routes through OpenAI with function-calling tools."""
@@ -298,6 +298,8 @@ def note_list_item_duplicates(note_id):
         section_prefix=LIST_SECTION_PREFIX,
         subsection_prefix=LIST_SUBSECTION_PREFIX,
         embed_text_fn=embed_text,
+        embed_texts_fn=embed_texts_cached,
+        signatures_fn=list_duplicate_signatures_fn(user.id, LIST_KIND_NOTE, note.id, embed_texts_cached),
     )
     return jsonify(payload)
 
@@ -157,6 +157,7 @@ def handle_notes():
     or_ = a.or_
     parse_bool = a.parse_bool
     request = a.request
+    search_entity_ids = a.search_entity_ids
     """List or create notes/lists for the current user."""
     user = get_current_user()
     if not user:
@@ -261,7 +262,19 @@ def handle_notes():
             notes_query = notes_query.filter(Note.folder_id.is_(None))
         else:
             notes_query = notes_query.filter_by(folder_id=folder_id_int)
-    if title_search:
+    if planner_multi_item_id:
+        notes_query = notes_query.filter(Note.planner_multi_item_id == planner_multi_item_id)
+    if planner_multi_line_id:
+        notes_query = notes_query.filter(Note.planner_multi_line_id == planner_multi_line_id)
+    if not include_hidden:
+        notes_query = notes_query.filter(Note.is_listed.is_(True))
+    # Matched within the filtered notes, so the candidate limit never hides a visible match.
+    title_hits = search_entity_ids(
+        user.id, title_search, 'note', title_only=True, within=notes_query.with_entities(Note.id)
+    ) if title_search else None
+    if title_hits is not None:
+        notes_query = notes_query.filter(Note.id.in_(list(title_hits)))
+    elif title_search:
         title_search_like = (
             title_search
             .replace('\\', '\\\\')
@@ -269,12 +282,6 @@ def handle_notes():
             .replace('_', '\\_')
         )
         notes_query = notes_query.filter(Note.title.ilike(f'%{title_search_like}%', escape='\\'))
-    if planner_multi_item_id:
-        notes_query = notes_query.filter(Note.planner_multi_item_id == planner_multi_item_id)
-    if planner_multi_line_id:
-        notes_query = notes_query.filter(Note.planner_multi_line_id == planner_multi_line_id)
-    if not include_hidden:
-        notes_query = notes_query.filter(Note.is_listed.is_(True))
     notes = notes_query.order_by(
         Note.pinned.desc(),
         Note.pin_order.asc(),
@@ -788,6 +795,7 @@ def handle_note(note_id):
 def note_list_items(note_id):
     import app as a
     CalendarEvent = a.CalendarEvent
+    LIST_KIND_NOTE = a.LIST_KIND_NOTE
     Note = a.Note
     NoteListItem = a.NoteListItem
     _sanitize_note_html = a._sanitize_note_html
@@ -799,6 +807,7 @@ def note_list_items(note_id):
     parse_day_value = a.parse_day_value
     pytz = a.pytz
     request = a.request
+    update_list_duplicate_entries = a.update_list_duplicate_entries
     user = get_current_user()
     if not user:
         return jsonify({'error': 'No user selected'}), 401
@@ -911,6 +920,10 @@ def note_list_items(note_id):
     )
     note.updated_at = datetime.now(pytz.UTC).replace(tzinfo=None)
     db.session.add(item)
+    db.session.flush()
+    update_list_duplicate_entries(
+        user.id, LIST_KIND_NOTE, note.id, [item], LIST_SECTION_PREFIX, LIST_SUBSECTION_PREFIX, commit=False
+    )
     db.session.commit()
     return jsonify(item.to_dict()), 201
 
@@ -918,6 +931,7 @@ def note_list_item_detail(note_id, item_id):
     import app as a
     CalendarEvent = a.CalendarEvent
     ENTITY_CALENDAR = a.ENTITY_CALENDAR
+    LIST_KIND_NOTE = a.LIST_KIND_NOTE
     Note = a.Note
     NoteListItem = a.NoteListItem
     _cancel_reminder_job = a._cancel_reminder_job
@@ -934,8 +948,10 @@ def note_list_item_detail(note_id, item_id):
     parse_day_value = a.parse_day_value
     parse_time_str = a.parse_time_str
     pytz = a.pytz
+    remove_list_duplicate_entries = a.remove_list_duplicate_entries
     request = a.request
     start_embedding_job = a.start_embedding_job
+    update_list_duplicate_entries = a.update_list_duplicate_entries
     user = get_current_user()
     if not user:
         return jsonify({'error': 'No user selected'}), 401
@@ -962,6 +978,7 @@ def note_list_item_detail(note_id, item_id):
             delete_embedding(user.id, ENTITY_CALENDAR, linked_event.id)
             db.session.delete(linked_event)
         db.session.delete(item)
+        remove_list_duplicate_entries(LIST_KIND_NOTE, [item.id], commit=False)
         _reindex_note_list_items(note.id)
         note.updated_at = datetime.now(pytz.UTC).replace(tzinfo=None)
         db.session.commit()
@@ -1143,6 +1160,10 @@ def note_list_item_detail(note_id, item_id):
             else:
                 _cancel_reminder_job(linked_event)
 
+    if 'text' in data or 'link_text' in data:
+        update_list_duplicate_entries(
+            user.id, LIST_KIND_NOTE, note.id, [item], LIST_SECTION_PREFIX, LIST_SUBSECTION_PREFIX, commit=False
+        )
     note.updated_at = datetime.now(pytz.UTC).replace(tzinfo=None)
     db.session.commit()
     for linked_event in events_to_reschedule.values():
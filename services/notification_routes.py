@@ -1,18 +1,17 @@
 """Extracted heavy route handlers from app.py."""
 
-scheduler = None
-
 def snooze_reminder(event_id):
     import app as a
     CalendarEvent = a.CalendarEvent
     _get_or_create_notification_settings = a._get_or_create_notification_settings
-    _send_event_reminder = a._send_event_reminder
     app = a.app
     datetime = a.datetime
     db = a.db
     get_current_user = a.get_current_user
     jsonify = a.jsonify
+    local_to_utc = a.local_to_utc
     pytz = a.pytz
+    reminder_dispatcher = a.reminder_dispatcher
     request = a.request
     timedelta = a.timedelta
     """Snooze a calendar event reminder."""
@@ -43,31 +42,14 @@ def snooze_reminder(event_id):
     now = datetime.now(tz).replace(tzinfo=None)
     snooze_until = now + timedelta(minutes=snooze_minutes)
 
-    # Update event
+    # Update event; the reminder dispatcher sends it again at the snooze time
     event.reminder_snoozed_until = snooze_until
     event.reminder_sent = False
+    event.reminder_job_id = None
+    event.next_reminder_at = local_to_utc(snooze_until, app.config['DEFAULT_TIMEZONE'])
     db.session.commit()
-
-    # Schedule reminder for snooze time
-    global scheduler
-    scheduler = a.scheduler
-    if scheduler:
-        job_id = f"reminder_{event.id}_{int(snooze_until.timestamp())}"
-        try:
-            scheduler.add_job(
-                _send_event_reminder,
-                'date',
-                run_date=pytz.timezone(app.config['DEFAULT_TIMEZONE']).localize(snooze_until),
-                args=[event_id],
-                id=job_id,
-                replace_existing=True
-            )
-            event.reminder_job_id = job_id
-            db.session.commit()
-            app.logger.info(f"Snoozed reminder for event {event_id} for {snooze_minutes} minutes")
-        except Exception as e:
-            app.logger.error(f"Error scheduling snoozed reminder: {e}")
-            return jsonify({'error': 'Failed to schedule snooze'}), 500
+    reminder_dispatcher.schedule(event.id, event.next_reminder_at)
+    app.logger.info(f"Snoozed reminder for event {event_id} for {snooze_minutes} minutes")
 
     return jsonify({
         'snoozed': True,
@@ -88,6 +70,7 @@ def get_pending_reminders():
     jsonify = a.jsonify
     or_ = a.or_
     pytz = a.pytz
+    request = a.request
     timedelta = a.timedelta
     """Get upcoming reminders for mobile app to schedule locally."""
     user = get_current_user()
@@ -101,57 +84,66 @@ def get_pending_reminders():
     # Get events with reminders in the next 7 days that haven't been sent yet
     end_window = now + timedelta(days=7)
 
-    events = CalendarEvent.query.filter(
+    # next_reminder_at is the fire time (naive UTC) the reminder dispatcher uses, snoozes
+    # included, so the window is a range scan on idx_calendar_event_user_next_reminder
+    # whatever the lead. Linked sources come in through outer joins instead of one lookup
+    # per row.
+    now_utc = now.astimezone(pytz.UTC).replace(tzinfo=None)
+    end_utc = end_window.astimezone(pytz.UTC).replace(tzinfo=None)
+    rows = db.session.query(
+        CalendarEvent,
+        TodoItem.id,
+        TodoItem.status,
+        NoteListItem.id,
+        NoteListItem.checked,
+        NoteListItem.scheduled_date,
+        DoFeedItem.id,
+        DoFeedItem.scheduled_date,
+    ).outerjoin(
+        TodoItem, TodoItem.id == CalendarEvent.todo_item_id
+    ).outerjoin(
+        NoteListItem, NoteListItem.id == CalendarEvent.note_list_item_id
+    ).outerjoin(
+        DoFeedItem, DoFeedItem.id == CalendarEvent.do_feed_item_id
+    ).filter(
         CalendarEvent.user_id == user.id,
+        CalendarEvent.next_reminder_at > now_utc,
+        CalendarEvent.next_reminder_at <= end_utc,
+        or_(CalendarEvent.reminder_sent.is_(False), CalendarEvent.reminder_sent.is_(None)),
         CalendarEvent.status.notin_(['done', 'canceled']),
-        or_(CalendarEvent.reminder_sent.is_(False), CalendarEvent.reminder_sent.is_(None))
-    ).all()
+        CalendarEvent.start_time.isnot(None),
+    ).order_by(CalendarEvent.day, CalendarEvent.start_time, CalendarEvent.id).all()
 
     pending = []
-    for event in events:
+    for event, todo_id, todo_status, note_item_id, note_checked, note_day, feed_id, feed_day in rows:
         if event.todo_item_id:
-            linked_todo = db.session.get(TodoItem, event.todo_item_id)
-            if (not linked_todo) or linked_todo.status == 'done':
+            if todo_id is None or todo_status == 'done':
                 continue
         if event.note_list_item_id:
-            linked_item = db.session.get(NoteListItem, event.note_list_item_id)
-            if (not linked_item) or linked_item.checked:
+            if note_item_id is None or note_checked:
                 continue
-            if (not linked_item.scheduled_date) or linked_item.scheduled_date != event.day:
+            if (not note_day) or note_day != event.day:
                 continue
         if event.do_feed_item_id:
-            linked_feed = db.session.get(DoFeedItem, event.do_feed_item_id)
-            if not linked_feed:
+            if feed_id is None:
                 continue
-            if linked_feed.scheduled_date and linked_feed.scheduled_date != event.day:
+            if feed_day and feed_day != event.day:
                 continue
-        if not event.start_time:
-            continue
-
-        # Combine day and time
-        event_datetime = datetime.combine(event.day, event.start_time)
-
-        # Check if snoozed
-        if event.reminder_snoozed_until:
-            remind_at = event.reminder_snoozed_until
-            remind_at_local = remind_at if remind_at.tzinfo else tz.localize(remind_at)
-        elif event.reminder_minutes_before is not None:
-            event_local = event_datetime if event_datetime.tzinfo else tz.localize(event_datetime)
-            remind_at_local = event_local - timedelta(minutes=event.reminder_minutes_before)
-        else:
-            continue  # No reminder set
-
-        # Only include if reminder is in the future and within our window
-        if now < remind_at_local <= end_window:
-            remind_at_utc = remind_at_local.astimezone(pytz.UTC)
-            pending.append({
-                'event_id': event.id,
-                'title': event.title,
-                'start_time': event.start_time.strftime('%I:%M %p'),
-                'day': event.day.isoformat(),
-                'remind_at': remind_at_local.replace(tzinfo=None).isoformat(),
-                'remind_at_ts': int(remind_at_utc.timestamp() * 1000),
-                'url': f'/calendar?day={event.day.isoformat()}'
-            })
 
-    return jsonify({'reminders': pending})
+        remind_at_utc = pytz.UTC.localize(event.next_reminder_at)
+        remind_at_local = remind_at_utc.astimezone(tz)
+        pending.append({
+            'event_id': event.id,
+            'title': event.title,
+            'start_time': event.start_time.strftime('%I:%M %p'),
+            'day': event.day.isoformat(),
+            'remind_at': remind_at_local.replace(tzinfo=None).isoformat(),
+            'remind_at_ts': int(remind_at_utc.timestamp() * 1000),
+            'url': f'/calendar?day={event.day.isoformat()}'
+        })
+
+    # Polls with an unchanged list get a bodiless 304.
+    response = jsonify({'reminders': pending})
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
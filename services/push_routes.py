@@ -64,12 +64,14 @@ def api_push_list():
     PushSubscription = a.PushSubscription
     get_current_user = a.get_current_user
     jsonify = a.jsonify
+    push_delivery = a.push_delivery
 
     user = get_current_user()
     if not user:
         return jsonify({'error': 'No user selected'}), 401
     subs = PushSubscription.query.filter_by(user_id=user.id).all()
-    return jsonify([s.to_dict() for s in subs])
+    # latency: this process's recent delivery timings for the endpoint, None before the first send
+    return jsonify([dict(s.to_dict(), latency=push_delivery.endpoint_latency(s.endpoint)) for s in subs])
 
 
 def api_push_clear():
@@ -250,7 +250,7 @@ def area_vault_document_move(area_id, doc_id):
 
 
 def vault_search(area_id=None):
-    """Search documents by title, filename, type, or tags."""
+    """Search documents by title, filename, type, tags, and extracted text."""
     user = get_current_user()
     if not user:
         return jsonify({'error': 'No user selected'}), 401
@@ -258,18 +258,23 @@ def vault_search(area_id=None):
     if not query:
         return jsonify([])
     archived_only = parse_bool(request.args.get('archived'))
-    like = f"%{query}%"
-    query = _filter_area_scope(Document.query.filter(
+    scoped = _filter_area_scope(Document.query.filter(
         Document.user_id == user.id,
-        Document.archived_at.isnot(None) if archived_only else Document.archived_at.is_(None),
+        Document.archived_at.isnot(None) if archived_only else Document.archived_at.is_(None)
+    ), Document, area_id)
+    hits = search_entity_ids(user.id, query, 'document', within=scoped.with_entities(Document.id))
+    if hits is not None:
+        results = sorted(scoped.filter(Document.id.in_(list(hits))).all(), key=lambda doc: -hits[doc.id].rank)
+        return jsonify([dict(doc.to_dict(), snippet=hits[doc.id].snippet) for doc in results])
+    like = f"%{query}%"
+    results = scoped.filter(
         or_(
             Document.title.ilike(like),
             Document.original_filename.ilike(like),
             Document.file_type.ilike(like),
             Document.tags.ilike(like)
         )
-    ), Document, area_id)
-    results = query.order_by(
+    ).order_by(
         Document.pinned.desc(),
         Document.pin_order.desc(),
         Document.created_at.desc()
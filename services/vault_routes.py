@@ -32,6 +32,7 @@ def vault_documents(area_id=None):
     mimetypes = a.mimetypes
     os = a.os
     request = a.request
+    start_vault_text_job = a.start_vault_text_job
     tags_to_string = a.tags_to_string
     uuid = a.uuid
     """List or upload vault documents."""
@@ -176,6 +177,7 @@ def vault_documents(area_id=None):
                 pass
         return jsonify({'error': str(exc)}), 400
 
+    start_vault_text_job()
     if len(created) == 1:
         return jsonify(created[0].to_dict()), 201
     return jsonify([doc.to_dict() for doc in created]), 201
@@ -1292,3 +1292,87 @@ def test_area_routes_enforce_user_ownership(tmp_path, monkeypatch):
         assert app_module.db.session.get(app_module.AreaSection, second_section_id) is not None
         assert app_module.db.session.get(app_module.AreaBlock, second_block_id) is not None
         assert app_module.db.session.get(app_module.AreaBlockItem, second_block_item_id) is not None
+
+
+def test_area_list_duplicates_are_served_from_the_persisted_index(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, 'area-duplicate-index.db')
+    from models import ListDuplicateEntry
+    from services import duplicate_index
+
+    monkeypatch.setattr(duplicate_index, 'embeddings_available', lambda: False)
+
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        user = _create_user(app_module, 'duplicate-index-owner')
+        area = app_module.Area(user_id=user.id, name='Groceries')
+        app_module.db.session.add(area)
+        app_module.db.session.flush()
+        block = app_module.AreaBlock(user_id=user.id, area_id=area.id, block_type='list', title='Shopping')
+        app_module.db.session.add(block)
+        app_module.db.session.commit()
+        user_id = user.id
+        block_id = block.id
+
+    client = app_module.app.test_client()
+    _login(client, user_id)
+
+    item_ids = {}
+    for text in ['[[section]] Dairy', 'Oat milk', 'oat  milk!', 'Bread']:
+        response = client.post(f'/api/area-list-blocks/{block_id}/list-items', json={'text': text})
+        assert response.status_code == 201
+        item_ids[text] = response.get_json()['id']
+
+    def entries():
+        with app_module.app.app_context():
+            return {
+                entry.item_id: entry.normalized_text
+                for entry in ListDuplicateEntry.query.filter_by(
+                    list_kind='area', list_id=block_id
+                )
+            }
+
+    assert entries() == {
+        item_ids['Oat milk']: 'oat milk',
+        item_ids['oat  milk!']: 'oat milk',
+        item_ids['Bread']: 'bread',
+    }
+
+    response = client.get(f'/api/area-list-blocks/{block_id}/list-items/duplicates')
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload['method'] == 'fuzzy'
+    assert [sorted(entry['id'] for entry in group['items']) for group in payload['groups']] == [
+        sorted([item_ids['Oat milk'], item_ids['oat  milk!']])
+    ]
+    assert payload['groups'][0]['items'][0]['section'] == 'Dairy'
+
+    response = client.put(
+        f"/api/area-list-blocks/{block_id}/list-items/{item_ids['oat  milk!']}",
+        json={'text': 'Sourdough bread'},
+    )
+    assert response.status_code == 200
+    assert entries()[item_ids['oat  milk!']] == 'sourdough bread'
+
+    response = client.delete(f"/api/area-list-blocks/{block_id}/list-items/{item_ids['Bread']}")
+    assert response.status_code == 200
+    assert item_ids['Bread'] not in entries()
+
+    response = client.get(f'/api/area-list-blocks/{block_id}/list-items/duplicates')
+    assert response.get_json()['groups'] == []
+
+    # A write that bypasses the hooks: the GET recomputes in memory without writing.
+    with app_module.app.app_context():
+        item = app_module.db.session.get(app_module.AreaBlockItem, item_ids['Oat milk'])
+        item.text = 'Sourdough bread'
+        app_module.db.session.commit()
+    response = client.get(f'/api/area-list-blocks/{block_id}/list-items/duplicates')
+    assert [sorted(entry['id'] for entry in group['items']) for group in response.get_json()['groups']] == [
+        sorted([item_ids['Oat milk'], item_ids['oat  milk!']])
+    ]
+    assert entries()[item_ids['Oat milk']] == 'oat milk'
+    assert duplicate_index.pending_signatures.stats()['entries'] == 1
+
+    with app_module.app.app_context():
+        assert duplicate_index.persist_pending_signatures() == 1
+    assert entries()[item_ids['Oat milk']] == 'sourdough bread'
+    assert duplicate_index.pending_signatures.stats() == {'entries': 0, 'vectors': 0}
@@ -0,0 +1,177 @@
+import importlib
+import random
+from datetime import date, time
+from types import SimpleNamespace
+
+from sqlalchemy import event
+
+
+def _load_test_app(tmp_path, monkeypatch, name='conflicts.db'):
+    database_path = tmp_path / name
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database_path.as_posix()}')
+    monkeypatch.setenv('BOOTSTRAP_JOBS_ON_IMPORT', '0')
+
+    import app as app_module
+
+    app_module = importlib.reload(app_module)
+    app_module.app.config.update(TESTING=True)
+    return app_module
+
+
+def _minutes(t):
+    return t.hour * 60 + t.minute
+
+
+def _end(start, end_time):
+    if end_time and _minutes(end_time) > start:
+        return _minutes(end_time)
+    return min(start + 30, 24 * 60)
+
+
+def _linear_conflict(entries, start_time, end_time, is_event, allow_overlap, exclude_event_id):
+    """The four per-pair rules as the old linear scans applied them."""
+    start = _minutes(start_time)
+    if is_event:
+        end = _end(start, end_time)
+    else:
+        end = _minutes(end_time) if end_time else None
+        if end is not None and end < start:
+            end = start
+    events = [e for e in entries if e.is_event and e.start_time]
+    tasks = [e for e in entries if not e.is_event and not e.is_phase and not e.is_group and e.start_time]
+    found = []
+    for group, is_event_group in ((events, True), (tasks, False)):
+        for ev in group:
+            if exclude_event_id and ev.id == exclude_event_id:
+                continue
+            ev_start = _minutes(ev.start_time)
+            ev_end = _end(ev_start, ev.end_time)
+            if end is None:
+                overlaps = ev_start <= start < ev_end
+            else:
+                overlaps = not (end <= ev_start or start >= ev_end)
+            if not overlaps:
+                continue
+            if is_event and is_event_group:
+                hit = not ev.allow_overlap or not allow_overlap
+            elif is_event:
+                hit = ev.allow_overlap is True or not allow_overlap
+            elif is_event_group:
+                hit = allow_overlap or not ev.allow_overlap
+            else:
+                hit = allow_overlap or ev.allow_overlap is True
+            if hit:
+                found.append(ev)
+        if found:
+            return found
+    return found
+
+
+def test_day_schedule_matches_linear_overlap_rules():
+    from backend.calendar_conflicts import DaySchedule
+
+    rng = random.Random(7)
+
+    def random_time():
+        return time(rng.randint(0, 23), rng.choice([0, 10, 15, 30, 45, 59]))
+
+    for _ in range(400):
+        entries = [
+            SimpleNamespace(
+                id=entry_id,
+                start_time=random_time(),
+                end_time=rng.choice([None, random_time()]),
+                is_event=rng.random() < 0.5,
+                is_phase=rng.random() < 0.1,
+                is_group=rng.random() < 0.1,
+                allow_overlap=rng.choice([None, False, True]),
+            )
+            for entry_id in range(1, rng.randint(0, 25) + 1)
+        ]
+        schedule = DaySchedule(date(2026, 5, 1), entries)
+        for _ in range(20):
+            args = (
+                random_time(),
+                rng.choice([None, random_time()]),
+                rng.random() < 0.5,
+                rng.random() < 0.5,
+                rng.choice([None, 1, 2]),
+            )
+            expected = _linear_conflict(entries, *args)
+            found = schedule.conflict(*args)
+            assert (found is None) == (not expected), args
+            assert found is None or found in expected
+
+
+def test_first_free_start_skips_blocking_entries():
+    from backend.calendar_conflicts import DaySchedule
+
+    entries = [
+        SimpleNamespace(id=1, start_time=time(9, 0), end_time=time(10, 0), is_event=True,
+                        is_phase=False, is_group=False, allow_overlap=False),
+        SimpleNamespace(id=2, start_time=time(10, 0), end_time=time(10, 45), is_event=False,
+                        is_phase=False, is_group=False, allow_overlap=True),
+    ]
+    schedule = DaySchedule(date(2026, 5, 1), entries)
+    assert schedule.first_free_start(30, is_event=True, earliest=9 * 60 + 15) == 10 * 60 + 45
+    assert schedule.first_free_start(30, is_event=True, earliest=8 * 60) == 8 * 60
+    assert schedule.first_free_start(120, is_event=True, earliest=23 * 60) is None
+
+
+def test_batch_conflict_endpoint_loads_days_once(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch)
+
+    with app_module.app.app_context():
+        db = app_module.db
+        user = app_module.User(username='conflicts', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        meeting = app_module.CalendarEvent(
+            user_id=user.id, title='Meeting', day=date(2026, 5, 4), start_time=time(9, 0), end_time=time(10, 0),
+            is_event=True,
+        )
+        focus = app_module.CalendarEvent(
+            user_id=user.id, title='Focus', day=date(2026, 5, 5), start_time=time(13, 0), end_time=time(14, 0),
+            allow_overlap=True,
+        )
+        db.session.add_all([meeting, focus])
+        db.session.commit()
+        user_id, meeting_id, focus_id = user.id, meeting.id, focus.id
+        engine = db.engine
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+    # The first request also runs app start-up jobs; keep them out of the count.
+    client.get('/api/calendar/events?day=2026-05-04')
+    slots = [
+        {'day': '2026-05-04', 'start_time': '09:30', 'end_time': '10:30'},
+        {'day': '2026-05-04', 'start_time': '10:00', 'end_time': '10:30'},
+        {'day': '2026-05-05', 'start_time': '13:15', 'is_event': True},
+        {'day': '2026-05-04', 'start_time': '09:30', 'exclude_event_id': meeting_id, 'is_event': True},
+        {'day': 'nope', 'start_time': '09:00'},
+    ]
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        response = client.post('/api/calendar/conflicts', json={'slots': slots, 'find_free': True})
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results[0]['conflict_event_id'] == meeting_id and results[0]['next_free_start'] == '10:00:00'
+    assert results[1]['conflict'] is False
+    assert results[2]['conflict_event_id'] == focus_id and results[2]['next_free_start'] == '14:00:00'
+    assert results[3]['conflict'] is False
+    assert 'error' in results[4]
+    assert sum(1 for sql in statements if 'FROM calendar_event' in sql) == 1
+
+    created = client.post('/api/calendar/events', json={
+        'title': 'Overlap', 'day': '2026-05-04', 'start_time': '09:15', 'end_time': '09:45',
+    })
+    assert created.status_code == 409
+    assert created.get_json()['conflict_event_id'] == meeting_id
+    assert 'Add task anyway?' in created.get_json()['message']
@@ -0,0 +1,128 @@
+import importlib
+from datetime import date, time
+
+from sqlalchemy import event
+
+
+TODAY = date(2026, 6, 2)
+YESTERDAY = date(2026, 6, 1)
+
+
+def _load_test_app(tmp_path, monkeypatch, name='rollover.db'):
+    database_path = tmp_path / name
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database_path.as_posix()}')
+    monkeypatch.setenv('BOOTSTRAP_JOBS_ON_IMPORT', '0')
+
+    import app as app_module
+
+    app_module = importlib.reload(app_module)
+    app_module.app.config.update(TESTING=True)
+    return app_module
+
+
+def _seed_user(app_module, name):
+    db = app_module.db
+    CalendarEvent = app_module.CalendarEvent
+    user = app_module.User(username=name, password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    todo_list = app_module.TodoList(title='Tasks', user_id=user.id)
+    db.session.add(todo_list)
+    db.session.flush()
+    done_task = app_module.TodoItem(list_id=todo_list.id, content='Shipped', status='done', due_date=YESTERDAY)
+    open_task = app_module.TodoItem(list_id=todo_list.id, content='Write report', due_date=YESTERDAY)
+    rule = app_module.RecurringEvent(user_id=user.id, title='Water plants', start_day=YESTERDAY, frequency='daily')
+    db.session.add_all([done_task, open_task, rule])
+    db.session.flush()
+    phase = CalendarEvent(user_id=user.id, title='Morning', day=YESTERDAY, is_phase=True, order_index=1)
+    db.session.add(phase)
+    db.session.flush()
+    db.session.add_all([
+        CalendarEvent(user_id=user.id, title='Stretch', day=YESTERDAY, phase_id=phase.id,
+                      rollover_enabled=True, order_index=2, start_time=time(7, 0)),
+        CalendarEvent(user_id=user.id, title='Shipped', day=YESTERDAY, todo_item_id=done_task.id,
+                      rollover_enabled=True, order_index=3),
+        CalendarEvent(user_id=user.id, title='Write report', day=YESTERDAY, todo_item_id=open_task.id,
+                      rollover_enabled=True, order_index=4),
+        CalendarEvent(user_id=user.id, title='Water plants', day=YESTERDAY, recurrence_id=rule.id,
+                      rollover_enabled=True, order_index=5),
+        CalendarEvent(user_id=user.id, title='Gone item', day=YESTERDAY, note_list_item_id=987654,
+                      rollover_enabled=True, order_index=6),
+        CalendarEvent(user_id=user.id, title='Finished', day=YESTERDAY, status='done',
+                      rollover_enabled=True, order_index=7),
+        CalendarEvent(user_id=user.id, title='Today already', day=TODAY, order_index=9),
+    ])
+    db.session.commit()
+    return user.id, open_task.id, rule.id
+
+
+def test_rollover_copies_all_users_in_bulk(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch)
+    from backend.calendar_rollover import roll_over_calendar
+
+    with app_module.app.app_context():
+        db = app_module.db
+        CalendarEvent = app_module.CalendarEvent
+        seeded = [_seed_user(app_module, f'user{index}') for index in range(3)]
+
+        before = CalendarEvent.query.count()
+        report, created = roll_over_calendar(TODAY, dry_run=True)
+        assert report['dry_run'] and report['users'] == 3 and report['copied'] == 9
+        assert created == {} and CalendarEvent.query.count() == before
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            report, created = roll_over_calendar(TODAY, batch_size=7)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        db.session.expire_all()
+
+        assert report['scanned'] == 15 and report['copied'] == 9 and report['phases_copied'] == 3
+        assert report['marked_done'] == 3 and report['deleted'] == 3 and report['batches'] == 2
+        assert set(report['timings']) == {'load', 'plan', 'write', 'total'}
+        # Reads are independent of the number of users; writes are per batch.
+        assert len(statements) < 45
+
+        for user_id, open_task_id, rule_id in seeded:
+            today_rows = CalendarEvent.query.filter_by(user_id=user_id, day=TODAY).order_by(CalendarEvent.order_index).all()
+            assert [(ev.title, ev.order_index) for ev in today_rows] == [
+                ('Today already', 9), ('Morning', 10), ('Stretch', 11), ('Write report', 12), ('Water plants', 13),
+            ]
+            assert today_rows[2].phase_id == today_rows[1].id
+            assert sorted(created[user_id]) == sorted(ev.id for ev in today_rows[1:])
+            assert db.session.get(app_module.TodoItem, open_task_id).due_date == TODAY
+            assert app_module.RecurrenceException.query.filter_by(recurrence_id=rule_id, day=TODAY).count() == 1
+            left = {ev.title: ev.status for ev in CalendarEvent.query.filter_by(user_id=user_id, day=YESTERDAY)}
+            assert left == {'Morning': 'not_started', 'Shipped': 'done', 'Finished': 'done'}
+
+        total = CalendarEvent.query.count()
+        rerun, created = roll_over_calendar(TODAY)
+        assert rerun['copied'] == 0 and created == {} and CalendarEvent.query.count() == total
+
+
+def test_manual_rollover_dry_run_reports_without_writing(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, 'manual-rollover.db')
+    import backend.app_core_logic as app_core_logic
+    app_core_logic = importlib.reload(app_core_logic)
+    monkeypatch.setattr(app_core_logic, '_now_local', lambda: app_module.datetime(2026, 6, 2, 9, 0))
+    monkeypatch.setenv('ENABLE_CALENDAR_JOBS', '0')
+
+    with app_module.app.app_context():
+        user_id, _, _ = _seed_user(app_module, 'manual')
+        before = app_module.CalendarEvent.query.count()
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    response = client.post('/api/calendar/rollover-now?dry_run=1')
+    assert response.status_code == 200
+    report = response.get_json()['report']
+    assert report['dry_run'] is True and report['copied'] == 3
+
+    with app_module.app.app_context():
+        assert app_module.CalendarEvent.query.count() == before
+        report = app_core_logic._rollover_incomplete_events()
+        assert report['copied'] == 3
+        assert app_module.CalendarEvent.query.filter_by(day=TODAY).count() == 5
@@ -0,0 +1,140 @@
+import importlib
+import smtplib
+from datetime import date, time
+
+from backend.daily_digest import SmtpSession
+
+
+def _load_test_app(tmp_path, monkeypatch, name='digest.db'):
+    database_path = tmp_path / name
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database_path.as_posix()}')
+    monkeypatch.setenv('BOOTSTRAP_JOBS_ON_IMPORT', '0')
+    monkeypatch.setenv('ENABLE_CALENDAR_JOBS', '0')
+
+    import app as app_module
+
+    app_module = importlib.reload(app_module)
+    app_module.app.config.update(TESTING=True)
+    return app_module
+
+
+class _FakeSMTP:
+    """Records every connection; disconnects once after `drop_after` messages on the first one."""
+
+    connections = []
+
+    def __init__(self, host, port, timeout=None, drop_after=None):
+        self.messages = []
+        self.logged_in = False
+        self.drop_after = drop_after
+        _FakeSMTP.connections.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logged_in = True
+
+    def sendmail(self, from_addr, to_addrs, message):
+        if self.drop_after is not None and len(self.messages) >= self.drop_after:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.messages.append((from_addr, to_addrs, message))
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_smtp_session_reuses_one_connection_and_reconnects_on_drop():
+    _FakeSMTP.connections = []
+    factory = lambda host, port, timeout=None: _FakeSMTP(host, port, timeout, drop_after=2 if not _FakeSMTP.connections else None)
+    session = SmtpSession('smtp.example.com', user='ops', password='pw', from_addr='ops@example.com',
+                          messages_per_connection=3, smtp_factory=factory, sleep=lambda seconds: None)
+    with session:
+        assert all(session.send(f'user{n}@example.com', 'Digest', 'body') for n in range(6))
+    assert [len(conn.messages) for conn in _FakeSMTP.connections] == [2, 3, 1]
+    assert session.stats() == {'connections': 3, 'sent': 6, 'failed': 0, 'retried': 1}
+
+    class _Refusing(_FakeSMTP):
+        def sendmail(self, from_addr, to_addrs, message):
+            raise smtplib.SMTPDataError(554, b'Rejected')
+
+    rejected = SmtpSession('smtp.example.com', from_addr='ops@example.com', smtp_factory=_Refusing,
+                           sleep=lambda seconds: None)
+    assert rejected.send('a@example.com', 'Digest', 'body') is False
+    assert rejected.stats()['retried'] == 0 and rejected.stats()['connections'] == 1
+
+
+def test_digest_selects_users_in_sql_and_sends_over_one_session(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch)
+    import backend.app_core_logic as app_core_logic
+    app_core_logic = importlib.reload(app_core_logic)
+    monkeypatch.setenv('SMTP_HOST', 'smtp.example.com')
+    monkeypatch.setenv('SMTP_USER', 'ops@example.com')
+    monkeypatch.setenv('SMTP_PASSWORD', 'pw')
+    monkeypatch.setenv('CONTACT_TO_EMAIL', 'me@example.com')
+    _FakeSMTP.connections = []
+    monkeypatch.setattr(smtplib, 'SMTP', _FakeSMTP)
+    db = app_module.db
+    day = date(2026, 3, 2)
+
+    with app_module.app.app_context():
+        users = {}
+        for name, prefs in (
+            ('morning', {'digest_hour': 7}),
+            ('evening', {'digest_hour': 19}),
+            ('quiet', {'digest_enabled': False}),
+            ('defaults', None),
+            ('empty', {'digest_hour': 7}),
+        ):
+            user = app_module.User(username=name, password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            users[name] = user.id
+            if prefs is not None:
+                db.session.add(app_module.NotificationSetting(user_id=user.id, **prefs))
+        todo_list = app_module.TodoList(title='Inbox', user_id=users['morning'])
+        db.session.add(todo_list)
+        db.session.flush()
+        linked = app_module.TodoItem(list_id=todo_list.id, content='Linked todo', due_date=day)
+        loose = app_module.TodoItem(list_id=todo_list.id, content='Loose todo', due_date=day)
+        db.session.add_all([linked, loose])
+        db.session.flush()
+        db.session.add_all([
+            app_module.CalendarEvent(user_id=users['morning'], title='Standup', day=day, start_time=time(9, 0),
+                                     is_event=True),
+            app_module.CalendarEvent(user_id=users['morning'], title='Linked task', day=day, start_time=time(8, 0),
+                                     todo_item_id=linked.id),
+            app_module.CalendarEvent(user_id=users['evening'], title='Dinner', day=day, start_time=time(19, 0),
+                                     is_event=True),
+            app_module.CalendarEvent(user_id=users['defaults'], title='Gym', day=day),
+            app_module.CalendarEvent(user_id=users['quiet'], title='Hidden', day=day, is_event=True),
+        ])
+        db.session.commit()
+
+        selected, counts = app_module.select_digest_users(7)
+        assert selected == [users['morning'], users['defaults'], users['empty']]
+        assert counts == {'users_total': 5, 'skipped_prefs': 1, 'skipped_hour': 1}
+
+        items = app_module.prefetch_digest_items(selected, day)
+        events, tasks = items[users['morning']]
+        assert [ev.title for ev in events] == ['Standup']
+        assert [task['title'] for task in tasks] == ['Linked task', 'Loose todo']
+        assert items[users['empty']] == ([], [])
+
+        stats = app_core_logic._send_daily_email_digest(target_day=day)
+
+        from models import JobLock
+
+        assert JobLock.query.filter_by(job_name='daily_email_digest').count() == 0
+        db.session.add(JobLock(job_name='daily_email_digest', locked_at=app_core_logic._now_local(), locked_by='other'))
+        db.session.commit()
+        assert app_core_logic._send_daily_email_digest(target_day=day) == {'skipped_lock': True}
+
+    assert stats['users_total'] == 5 and stats['skipped_prefs'] == 1 and stats['skipped_hour'] == 0
+    assert stats['eligible'] == 3 and stats['sent'] == 3 and stats['skipped_no_items'] == 1
+    assert stats['errors'] == 0
+    assert len(_FakeSMTP.connections) == 1
+    assert _FakeSMTP.connections[0].logged_in and len(_FakeSMTP.connections[0].messages) == 3
@@ -0,0 +1,96 @@
+import importlib
+
+import numpy as np
+
+
+def _load_test_app(tmp_path, monkeypatch, name='duplicate-scan.db'):
+    database_path = tmp_path / name
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database_path.as_posix()}')
+    monkeypatch.setenv('BOOTSTRAP_JOBS_ON_IMPORT', '0')
+
+    import app as app_module
+
+    app_module = importlib.reload(app_module)
+    app_module.app.config.update(TESTING=True)
+    return app_module
+
+
+def test_duplicate_scan_resumes_across_chunks_and_pages_results(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, 'duplicate-scan.db')
+    from backend import duplicate_scan
+    from models import DuplicateMatch
+
+    def fake_vectors(texts_by_hash):
+        return {
+            content_hash: np.array([1.0, 0.0] if 'passport' in text else [0.0, 1.0], dtype=np.float32)
+            for content_hash, text in texts_by_hash.items()
+        }
+
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        user = app_module.User(username='scan-owner', email=None)
+        user.set_password('dummy')
+        app_module.db.session.add(user)
+        app_module.db.session.flush()
+        todo_list = app_module.TodoList(title='Errands', user_id=user.id)
+        note = app_module.Note(title='Someday', user_id=user.id, note_type='list')
+        area = app_module.Area(user_id=user.id, name='Admin')
+        app_module.db.session.add_all([todo_list, note, area])
+        app_module.db.session.flush()
+        block = app_module.AreaBlock(user_id=user.id, area_id=area.id, block_type='list', title='Docs')
+        app_module.db.session.add(block)
+        app_module.db.session.flush()
+        app_module.db.session.add_all([
+            app_module.TodoItem(list_id=todo_list.id, content='Buy oat milk'),
+            app_module.TodoItem(list_id=todo_list.id, content='Call the dentist'),
+            app_module.NoteListItem(note_id=note.id, text='[[section]] Buy oat milk'),
+            app_module.NoteListItem(note_id=note.id, text='Renew passport'),
+            app_module.AreaBlockItem(
+                user_id=user.id, area_id=area.id, block_id=block.id, text='renew my passport online'
+            ),
+            app_module.BookmarkItem(user_id=user.id, title='buy oat-milk', value='https://example.com'),
+        ])
+        app_module.db.session.commit()
+        user_id = user.id
+
+        loads = []
+        load_scan_rows = duplicate_scan.load_scan_rows
+        monkeypatch.setattr(duplicate_scan, 'load_scan_rows', lambda uid: loads.append(uid) or load_scan_rows(uid))
+
+        scan = duplicate_scan.request_duplicate_scan(user_id)
+        assert duplicate_scan.request_duplicate_scan(user_id).id == scan.id
+        # A spent deadline still lets one chunk through, then the cursor is saved.
+        assert duplicate_scan.run_duplicate_scan(scan, 0, chunk_rows=2, vectors_fn=fake_vectors) is False
+        assert (scan.status, scan.items_scanned, scan.items_total) == ('running', 2, 5)
+        assert scan.cursor_type == 'todo_item'
+        while not duplicate_scan.run_duplicate_scan(scan, 0, chunk_rows=2, vectors_fn=fake_vectors):
+            pass
+        assert scan.status == 'done'
+        assert loads == [user_id]  # resumed ticks reuse the indexed corpus
+
+        pairs = {
+            (match.source_type, match.target_type, match.method)
+            for match in DuplicateMatch.query.filter_by(scan_id=scan.id)
+        }
+        assert pairs == {
+            ('todo_item', 'bookmark', 'exact'),
+            ('note_list_item', 'area_block_item', 'vector'),
+        }
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    response = client.get('/api/duplicates?limit=1')
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload['scan']['status'] == 'done'
+    assert payload['total'] == 2
+    assert payload['next_offset'] == 1
+    assert payload['matches'][0]['method'] == 'exact'
+    assert payload['matches'][0]['source']['text'] == 'Buy oat milk'
+
+    response = client.get('/api/duplicates?limit=1&types=area_block_item')
+    payload = response.get_json()
+    assert payload['total'] == 1
+    assert payload['next_offset'] is None
+    assert payload['matches'][0]['target']['text'] == 'renew my passport online'
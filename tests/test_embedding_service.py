@@ -0,0 +1,749 @@
+import importlib
+import json
+from types import SimpleNamespace
+
+import numpy as np
+
+
+def _load_test_app(tmp_path, monkeypatch, name='embeddings.db'):
+    database_path = tmp_path / name
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database_path.as_posix()}')
+    monkeypatch.setenv('BOOTSTRAP_JOBS_ON_IMPORT', '0')
+
+    import app as app_module
+
+    app_module = importlib.reload(app_module)
+    app_module.app.config.update(TESTING=True)
+    return app_module
+
+
+def test_pack_embedding_round_trips_float32_and_float16():
+    from backend.embedding_service import pack_embedding, unpack_embedding
+
+    vector = [0.25, -1.5, 3.0]
+    blob, dtype_name = pack_embedding(vector, 'float32')
+    assert dtype_name == 'float32'
+    assert len(blob) == 12
+    assert unpack_embedding(blob, dtype_name).tolist() == vector
+
+    blob16, dtype16 = pack_embedding(vector, 'float16')
+    assert len(blob16) == 6
+    assert unpack_embedding(blob16, dtype16).tolist() == vector
+    assert unpack_embedding(b'\x00\x01\x02', 'float32') is None
+
+
+def test_score_embedding_matrix_matches_pairwise_cosine():
+    from backend.embedding_service import (
+        cosine_similarity,
+        normalize_rows,
+        score_embedding_matrix,
+    )
+
+    rng = np.random.default_rng(7)
+    raw = rng.normal(size=(40, 8)).astype(np.float32)
+    ids = np.arange(100, 140, dtype=np.int64)
+    query = rng.normal(size=8).tolist()
+
+    expected = sorted(
+        ((cosine_similarity(query, row.tolist()), int(entity_id)) for entity_id, row in zip(ids, raw)),
+        key=lambda pair: pair[0],
+        reverse=True,
+    )[:10]
+    scored = score_embedding_matrix(query, ids, normalize_rows(raw), 10)
+
+    assert [entity_id for _, entity_id in scored] == [entity_id for _, entity_id in expected]
+    for (score, _), (expected_score, _) in zip(scored, expected):
+        assert abs(score - expected_score) < 1e-5
+    assert score_embedding_matrix([1.0, 0.0], ids, normalize_rows(raw), 10) == []
+
+
+def test_load_embedding_matrix_reads_blobs_and_legacy_json(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch)
+    from backend import embedding_service
+
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        user = app_module.User(username='embed-owner', email=None)
+        user.set_password('dummy')
+        app_module.db.session.add(user)
+        app_module.db.session.flush()
+
+        blob, dtype_name = embedding_service.pack_embedding([3.0, 4.0])
+        app_module.db.session.add_all([
+            embedding_service.EmbeddingRecord(
+                user_id=user.id,
+                entity_type=embedding_service.ENTITY_RECALL,
+                entity_id=1,
+                embedding_blob=blob,
+                embedding_dtype=dtype_name,
+                embedding_dim=2,
+            ),
+            embedding_service.EmbeddingRecord(
+                user_id=user.id,
+                entity_type=embedding_service.ENTITY_RECALL,
+                entity_id=2,
+                embedding_json=json.dumps([0.0, 2.0]),
+                embedding_dim=2,
+            ),
+        ])
+        app_module.db.session.commit()
+
+        ids, matrix = embedding_service.load_embedding_matrix(user.id, embedding_service.ENTITY_RECALL)
+
+    assert sorted(ids.tolist()) == [1, 2]
+    rows = dict(zip(ids.tolist(), matrix.tolist()))
+    assert np.allclose(rows[1], [0.6, 0.8])
+    assert np.allclose(rows[2], [0.0, 1.0])
+
+
+def test_vector_cache_copy_on_write_keeps_held_views_and_counts_hits():
+    from backend.vector_cache import VectorIndexCache
+
+    loads = []
+
+    def loader(user_id, entity_type):
+        loads.append((user_id, entity_type))
+        return np.array([1, 2], dtype=np.int64), np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+
+    cache = VectorIndexCache(max_bytes=10_000, ttl_seconds=0)
+    ids, _ = cache.get(7, 'recall', loader)
+    assert ids.tolist() == [1, 2]
+
+    cache.upsert(7, 'recall', 3, [3.0, 4.0])
+    held_ids, held_matrix = cache.get(7, 'recall', loader)
+    cache.upsert(7, 'recall', 1, [0.0, 5.0])
+    cache.remove(7, 'recall', 2)
+    ids, matrix = cache.get(7, 'recall', loader)
+
+    # A view handed out earlier is unaffected by the later update and removal.
+    assert held_ids.tolist() == [1, 2, 3]
+    assert np.allclose(held_matrix, [[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]])
+    assert cache._loading == {}
+    assert loads == [(7, 'recall')]
+    rows = dict(zip(ids.tolist(), matrix.tolist()))
+    assert set(rows) == {1, 3}
+    assert np.allclose(rows[1], [0.0, 1.0])
+    assert np.allclose(rows[3], [0.6, 0.8])
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 1
+
+
+def test_vector_cache_batch_upsert_copies_buffers_once():
+    from backend.vector_cache import VectorIndexCache, _MatrixEntry
+
+    def loader(user_id, entity_type):
+        ids = np.arange(1, 5, dtype=np.int64)
+        return ids, np.eye(4, dtype=np.float32)
+
+    cache = VectorIndexCache(max_bytes=10_000, ttl_seconds=0)
+    held_ids, held_matrix = cache.get(7, 'recall', loader)
+    entry = cache._entries[(7, 'recall')]
+    copies = []
+    original_grow = _MatrixEntry._grow
+
+    def counting_grow(self, capacity=None):
+        copies.append(capacity)
+        original_grow(self, capacity)
+
+    entry._grow = counting_grow.__get__(entry)
+    cache.upsert_many(7, 'recall', [(1, [0, 2, 0, 0]), (2, [3, 0, 0, 0]), (3, [0, 0, 0, 4]), (9, [1, 1, 1, 1])])
+    ids, matrix = cache.get(7, 'recall', loader)
+
+    assert len(copies) == 1
+    assert held_ids.tolist() == [1, 2, 3, 4]
+    assert np.allclose(held_matrix, np.eye(4))
+    rows = dict(zip(ids.tolist(), matrix.tolist()))
+    assert set(rows) == {1, 2, 3, 4, 9}
+    assert np.allclose(rows[1], [0, 1, 0, 0])
+    assert np.allclose(rows[9], [0.5, 0.5, 0.5, 0.5])
+
+
+def test_vector_cache_evicts_least_recently_used_entry_over_budget():
+    from backend.vector_cache import VectorIndexCache
+
+    def loader(user_id, entity_type):
+        return np.arange(10, dtype=np.int64), np.ones((10, 8), dtype=np.float32)
+
+    # Each entry is 10 * 8 bytes of ids plus 10 * 8 * 4 bytes of floats.
+    cache = VectorIndexCache(max_bytes=800, ttl_seconds=0)
+    cache.get(1, 'recall', loader)
+    cache.get(2, 'recall', loader)
+    cache.get(1, 'recall', loader)
+    cache.get(3, 'recall', loader)
+
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 1
+    cache.get(1, 'recall', loader)
+    assert cache.stats()['hits'] == 2
+
+
+def test_ensure_embeddings_for_type_batches_requests_and_skips_fresh_rows(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, name='embeddings-batch.db')
+    from backend import embedding_service
+
+    calls = []
+
+    def fake_embed_texts(texts):
+        calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    monkeypatch.setattr(embedding_service, 'embed_texts', fake_embed_texts)
+
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        user = app_module.User(username='batch-owner', email=None)
+        user.set_password('dummy')
+        app_module.db.session.add(user)
+        app_module.db.session.flush()
+        for idx in range(5):
+            app_module.db.session.add(app_module.RecallItem(
+                user_id=user.id,
+                title=f'Recall {idx}',
+                why='because',
+                payload_type='text',
+                payload='x' * (idx + 1),
+            ))
+        app_module.db.session.commit()
+
+        written = embedding_service.ensure_embeddings_for_type(
+            user.id,
+            embedding_service.ENTITY_RECALL,
+            max_inputs=2,
+        )
+        assert written == 5
+        assert [len(batch) for batch in calls] == [2, 2, 1]
+        assert embedding_service.EmbeddingRecord.query.count() == 5
+
+        calls.clear()
+        assert embedding_service.ensure_embeddings_for_type(user.id, embedding_service.ENTITY_RECALL) == 0
+        assert calls == []
+
+
+def test_upsert_embeddings_bulk_retries_conflicts_with_the_computed_vectors(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, name='embeddings-conflict.db')
+    from backend import embedding_service
+
+    calls = []
+    monkeypatch.setattr(
+        embedding_service,
+        'embed_texts',
+        lambda texts: calls.append(list(texts)) or [[1.0, float(len(text))] for text in texts],
+    )
+
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        user = app_module.User(username='conflict-owner', email=None)
+        user.set_password('dummy')
+        app_module.db.session.add(user)
+        app_module.db.session.commit()
+        user_id = user.id
+
+        find_vectors = embedding_service._find_vectors
+        finds = []
+
+        def racing_find_vectors(hashes, model_name):
+            if not finds:
+                # Another worker inserts entity 2's record between our read and our write.
+                with app_module.db.engine.begin() as connection:
+                    connection.execute(embedding_service.EmbeddingRecord.__table__.insert().values(
+                        user_id=user_id, entity_type=embedding_service.ENTITY_BOOKMARK, entity_id=2,
+                    ))
+            finds.append(list(hashes))
+            return find_vectors(hashes, model_name)
+
+        monkeypatch.setattr(embedding_service, '_find_vectors', racing_find_vectors)
+        written = embedding_service.upsert_embeddings_bulk(
+            user_id, embedding_service.ENTITY_BOOKMARK, [(1, 'Dentist'), (2, 'Gym')]
+        )
+
+        assert written == 2
+        assert calls == [['Dentist', 'Gym']] and len(finds) == 2
+        records = embedding_service.EmbeddingRecord.query.order_by(embedding_service.EmbeddingRecord.entity_id).all()
+        assert [(record.entity_id, record.vector.ref_count) for record in records] == [(1, 1), (2, 1)]
+
+
+def test_refresh_dirty_embeddings_drains_markers_and_reports_status(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, name='embeddings-dirty.db')
+    from backend import embedding_service
+
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    monkeypatch.setattr(
+        embedding_service,
+        'embed_texts',
+        lambda texts: [[1.0, float(len(text))] for text in texts],
+    )
+
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        user = app_module.User(username='dirty-owner', email=None)
+        user.set_password('dummy')
+        app_module.db.session.add(user)
+        app_module.db.session.flush()
+        bookmark = app_module.BookmarkItem(user_id=user.id, title='Dentist', value='https://dentist.test')
+        app_module.db.session.add(bookmark)
+        app_module.db.session.commit()
+
+        embedding_service.mark_embedding_dirty(user.id, embedding_service.ENTITY_BOOKMARK, [bookmark.id, 999])
+        embedding_service.mark_embedding_dirty(user.id, embedding_service.ENTITY_BOOKMARK, [bookmark.id])
+        status = embedding_service.embedding_index_status(user.id, embedding_service.ENTITY_BOOKMARK)
+        assert status['pending'] == 2
+        assert status['indexed'] == 0
+
+        assert embedding_service.refresh_dirty_embeddings() == 1
+
+        status = embedding_service.embedding_index_status(user.id, embedding_service.ENTITY_BOOKMARK)
+        assert status['pending'] == 0
+        assert status['indexed'] == 1
+        assert embedding_service.EmbeddingDirtyMarker.query.count() == 0
+
+        # Detached markers upsert one row per entity and leave the caller's pending work alone.
+        user_id, bookmark_id = user.id, bookmark.id
+        app_module.db.session.add(app_module.BookmarkItem(user_id=user_id, title='Unsaved', value='x'))
+        embedding_service.mark_embedding_dirty_detached(user_id, embedding_service.ENTITY_BOOKMARK, [bookmark_id])
+        embedding_service.mark_embedding_dirty_detached(user_id, embedding_service.ENTITY_BOOKMARK, [bookmark_id, 7])
+        app_module.db.session.rollback()
+        assert app_module.BookmarkItem.query.filter_by(title='Unsaved').count() == 0
+        assert sorted(
+            marker.entity_id for marker in embedding_service.EmbeddingDirtyMarker.query.all()
+        ) == sorted([7, bookmark_id])
+
+
+def test_identical_text_shares_one_vector_with_ref_counting_and_gc(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, name='embeddings-shared.db')
+    from datetime import timedelta
+
+    from backend import embedding_service
+
+    calls = []
+
+    def fake_embed_texts(texts):
+        calls.append(list(texts))
+        return [[1.0, float(len(text))] for text in texts]
+
+    monkeypatch.setattr(embedding_service, 'embed_texts', fake_embed_texts)
+    monkeypatch.setattr(embedding_service, 'embed_text', lambda text: fake_embed_texts([text])[0])
+
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        owners = []
+        for name in ('shared-a', 'shared-b'):
+            user = app_module.User(username=name, email=None)
+            user.set_password('dummy')
+            app_module.db.session.add(user)
+            owners.append(user)
+        app_module.db.session.commit()
+        user_a, user_b = owners[0].id, owners[1].id
+
+        written = embedding_service.upsert_embeddings_bulk(
+            user_a,
+            embedding_service.ENTITY_CALENDAR,
+            [(1, 'Dentist 9am'), (2, 'Dentist 9am'), (3, 'Gym')],
+        )
+        assert written == 3
+        assert calls == [['Dentist 9am', 'Gym']]
+
+        assert embedding_service.upsert_embedding(user_b, embedding_service.ENTITY_CALENDAR, 5, 'Dentist 9am')
+        assert len(calls) == 1
+
+        shared = embedding_service.EmbeddingVector.query.filter_by(
+            content_hash=embedding_service._hash_text('Dentist 9am'),
+        ).one()
+        assert shared.ref_count == 3
+
+        for entity_id in (1, 2):
+            embedding_service.delete_embedding_for_entity(user_a, embedding_service.ENTITY_CALENDAR, entity_id)
+        embedding_service.delete_embedding_for_entity(user_b, embedding_service.ENTITY_CALENDAR, 5)
+        app_module.db.session.commit()
+        app_module.db.session.refresh(shared)
+        assert shared.ref_count == 0
+
+        assert embedding_service.collect_unused_vectors() == 0
+        # A stale ref_count never decides deletion: the referenced 'Gym' vector survives.
+        gym = embedding_service.EmbeddingVector.query.filter_by(
+            content_hash=embedding_service._hash_text('Gym'),
+        ).one()
+        gym.ref_count = 0
+        app_module.db.session.commit()
+        assert embedding_service.collect_unused_vectors(grace=timedelta(seconds=-1)) == 1
+        assert embedding_service.EmbeddingVector.query.count() == 1
+
+        # A record left pointing at a vanished vector is detached and queued for re-embedding.
+        app_module.db.session.delete(gym)
+        app_module.db.session.commit()
+        assert embedding_service.collect_unused_vectors(grace=timedelta(seconds=-1)) == 0
+        record = embedding_service.EmbeddingRecord.query.filter_by(entity_id=3).one()
+        assert record.vector_id is None and record.source_hash is None
+        assert embedding_service.EmbeddingDirtyMarker.query.filter_by(user_id=user_a, entity_id=3).count() == 1
+
+
+def test_query_embedding_cache_normalizes_keys_and_survives_restart(tmp_path, monkeypatch):
+    from backend import query_embedding_cache as cache_module
+    from backend.query_embedding_cache import QueryEmbeddingCache
+
+    disk_path = str(tmp_path / 'query-cache.sqlite')
+    cache = QueryEmbeddingCache(max_entries=2, ttl_seconds=60, disk_path=disk_path)
+    assert cache.get('model-a', 'Dentist  appointment') is None
+    cache.put('model-a', 'Dentist  appointment', [0.5, 0.25])
+
+    assert cache.get('model-a', ' dentist appointment ') == [0.5, 0.25]
+    assert cache.get('model-b', 'dentist appointment') is None
+
+    cache.put('model-a', 'gym', [1.0, 0.0])
+    cache.put('model-a', 'groceries', [0.0, 1.0])
+    assert cache.stats()['entries'] == 2
+
+    restarted = QueryEmbeddingCache(max_entries=2, ttl_seconds=60, disk_path=disk_path)
+    assert restarted.get('model-a', 'DENTIST appointment') == [0.5, 0.25]
+    stats = restarted.stats()
+    assert stats['disk_hits'] == 1 and stats['hit_rate'] == 1.0
+
+    now = cache_module.time.time()
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now + 120)
+    assert QueryEmbeddingCache(ttl_seconds=60, disk_path=disk_path).get('model-a', 'gym') is None
+
+    # Expired rows are pruned once per interval, through the stored_at index, not on every put.
+    import sqlite3
+    from contextlib import closing
+
+    cache.put('model-a', 'tea', [0.1, 0.2])
+    with closing(sqlite3.connect(disk_path)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM query_embedding').fetchone()[0] == 4
+        plan = conn.execute('EXPLAIN QUERY PLAN DELETE FROM query_embedding WHERE stored_at < 1').fetchall()
+        assert 'idx_query_embedding_stored_at' in str(plan)
+    cache._pruned_at = 0.0
+    cache.put('model-a', 'coffee', [0.3, 0.4])
+    with closing(sqlite3.connect(disk_path)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM query_embedding').fetchone()[0] == 2
+
+
+def test_embed_text_serves_repeated_queries_from_cache(monkeypatch):
+    from backend import ai_embeddings
+    from backend.query_embedding_cache import QueryEmbeddingCache
+
+    requests_made = []
+
+    class FakeEmbeddings:
+        def create(self, model, input):
+            requests_made.append(input)
+            return SimpleNamespace(data=[SimpleNamespace(embedding=[0.1, 0.2])])
+
+    monkeypatch.setattr(ai_embeddings, 'query_embedding_cache', QueryEmbeddingCache(max_entries=8))
+    monkeypatch.setattr(ai_embeddings, 'get_openai_client', lambda: SimpleNamespace(embeddings=FakeEmbeddings()))
+
+    assert ai_embeddings.embed_text('Where is my passport?') == [0.1, 0.2]
+    assert ai_embeddings.embed_text('where is my  passport?') == [0.1, 0.2]
+    assert requests_made == ['Where is my passport?']
+
+
+def _clustered_unit_rows(rng, clusters, per_cluster, dim):
+    from backend.embedding_service import normalize_rows
+
+    centers = rng.normal(size=(clusters, dim))
+    rows = np.repeat(centers, per_cluster, axis=0) + rng.normal(scale=0.35, size=(clusters * per_cluster, dim))
+    return normalize_rows(rows.astype(np.float32))
+
+
+def test_ivf_index_recall_is_tunable_against_exact_search():
+    from backend.ann_index import IvfIndex, measure_recall
+
+    rng = np.random.default_rng(11)
+    matrix = _clustered_unit_rows(rng, clusters=40, per_cluster=100, dim=16)
+    ids = np.arange(matrix.shape[0], dtype=np.int64)
+    queries = matrix[rng.choice(matrix.shape[0], size=25, replace=False)]
+
+    index = IvfIndex.build(ids, matrix, n_lists=32)
+    assert measure_recall(index, matrix, queries, k=10, nprobe=32) == 1.0
+    assert measure_recall(index, matrix, queries, k=10, nprobe=8) >= 0.9
+    assert measure_recall(index, matrix, queries, k=10, nprobe=1) <= measure_recall(
+        index, matrix, queries, k=10, nprobe=8
+    )
+
+
+def test_ann_registry_follows_cache_changes_and_persists(tmp_path):
+    from backend.ann_index import AnnIndexRegistry
+
+    rng = np.random.default_rng(5)
+    matrix = _clustered_unit_rows(rng, clusters=10, per_cluster=30, dim=8)
+    ids = np.arange(1, matrix.shape[0] + 1, dtype=np.int64)
+    registry = AnnIndexRegistry(min_rows=100, nprobe=4, directory=str(tmp_path))
+
+    assert registry.search(1, 'recall', matrix[0], ids[:50], matrix[:50], 5) is None
+    rows, scores = registry.search(1, 'recall', matrix[0], ids, matrix, 5)
+    assert ids[rows[0]] == 1 and abs(scores[0] - 1.0) < 1e-5
+    assert (tmp_path / '1_recall.npz').exists()
+
+    # A new row appended by the cache is assigned on the next search.
+    extra = np.vstack([matrix, matrix[7:8]])
+    extra_ids = np.append(ids, 9999)
+    rows, _ = registry.search(1, 'recall', matrix[7], extra_ids, extra, 2)
+    assert set(extra_ids[rows].tolist()) == {8, 9999}
+
+    restarted = AnnIndexRegistry(min_rows=100, nprobe=4, directory=str(tmp_path))
+    rows, _ = restarted.search(1, 'recall', matrix[3], ids[::-1], matrix[::-1], 1)
+    assert ids[::-1][rows[0]] == 4
+    assert restarted.stats()['builds'] == 0
+
+
+def test_ann_registry_builds_outside_the_lock_of_other_keys(tmp_path, monkeypatch):
+    import threading
+
+    from backend import ann_index
+
+    rng = np.random.default_rng(9)
+    matrix = _clustered_unit_rows(rng, clusters=10, per_cluster=30, dim=8)
+    ids = np.arange(1, matrix.shape[0] + 1, dtype=np.int64)
+    registry = ann_index.AnnIndexRegistry(min_rows=100, nprobe=4, directory=str(tmp_path))
+    assert registry.search(2, 'recall', matrix[0], ids, matrix, 1) is not None
+
+    started, release = threading.Event(), threading.Event()
+    build = ann_index.IvfIndex.build
+
+    def slow_build(*args, **kwargs):
+        started.set()
+        assert release.wait(5)
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(ann_index.IvfIndex, 'build', slow_build)
+    results = {}
+    builder = threading.Thread(
+        target=lambda: results.setdefault('built', registry.search(1, 'recall', matrix[0], ids, matrix, 1))
+    )
+    builder.start()
+    assert started.wait(5)
+    # Another user's index answers, and the same key falls back to exact search, while the build runs.
+    rows, _ = registry.search(2, 'recall', matrix[3], ids, matrix, 1)
+    assert ids[rows[0]] == 4
+    assert registry.search(1, 'recall', matrix[0], ids, matrix, 1) is None
+    assert registry.stats()['building'] == 1
+    release.set()
+    builder.join(5)
+    assert ids[results['built'][0][0]] == 1
+    assert registry.stats()['building'] == 0 and registry.stats()['builds'] == 2
+
+
+def test_semantic_search_endpoint_embeds_once_and_applies_type_quotas(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, name='embeddings-unified.db')
+    from backend import ai_service, embedding_service
+
+    def direction(text):
+        if 'Dentist link' in text:
+            return [1.0, 0.0]
+        return [0.8, 0.6] if 'Dentist' in text else [0.0, 1.0]
+
+    query_calls = []
+
+    def fake_embed_text(text):
+        query_calls.append(text)
+        return [1.0, -0.05]
+
+    monkeypatch.setattr(ai_service, 'embed_text', fake_embed_text)
+    monkeypatch.setattr(
+        embedding_service,
+        'embed_texts',
+        lambda texts: [direction(text) for text in texts],
+    )
+
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        user = app_module.User(username='unified-owner', email=None)
+        user.set_password('dummy')
+        app_module.db.session.add(user)
+        app_module.db.session.flush()
+        for idx in range(6):
+            app_module.db.session.add(app_module.BookmarkItem(
+                user_id=user.id, title=f'Dentist link {idx}', value=f'https://dentist.test/{idx}',
+            ))
+        app_module.db.session.add(app_module.RecallItem(
+            user_id=user.id, title='Dentist insurance', why='claims', payload_type='text', payload='policy',
+        ))
+        app_module.db.session.add(app_module.RecallItem(
+            user_id=user.id, title='Gym plan', why='fitness', payload_type='text', payload='legs',
+        ))
+        app_module.db.session.commit()
+        user_id = user.id
+        for entity_type in (embedding_service.ENTITY_BOOKMARK, embedding_service.ENTITY_RECALL):
+            embedding_service.ensure_embeddings_for_type(user_id, entity_type)
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+    response = client.get('/api/semantic-search?q=dentist&limit=4&types=recall,bookmark')
+    assert response.status_code == 200
+    payload = response.get_json()
+
+    assert query_calls == ['dentist']
+    types = [hit['type'] for hit in payload['results']]
+    # Bookmarks score higher, but the quota keeps a slot for the best recall.
+    assert types == ['bookmark', 'bookmark', 'bookmark', 'recall']
+    assert all('Dentist' in hit['item']['title'] for hit in payload['results'])
+    assert set(payload['index']) == {'recall', 'bookmark'}
+
+    with app_module.app.app_context():
+        single = ai_service.semantic_search(user_id, 'dentist', limit=4, entity_types='recall')
+    assert set(single['index']) == {'recall'}
+    assert [hit['item']['title'] for hit in single['results']][0] == 'Dentist insurance'
+    assert {hit['type'] for hit in single['results']} == {'recall'}
+
+    response = client.get('/api/semantic-search?q=dentist&types=recall,recalls')
+    assert response.status_code == 400
+
+    # Without a query vector the keyword fallback must not call the provider again per type.
+    query_calls.clear()
+    monkeypatch.setattr(ai_service, 'embed_text', lambda text: query_calls.append(text))
+    response = client.get('/api/semantic-search?q=dentist&limit=4')
+    assert response.status_code == 200
+    assert query_calls == ['dentist']
+    assert {hit['type'] for hit in response.get_json()['results']} <= {'recall', 'bookmark'}
+
+
+def test_bm25_index_ranks_rare_terms_and_supports_upserts():
+    from backend.lexical_index import Bm25Index, reciprocal_rank_fusion
+
+    index = Bm25Index({
+        1: 'module: bookmark Dentist portal login',
+        2: 'module: bookmark Gym timetable',
+        3: 'module: bookmark Dentist dentist invoice',
+    })
+    assert [entity_id for _, entity_id in index.search('dentist', 5)] == [3, 1]
+    assert index.search('module', 5) and index.search('unknown', 5) == []
+
+    index.upsert(2, 'module: bookmark Dentist parking')
+    index.remove(3)
+    assert {entity_id for _, entity_id in index.search('dentist', 5)} == {1, 2}
+    assert 'invoice' not in index.postings
+
+    fused = reciprocal_rank_fusion([[7, 8, 9], [9, 7]])
+    assert [entity_id for _, entity_id in fused] == [7, 9, 8]
+
+
+def test_semantic_search_fuses_lexical_hits_and_skips_ai_rerank(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, name='embeddings-hybrid.db')
+    from backend import ai_service, embedding_service
+
+    monkeypatch.setattr(ai_service, 'embed_text', lambda text: [1.0, 0.0])
+    monkeypatch.setattr(
+        embedding_service,
+        'embed_texts',
+        lambda texts: [[0.9, 0.1] if 'passport' in text else [0.2, 1.0] for text in texts],
+    )
+    rerank_calls = []
+    monkeypatch.setattr(ai_service, 'call_chat_json', lambda *args, **kwargs: rerank_calls.append(args))
+    monkeypatch.setenv('AI_SEARCH_RERANK', '1')
+    lexical_cache = embedding_service.lexical_cache
+    monkeypatch.setattr(lexical_cache, '_ensure_worker', lambda: None)
+
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        user = app_module.User(username='hybrid-owner', email=None)
+        user.set_password('dummy')
+        app_module.db.session.add(user)
+        app_module.db.session.flush()
+        app_module.db.session.add_all([
+            app_module.RecallItem(user_id=user.id, title='Passport renewal', why='travel',
+                                  payload_type='text', payload='form'),
+            app_module.RecallItem(user_id=user.id, title='Visa office hours', why='travel',
+                                  payload_type='text', payload='embassy'),
+        ])
+        app_module.db.session.commit()
+        embedding_service.ensure_embeddings_for_type(user.id, embedding_service.ENTITY_RECALL)
+
+        # The first search never scans the account: it is vector-only and queues the BM25 build.
+        results = ai_service._search_recalls_semantic(user.id, 'passport', limit=2)
+        assert [item['title'] for item in results] == ['Passport renewal', 'Visa office hours']
+        assert embedding_service.get_lexical_index(user.id, embedding_service.ENTITY_RECALL) is None
+        assert lexical_cache.run_pending() == 1
+        rerank_calls.clear()
+
+        results = ai_service._search_recalls_semantic(user.id, 'passport', limit=2)
+        assert [item['title'] for item in results] == ['Passport renewal', 'Visa office hours']
+        assert rerank_calls == []
+
+        # Unembedded edits become lexically searchable once the builder re-reads them.
+        visa = app_module.RecallItem.query.filter_by(title='Visa office hours').one()
+        visa.payload = 'embassy appointment for passport photos'
+        app_module.db.session.commit()
+        embedding_service.mark_embedding_dirty(user.id, embedding_service.ENTITY_RECALL, [visa.id])
+        assert lexical_cache.run_pending() == 1
+        lexical = embedding_service.get_lexical_index(user.id, embedding_service.ENTITY_RECALL)
+        assert {entity_id for _, entity_id in lexical.search('photos', 5)} == {visa.id}
+
+
+def test_embedding_queue_coalesces_repeated_requests_into_batches():
+    import time
+
+    from backend.embedding_queue import EmbeddingRefreshQueue
+
+    calls = []
+    queue = EmbeddingRefreshQueue(
+        refresh=lambda user_id, entity_type, ids: calls.append((user_id, entity_type, sorted(ids))),
+        debounce_seconds=5,
+        max_delay_seconds=20,
+        max_pending=3,
+        batch_size=2,
+    )
+    queue._ensure_dispatcher = lambda: None
+
+    queue.enqueue(None, 1, 'todo_item', [10, 11])
+    queue.enqueue(None, 1, 'todo_item', [10])
+    queue.enqueue(None, 2, 'recall', [5, 6])
+    stats = queue.stats()
+    assert stats['depth'] == 3
+    assert stats['coalesced'] == 1 and stats['dropped'] == 1
+
+    assert queue.take_ready() == []
+    batches = queue.take_ready(time.monotonic() + 6)
+    assert sorted((user_id, entity_type, sorted(ids)) for user_id, entity_type, ids, _ in batches) == [
+        (1, 'todo_item', [10, 11]),
+        (2, 'recall', [5]),
+    ]
+    for batch in batches:
+        queue.run_batch(*batch)
+    assert len(calls) == 2
+    stats = queue.stats()
+    assert stats['depth'] == 0 and stats['processed'] == 3
+
+
+def test_embedding_queue_dispatcher_flushes_through_worker_pool():
+    import threading
+
+    from backend.embedding_queue import EmbeddingRefreshQueue
+
+    done = threading.Event()
+    calls = []
+
+    def refresh(user_id, entity_type, ids):
+        calls.append(sorted(ids))
+        done.set()
+
+    queue = EmbeddingRefreshQueue(refresh=refresh, debounce_seconds=0.05, workers=1)
+    for _ in range(5):
+        queue.enqueue(None, 3, 'bookmark', [1, 2])
+
+    assert done.wait(5)
+    assert calls == [[1, 2]]
+    assert queue.stats()['coalesced'] == 8
+
+
+def test_embed_texts_cached_dedupes_and_only_embeds_misses(monkeypatch):
+    from backend import ai_embeddings
+    from backend.query_embedding_cache import QueryEmbeddingCache
+
+    batches = []
+
+    def fake_embed_texts(texts):
+        batches.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    cache = QueryEmbeddingCache(max_entries=16)
+    cache.put(ai_embeddings.embedding_model_name(), 'milk', [9.0, 9.0])
+    monkeypatch.setattr(ai_embeddings, 'query_embedding_cache', cache)
+    monkeypatch.setattr(ai_embeddings, 'embed_texts', fake_embed_texts)
+
+    vectors = ai_embeddings.embed_texts_cached(['milk', 'eggs', 'eggs', '', 'bread'])
+    assert vectors == [[9.0, 9.0], [4.0, 1.0], [4.0, 1.0], None, [5.0, 1.0]]
+    assert batches == [['eggs', 'bread']]
+
+    assert ai_embeddings.embed_texts_cached(['bread', 'eggs'])[0] == [5.0, 1.0]
+    assert len(batches) == 1
@@ -88,3 +88,68 @@ def test_detect_note_list_duplicates_reports_subsection_context():
 
     assert payload['groups']
     assert payload['groups'][0]['items'][0]['section'] == 'Projects > Work'
+
+
+def test_detect_note_list_duplicates_blocking_matches_all_pairs(monkeypatch):
+    import random
+
+    from services import duplicate_service
+
+    rng = random.Random(4)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz'
+    lines = [
+        ' '.join(''.join(rng.choice(alphabet) for _ in range(8)) for _ in range(2))
+        for _ in range(200)
+    ]
+    lines += lines[:15]
+    lines += [line[:3] + line[4:] for line in lines[20:35]]
+    items = [make_item(idx + 1, line, idx + 1) for idx, line in enumerate(lines)]
+
+    def grouped_ids(min_items):
+        monkeypatch.setattr(duplicate_service, 'DUPLICATE_BLOCKING_MIN_ITEMS', min_items)
+        payload = detect_note_list_duplicates(
+            items=items,
+            section_prefix='[[section]]',
+            embed_text_fn=lambda _text: None,
+        )
+        assert payload['method'] == 'fuzzy'
+        return sorted(sorted(entry['id'] for entry in group['items']) for group in payload['groups'])
+
+    blocked = grouped_ids(0)
+    assert len(blocked) == 30
+    assert blocked == grouped_ids(10 ** 6)
+
+
+def test_detect_note_list_duplicates_embedding_mode_batches_and_matches_serial():
+    vectors = {
+        'sneakers': [1.0, 0.1, 0.0],
+        'trainers': [0.95, 0.15, 0.0],
+        'milk': [0.0, 1.0, 0.0],
+        'oat milk': [0.0, 0.2, 1.0],
+        'bread': [0.3, -1.0, 0.2],
+    }
+    items = [make_item(idx + 1, text, idx + 1) for idx, text in enumerate(vectors)]
+    batch_calls = []
+
+    def embed_texts(texts):
+        batch_calls.append(list(texts))
+        return [vectors[text] for text in texts]
+
+    batched = detect_note_list_duplicates(
+        items=items,
+        section_prefix='[[section]]',
+        embed_text_fn=lambda _text: None,
+        embed_texts_fn=embed_texts,
+    )
+    serial = detect_note_list_duplicates(
+        items=items,
+        section_prefix='[[section]]',
+        embed_text_fn=lambda text: vectors[text],
+    )
+
+    assert len(batch_calls) == 1
+    assert batched['method'] == 'embeddings'
+    groups = sorted(sorted(entry['id'] for entry in group['items']) for group in batched['groups'])
+    # sneakers/trainers by cosine, milk/oat milk by token containment.
+    assert groups == [[1, 2], [3, 4]]
+    assert batched == serial
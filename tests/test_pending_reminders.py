@@ -0,0 +1,91 @@
+import importlib
+from datetime import datetime, time, timedelta
+
+import pytz
+
+
+def _load_test_app(tmp_path, monkeypatch, name='pending.db'):
+    database_path = tmp_path / name
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database_path.as_posix()}')
+    monkeypatch.setenv('BOOTSTRAP_JOBS_ON_IMPORT', '0')
+    monkeypatch.setenv('ENABLE_CALENDAR_JOBS', '0')
+
+    import app as app_module
+
+    app_module = importlib.reload(app_module)
+    app_module.app.config.update(TESTING=True)
+    return app_module
+
+
+def test_pending_reminders_window_sources_and_etag(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch)
+    db = app_module.db
+    CalendarEvent = app_module.CalendarEvent
+    tz = pytz.timezone(app_module.app.config['DEFAULT_TIMEZONE'])
+    today = datetime.now(tz).date()
+    tomorrow = today + timedelta(days=1)
+
+    with app_module.app.app_context():
+        user = app_module.User(username='pending', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        todo_list = app_module.TodoList(title='Inbox', user_id=user.id)
+        db.session.add(todo_list)
+        db.session.flush()
+        open_todo = app_module.TodoItem(list_id=todo_list.id, content='Open', due_date=tomorrow)
+        done_todo = app_module.TodoItem(list_id=todo_list.id, content='Done', due_date=tomorrow, status='done')
+        db.session.add_all([open_todo, done_todo])
+        db.session.flush()
+        # Legacy rows can carry a NULL status; they are still open.
+        db.session.execute(
+            db.text('UPDATE todo_item SET status = NULL WHERE id = :id'), {'id': open_todo.id}
+        )
+        db.session.add_all([
+            CalendarEvent(user_id=user.id, title='Standup', day=tomorrow, start_time=time(9, 0),
+                          reminder_minutes_before=15),
+            CalendarEvent(user_id=user.id, title='Open todo', day=tomorrow, start_time=time(10, 0),
+                          reminder_minutes_before=5, todo_item_id=open_todo.id),
+            CalendarEvent(user_id=user.id, title='Done todo', day=tomorrow, start_time=time(11, 0),
+                          reminder_minutes_before=5, todo_item_id=done_todo.id),
+            CalendarEvent(user_id=user.id, title='Deleted todo', day=tomorrow, start_time=time(11, 0),
+                          reminder_minutes_before=5, todo_item_id=9999),
+            CalendarEvent(user_id=user.id, title='Long lead', day=today + timedelta(days=10),
+                          start_time=time(12, 0), reminder_minutes_before=6 * 24 * 60),
+            CalendarEvent(user_id=user.id, title='Very long lead', day=today + timedelta(days=20),
+                          start_time=time(13, 0), reminder_minutes_before=14 * 24 * 60),
+            CalendarEvent(user_id=user.id, title='Too far', day=today + timedelta(days=9),
+                          start_time=time(12, 0), reminder_minutes_before=5),
+            CalendarEvent(user_id=user.id, title='Last year', day=today - timedelta(days=365),
+                          start_time=time(12, 0), reminder_minutes_before=5),
+            CalendarEvent(user_id=user.id, title='Sent', day=tomorrow, start_time=time(12, 0),
+                          reminder_minutes_before=5, reminder_sent=True),
+            CalendarEvent(user_id=user.id, title='No reminder', day=tomorrow, start_time=time(12, 0)),
+        ])
+        db.session.flush()
+        from backend.app_core_logic import _schedule_reminder_job
+        for event in CalendarEvent.query.filter(CalendarEvent.reminder_sent.isnot(True)):
+            _schedule_reminder_job(event, commit=False)
+        db.session.commit()
+        user_id = user.id
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+    response = client.get('/api/calendar/events/pending-reminders')
+    assert response.status_code == 200
+    assert [item['title'] for item in response.get_json()['reminders']] == [
+        'Standup', 'Open todo', 'Long lead', 'Very long lead',
+    ]
+    etag = response.headers['ETag']
+
+    unchanged = client.get('/api/calendar/events/pending-reminders', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304 and unchanged.data == b''
+
+    with app_module.app.app_context():
+        event = CalendarEvent.query.filter_by(title='Standup').first()
+        event.reminder_sent = True
+        db.session.commit()
+    changed = client.get('/api/calendar/events/pending-reminders', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert [item['title'] for item in changed.get_json()['reminders']] == ['Open todo', 'Long lead', 'Very long lead']
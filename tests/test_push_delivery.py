@@ -0,0 +1,118 @@
+import base64
+import importlib
+import threading
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from backend.push_delivery import VAPID_TOKEN_SECONDS, PushDeliveryService, PushTarget
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _vapid_private_key():
+    key = ec.generate_private_key(ec.SECP256R1())
+    return _b64(key.private_numbers().private_value.to_bytes(32, 'big'))
+
+
+def _subscription_keys():
+    key = ec.generate_private_key(ec.SECP256R1())
+    public = key.public_key().public_bytes(serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint)
+    return _b64(public), _b64(b'0123456789abcdef')
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.reason = ''
+        self.text = ''
+
+
+class _FakeSession:
+    """Stands in for the pooled requests.Session; answers per endpoint after a delay."""
+
+    def __init__(self, statuses, delay=0.0):
+        self.statuses = statuses
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def post(self, endpoint, data=None, headers=None, timeout=None):
+        with self._lock:
+            self.calls.append((endpoint, {name.lower(): value for name, value in headers.items()}, timeout))
+        time.sleep(self.delay)
+        return _Response(self.statuses.get(endpoint, 201))
+
+
+def _targets(endpoints):
+    targets = []
+    for position, endpoint in enumerate(endpoints, start=1):
+        p256dh, auth = _subscription_keys()
+        targets.append(PushTarget(position, endpoint, p256dh, auth))
+    return targets
+
+
+def test_push_fans_out_concurrently_and_reuses_vapid_headers():
+    endpoints = [
+        'https://fcm.example.com/send/a',
+        'https://fcm.example.com/send/b',
+        'https://updates.example.org/wpush/c',
+        'https://updates.example.org/wpush/d',
+    ]
+    session = _FakeSession({endpoints[1]: 410, endpoints[3]: 500}, delay=0.2)
+    clock = [1_000_000.0]
+    service = PushDeliveryService(workers=4, timeout=5, session=session, clock=lambda: clock[0])
+    private_key = _vapid_private_key()
+    targets = _targets(endpoints)
+
+    started = time.perf_counter()
+    result = service.send(targets, '{"title": "Hi"}', private_key, 'mailto:ops@example.com', headers={'Urgency': 'high'})
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.6  # four 0.2s requests ran side by side
+    assert result.sent == 2 and result.dead == [2] and result.failed == 1
+    assert service.vapid_signatures == 2  # one per push-service origin
+    for endpoint, headers, timeout in session.calls:
+        assert headers['urgency'] == 'high' and headers['authorization'].startswith('vapid ')
+        assert timeout == 5
+    latency = service.endpoint_latency(endpoints[0])
+    assert latency['count'] == 1 and latency['last_ms'] >= 150 and latency['last_status'] == 201
+    assert service.endpoint_latency(endpoints[3])['failures'] == 1
+
+    service.send(targets[:1], '{}', private_key, 'mailto:ops@example.com')
+    assert service.vapid_signatures == 2
+    clock[0] += VAPID_TOKEN_SECONDS
+    service.send(targets[:1], '{}', private_key, 'mailto:ops@example.com')
+    assert service.vapid_signatures == 3
+
+
+def test_dead_subscriptions_are_deleted_together(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{(tmp_path / 'push.db').as_posix()}")
+    monkeypatch.setenv('BOOTSTRAP_JOBS_ON_IMPORT', '0')
+    import app as app_module
+    app_module = importlib.reload(app_module)
+    import backend.app_core_logic as app_core_logic
+    app_core_logic = importlib.reload(app_core_logic)
+    app_module.app.config.update(TESTING=True, VAPID_PUBLIC_KEY='public', VAPID_PRIVATE_KEY=_vapid_private_key())
+
+    endpoints = [f'https://push.example.com/{name}' for name in ('live', 'gone', 'expired')]
+    session = _FakeSession({endpoints[1]: 404, endpoints[2]: 410})
+    monkeypatch.setattr(app_core_logic, 'push_delivery', PushDeliveryService(workers=3, session=session))
+
+    db = app_module.db
+    with app_module.app.app_context():
+        user = app_module.User(username='push', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        for endpoint in endpoints:
+            p256dh, auth = _subscription_keys()
+            db.session.add(app_module.PushSubscription(user_id=user.id, endpoint=endpoint, p256dh=p256dh, auth=auth))
+        db.session.commit()
+
+        assert app_core_logic._send_push_to_user(user, 'Reminder: Call', 'Soon', event_id=7) == 1
+        remaining = [sub.endpoint for sub in app_module.PushSubscription.query.all()]
+        assert remaining == [endpoints[0]]
+        assert all(headers['topic'] == 'reminder' for _, headers, _ in session.calls)
@@ -0,0 +1,161 @@
+import importlib
+import random
+from datetime import date, time, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import event
+
+
+def _load_test_app(tmp_path, monkeypatch, name='recurrence.db'):
+    database_path = tmp_path / name
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database_path.as_posix()}')
+    monkeypatch.setenv('BOOTSTRAP_JOBS_ON_IMPORT', '0')
+
+    import app as app_module
+
+    app_module = importlib.reload(app_module)
+    app_module.app.config.update(TESTING=True)
+    return app_module
+
+
+def test_recurrence_occurrences_match_day_by_day_rule_checks():
+    from backend.recurrence import recurrence_occurrences, recurrence_occurs_on
+
+    rng = random.Random(11)
+    for _ in range(1500):
+        start = date(2024, 1, 1) + timedelta(days=rng.randint(0, 700))
+        rule = SimpleNamespace(
+            frequency=rng.choice(['daily', 'weekly', 'biweekly', 'monthly', 'yearly', 'custom', 'monthly_weekday']),
+            interval=rng.choice([None, 1, 2, 3, 5]),
+            interval_unit=rng.choice(['days', 'weeks', 'months', 'years', '']),
+            days_of_week=rng.choice([None, '0,2,4', '6', '5,0']),
+            day_of_month=rng.choice([None, 1, 15, 29, 31]),
+            month_of_year=rng.choice([None, 1, 2, 12]),
+            week_of_month=rng.choice([None, 1, 2, 5]),
+            weekday_of_month=rng.choice([None, 0, 6]),
+            start_day=start,
+            end_day=rng.choice([None, start + timedelta(days=rng.randint(0, 800))]),
+        )
+        low = date(2024, 1, 1) + timedelta(days=rng.randint(0, 900))
+        high = low + timedelta(days=rng.randint(0, 500))
+        expected = [
+            low + timedelta(days=offset)
+            for offset in range((high - low).days + 1)
+            if recurrence_occurs_on(rule, low + timedelta(days=offset))
+        ]
+        assert list(recurrence_occurrences(rule, low, high)) == expected, rule
+
+
+def test_ensure_recurring_instances_bulk_materializes_a_year(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch)
+    from backend import app_core_logic
+
+    queued = []
+    monkeypatch.setattr(app_core_logic, 'start_embedding_jobs', lambda user_id, entity_type, ids: queued.append(list(ids)))
+
+    with app_module.app.app_context():
+        db = app_module.db
+        user = app_module.User(username='recurring', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(app_module.CalendarEvent(user_id=user.id, title='One-off', day=date(2026, 1, 5), order_index=4))
+        weekly = app_module.RecurringEvent(
+            user_id=user.id, title='Standup', start_day=date(2026, 1, 5), frequency='weekly',
+            days_of_week='0,2', start_time=time(9, 0),
+        )
+        monthly = app_module.RecurringEvent(
+            user_id=user.id, title='Rent', start_day=date(2026, 1, 31), frequency='monthly',
+        )
+        db.session.add_all([weekly, monthly])
+        db.session.flush()
+        db.session.add(app_module.RecurrenceException(user_id=user.id, recurrence_id=weekly.id, day=date(2026, 1, 7)))
+        db.session.commit()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            app_core_logic._ensure_recurring_instances(user.id, date(2026, 1, 1), date(2026, 12, 31))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        instances = app_module.CalendarEvent.query.filter(app_module.CalendarEvent.recurrence_id.isnot(None)).all()
+        standups = sorted(ev.day for ev in instances if ev.recurrence_id == weekly.id)
+        rents = sorted(ev.day for ev in instances if ev.recurrence_id == monthly.id)
+        assert len(standups) == 103 and date(2026, 1, 7) not in standups
+        assert rents[:3] == [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31)] and len(rents) == 12
+        first_monday = next(ev for ev in instances if ev.day == date(2026, 1, 5))
+        assert first_monday.order_index == 5
+        assert queued == [[ev.id for ev in sorted(instances, key=lambda ev: ev.id)]]
+        assert sum(1 for sql in statements if 'max(calendar_event.order_index)' in sql) == 1
+        assert len(statements) < 20
+        from backend.search_index import search_hits
+        assert len(search_hits(user.id, 'standup', ['calendar_event'], limit=500)) == 103
+
+        app_core_logic._ensure_recurring_instances(user.id, date(2026, 1, 1), date(2026, 12, 31))
+        assert app_module.CalendarEvent.query.filter(app_module.CalendarEvent.recurrence_id.isnot(None)).count() == 115
+
+
+def test_virtual_recurrences_are_served_without_writes(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, 'virtual.db')
+    import backend.app_core_logic as app_core_logic
+    app_core_logic = importlib.reload(app_core_logic)
+    from backend.recurrence import parse_virtual_occurrence_id, virtual_occurrence_id
+
+    monkeypatch.setattr(app_core_logic, 'start_embedding_jobs', lambda *args: None)
+    monkeypatch.setattr(app_module, 'start_embedding_job', lambda *args: None)
+    app_module.app.config['CALENDAR_VIRTUAL_RECURRENCES'] = True
+    assert parse_virtual_occurrence_id(virtual_occurrence_id(42, date(9999, 12, 31))) == (42, date(9999, 12, 31))
+    assert parse_virtual_occurrence_id(-100003) is None
+    assert parse_virtual_occurrence_id(-(42 * 10 ** 7 + 9999999)) is None
+
+    with app_module.app.app_context():
+        db = app_module.db
+        user = app_module.User(username='virtual', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(app_module.CalendarEvent(user_id=user.id, title='Dentist', day=date(2031, 3, 3), order_index=2))
+        rule = app_module.RecurringEvent(
+            user_id=user.id, title='Gym', start_day=date(2031, 3, 1), frequency='daily', start_time=time(7, 0),
+        )
+        db.session.add(rule)
+        db.session.commit()
+        user_id, rule_id = user.id, rule.id
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+    response = client.get('/api/calendar/events?start=2031-03-01&end=2031-03-31')
+    assert response.status_code == 200
+    by_day = response.get_json()['events']
+    gyms = [ev for events in by_day.values() for ev in events if ev['title'] == 'Gym']
+    assert len(gyms) == 31 and all(ev['is_virtual'] and ev['id'] < 0 for ev in gyms)
+    assert next(ev for ev in by_day['2031-03-03'] if ev['title'] == 'Gym')['order_index'] == 3
+
+    day_gyms = [ev for ev in client.get('/api/calendar/events?day=2031-03-10').get_json() if ev['title'] == 'Gym']
+    assert [ev['id'] for ev in day_gyms] == [virtual_occurrence_id(rule_id, date(2031, 3, 10))]
+
+    with app_module.app.app_context():
+        assert app_module.CalendarEvent.query.filter_by(recurrence_id=rule_id).count() == 0
+
+    edited = client.put(
+        f'/api/calendar/events/{virtual_occurrence_id(rule_id, date(2031, 3, 10))}',
+        json={'status': 'done'},
+    )
+    assert edited.status_code == 200
+    assert edited.get_json()['id'] > 0 and edited.get_json()['status'] == 'done'
+    deleted = client.delete(f'/api/calendar/events/{virtual_occurrence_id(rule_id, date(2031, 3, 11))}')
+    assert deleted.status_code == 204
+    assert client.delete(f'/api/calendar/events/{virtual_occurrence_id(rule_id, date(2030, 1, 1))}').status_code == 404
+    out_of_range = -(rule_id * 10 ** 7 + 9999999)
+    assert client.put(f'/api/calendar/events/{out_of_range}', json={'status': 'done'}).status_code == 404
+    assert client.delete(f'/api/calendar/events/{out_of_range}').status_code == 404
+
+    by_day = client.get('/api/calendar/events?start=2031-03-10&end=2031-03-11').get_json()['events']
+    assert [ev.get('is_virtual', False) for ev in by_day['2031-03-10'] if ev['title'] == 'Gym'] == [False]
+    assert '2031-03-11' not in by_day
+
+    with app_module.app.app_context():
+        assert app_module.CalendarEvent.query.filter_by(recurrence_id=rule_id).count() == 1
+        assert app_module.RecurrenceException.query.filter_by(recurrence_id=rule_id).count() == 1
@@ -0,0 +1,153 @@
+import importlib
+import random
+from datetime import datetime, time, timedelta
+
+from backend.reminder_dispatcher import ReminderDispatcher, TimingWheel
+
+
+def _load_test_app(tmp_path, monkeypatch, name='reminders.db'):
+    database_path = tmp_path / name
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database_path.as_posix()}')
+    monkeypatch.setenv('BOOTSTRAP_JOBS_ON_IMPORT', '0')
+    monkeypatch.setenv('ENABLE_CALENDAR_JOBS', '0')
+
+    import app as app_module
+
+    app_module = importlib.reload(app_module)
+    app_module.app.config.update(TESTING=True)
+    return app_module
+
+
+def test_timing_wheel_fires_each_key_at_its_first_tick():
+    wheel = TimingWheel(tick_seconds=1.0, slots=8, now=1000.0)
+    rng = random.Random(7)
+    deadlines = {key: 1000 + rng.uniform(-3, 200) for key in range(300)}
+    for key, deadline in deadlines.items():
+        wheel.add(key, deadline)
+    wheel.add(0, 1500.5)  # moved past the coarse level into overflow
+    deadlines[0] = 1500.5
+    wheel.discard(1)
+    del deadlines[1]
+
+    fired = {}
+    now = 1000.0
+    while now <= 1600:
+        for key in wheel.advance(now):
+            fired[key] = now
+        now += 1.0
+    assert set(fired) == set(deadlines)
+    for key, deadline in deadlines.items():
+        assert deadline <= fired[key] < deadline + 1.0 or (deadline < 1000 and fired[key] == 1000.0)
+    assert len(wheel) == 0
+
+
+def test_timing_wheel_catches_up_after_a_long_stall():
+    wheel = TimingWheel(tick_seconds=1.0, slots=4, now=0.0)
+    wheel.add('soon', 3)
+    wheel.add('later', 40)
+    wheel.add('much_later', 5000)
+    assert wheel.advance(100) == ['soon', 'later']
+    assert 'much_later' in wheel
+    assert wheel.advance(5000) == ['much_later']
+
+
+def test_dispatcher_pulls_only_the_lookahead_window():
+    clock = [10_000.0]
+    base = datetime.utcfromtimestamp(10_000)
+    stored = {1: base + timedelta(seconds=5), 2: base + timedelta(seconds=50), 3: base + timedelta(minutes=10)}
+    requested = []
+
+    def load_due(until, batch_size):
+        requested.append(until)
+        return sorted((event_id, due) for event_id, due in stored.items() if due <= until)
+
+    fired = []
+
+    def fire(event_ids):
+        # Sending clears next_reminder_at, as the claim does.
+        fired.append(event_ids)
+        for event_id in event_ids:
+            stored.pop(event_id, None)
+
+    dispatcher = ReminderDispatcher(
+        fire=fire, load_due=load_due, lookahead_seconds=60, batch_size=10, clock=lambda: clock[0]
+    )
+    wait = dispatcher.run_pending()
+    assert requested == [base + timedelta(seconds=60)]
+    assert wait <= 1.0 and fired == []
+
+    clock[0] += 5
+    dispatcher.run_pending()
+    assert fired == [[1]]
+
+    # Written in this process after the refill: tracked without another query.
+    dispatcher.schedule(4, base + timedelta(seconds=8))
+    clock[0] += 3
+    dispatcher.run_pending()
+    assert fired == [[1], [4]] and len(requested) == 1
+
+    dispatcher.cancel(2)
+    clock[0] += 30
+    dispatcher.run_pending()
+    assert len(requested) == 2  # refill every lookahead / 2 brings event 2 back
+    clock[0] += 15
+    dispatcher.run_pending()
+    assert fired[-1] == [2]
+    assert dispatcher.stats()['fired'] == 3
+
+
+def test_due_reminders_are_claimed_once_and_missed_ones_skipped(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch)
+    import backend.app_core_logic as app_core_logic
+    app_core_logic = importlib.reload(app_core_logic)
+    pushes = []
+    monkeypatch.setattr(
+        app_core_logic, '_send_push_to_user', lambda user, title, body=None, **kwargs: pushes.append((title, kwargs))
+    )
+    db = app_module.db
+    CalendarEvent = app_module.CalendarEvent
+
+    with app_module.app.app_context():
+        user = app_module.User(username='reminders', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(app_module.NotificationSetting(user_id=user.id, push_enabled=True))
+        tomorrow = app_core_logic._now_local().date() + timedelta(days=1)
+        upcoming = CalendarEvent(user_id=user.id, title='Standup', day=tomorrow, start_time=time(9, 30),
+                                 reminder_minutes_before=15)
+        db.session.add(upcoming)
+        db.session.commit()
+        user_id = user.id
+
+        app_core_logic._schedule_reminder_job(upcoming)
+        expected = app_module.reminder_due_at(tomorrow, time(9, 30), 15, app_module.app.config['DEFAULT_TIMEZONE'])
+        assert upcoming.next_reminder_at == expected and upcoming.reminder_job_id is None
+
+        now = datetime.utcnow()
+        late = CalendarEvent(user_id=user_id, title='Call', day=tomorrow, start_time=time(8, 0),
+                             reminder_minutes_before=5, next_reminder_at=now - timedelta(minutes=2))
+        missed = CalendarEvent(user_id=user_id, title='Old', day=tomorrow, start_time=time(8, 0),
+                               reminder_minutes_before=5, next_reminder_at=now - timedelta(hours=5))
+        db.session.add_all([late, missed])
+        db.session.commit()
+        ids = [upcoming.id, late.id, missed.id]
+
+        assert app_core_logic._dispatch_due_reminders(ids) == 1
+        assert app_core_logic._dispatch_due_reminders(ids) == 0
+        assert [title for title, _ in pushes] == ['Reminder: Call']
+        rows = {ev.title: ev for ev in CalendarEvent.query.all()}
+        assert rows['Call'].reminder_sent and rows['Call'].next_reminder_at is None
+        assert rows['Old'].reminder_sent and rows['Old'].next_reminder_at is None
+        assert not rows['Standup'].reminder_sent and rows['Standup'].next_reminder_at == expected
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    response = client.post(f'/api/calendar/events/{ids[1]}/snooze', json={'snooze_minutes': 10})
+    assert response.status_code == 200
+    with app_module.app.app_context():
+        snoozed = db.session.get(CalendarEvent, ids[1])
+        assert snoozed.reminder_sent is False
+        assert snoozed.next_reminder_at == app_module.local_to_utc(
+            snoozed.reminder_snoozed_until, app_module.app.config['DEFAULT_TIMEZONE']
+        )
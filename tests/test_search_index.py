@@ -0,0 +1,137 @@
+import importlib
+from datetime import date
+
+
+def _load_test_app(tmp_path, monkeypatch, name='search.db'):
+    database_path = tmp_path / name
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database_path.as_posix()}')
+    monkeypatch.setenv('BOOTSTRAP_JOBS_ON_IMPORT', '0')
+
+    import app as app_module
+
+    app_module = importlib.reload(app_module)
+    app_module.app.config.update(TESTING=True)
+    return app_module
+
+
+def test_full_text_search_tracks_orm_writes_and_ranks_titles(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch)
+    from backend.search_index import rebuild_search_index, search_backend, search_hits
+
+    with app_module.app.app_context():
+        db = app_module.db
+        assert search_backend() == 'fts5'
+        user = app_module.User(username='searcher', password_hash='x')
+        other = app_module.User(username='other', password_hash='x')
+        db.session.add_all([user, other])
+        db.session.flush()
+        todo_list = app_module.TodoList(title='Errands', user_id=user.id)
+        other_list = app_module.TodoList(title='Theirs', user_id=other.id)
+        db.session.add_all([todo_list, other_list])
+        db.session.flush()
+        in_title = app_module.TodoItem(list_id=todo_list.id, content='Buy oat milk')
+        in_body = app_module.TodoItem(list_id=todo_list.id, content='Groceries', description='remember the oat milk')
+        foreign = app_module.TodoItem(list_id=other_list.id, content='Buy oat milk too')
+        note = app_module.Note(user_id=user.id, title='Breakfast ideas', content='<p>Overnight <b>oats</b> &amp; berries</p>')
+        event = app_module.CalendarEvent(user_id=user.id, title='Dentist', description='Bring insurance card', day=date(2026, 3, 2))
+        db.session.add_all([in_title, in_body, foreign, note, event])
+        db.session.commit()
+        user_id, item_ids = user.id, (in_title.id, in_body.id)
+
+        hits = search_hits(user_id, 'OAT Mil', ['todo_item'])
+        assert [hit.entity_id for hit in hits] == list(item_ids)
+        assert '<mark>oat</mark>' in hits[1].snippet
+        assert [hit.entity_type for hit in search_hits(user_id, 'oats berries')] == ['note']
+        assert search_hits(user_id, 'oats', ['note'], title_only=True) == []
+        assert search_hits(user_id, '%%') is None
+
+        in_body.description = 'nothing relevant'
+        db.session.delete(in_title)
+        event.title = 'Dentist checkup'
+        db.session.commit()
+        assert search_hits(user_id, 'oat', ['todo_item']) == []
+        assert [hit.entity_id for hit in search_hits(user_id, 'checkup')] == [event.id]
+
+        assert rebuild_search_index(user_id) == 3
+        assert [hit.entity_id for hit in search_hits(user_id, 'insurance')] == [event.id]
+        assert len(search_hits(other.id, 'oat')) == 1
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    payload = client.get('/api/search?q=dentist').get_json()
+    assert payload['items'] == []
+    assert payload['notes'] == []
+    calendar = client.get('/api/calendar/search?q=insur').get_json()
+    assert [row['type'] for row in calendar['results']] == ['event']
+    assert '<mark>insurance</mark>' in calendar['results'][0]['snippet']
+    notes = client.get('/api/notes?all=1&search=break').get_json()
+    assert [n['title'] for n in notes] == ['Breakfast ideas']
+
+
+def test_search_filters_apply_before_the_candidate_limit_and_rebuild_runs_per_user(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, name='search-within.db')
+    from backend.search_index import rebuild_search_index, search_entity_ids, search_hits
+
+    with app_module.app.app_context():
+        db = app_module.db
+        user = app_module.User(username='filterer', password_hash='x')
+        gone = app_module.User(username='gone', password_hash='x')
+        db.session.add_all([user, gone])
+        db.session.flush()
+        todo_list = app_module.TodoList(title='Errands', user_id=user.id)
+        gone_list = app_module.TodoList(title='Old', user_id=gone.id)
+        db.session.add_all([todo_list, gone_list])
+        db.session.flush()
+        done = [
+            app_module.TodoItem(list_id=todo_list.id, content=f'Oat milk {n}', status='done') for n in range(5)
+        ]
+        open_item = app_module.TodoItem(list_id=todo_list.id, content='Oat milk, oat bars and more', status='not_started')
+        db.session.add_all(done + [open_item, app_module.TodoItem(list_id=gone_list.id, content='Oat milk')])
+        db.session.commit()
+        user_id, gone_id, open_id = user.id, gone.id, open_item.id
+
+        within = db.session.query(app_module.TodoItem.id).filter(app_module.TodoItem.status == 'not_started')
+        assert list(search_entity_ids(user_id, 'oat', 'todo_item', limit=1, within=within)) == [open_id]
+
+        db.session.execute(db.text('DELETE FROM todo_item WHERE list_id = :list_id'), {'list_id': gone_list.id})
+        db.session.execute(db.text('DELETE FROM todo_list WHERE id = :list_id'), {'list_id': gone_list.id})
+        db.session.execute(db.text('DELETE FROM "user" WHERE id = :user_id'), {'user_id': gone_id})
+        db.session.commit()
+        assert len(search_hits(gone_id, 'oat')) == 1
+        assert rebuild_search_index() == 6
+        assert search_hits(gone_id, 'oat') == []
+        assert len(search_hits(user_id, 'oat')) == 6
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    items = client.get('/api/items?q=oat&status=not_started&limit=1').get_json()
+    assert [item['id'] for item in items] == [open_id]
+
+
+def test_search_endpoint_ranks_each_type_separately(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, name='search-types.db')
+
+    with app_module.app.app_context():
+        db = app_module.db
+        user = app_module.User(username='mixed', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        todo_list = app_module.TodoList(title='Pantry', user_id=user.id)
+        db.session.add(todo_list)
+        db.session.flush()
+        db.session.add_all([
+            app_module.TodoItem(list_id=todo_list.id, content=f'Oat oat oat restock {n}') for n in range(12)
+        ])
+        note = app_module.Note(user_id=user.id, title='Porridge', content='<p>Soak the oat flakes overnight</p>')
+        db.session.add(note)
+        db.session.commit()
+        user_id, note_id = user.id, note.id
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    payload = client.get('/api/search?q=oat&item_limit=2').get_json()
+    assert len(payload['items']) == 2
+    assert [n['id'] for n in payload['notes']] == [note_id]
@@ -0,0 +1,79 @@
+import importlib
+
+
+def _load_test_app(tmp_path, monkeypatch, name='titles.db'):
+    database_path = tmp_path / name
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database_path.as_posix()}')
+    monkeypatch.setenv('BOOTSTRAP_JOBS_ON_IMPORT', '0')
+
+    import app as app_module
+
+    app_module = importlib.reload(app_module)
+    app_module.app.config.update(TESTING=True)
+    return app_module
+
+
+def test_suggest_serves_title_prefixes_and_drops_stale_entries_on_commit(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, name='suggest.db')
+    from backend.title_index import invalidate_title_index
+
+    invalidate_title_index()
+    with app_module.app.app_context():
+        db = app_module.db
+        user = app_module.User(username='typer', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all([
+            app_module.TodoList(title='Grocery run', user_id=user.id),
+            app_module.Note(user_id=user.id, title='Garden groceries'),
+            app_module.Area(user_id=user.id, name='Café plans'),
+            app_module.BookmarkItem(user_id=user.id, title='Gross margin calculator', value='https://example.com'),
+        ])
+        db.session.commit()
+        user_id = user.id
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+    def titles(query):
+        return [row['title'] for row in client.get(f'/api/suggest?{query}').get_json()['results']]
+
+    assert titles('q=gro') == ['Grocery run', 'Gross margin calculator', 'Garden groceries']
+    assert titles('q=gar gro') == ['Garden groceries']
+    assert titles('q=gro&types=note') == ['Garden groceries']
+    assert titles('q=cafe') == ['Café plans']
+    fuzzy = client.get('/api/suggest?q=grocey').get_json()['results']
+    assert fuzzy and all(row.get('fuzzy') for row in fuzzy)
+    assert client.get('/api/suggest?q=x&types=bogus').status_code == 400
+
+    with app_module.app.app_context():
+        note = app_module.Note.query.filter_by(user_id=user_id).one()
+        note.title = 'Orchard notes'
+        app_module.db.session.commit()
+    assert titles('q=gro&types=note') == []
+    assert titles('q=orch') == ['Orchard notes']
+
+
+def test_suggest_filters_types_and_tokens_before_the_candidate_cap(tmp_path, monkeypatch):
+    app_module = _load_test_app(tmp_path, monkeypatch, name='suggest-cap.db')
+    import backend.title_index as title_index
+
+    title_index.invalidate_title_index()
+    monkeypatch.setattr(title_index, 'MAX_CANDIDATES', 3)
+    with app_module.app.app_context():
+        db = app_module.db
+        user = app_module.User(username='capped', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all([app_module.TodoList(title=f'Groc{n} run', user_id=user.id) for n in range(6)])
+        db.session.add_all([
+            app_module.Note(user_id=user.id, title='Groceries for the week'),
+            app_module.TodoList(title='Grocery week plan', user_id=user.id),
+        ])
+        db.session.commit()
+
+        notes = title_index.suggest_titles(user.id, 'groc', ['note'])
+        assert [row['title'] for row in notes] == ['Groceries for the week']
+        weekly = title_index.suggest_titles(user.id, 'groc week')
+        assert sorted(row['title'] for row in weekly) == ['Groceries for the week', 'Grocery week plan']
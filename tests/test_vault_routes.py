@@ -192,3 +192,78 @@ def test_vault_folder_move_restore_and_recursive_delete(tmp_path, monkeypatch):
         assert app_module.db.session.get(app_module.DocumentFolder, root_id) is None
         assert app_module.db.session.get(app_module.DocumentFolder, child_id) is None
         assert app_module.db.session.get(app_module.Document, document_id) is None
+
+
+def test_vault_search_matches_extracted_document_text(tmp_path, monkeypatch):
+    app_module, vault_path = _load_test_app(tmp_path, monkeypatch)
+    import backend.vault_text as vault_text
+    from backend.vault_text import extract_pending_document_text
+    from models import DocumentText
+
+    monkeypatch.setattr(vault_text, 'MAX_READ_BYTES', 120)
+
+    with app_module.app.app_context():
+        user = _create_user(app_module, 'vault-searcher')
+        app_module.db.session.commit()
+        user_id = user.id
+        user_vault = vault_path / str(user_id)
+        user_vault.mkdir(parents=True)
+        files = {
+            'minutes.md': 'Quarterly budget review with the finance team.' + ' filler' * 20 + ' overflowword',
+            'page.html': '<html><script>var budgetSecret = 1;</script><p>Garden &amp; budget plans</p></html>',
+            'photo.jpg': 'not text',
+        }
+        for name, body in files.items():
+            (user_vault / name).write_text(body, encoding='utf-8')
+            app_module.db.session.add(app_module.Document(
+                user_id=user_id,
+                title=name.split('.')[0].title(),
+                original_filename=name,
+                stored_filename=name,
+                file_type='text/plain',
+                file_extension=name.rsplit('.', 1)[1],
+                file_size=len(body),
+            ))
+        app_module.db.session.commit()
+
+        assert extract_pending_document_text(lambda uid: str(vault_path / str(uid)), workers=2, batch_size=1) == 2
+        assert extract_pending_document_text(lambda uid: str(vault_path / str(uid))) == 0
+        texts = {row.stored_filename: row for row in DocumentText.query.all()}
+        assert texts['minutes.md'].truncated is True
+        assert 'overflowword' not in texts['minutes.md'].content
+        assert 'budgetSecret' not in texts['page.html'].content
+
+    client = app_module.app.test_client()
+    _login(client, user_id)
+    results = client.get('/api/vault/search?q=budget').get_json()
+    assert sorted(doc['original_filename'] for doc in results) == ['minutes.md', 'page.html']
+    assert all('<mark>budget</mark>' in doc['snippet'] for doc in results)
+    assert client.get('/api/vault/search?q=overflowword').get_json() == []
+    assert [doc['title'] for doc in client.get('/api/vault/search?q=phot').get_json()] == ['Photo']
+
+
+def test_pdf_text_fallback_reads_flate_content_streams():
+    import zlib
+
+    from backend.vault_text import _pdf_text_fallback
+
+    content = zlib.compress(b"BT /F1 12 Tf (Invoice \\(paid\\)) Tj [(Tot) -20 (al due)] TJ ET")
+    data = b"%PDF-1.4\n1 0 obj << /Filter /FlateDecode >>\nstream\n" + content + b"\nendstream\nendobj\n"
+    assert _pdf_text_fallback(data) == 'Invoice (paid) Total due'
+
+
+def test_pdf_text_fallback_bounds_inflated_streams_and_tolerates_bad_escapes(monkeypatch):
+    import zlib
+
+    import backend.vault_text as vault_text
+
+    plain = b"BT (Esc \\8\\9 \\101) Tj ET"
+    data = b"stream\n" + zlib.compress(plain) + b"\nendstream\n"
+    assert vault_text._pdf_text_fallback(data) == 'Esc 89 A'
+
+    monkeypatch.setattr(vault_text, 'MAX_TEXT_CHARS', 40)
+    monkeypatch.setattr(vault_text, 'MAX_PDF_STREAM_BYTES', 1000)
+    bomb = zlib.compress(b"BT (word) Tj ET " * 100_000)
+    data = (b"stream\n" + bomb + b"\nendstream\n") * 3
+    text = vault_text._pdf_text_fallback(data)
+    assert 0 < len(text) <= 45 and set(text.split()) == {'word'}